@@ -91,6 +91,11 @@
         AtomicID::registerId(-1232,"Tile")+
         AtomicID::registerId(-1219,"Suspend")+
         AtomicID::registerId(-1239,"Resume")+
+        AtomicID::registerId(-1741,"Depth")+
+        AtomicID::registerId(-1070,"Max")+
+        AtomicID::registerId(-1163,"Num")+
+        AtomicID::registerId(-1126,"Time")+
+        AtomicID::registerId(-1815,"Rate")+
     0;
     return res;
   }
@@ -93,6 +93,11 @@ const int AidDefault_int = -1221;
 const DMI::AtomicID AidDelete(-1336);             // from /home/oms/LOFAR/Timba/MEQ/src/Forest.h:31
 const int AidDelete_int = -1336;
 #endif
+#ifndef _defined_id_AidDepth
+#define _defined_id_AidDepth 1
+const DMI::AtomicID AidDepth(-1741);              // from /home/oms/LOFAR/Timba/AppAgent/AppAgent/src/MTQueueChannel.h:34
+const int AidDepth_int = -1741;
+#endif
 #ifndef _defined_id_AidDestination
 #define _defined_id_AidDestination 1
 const DMI::AtomicID AidDestination(-1495);        // from /home/oms/LOFAR/Timba/AppAgent/AppAgent/src/AppEventSink.h:30
@@ -193,6 +198,11 @@ const int AidMT_int = -1604;
 const DMI::AtomicID AidMap(-1216);                // from /home/oms/LOFAR/Timba/AppAgent/AppAgent/src/OctoEventSink.h:12
 const int AidMap_int = -1216;
 #endif
+#ifndef _defined_id_AidMax
+#define _defined_id_AidMax 1
+const DMI::AtomicID AidMax(-1070);                // from /home/oms/LOFAR/Timba/AppAgent/AppAgent/src/MTQueueChannel.h:34
+const int AidMax_int = -1070;
+#endif
 #ifndef _defined_id_AidMode
 #define _defined_id_AidMode 1
 const DMI::AtomicID AidMode(-1215);               // from /home/oms/LOFAR/Timba/AppAgent/AppAgent/src/BOIOSink.h:9
@@ -213,6 +223,11 @@ const int AidNormal_int = -1223;
 const DMI::AtomicID AidNotify(-1210);             // from /home/oms/LOFAR/Timba/AppAgent/AppAgent/src/AppControlAgent.h:20
 const int AidNotify_int = -1210;
 #endif
+#ifndef _defined_id_AidNum
+#define _defined_id_AidNum 1
+const DMI::AtomicID AidNum(-1163);                // from /home/oms/LOFAR/Timba/AppAgent/AppAgent/src/MTQueueChannel.h:34
+const int AidNum_int = -1163;
+#endif
 #ifndef _defined_id_AidOn
 #define _defined_id_AidOn 1
 const DMI::AtomicID AidOn(-1641);                 // from /home/oms/LOFAR/Timba/AppAgent/AppAgent/src/EventChannel.h:34
@@ -253,6 +268,11 @@ const int AidPriority_int = -1244;
 const DMI::AtomicID AidQueue(-1469);              // from /home/oms/LOFAR/Timba/MeqServer/src/Spigot.h:8
 const int AidQueue_int = -1469;
 #endif
+#ifndef _defined_id_AidRate
+#define _defined_id_AidRate 1
+const DMI::AtomicID AidRate(-1815);               // from /home/oms/LOFAR/Timba/AppAgent/AppAgent/src/MTQueueChannel.h:34
+const int AidRate_int = -1815;
+#endif
 #ifndef _defined_id_AidReceive
 #define _defined_id_AidReceive 1
 const DMI::AtomicID AidReceive(-1236);            // from /home/oms/LOFAR/Timba/AppAgent/AppAgent/src/OctoEventSink.h:12
@@ -293,6 +313,11 @@ const int AidText_int = -1055;
 const DMI::AtomicID AidTile(-1232);               // from /home/oms/LOFAR/Timba/AppAgent/AppAgent/src/VisAgentVocabulary.h:11
 const int AidTile_int = -1232;
 #endif
+#ifndef _defined_id_AidTime
+#define _defined_id_AidTime 1
+const DMI::AtomicID AidTime(-1126);               // from /home/oms/LOFAR/Timba/AppAgent/AppAgent/src/MTQueueChannel.h:34
+const int AidTime_int = -1126;
+#endif
 #ifndef _defined_id_AidType
 #define _defined_id_AidType 1
 const DMI::AtomicID AidType(-1085);               // from /home/oms/LOFAR/Timba/OCTOPUSSY/src/Gateways.h:24
@@ -25,6 +25,8 @@
 
 #include "MTQueueChannel.h"
 #include "AID-AppAgent.h"
+#include <DMI/Record.h>
+#include <sys/time.h>
 
     
 namespace AppAgent
@@ -37,6 +39,13 @@ using namespace EventChannelVocabulary;
 
 const HIID FQueueInit = AidQueue|AidInit;
 
+static inline double wallTime ()
+{
+  struct timeval tv;
+  gettimeofday(&tv,0);
+  return tv.tv_sec + tv.tv_usec*1e-6;
+}
+
 MTQueueChannel::MTQueueChannel (const EventChannel::Ref &channel)
 {
   remote_chanref_ = channel;
@@ -44,6 +53,9 @@ MTQueueChannel::MTQueueChannel (const EventChannel::Ref &channel)
   setState(CLOSED);
   remote_thread_ = 0;
   aborted_ = false;
+  posting_ = false;
+  max_post_depth_ = num_posted_ = 0;
+  post_time_ = 0;
 }
 
 MTQueueChannel::MTQueueChannel (EventChannel *pchannel)
@@ -51,6 +63,10 @@ MTQueueChannel::MTQueueChannel (EventChannel *pchannel)
   remote_chanref_ <<= premote_ = pchannel;
   setState(CLOSED);
   remote_thread_ = 0;
+  aborted_ = false;
+  posting_ = false;
+  max_post_depth_ = num_posted_ = 0;
+  post_time_ = 0;
 }
 
 MTQueueChannel::~MTQueueChannel ()
@@ -83,6 +99,10 @@ int MTQueueChannel::init (const DMI::Record &data)
   FailWhen(queue_size_<1,"illegal queue size");
   post_queue_.clear();
   get_queue_.clear();
+  posting_ = false;
+  max_post_depth_ = 0;
+  num_posted_ = 0;
+  post_time_ = 0;
   // launch worker thread
   initrec_.attach(data);
   remote_initialized_ = false;
@@ -140,7 +160,9 @@ void * MTQueueChannel::runWorker ()
       // we post the event, so that main
       // thread has a chance to post something else
       raiseEventFlag();
+      posting_ = true;
       lock.release();
+      double t0 = wallTime();
       try
       {
         remote().postEvent(qe.id,qe.data,qe.category,qe.addr);
@@ -148,11 +170,18 @@ void * MTQueueChannel::runWorker ()
       catch( std::exception &exc )
       {
         lock.lock(eventFlag().condVar());
+        posting_ = false;
         err_queue_.add(exc);
         eventFlag().condVar().broadcast();
         continue;
       }
+      double dt = wallTime() - t0;
       lock.lock(eventFlag().condVar());
+      posting_ = false;
+      num_posted_++;
+      post_time_ += dt;
+      // wake up flush(), if waiting
+      eventFlag().condVar().broadcast();
     }
     // clear our event flag since our queue is clear
     clearEventFlag();
@@ -235,6 +264,8 @@ void MTQueueChannel::postEvent (const HIID &id,const ObjRef &data,
   qe.data = data;
   qe.category = category;
   qe.addr = destination;
+  if( post_queue_.size() > max_post_depth_ )
+    max_post_depth_ = post_queue_.size();
   // raise event flag to wake up remote thread
   raiseEventFlag();
 }
@@ -360,13 +391,35 @@ bool MTQueueChannel::isEventBound (const HIID &id,AtomicID category)
 
 void MTQueueChannel::flush ()
 {
-  // flush the post queue
+  // flush the post queue, and wait for the last event to be posted.
+  // If the remote channel has thrown an error, the worker stops posting
+  // until the error has been picked up (by the next call that checks the
+  // error queue), so don't wait for it then
   Thread::Mutex::Lock lock(eventFlag().condVar());
   assureRemoteInit();
-  while( !aborted_ && !post_queue_.empty() )
+  while( !aborted_ && ( !post_queue_.empty() || posting_ ) && err_queue_.empty() )
     eventFlag().condVar().wait();
 }
 
+void MTQueueChannel::setQueueSize (uint size)
+{
+  FailWhen(size<1,"illegal queue size");
+  Thread::Mutex::Lock lock(eventFlag().condVar());
+  queue_size_ = size;
+  // wake up anyone waiting for space in a queue
+  eventFlag().condVar().broadcast();
+}
+
+void MTQueueChannel::fillStats (DMI::Record &rec) const
+{
+  Thread::Mutex::Lock lock(eventFlag().condVar());
+  rec[FQueueDepth] = int(post_queue_.size());
+  rec[FMaxQueueDepth] = int(max_post_depth_);
+  rec[FNumPosted] = num_posted_;
+  rec[FPostTime] = post_time_;
+  rec[FPostRate] = post_time_ > 0 ? num_posted_/post_time_ : 0.;
+}
+
 
 
 }
@@ -31,6 +31,7 @@
 
 #pragma aidgroup AppAgent
 #pragma aid MT Queue Size Init
+#pragma aid Depth Max Num Time Rate
 
 namespace AppAgent
 {    
@@ -38,6 +39,13 @@ namespace AppAgent
 namespace EventChannelVocabulary
 {
   const HIID FMTQueueSize  = AidMT|AidQueue|AidSize;
+
+  // statistics of posted events, see MTQueueChannel::fillStats()
+  const HIID FQueueDepth    = AidQueue|AidDepth;
+  const HIID FMaxQueueDepth = AidMax|AidQueue|AidDepth;
+  const HIID FNumPosted     = AidNum|AidPost;
+  const HIID FPostTime      = AidPost|AidTime;
+  const HIID FPostRate      = AidPost|AidRate;
   
   const int DEFAULT_QUEUE_SIZE = 256;
 };
@@ -52,6 +60,8 @@ namespace EventChannelVocabulary
 //## queue size. Once either queue reaches this size, the sending end 
 //## is blocked until the queue becomes smaller.
 //## The rest of the record is passed on to the other channel.
+//## flush() is a barrier: it returns once all events posted so far have
+//## been posted to the other channel.
 
 class MTQueueChannel : public EventChannel
 {
@@ -134,6 +144,14 @@ class MTQueueChannel : public EventChannel
     //## are not.
     virtual bool isAsynchronous() const
     { return true; }
+    
+    //## changes the maximum queue size
+    void setQueueSize (uint size);
+    
+    //## fills record with statistics of posted events: current and maximum
+    //## depth of the post queue, number of events posted to the other 
+    //## channel, time spent posting them, and the resulting rate (events/s)
+    void fillStats (DMI::Record &rec) const;
       
     //##ModelId=3E394D4C02DE
     virtual string sdebug ( int = 1,const string & = "",
@@ -185,6 +203,14 @@ class MTQueueChannel : public EventChannel
     // max queue size 
     uint queue_size_;
     
+    // flag: worker is posting an event to the remote channel
+    bool posting_;
+    
+    // statistics of posted events
+    uint   max_post_depth_;
+    int    num_posted_;
+    double post_time_;
+    
     Thread::ThrID remote_thread_;
     
     DMI::Record::Ref initrec_;
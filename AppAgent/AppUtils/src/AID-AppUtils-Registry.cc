@@ -63,6 +63,16 @@
         AtomicID::registerId(-1553,"Cwd")+
         AtomicID::registerId(-1730,"Apply")+
         AtomicID::registerId(-1731,"Hanning")+
+        AtomicID::registerId(-1814,"Prefetch")+
+        AtomicID::registerId(-1741,"Depth")+
+        AtomicID::registerId(-1488,"Read")+
+        AtomicID::registerId(-1531,"Stats")+
+        AtomicID::registerId(-1625,"Chunks")+
+        AtomicID::registerId(-1791,"Blocked")+
+        AtomicID::registerId(-1818,"Ifrs")+
+        AtomicID::registerId(-1819,"Columns")+
+        AtomicID::registerId(-1153,"Row")+
+        AtomicID::registerId(-1061,"Index")+
     0;
     return res;
   }
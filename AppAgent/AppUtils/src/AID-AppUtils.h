@@ -23,11 +23,21 @@ const int AidAuto_int = -1213;
 const DMI::AtomicID AidBitflag(-1743);            // from /home/oms/Timba/AppAgent/AppUtils/src/MSChannelVocabulary.h:36
 const int AidBitflag_int = -1743;
 #endif
+#ifndef _defined_id_AidBlocked
+#define _defined_id_AidBlocked 1
+const DMI::AtomicID AidBlocked(-1791);            // from /home/oms/LOFAR/Timba/AppAgent/AppUtils/src/MSChannelVocabulary.h:40
+const int AidBlocked_int = -1791;
+#endif
 #ifndef _defined_id_AidCalibrated
 #define _defined_id_AidCalibrated 1
 const DMI::AtomicID AidCalibrated(-1275);         // from /home/oms/LOFAR/Timba/AppAgent/AppUtils/src/MSVisAgentVocabulary.h:39
 const int AidCalibrated_int = -1275;
 #endif
+#ifndef _defined_id_AidChunks
+#define _defined_id_AidChunks 1
+const DMI::AtomicID AidChunks(-1625);             // from /home/oms/LOFAR/Timba/AppAgent/AppUtils/src/MSChannelVocabulary.h:40
+const int AidChunks_int = -1625;
+#endif
 #ifndef _defined_id_AidClear
 #define _defined_id_AidClear 1
 const DMI::AtomicID AidClear(-1353);              // from /home/oms/LOFAR/Timba/MEQ/src/MeqVocabulary.h:39
@@ -38,6 +48,11 @@ const int AidClear_int = -1353;
 const DMI::AtomicID AidColumn(-1258);             // from /home/oms/LOFAR/Timba/AppAgent/AppUtils/src/MSVisAgentVocabulary.h:34
 const int AidColumn_int = -1258;
 #endif
+#ifndef _defined_id_AidColumns
+#define _defined_id_AidColumns 1
+const DMI::AtomicID AidColumns(-1819);            // from /home/oms/LOFAR/Timba/AppAgent/AppUtils/src/MSChannelVocabulary.h:42
+const int AidColumns_int = -1819;
+#endif
 #ifndef _defined_id_AidCorr
 #define _defined_id_AidCorr 1
 const DMI::AtomicID AidCorr(-1188);               // from /home/oms/LOFAR/Timba/VisCube/src/VisVocabulary.h:28
@@ -58,6 +73,11 @@ const int AidDDID_int = -1270;
 const DMI::AtomicID AidData(-1103);               // from /home/oms/LOFAR/Timba/OCTOPUSSY/test/EchoWP.h:11
 const int AidData_int = -1103;
 #endif
+#ifndef _defined_id_AidDepth
+#define _defined_id_AidDepth 1
+const DMI::AtomicID AidDepth(-1741);              // from /home/oms/LOFAR/Timba/AppAgent/AppUtils/src/MSChannelVocabulary.h:40
+const int AidDepth_int = -1741;
+#endif
 #ifndef _defined_id_AidDomain
 #define _defined_id_AidDomain 1
 const DMI::AtomicID AidDomain(-1256);             // from /home/oms/LOFAR/Timba/AppAgent/AppUtils/src/MSVisAgentVocabulary.h:37
@@ -103,11 +123,21 @@ const int AidFormat_int = -1261;
 const DMI::AtomicID AidHanning(-1731);            // from /home/oms/Timba/AppAgent/AppUtils/src/MSChannelVocabulary.h:38
 const int AidHanning_int = -1731;
 #endif
+#ifndef _defined_id_AidIfrs
+#define _defined_id_AidIfrs 1
+const DMI::AtomicID AidIfrs(-1818);               // from /home/oms/LOFAR/Timba/AppAgent/AppUtils/src/MSChannelVocabulary.h:42
+const int AidIfrs_int = -1818;
+#endif
 #ifndef _defined_id_AidIncrement
 #define _defined_id_AidIncrement 1
 const DMI::AtomicID AidIncrement(-1598);          // from /home/oms/LOFAR/Timba/AppAgent/AppUtils/src/MSVisAgentVocabulary.h:34
 const int AidIncrement_int = -1598;
 #endif
+#ifndef _defined_id_AidIndex
+#define _defined_id_AidIndex 1
+const DMI::AtomicID AidIndex(-1061);              // from /home/oms/LOFAR/Timba/AppAgent/AppUtils/src/MSChannelVocabulary.h:42
+const int AidIndex_int = -1061;
+#endif
 #ifndef _defined_id_AidInput
 #define _defined_id_AidInput 1
 const DMI::AtomicID AidInput(-1036);              // from /home/oms/LOFAR/Timba/OCTOPUSSY/src/WPInterface.h:23
@@ -178,16 +208,31 @@ const int AidPhases_int = -1755;
 const DMI::AtomicID AidPredict(-1265);            // from /home/oms/LOFAR/Timba/AppAgent/AppUtils/src/MSVisAgentVocabulary.h:36
 const int AidPredict_int = -1265;
 #endif
+#ifndef _defined_id_AidPrefetch
+#define _defined_id_AidPrefetch 1
+const DMI::AtomicID AidPrefetch(-1814);           // from /home/oms/LOFAR/Timba/AppAgent/AppUtils/src/MSChannelVocabulary.h:40
+const int AidPrefetch_int = -1814;
+#endif
 #ifndef _defined_id_AidRaw
 #define _defined_id_AidRaw 1
 const DMI::AtomicID AidRaw(-1132);                // from /home/oms/LOFAR/Timba/VisCube/src/VisVocabulary.h:26
 const int AidRaw_int = -1132;
 #endif
+#ifndef _defined_id_AidRead
+#define _defined_id_AidRead 1
+const DMI::AtomicID AidRead(-1488);               // from /home/oms/LOFAR/Timba/AppAgent/AppUtils/src/MSChannelVocabulary.h:40
+const int AidRead_int = -1488;
+#endif
 #ifndef _defined_id_AidResiduals
 #define _defined_id_AidResiduals 1
 const DMI::AtomicID AidResiduals(-1259);          // from /home/oms/LOFAR/Timba/AppAgent/AppUtils/src/MSVisAgentVocabulary.h:36
 const int AidResiduals_int = -1259;
 #endif
+#ifndef _defined_id_AidRow
+#define _defined_id_AidRow 1
+const DMI::AtomicID AidRow(-1153);                // from /home/oms/LOFAR/Timba/AppAgent/AppUtils/src/MSChannelVocabulary.h:42
+const int AidRow_int = -1153;
+#endif
 #ifndef _defined_id_AidSegments
 #define _defined_id_AidSegments 1
 const DMI::AtomicID AidSegments(-1287);           // from /home/oms/LOFAR/Timba/MEQ/src/MeqVocabulary.h:34
@@ -218,6 +263,11 @@ const int AidSnippet_int = -1621;
 const DMI::AtomicID AidStart(-1106);              // from /home/oms/LOFAR/Timba/OCTOGlish/src/GlishClientWP.h:21
 const int AidStart_int = -1106;
 #endif
+#ifndef _defined_id_AidStats
+#define _defined_id_AidStats 1
+const DMI::AtomicID AidStats(-1531);              // from /home/oms/LOFAR/Timba/AppAgent/AppUtils/src/MSChannelVocabulary.h:40
+const int AidStats_int = -1531;
+#endif
 #ifndef _defined_id_AidString
 #define _defined_id_AidString 1
 const DMI::AtomicID AidString(-48);               // from /home/oms/LOFAR/Timba/DMI/src/TypeId.h:109
@@ -37,6 +37,8 @@
 #pragma aid Time Data Predict Residuals Column Name Message Type
 #pragma aid Throw Error Domain start string Original Shape Flip Clear Extent
 #pragma aid Raw Non Calibrated Predict Residuals Iteration Cwd Apply Hanning
+#pragma aid Prefetch Depth Read Stats Chunks Blocked
+#pragma aid Ifrs Columns Row Index
 
 namespace AppAgent
 {
@@ -71,6 +73,16 @@ namespace MSChannel
        FApplyHanning      = AidApply|AidHanning,
        FChannelWidth      = AidChannel|AidWidth,
        FInvertPhases      = AidInvert|AidPhases,
+       FPrefetchDepth     = AidPrefetch|AidDepth,
+       FReadIfrs          = AidRead|AidIfrs,
+       FReadColumns       = AidRead|AidColumns,
+       FRowIndex          = AidRow|AidIndex,
+
+       FReadStats         = AidRead|AidStats,
+       FNumChunks         = AidNum|AidChunks,
+       FReadTime          = AidRead|AidTime,
+       FBlockedTime       = AidBlocked|AidTime,
+       FNumBlocked        = AidNum|AidBlocked,
 
        FOutputParams      = AidMS|AidOutput|AidParams,
 
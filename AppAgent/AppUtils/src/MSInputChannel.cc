@@ -44,6 +44,7 @@
 #include <measures/Measures/Stokes.h>
 #include <casa/Quanta/MVPosition.h>
 #include <casa/Containers/Record.h>
+#include <casa/Arrays/ArrayMath.h>
 #include <tables/Tables/ArrColDesc.h>
 #include <tables/Tables/ArrayColumn.h>
 #include <tables/Tables/ColumnDesc.h>
@@ -52,6 +53,11 @@
 #include <tables/Tables/SetupNewTab.h>
 #include <tables/Tables/TableParse.h>
 #include <unistd.h>
+#include <stdio.h>
+#include <string.h>
+#include <sys/time.h>
+#include <algorithm>
+#include <set>
 
 using namespace casa;
 
@@ -89,10 +95,23 @@ using namespace AppEvent;
 using namespace VisData;
 using namespace MSChannel;
 
+static inline double wallTime ()
+{
+  struct timeval tv;
+  gettimeofday(&tv,0);
+  return tv.tv_sec + tv.tv_usec*1e-6;
+}
+
 //##ModelId=3DF9FECD0219
 MSInputChannel::MSInputChannel ()
-    : FileChannel(),obsid_(0)
+    : FileChannel(),obsid_(0),prefetch_depth_(0),prefetch_stop_(false),
+      prefetch_thread_(0)
+{
+}
+
+MSInputChannel::~MSInputChannel ()
 {
+  stopPrefetch();
 }
 
 
@@ -218,14 +237,6 @@ void MSInputChannel::openMS (DMI::Record &header,const DMI::Record &select)
   // figure out max ifr index
   num_ifrs_ = ifrNumber(num_antennas_-1,num_antennas_-1) + 1;
 
-  // We only handle the given field & data desc id
-  TableExprNode expr = ( ms_.col("FIELD_ID") == fieldid && ms_.col("DATA_DESC_ID") == ddid );
-  if( !autocorr )
-    expr = expr && ms_.col("ANTENNA1") != ms_.col("ANTENNA2");
-  selms_ = ms_(expr);
-  // sort by time
-  selms_.sort("TIME");
-
   vdsid_ = VDSID(obsid_++,0,0);
   header[FVDSID] = static_cast<HIID&>(vdsid_);
   header[FDDID] = ddid;
@@ -239,29 +250,84 @@ void MSInputChannel::openMS (DMI::Record &header,const DMI::Record &select)
   header[FChannelIncrement]  = channel_incr_;
   header[FTimeIncrement] = time_incr_;
   
-  // get and apply selection string
+  // get selection string
   String where = select[FSelectionString].as<string>("");
   dprintf(1)("select ddid=%d, field=%d, where=\"%s\", channels=[%d:%d]\n",
       ddid,fieldid,where.c_str(),channels_[0],channels_[1]);
-  if( where.empty() )
+  // The selected rows, grouped by timeslot, are kept in an index file
+  // inside the MS, so that we only have to scan the MS the first time
+  // around. The key identifies the selection that the index was made for.
+  // An index is only valid for as long as the columns it was made from do
+  // not change, which we can't tell for an arbitrary selection string, so
+  // in that case the MS is always scanned.
+  bool use_index = use_row_index_ && where.empty();
+  string key = Debug::ssprintf("ddid=%d field=%d autocorr=%d antennas=%d",
+                        ddid,fieldid,int(autocorr),num_antennas_);
+  string index_file = msname_ + Debug::ssprintf("/MEQ_ROWINDEX_%d_%d_%d",
+                        ddid,fieldid,int(autocorr));
+  RowIndex index;
+  if( use_index && readRowIndex(index,index_file,key) )
   {
-    tableiter_  = TableIterator(selms_, "TIME");
+    dprintf(1)("using row index %s\n",index_file.c_str());
   }
   else
   {
-    selms_ = tableCommand ("select from $1 where " + where, selms_).table();
-    FailWhen( !selms_.nrow(),"selection yields empty table" );
-    tableiter_  = TableIterator(selms_, "TIME");
+    // We only handle the given field & data desc id
+    TableExprNode expr = ( ms_.col("FIELD_ID") == fieldid && ms_.col("DATA_DESC_ID") == ddid );
+    if( !autocorr )
+      expr = expr && ms_.col("ANTENNA1") != ms_.col("ANTENNA2");
+    Table sel = ms_(expr);
+    // apply selection string
+    if( !where.empty() )
+      sel = tableCommand("select from $1 where " + where,sel).table();
+    scanRowIndex(index,sel);
+    // failure to write the index (e.g. a read-only MS) is not an error
+    if( use_index && !index.rows.empty() && !writeRowIndex(index,index_file,key) )
+    {
+      dprintf(1)("unable to write row index %s, ignoring\n",index_file.c_str());
+    }
   }
-  int nrows = selms_.nrow();
-  FailWhen(!nrows,"MS selection yields no rows. This is usually due to the MS containing no data "
+  FailWhen(index.rows.empty(),"MS selection yields no rows. This is usually due to the MS containing no data "
     "matching your current Data Description and/or Field ID setting, or to a too-restrictive "
     "TaQL selection string.");
-  dprintf(1)("MS selection yields %d rows\n",selms_.nrow());
+  // Now pick out the rows of the ifrs that are to be read. All timeslots
+  // are kept (even if they end up empty), so that the tiling does not
+  // depend on which ifrs are read.
+  std::vector<bool> read_ifr;
+  if( !read_ifrs_.empty() )
+  {
+    read_ifr.assign(num_ifrs_,false);
+    for( uint i=0; i<read_ifrs_.size(); i++ )
+      if( read_ifrs_[i] >= 0 && read_ifrs_[i] < num_ifrs_ )
+        read_ifr[read_ifrs_[i]] = true;
+  }
+  int num_times = index.times.size();
+  Vector<uInt> rownrs(index.rows.size());
+  int nrows = 0;
+  slot_start_.resize(num_times+1);
+  for( int k=0; k<num_times; k++ )
+  {
+    slot_start_[k] = nrows;
+    for( int i=index.slot_start[k]; i<index.slot_start[k+1]; i++ )
+    {
+      // rows with invalid antennas are kept when reading all ifrs, so
+      // that readChunk() can warn about them
+      int ifr = index.ifrs[i];
+      if( read_ifr.empty() || ( ifr >= 0 && read_ifr[ifr] ) )
+        rownrs(nrows++) = index.rows[i];
+    }
+  }
+  slot_start_[num_times] = nrows;
+  slot_times_ = index.times;
+  FailWhen(!nrows,"MS selection yields no rows for the interferometers in the tree");
+  rownrs.resize(nrows,True);
+  selms_ = ms_(rownrs);
+  dprintf(1)("MS selection yields %d rows in %d timeslots, %d rows to be read\n",
+      int(index.rows.size()),num_times,nrows);
 
   // do we have a WEIGHT_SPECTRUM column at all?
   const TableDesc & tabledesc = selms_.tableDesc();
-  has_weights_ = tabledesc.isColumn("WEIGHT_SPECTRUM");
+  has_weights_ = read_weights_ && tabledesc.isColumn("WEIGHT_SPECTRUM");
 
   // do we have a BITFLAG column?
   has_bitflags_ = tabledesc.isColumn("BITFLAG") && tabledesc.isColumn("BITFLAG_ROW");
@@ -269,32 +335,19 @@ void MSInputChannel::openMS (DMI::Record &header,const DMI::Record &select)
   if( !has_bitflags_ )
     flagmask_ = 0;
 
-  // process the TIME column to figure out the tiling and the number of timeslots
-  ROScalarColumn<Double> timeCol(selms_,"TIME");
-  Vector<Double> times = timeCol.getColumn();
   // store time extent in table
   time_range_.resize(2);
-  double t0 = time_range_[0] = times(0);
-  time_range_[1] = times(nrows-1);
+  time_range_[0] = slot_times_.front();
+  time_range_[1] = slot_times_.back();
   header[FTimeExtent] = time_range_;
-  // count the number of unique timeslots
-  int num_times = 1;
-  for( int i=1; i<nrows; i++ )
-    if( times(i) != t0 )
-    {
-      t0 = times(i);
-      num_times++;
-    }
   header[FNumTimeslots] = num_times;
-  // And also read the EXPOSURE column, and associate default exposure times with each timeslot.
-  // The reason for this is that missing rows (i.e. missing timeslots on some baselines) result
-  // in null exposure times, which causes great confusion down the line, so we fill in a default value
-  // instead
-  ROScalarColumn<Double> expCol(selms_,"EXPOSURE");
-  Vector<Double> exposures = expCol.getColumn();
-
-  // times are sorted. We go over them to discover timeslots, i.e. "chunks"
-  // with the same timestamp. Every time we find a new timeslot, we check if
+  // The row index also gives the EXPOSURE of each timeslot, which is used
+  // as the default exposure time. The reason for this is that missing rows
+  // (i.e. missing timeslots on some baselines) result in null exposure
+  // times, which causes great confusion down the line, so we fill in a
+  // default value instead.
+  // We go over the timeslots (stepping by the time increment, which is
+  // how readChunk() will read them). For every timeslot, we check if
   //  (a) it's in a new tile (i.e. we've gone past the tilesize)
   //  (b) it's in a different segment (i.e. delta-t has changed)
   // The following variables are used:
@@ -311,26 +364,17 @@ void MSInputChannel::openMS (DMI::Record &header,const DMI::Record &select)
   // timestamp of current timeslot
   Double curtime = 0;
   // number of timeslots per each tile
-  tile_sizes_.resize(nrows);     // make big enough, will resize back later
+  tile_sizes_.resize(num_times+1);  // make big enough, will resize back later
   tile_sizes_[0] = 0;            // first timeslot in first tile
   // exposure per each timeslot
-  exposure_times_.resize(nrows);  // will resize back later
+  exposure_times_.resize(num_times);  // will resize back later
   // starting time of each tile
-  std::vector<double> start_times(nrows);
-  // now loop over all times
-  int cur_incr_ = 0;
-  for( int i=0; i<nrows; i++ )
+  std::vector<double> start_times(num_times+1);
+  // now loop over all timeslots
+  for( int k=0; k<num_times; k+=time_incr_ )
   {
-    Double tm = times(i);
-    if( i && tm == curtime ) // skip if in same timeslot
-      continue;
-    // skip over specified number of timeslots
-    cur_incr_++;
-    if( cur_incr_ < time_incr_ )
-      continue;
-    cur_incr_ = 0;
-    // at this point we have a new timeslot
-    exposure_times_[current_ts] = exposures(i);
+    Double tm = slot_times_[k];
+    exposure_times_[current_ts] = index.exposures[k];
     current_ts++;
     // this is its delta-t w.r.t. previous timeslot
     Double delta = tm - curtime;
@@ -396,7 +440,187 @@ void MSInputChannel::openMS (DMI::Record &header,const DMI::Record &select)
   LoShape datashape = ROArrayColumn<Complex>(selms_,dataColName_).shape(0);
   header[FOriginalDataShape] = datashape;
 
-  tableiter_.reset();
+  current_slot_ = 0;
+}
+
+// orders row indices by time
+class TimeOrder
+{
+  public:
+    TimeOrder (const std::vector<double> &times)
+    : times_(times) {}
+
+    bool operator () (int a,int b) const
+    { return times_[a] < times_[b]; }
+
+  private:
+    const std::vector<double> &times_;
+};
+
+void MSInputChannel::scanRowIndex (RowIndex &index,const Table &sel)
+{
+  int nrows = sel.nrow();
+  Vector<Double> times = ROScalarColumn<Double>(sel,"TIME").getColumn();
+  Vector<Double> exposures = ROScalarColumn<Double>(sel,"EXPOSURE").getColumn();
+  Vector<Int> ant1 = ROScalarColumn<Int>(sel,"ANTENNA1").getColumn();
+  Vector<Int> ant2 = ROScalarColumn<Int>(sel,"ANTENNA2").getColumn();
+  Vector<uInt> rownums = sel.rowNumbers(ms_);
+  // sort by time, leaving rows of the same timeslot in MS order
+  std::vector<double> tm(nrows);
+  std::vector<int> order(nrows);
+  for( int i=0; i<nrows; i++ )
+  {
+    tm[i] = times(i);
+    order[i] = i;
+  }
+  std::stable_sort(order.begin(),order.end(),TimeOrder(tm));
+  index.rows.resize(nrows);
+  index.ifrs.resize(nrows);
+  index.slot_start.clear();
+  index.times.clear();
+  index.exposures.clear();
+  for( int j=0; j<nrows; j++ )
+  {
+    int i = order[j];
+    index.rows[j] = rownums(i);
+    int a1 = ant1(i), a2 = ant2(i);
+    if( a1 >= 0 && a1 < num_antennas_ && a2 >= 0 && a2 < num_antennas_ )
+      index.ifrs[j] = ifrNumber(a1,a2);
+    else
+      index.ifrs[j] = -1;
+    // a new time starts a new timeslot
+    if( index.times.empty() || tm[i] != index.times.back() )
+    {
+      index.slot_start.push_back(j);
+      index.times.push_back(tm[i]);
+      index.exposures.push_back(exposures(i));
+    }
+  }
+  index.slot_start.push_back(nrows);
+  dprintf(1)("scanned %d rows of MS, found %d timeslots\n",nrows,int(index.times.size()));
+}
+
+// number of rows sampled by indexCheckValues()
+static const int NumIndexCheckRows = 16;
+
+std::vector<double> MSInputChannel::indexCheckValues ()
+{
+  // the number of rows, plus the time, exposure, antennas, field and ddid
+  // of a sample of rows. This changes if rows are added or removed, but not
+  // if data columns are written to.
+  int nrow = ms_.nrow();
+  std::vector<double> values(1,nrow);
+  ROScalarColumn<Double> timeCol(ms_,"TIME");
+  ROScalarColumn<Double> expCol(ms_,"EXPOSURE");
+  ROScalarColumn<Int> ant1Col(ms_,"ANTENNA1");
+  ROScalarColumn<Int> ant2Col(ms_,"ANTENNA2");
+  ROScalarColumn<Int> fieldCol(ms_,"FIELD_ID");
+  ROScalarColumn<Int> ddidCol(ms_,"DATA_DESC_ID");
+  for( int i=0; i<NumIndexCheckRows && nrow>0; i++ )
+  {
+    uInt row = uInt(double(nrow-1)*i/(NumIndexCheckRows-1));
+    values.push_back(timeCol(row));
+    values.push_back(expCol(row));
+    values.push_back(ant1Col(row));
+    values.push_back(ant2Col(row));
+    values.push_back(fieldCol(row));
+    values.push_back(ddidCol(row));
+  }
+  return values;
+}
+
+// Row index file layout (native byte order):
+//    char[8]   RowIndexMagic
+//    int[4]    length of key, number of check values, number of rows,
+//              number of timeslots
+//    char[]    key
+//    double[]  check values
+//    uint[]    rows
+//    int[]     ifrs
+//    int[]     slot_start (number of timeslots + 1)
+//    double[]  times
+//    double[]  exposures
+static const char RowIndexMagic[8] = { 'M','E','Q','R','I','D','X','1' };
+
+template<class T>
+static bool writeVector (FILE *f,const std::vector<T> &vec)
+{
+  return vec.empty() || fwrite(&vec[0],sizeof(T),vec.size(),f) == vec.size();
+}
+
+template<class T>
+static bool readVector (FILE *f,std::vector<T> &vec,int n)
+{
+  vec.resize(n);
+  return !n || fread(&vec[0],sizeof(T),n,f) == uint(n);
+}
+
+bool MSInputChannel::writeRowIndex (const RowIndex &index,const string &filename,const string &key)
+{
+  std::vector<double> check = indexCheckValues();
+  int header[4] = { int(key.length()),int(check.size()),
+                    int(index.rows.size()),int(index.times.size()) };
+  // write to a temporary file first, so that nobody ever sees a partly
+  // written index
+  string tmpfile = filename + Debug::ssprintf(".%d",int(getpid()));
+  FILE *f = fopen(tmpfile.c_str(),"wb");
+  if( !f )
+    return false;
+  bool ok = fwrite(RowIndexMagic,sizeof(RowIndexMagic),1,f) == 1 &&
+            fwrite(header,sizeof(header),1,f) == 1 &&
+            fwrite(key.data(),1,key.length(),f) == key.length() &&
+            writeVector(f,check) &&
+            writeVector(f,index.rows) &&
+            writeVector(f,index.ifrs) &&
+            writeVector(f,index.slot_start) &&
+            writeVector(f,index.times) &&
+            writeVector(f,index.exposures);
+  ok = !fclose(f) && ok;
+  if( ok )
+    ok = !rename(tmpfile.c_str(),filename.c_str());
+  if( !ok )
+    unlink(tmpfile.c_str());
+  return ok;
+}
+
+bool MSInputChannel::readRowIndex (RowIndex &index,const string &filename,const string &key)
+{
+  FILE *f = fopen(filename.c_str(),"rb");
+  if( !f )
+    return false;
+  char magic[sizeof(RowIndexMagic)];
+  int header[4];
+  string filekey;
+  std::vector<double> check;
+  // sanity-check the sizes, so that a corrupt file can't make us
+  // allocate silly amounts of memory
+  bool ok = fread(magic,sizeof(magic),1,f) == 1 &&
+            !memcmp(magic,RowIndexMagic,sizeof(magic)) &&
+            fread(header,sizeof(header),1,f) == 1 &&
+            header[0] == int(key.length()) &&
+            header[1] >= 0 && header[1] <= 1+6*NumIndexCheckRows &&
+            header[2] > 0 && uint(header[2]) <= ms_.nrow() &&
+            header[3] > 0 && header[3] <= header[2];
+  if( ok )
+  {
+    filekey.resize(header[0]);
+    ok = !header[0] || fread(&filekey[0],1,header[0],f) == uint(header[0]);
+  }
+  ok = ok && filekey == key &&
+       readVector(f,check,header[1]) &&
+       readVector(f,index.rows,header[2]) &&
+       readVector(f,index.ifrs,header[2]) &&
+       readVector(f,index.slot_start,header[3]+1) &&
+       readVector(f,index.times,header[3]) &&
+       readVector(f,index.exposures,header[3]);
+  fclose(f);
+  // the index must have been made from the MS as it is now
+  if( ok && check != indexCheckValues() )
+  {
+    dprintf(1)("row index %s is out of date, ignoring\n",filename.c_str());
+    ok = false;
+  }
+  return ok;
 }
 
 //##ModelId=3DF9FECD0235
@@ -417,6 +641,22 @@ int MSInputChannel::init (const DMI::Record &params)
   // get name of data column (default is DATA)
   dataColName_ = params[FDataColumnName].as<string>("DATA");
   predictColName_ = params[FPredictColumnName].as<string>("");
+  // ifrs and columns to read (default is all)
+  read_ifrs_ = params[FReadIfrs].as_vector<int>(std::vector<int>());
+  read_data_ = read_weights_ = true;
+  if( params[FReadColumns].exists() )
+  {
+    std::vector<string> columns;
+    params[FReadColumns].get_vector(columns);
+    std::set<string> colset;
+    for( uint i=0; i<columns.size(); i++ )
+      colset.insert(struppercase(columns[i]));
+    read_data_ = colset.count("DATA") > 0;
+    read_weights_ = colset.count("WEIGHT") > 0;
+    if( !colset.count("PREDICT") )
+      predictColName_ = "";
+  }
+  use_row_index_ = params[FRowIndex].as<bool>(true);
   // get # of timeslots or # of segments per tile
   tilesize_ = params[FTileSize].as<int>(0);
   tilesegs_ = params[FTileSegments].as<int>(0);
@@ -438,6 +678,12 @@ int MSInputChannel::init (const DMI::Record &params)
   channel_width_factor_ = params[FChannelWidth].as<double>(1.);
   // phase inversion?
   invert_phases_ = params[FInvertPhases].as<bool>(false);
+  // read-ahead
+  stopPrefetch();
+  prefetch_depth_ = params[FPrefetchDepth].as<int>(1);
+  FailWhen(prefetch_depth_<0,FPrefetchDepth.toString()+" must be >=0");
+  num_chunks_read_ = num_blocked_ = 0;
+  read_time_ = blocked_time_ = 0;
 
   openMS(header,*pselection);
 
@@ -456,12 +702,21 @@ int MSInputChannel::init (const DMI::Record &params)
   // put header on output stream
   putOnStream(VisEventHIID(HEADER,vdsid_),href);
 
+  // start reading ahead
+  if( prefetch_depth_ > 0 )
+  {
+    prefetch_stop_ = false;
+    prefetch_thread_ = Thread::create(start_prefetchThread,this);
+  }
+
   return state();
 }
 
 //##ModelId=3DF9FECD0244
 void MSInputChannel::close (const string &str)
 {
+  // stop reading first, since the prefetch thread uses the MS
+  stopPrefetch();
   FileChannel::close(str);
   // close & detach from everything
   LOFAR::Thread::Mutex::Lock lock(aipspp_mutex);
@@ -480,105 +735,103 @@ BZ_DECLARE_STENCIL2(hanning_flag_stencil,A,B)
   A = (B(0,0,0)|B(0,1,0)|B(0,-1,0));
 BZ_END_STENCIL_WITH_SHAPE(blitz::shape(0,-1,0),blitz::shape(0,1,0))
 
-//##ModelId=3DF9FECD021B
-int MSInputChannel::refillStream ()
+bool MSInputChannel::readChunk (Chunk &chunk)
 {
-  LOFAR::Thread::Mutex::Lock lock(aipspp_mutex);
-  try
+// loop until some tiles are generated
+  int nout = 0;
+  while( !nout )
   {
-    if( state() == HEADER )
-      setState(DATA);
-    else if( state() != DATA ) // return CLOSED when no more data
+  // Past last timeslot? Close MS
+    if( current_slot_ >= int(slot_times_.size()) )
     {
-      return AppEvent::CLOSED;
+      selms_ = MeasurementSet();
+      ms_ = MeasurementSet();
+      tileformat_.detach();
+      return false;
     }
-  // loop until some tiles are generated
-    int nout = 0;
-    while( !nout )
+    const LoRange ALL = LoRange::all();
+    const LoRange CHANS = LoRange(channels_[0],channels_[1],channel_incr_);
+  // fill cache with next time interval
+    if( tiles_.empty() )
+      tiles_.resize(num_ifrs_);
+    // loop until we've got the requisite number of timeslots
+    FailWhen(uint(current_tile_)>=tile_sizes_.size(),
+        "inconsistency in MS: more timeslots than expected");
+    int current_tilesize = tile_sizes_[current_tile_];
+    // the tile_times vector will be assigned to the TIME column of each
+    // tile. time=0 is are used to indicate rows that are missing in EVERY
+    // tile.
+    LoVec_double tile_times(current_tilesize);
+    tile_times(LoRange::all()) = 0;
+    for( int ntimes = 0; ntimes < current_tilesize && current_slot_ < int(slot_times_.size()); ntimes++ )
     {
-    // End of table iterator? Generate footer and close MS
-      if( tableiter_.pastEnd() )
+      int nrows = slot_start_[current_slot_+1] - slot_start_[current_slot_];
+      double timeslot = slot_times_[current_slot_];
+      tile_times(ntimes) = timeslot;
+      if( !ntimes )
       {
-        setState(FOOTER);
-        DMI::Record::Ref footer(DMI::ANONWR);
-        footer()[FVDSID] = vdsid_;
-        putOnStream(VisEventHIID(FOOTER,vdsid_),footer);
-        selms_ = MeasurementSet();
-        ms_ = MeasurementSet();
-        tileformat_.detach();
-        return AppEvent::SUCCESS;
+        dprintf(2)("Tile %d: time is %.2f\n",current_tile_,timeslot);
       }
-      const LoRange ALL = LoRange::all();
-      const LoRange CHANS = LoRange(channels_[0],channels_[1],channel_incr_);
-    // fill cache with next time interval
-      if( tiles_.empty() )
-        tiles_.resize(num_ifrs_);
-      // loop until we've got the requisite number of timeslots
-      FailWhen(uint(current_tile_)>=tile_sizes_.size(),
-          "inconsistency in MS: TableIterator yields more timeslots than expected");
-      int current_tilesize = tile_sizes_[current_tile_];
-      // the tile_times vector will be assigned to the TIME column of each
-      // tile. time=0 is are used to indicate rows that are missing in EVERY
-      // tile.
-      LoVec_double tile_times(current_tilesize);
-      tile_times(LoRange::all()) = 0;
-      for( int ntimes = 0; ntimes < current_tilesize && !tableiter_.pastEnd(); ntimes++ )
+      else if( ntimes == current_tilesize-1 )
       {
-        const Table &table = tableiter_.table();
-        int nrows = table.nrow();
-        FailWhen( !nrows,"unexpected empty table iteration");
-        dprintf(4)("Table iterator yields %d rows\n",table.nrow());
-        // get relevant table columns
-        ROScalarColumn<Double> timeCol(table,"TIME");
-        double timeslot = timeCol(0); // same for all rows since we iterate over it
-        ROScalarColumn<Double> intCol(table,"EXPOSURE");
-        ROScalarColumn<Int> ant1col(table,"ANTENNA1");
-        ROScalarColumn<Int> ant2col(table,"ANTENNA2");
-        ROScalarColumn<Bool> rowflagCol(table,"FLAG_ROW");
-        LoCube_float weightcube;
-        tile_times(ntimes) = timeslot;
-        if( !ntimes )
-        {
-          dprintf(2)("Tile %d: time is %.2f\n",current_tile_,timeslot);
-        }
-        else if( ntimes == current_tilesize-1 )
-        {
-          dprintf(2)("Tile %d: ending time is %.2f\n",current_tile_,timeslot);
-        }
-        // WEIGHT is optional
-        Cube<Float> weightcube1;
-        if( has_weights_ )
+        dprintf(2)("Tile %d: ending time is %.2f\n",current_tile_,timeslot);
+      }
+      // timeslot is empty if none of its ifrs are being read
+      if( !nrows )
+      {
+        current_timeslot_++;
+        current_slot_ += time_incr_;
+        continue;
+      }
+      // the rows of this timeslot are contiguous in selms_
+      Vector<uInt> slotrows(nrows);
+      indgen(slotrows,uInt(slot_start_[current_slot_]));
+      Table table = selms_(slotrows);
+      dprintf(4)("timeslot %d has %d rows\n",current_slot_,nrows);
+      // get relevant table columns
+      ROScalarColumn<Double> intCol(table,"EXPOSURE");
+      ROScalarColumn<Int> ant1col(table,"ANTENNA1");
+      ROScalarColumn<Int> ant2col(table,"ANTENNA2");
+      LoCube_float weightcube;
+      // WEIGHT is optional
+      Cube<Float> weightcube1;
+      if( has_weights_ )
+      {
+        try
         {
-          try
-          {
-            weightcube1 = ROArrayColumn<Float>(table,"WEIGHT_SPECTRUM").getColumn();
-            weightcube.reference(B2A::refAipsToBlitz<float,3>(weightcube1));
-            weightcube.reference(weightcube(ALL,CHANS,ALL));
-            cdebug(5)<<"WEIGHT_SPECTRUM: "<<weightcube;
-          }
-          catch( ... )
-          {}
+          weightcube1 = ROArrayColumn<Float>(table,"WEIGHT_SPECTRUM").getColumn();
+          weightcube.reference(B2A::refAipsToBlitz<float,3>(weightcube1));
+          weightcube.reference(weightcube(ALL,CHANS,ALL));
+          cdebug(5)<<"WEIGHT_SPECTRUM: "<<weightcube;
         }
-        cdebug(5)<<"WEIGHT_SPECTRUM: "<<weightcube(ALL,ALL,0);
-        // get array columns as Lorrays
-        Matrix<Double> uvwmat1 = ROArrayColumn<Double>(table, "UVW").getColumn();
-        LoMat_double uvwmat = B2A::refAipsToBlitz<double,2>(uvwmat1);
-        Cube<Complex> datacube1 = ROArrayColumn<Complex>(table,dataColName_).getColumn();
+        catch( ... )
+        {}
+      }
+      cdebug(5)<<"WEIGHT_SPECTRUM: "<<weightcube(ALL,ALL,0);
+      // get array columns as Lorrays
+      Matrix<Double> uvwmat1 = ROArrayColumn<Double>(table, "UVW").getColumn();
+      LoMat_double uvwmat = B2A::refAipsToBlitz<double,2>(uvwmat1);
+      Cube<Complex> datacube1;
+      LoCube_fcomplex datacube;
+      if( read_data_ )
+      {
+        datacube1 = ROArrayColumn<Complex>(table,dataColName_).getColumn();
         // invert phases if asked to
         if( invert_phases_ )
           datacube1 = conj(datacube1);
-        LoCube_fcomplex datacube = B2A::refAipsToBlitzComplex<3>(datacube1);
-        Cube<Complex> predcube1;
-        LoCube_fcomplex predcube;
-        if( !predictColName_.empty() )
-        {
-          predcube1 = ROArrayColumn<Complex>(table,predictColName_).getColumn();
-          // NB: we only invert input phases
-          // if( invert_phases_ )
-          //  predcube1 = conj(predcube1);
-          predcube.reference(B2A::refAipsToBlitzComplex<3>(predcube1));
-        }
-        // apply taper
+        datacube.reference(B2A::refAipsToBlitzComplex<3>(datacube1));
+      }
+      Cube<Complex> predcube1;
+      LoCube_fcomplex predcube;
+      if( !predictColName_.empty() )
+      {
+        predcube1 = ROArrayColumn<Complex>(table,predictColName_).getColumn();
+        // NB: we only invert input phases
+        // if( invert_phases_ )
+        //  predcube1 = conj(predcube1);
+        predcube.reference(B2A::refAipsToBlitzComplex<3>(predcube1));
+      }
+      // apply taper
 //        if( apply_hanning_ )
 //        {
 //          cdebug(0)<<"before: "<<abs(datacube(0,10,0));
@@ -587,256 +840,413 @@ int MSInputChannel::refillStream ()
 //          datacube.reference(tapered_data);
 //          cdebug(0)<<"after: "<<abs(datacube(0,10,0));
 //        }
-        // build up flag cube
-        LoCube_int bitflagcube;
-        LoVec_int bitflagvec;
-        bool hasflags = false;
-        // read bitflag columns, if available
-        if( has_bitflags_ && flagmask_ )
+      // build up flag cube
+      LoCube_int bitflagcube;
+      LoVec_int bitflagvec;
+      bool hasflags = false;
+      // read bitflag columns, if available
+      if( has_bitflags_ && flagmask_ )
+      {
+        try
         {
-          try
-          {
-            Cube<Int> bitflagcube1 = ROArrayColumn<Int>(table,"BITFLAG").getColumn();
-            Vector<Int> bitflagvec1 = ROScalarColumn<Int>(table,"BITFLAG_ROW").getColumn();
-            B2A::copyArray(bitflagcube,bitflagcube1);
-            bitflagcube &= flagmask_;
-            B2A::copyArray(bitflagvec,bitflagvec1);
-            bitflagvec &= flagmask_;
-            if( tile_bitflag_ )
-            {
-              bitflagcube = where(bitflagcube,tile_bitflag_,0);
-              bitflagvec = where(bitflagvec,tile_bitflag_,0);
-            }
-            hasflags = true;
-          }
-          // error probably means column is there, but is variable shape and hasn't been initialized yet
-          catch( std::exception &exc )
+          Cube<Int> bitflagcube1 = ROArrayColumn<Int>(table,"BITFLAG").getColumn();
+          Vector<Int> bitflagvec1 = ROScalarColumn<Int>(table,"BITFLAG_ROW").getColumn();
+          B2A::copyArray(bitflagcube,bitflagcube1);
+          bitflagcube &= flagmask_;
+          B2A::copyArray(bitflagvec,bitflagvec1);
+          bitflagvec &= flagmask_;
+          if( tile_bitflag_ )
           {
-            cdebug(2)<<"Failed to read BITFLAG/BITFLAG_ROW, assuming null bitflags\n";
-            cdebug(2)<<"Error was: "<<exc.what()<<endl;
+            bitflagcube = where(bitflagcube,tile_bitflag_,0);
+            bitflagvec = where(bitflagvec,tile_bitflag_,0);
           }
+          hasflags = true;
         }
-        // read legacy flag columns, if available
-        if( legacy_bitflag_ )
+        // error probably means column is there, but is variable shape and hasn't been initialized yet
+        catch( std::exception &exc )
         {
-          Cube<Bool> flagcube1 = ROArrayColumn<Bool>(table,"FLAG").getColumn();
-          LoCube_bool flagcube = B2A::refAipsToBlitz<bool,3>(flagcube1);
-          if( !hasflags ) // array not initialized above
-          {
-            bitflagcube.resize(flagcube.shape());
-            bitflagcube = where(flagcube,legacy_bitflag_,0);
-          }
-          else
-            bitflagcube |= where(flagcube,legacy_bitflag_,0);
-          Vector<Bool> bitflagrow1 = ROScalarColumn<Bool>(table,"FLAG_ROW").getColumn();
-          LoVec_bool bitflagrow = B2A::refAipsToBlitz<bool,1>(bitflagrow1);
-          if( !hasflags )
-          {
-            bitflagvec.resize(bitflagrow.shape());
-            bitflagvec = where(bitflagrow,legacy_bitflag_,0);
-          }
-          else
-            bitflagvec |= where(bitflagrow,legacy_bitflag_,0);
-          hasflags = true;
+          cdebug(2)<<"Failed to read BITFLAG/BITFLAG_ROW, assuming null bitflags\n";
+          cdebug(2)<<"Error was: "<<exc.what()<<endl;
+        }
+      }
+      // read legacy flag columns, if available
+      if( legacy_bitflag_ )
+      {
+        Cube<Bool> flagcube1 = ROArrayColumn<Bool>(table,"FLAG").getColumn();
+        LoCube_bool flagcube = B2A::refAipsToBlitz<bool,3>(flagcube1);
+        if( !hasflags ) // array not initialized above
+        {
+          bitflagcube.resize(flagcube.shape());
+          bitflagcube = where(flagcube,legacy_bitflag_,0);
         }
-        // apply Hanning taper if asked to
-        if( apply_hanning_ )
+        else
+          bitflagcube |= where(flagcube,legacy_bitflag_,0);
+        Vector<Bool> bitflagrow1 = ROScalarColumn<Bool>(table,"FLAG_ROW").getColumn();
+        LoVec_bool bitflagrow = B2A::refAipsToBlitz<bool,1>(bitflagrow1);
+        if( !hasflags )
         {
-          LoShape shape = datacube.shape();
-          LoCube_fcomplex tapered_data(shape);
+          bitflagvec.resize(bitflagrow.shape());
+          bitflagvec = where(bitflagrow,legacy_bitflag_,0);
+        }
+        else
+          bitflagvec |= where(bitflagrow,legacy_bitflag_,0);
+        hasflags = true;
+      }
+      // apply Hanning taper if asked to
+      if( apply_hanning_ && read_data_ )
+      {
+        LoShape shape = datacube.shape();
+        LoCube_fcomplex tapered_data(shape);
 //          LoCube_int tapered_flags(shape);
-          for( int i=0; i<shape[0]; i++ )
-            for( int j=0; j<shape[2]; j++ )
-            {
-              tapered_data(i,0,j) = datacube(i,0,j);
-              tapered_data(i,shape[1]-1,j) = datacube(i,shape[1]-1,j);
-              for( int k=1; k<shape[1]-1; k++ )
-                tapered_data(i,k,j) = (fcomplex(.50+0j)*datacube(i,k,j)+
-                                      fcomplex(.25+0j)*datacube(i,k-1,j)+
-                                      fcomplex(.25+0j)*datacube(i,k+1,j));
+        for( int i=0; i<shape[0]; i++ )
+          for( int j=0; j<shape[2]; j++ )
+          {
+            tapered_data(i,0,j) = datacube(i,0,j);
+            tapered_data(i,shape[1]-1,j) = datacube(i,shape[1]-1,j);
+            for( int k=1; k<shape[1]-1; k++ )
+              tapered_data(i,k,j) = (fcomplex(.50+0j)*datacube(i,k,j)+
+                                    fcomplex(.25+0j)*datacube(i,k-1,j)+
+                                    fcomplex(.25+0j)*datacube(i,k+1,j));
 //              if( hasflags )
 //                for( int k=1; k<shape[1]-1; k++ )
 //                  tapered_flags(i,k,j) = bitflagcube(i,k,j)|
 //                                         bitflagcube(i,k-1,j)|
 //                                         bitflagcube(i,k+1,j);
-            }
-          datacube.reference(tapered_data);
+          }
+        datacube.reference(tapered_data);
 //          if( hasflags )
 //            bitflagcube.reference(tapered_flags);
-        }
-        // apply channel selection
+      }
+      // apply channel selection
+      if( read_data_ )
         datacube.reference(datacube(ALL,CHANS,ALL));
+      if( hasflags )
+        bitflagcube.reference(bitflagcube(ALL,CHANS,ALL));
+      if( !predictColName_.empty() )
+        predcube.reference(predcube(ALL,CHANS,ALL));
+      // check weightcube shape (WSRT gets it wrong), disable weights on first error
+      if( has_weights_ && weightcube.shape() != LoShape(num_corrs_,num_channels_,nrows) )
+      {
+        cdebug(0)<<"WEIGHT_SPECTRUM column malformed, weights will be ignored\n";
+        has_weights_ = false;
+      }
+      // flip along frequency axis, if asked to
+      cdebug(5)<<"WEIGHT_SPECTRUM: "<<weightcube(ALL,ALL,0);
+      if( flip_freq_ )
+      {
+        if( read_data_ )
+          datacube.reverseSelf(blitz::secondDim);
         if( hasflags )
-          bitflagcube.reference(bitflagcube(ALL,CHANS,ALL));
+          bitflagcube.reverseSelf(blitz::secondDim);
+        if( has_weights_ )
+          weightcube.reverseSelf(blitz::secondDim);
         if( !predictColName_.empty() )
-          predcube.reference(predcube(ALL,CHANS,ALL));
-        // check weightcube shape (WSRT gets it wrong), disable weights on first error
-        if( has_weights_ && weightcube.shape() != datacube.shape() )
+          predcube.reverseSelf(blitz::secondDim);
+      }
+      // get vector of row numbers
+      Vector<uInt> rownums = table.rowNumbers(ms_);
+  // now process rows one by one
+      for( int i=0; i<nrows; i++ )
+      {
+        int ant1 = ant1col(i), ant2 = ant2col(i);
+        if( ant1 < 0 || ant1 >= num_antennas_ )
         {
-          cdebug(0)<<"WEIGHT_SPECTRUM column malformed, weights will be ignored\n";
-          has_weights_ = false;
+          cerr<<"WARNING: invalid ANTENNA1=="<<ant1<<" at MS main table row "<<rownums(i)<<", skipping.\n";
+          continue;
         }
-        // flip along frequency axis, if asked to
-        cdebug(5)<<"WEIGHT_SPECTRUM: "<<weightcube(ALL,ALL,0);
-        if( flip_freq_ )
+        if( ant2 < 0 || ant2 >= num_antennas_ )
         {
-          datacube.reverseSelf(blitz::secondDim);
-          if( hasflags )
-            bitflagcube.reverseSelf(blitz::secondDim);
-          if( has_weights_ )
-            weightcube.reverseSelf(blitz::secondDim);
-          if( !predictColName_.empty() )
-            predcube.reverseSelf(blitz::secondDim);
+          cerr<<"WARNING: invalid ANTENNA2=="<<ant2<<" at MS main table row "<<rownums(i)<<", skipping.\n";
+          continue;
         }
-        // get vector of row numbers
-        Vector<uInt> rownums = table.rowNumbers(ms_);
-    // now process rows one by one
-        for( int i=0; i<nrows; i++ )
+        int ifr = ifrNumber(ant1,ant2);
+  // init tile if one is not ready
+        VTile *ptile;
+        if( tiles_[ifr].valid() )
+          ptile = tiles_[ifr].dewr_p();
+        else
         {
-          int ant1 = ant1col(i), ant2 = ant2col(i);
-          if( ant1 < 0 || ant1 >= num_antennas_ )
-          {
-            cerr<<"WARNING: invalid ANTENNA1=="<<ant1<<" at MS main table row "<<rownums(i)<<", skipping.\n";
-            continue;
-          }
-          if( ant2 < 0 || ant2 >= num_antennas_ )
-          {
-            cerr<<"WARNING: invalid ANTENNA2=="<<ant2<<" at MS main table row "<<rownums(i)<<", skipping.\n";
-            continue;
-          }
-          int ifr = ifrNumber(ant1,ant2);
-    // init tile if one is not ready
-          VTile *ptile;
-          if( tiles_[ifr].valid() )
-            ptile = tiles_[ifr].dewr_p();
-          else
-          {
-            tiles_[ifr] <<= ptile = new VTile(tileformat_,current_tilesize);
-            // set tile ID
-            ptile->setTileId(ant1col(i),ant2col(i),current_tile_,vdsid_);
-            // init all row flags to missing
-            ptile->wrowflag() = FlagMissing;
-            // init all time intervals to the default exposure time for this timeslot. This will be overwritten
-            // by the actual exposure time just below, but if some rows of a tile are missing, it's important
-            // to have a default interval set. A similar procedure will be followed for the time column
-            // below
-            ptile->winterval()(ALL) = exposure_times_[current_timeslot_];
-          }
-          ptile->wtimeslot()(ntimes) = current_timeslot_*time_incr_;
-          ptile->winterval()(ntimes) = intCol(i);
-          LoVec_double uvw = uvwmat(ALL,i);
-          ptile->wuvw()(ALL,ntimes) = uvw;
+          tiles_[ifr] <<= ptile = new VTile(tileformat_,current_tilesize);
+          // set tile ID
+          ptile->setTileId(ant1col(i),ant2col(i),current_tile_,vdsid_);
+          // init all row flags to missing
+          ptile->wrowflag() = FlagMissing;
+          // init all time intervals to the default exposure time for this timeslot. This will be overwritten
+          // by the actual exposure time just below, but if some rows of a tile are missing, it's important
+          // to have a default interval set. A similar procedure will be followed for the time column
+          // below
+          ptile->winterval()(ALL) = exposure_times_[current_timeslot_];
+          // data not being read is left at zero
+          if( !read_data_ )
+            ptile->wdata() = fcomplex(0);
+        }
+        ptile->wtimeslot()(ntimes) = current_timeslot_*time_incr_;
+        ptile->winterval()(ntimes) = intCol(i);
+        LoVec_double uvw = uvwmat(ALL,i);
+        ptile->wuvw()(ALL,ntimes) = uvw;
+        if( read_data_ )
           ptile->wdata()(ALL,ALL,ntimes) = datacube(ALL,ALL,i);
-          if( !predictColName_.empty() )
-            ptile->wpredict()(ALL,ALL,ntimes) = predcube(ALL,ALL,i);
-          if( has_weights_ )
-          {
-            cdebug(6)<<"weights for timeslot "<<ntimes<<" ifr "<<ant1<<"-"<<ant2<<":"<<weightcube(ALL,ALL,i)<<endl;
-            ptile->wweight()(ALL,ALL,ntimes) = weightcube(ALL,ALL,i);
-            cdebug(6)<<"weights for timeslot after assignment "<<ptile->wweight()(ALL,ALL,ntimes)<<endl;
-          }
-          if( hasflags )
-          {
-            ptile->wrowflag()(ntimes) = bitflagvec(i);
-            ptile->wflags()(ALL,ALL,ntimes) = bitflagcube(ALL,ALL,i);
-          }
-          else
-          {
-            ptile->wrowflag()(ntimes) = 0;
-            ptile->wflags()(ALL,ALL,ntimes) = 0;
-          }
-          ptile->wseqnr()(ntimes) = rownums(i);
+        if( !predictColName_.empty() )
+          ptile->wpredict()(ALL,ALL,ntimes) = predcube(ALL,ALL,i);
+        if( has_weights_ )
+        {
+          cdebug(6)<<"weights for timeslot "<<ntimes<<" ifr "<<ant1<<"-"<<ant2<<":"<<weightcube(ALL,ALL,i)<<endl;
+          ptile->wweight()(ALL,ALL,ntimes) = weightcube(ALL,ALL,i);
+          cdebug(6)<<"weights for timeslot after assignment "<<ptile->wweight()(ALL,ALL,ntimes)<<endl;
         }
-        // increment current timeslot number
-        current_timeslot_++;
-        for( int k=0; k<time_incr_; k++ )
-          tableiter_++;
+        if( hasflags )
+        {
+          ptile->wrowflag()(ntimes) = bitflagvec(i);
+          ptile->wflags()(ALL,ALL,ntimes) = bitflagcube(ALL,ALL,i);
+        }
+        else
+        {
+          ptile->wrowflag()(ntimes) = 0;
+          ptile->wflags()(ALL,ALL,ntimes) = 0;
+        }
+        ptile->wseqnr()(ntimes) = rownums(i);
       }
-      current_tile_++;
-      // use this to ensure that a bad-dUVW warning goes out only once
-      bool warned_duvw = false;
-      // output all valid collected tiles onto stream, but do fill in
-      // their TIME column so that it's the same for all tiles regardless
-      // of what rows are actually found. Also fill in DUVW at this time.
-      for( uint i=0; i<tiles_.size(); i++ )
+      // increment current timeslot number
+      current_timeslot_++;
+      current_slot_ += time_incr_;
+    }
+    current_tile_++;
+    // use this to ensure that a bad-dUVW warning goes out only once
+    bool warned_duvw = false;
+    // output all valid collected tiles onto stream, but do fill in
+    // their TIME column so that it's the same for all tiles regardless
+    // of what rows are actually found. Also fill in DUVW at this time.
+    for( uint i=0; i<tiles_.size(); i++ )
+    {
+      if( tiles_[i].valid() )
       {
-        if( tiles_[i].valid() )
+        VTile &tile = tiles_[i];
+        tile.wtime() = tile_times;
+        HIID id = VisEventHIID(DATA,tiles_[i]->tileId());
+        // setup DUVW column
+        LoMat_double uvw = tile.wuvw();
+        LoMat_double duvw = tile.wduvw();
+        const LoVec_int &rowflag = tile.rowflag();
+        // get UVW from last timeslot of previous tile, if we had one
+        PrevUVWMap::const_iterator iter = prev_uvw_.find(std::pair<int,int>(tile.antenna1(),tile.antenna2()));
+        LoVec_double prev_uvw(3);
+        double prev_time = -1e+99;
+        if( iter != prev_uvw_.end() )
         {
-          VTile &tile = tiles_[i];
-          tile.wtime() = tile_times;
-          HIID id = VisEventHIID(DATA,tiles_[i]->tileId());
-          // setup DUVW column
-          LoMat_double uvw = tile.wuvw();
-          LoMat_double duvw = tile.wduvw();
-          const LoVec_int &rowflag = tile.rowflag();
-          // get UVW from last timeslot of previous tile, if we had one
-          PrevUVWMap::const_iterator iter = prev_uvw_.find(std::pair<int,int>(tile.antenna1(),tile.antenna2()));
-          LoVec_double prev_uvw(3);
-          double prev_time = -1e+99;
-          if( iter != prev_uvw_.end() )
+          prev_time = (iter->second)(0);
+          prev_uvw  = (iter->second)(LoRange(1,3));
+        }
+        // now loop over all (valid) timeslots of this tile
+        for( int k=0; k<tile.ntime(); k++ )
+          if( rowflag(k) != FlagMissing )
           {
-            prev_time = (iter->second)(0);
-            prev_uvw  = (iter->second)(LoRange(1,3));
-          }
-          // now loop over all (valid) timeslots of this tile
-          for( int k=0; k<tile.ntime(); k++ )
-            if( rowflag(k) != FlagMissing )
+            double t0 = tile_times(k);
+            double dt_back = t0 - prev_time;
+            double dt_forward = 1e+99;
+            int k1;
+            // find closest valid forward point
+            for( k1=k+1; k1<tile.ntime(); k1++ )
+              if( rowflag(k1) != FlagMissing )
+              {
+                dt_forward = tile_times(k1) - t0;
+                break;
+              }
+            // if neither forward not back point is found, emit a warning
+            if( dt_forward >= 1e+99 && dt_back >= 1e+99 )
             {
-              double t0 = tile_times(k);
-              double dt_back = t0 - prev_time;
-              double dt_forward = 1e+99;
-              int k1;
-              // find closest valid forward point
-              for( k1=k+1; k1<tile.ntime(); k1++ )
-                if( rowflag(k1) != FlagMissing )
-                {
-                  dt_forward = tile_times(k1) - t0;
-                  break;
-                }
-              // if neither forward not back point is found, emit a warning
-              if( dt_forward >= 1e+99 && dt_back >= 1e+99 )
+              if( !warned_duvw )
               {
-                if( !warned_duvw )
-                {
-                  cerr<<"WARNING: unable to determine delta-UVW in tile "<<id.toString()<<", setting to 0.\n";
-                  warned_duvw = true;
-                }
+                cerr<<"WARNING: unable to determine delta-UVW in tile "<<id.toString()<<", setting to 0.\n";
+                warned_duvw = true;
               }
-              // else use forward difference, if that timeslot is closer
-              else if( dt_back > dt_forward )
-                duvw(ALL,k) = (uvw(ALL,k1) - uvw(ALL,k))/dt_forward;
-              // else use backward difference
-              else
-                duvw(ALL,k) = (uvw(ALL,k) - prev_uvw)/dt_back;
-              // and store the last uvw
-              prev_time = t0;
-              prev_uvw = uvw(ALL,k);
             }
-          // save UVW of last row
-          LoVec_double & puvw = prev_uvw_[std::pair<int,int>(tile.antenna1(),tile.antenna2())];
-          puvw.resize(4);
-          puvw(0) = prev_time;
-          puvw(LoRange(1,3)) = prev_uvw;
-          // place on stream
-          putOnStream(id,tiles_[i]);
-          tiles_[i].detach();
-          nout++;  // increment pointer so that we break out of loop
-        }
+            // else use forward difference, if that timeslot is closer
+            else if( dt_back > dt_forward )
+              duvw(ALL,k) = (uvw(ALL,k1) - uvw(ALL,k))/dt_forward;
+            // else use backward difference
+            else
+              duvw(ALL,k) = (uvw(ALL,k) - prev_uvw)/dt_back;
+            // and store the last uvw
+            prev_time = t0;
+            prev_uvw = uvw(ALL,k);
+          }
+        // save UVW of last row
+        LoVec_double & puvw = prev_uvw_[std::pair<int,int>(tile.antenna1(),tile.antenna2())];
+        puvw.resize(4);
+        puvw(0) = prev_time;
+        puvw(LoRange(1,3)) = prev_uvw;
+        // add to chunk
+        chunk.push_back(ChunkEvent());
+        chunk.back().id = id;
+        chunk.back().ref = tiles_[i];
+        tiles_[i].detach();
+        nout++;  // increment pointer so that we break out of loop
       }
-      dprintf(2)("tile yielded %d baselines\n",nout);
-      cdebug(3)<<"tile times are "<<LoVec_double(tile_times-4646800000.)<<endl;
     }
-    return AppEvent::SUCCESS;
+    dprintf(2)("tile yielded %d baselines\n",nout);
+    cdebug(3)<<"tile times are "<<LoVec_double(tile_times-4646800000.)<<endl;
   }
-  // catch AIPS++ errors, but not our own exceptions -- these can only be
-  // caused by real bugs
-  catch( AipsError &err )
+  num_chunks_read_++;
+  return true;
+}
+
+void MSInputChannel::putFooter ()
+{
+  setState(FOOTER);
+  DMI::Record::Ref footer(DMI::ANONWR);
+  footer()[FVDSID] = vdsid_;
+  DMI::Record &stats = footer()[FReadStats] <<= new DMI::Record;
+  stats[FNumChunks] = num_chunks_read_;
+  stats[FReadTime] = read_time_;
+  stats[FBlockedTime] = blocked_time_;
+  stats[FNumBlocked] = num_blocked_;
+  stats[FPrefetchDepth] = prefetch_depth_;
+  dprintf(1)("%d chunks read in %.2fs, %d waits for reads totalling %.2fs\n",
+             num_chunks_read_,read_time_,num_blocked_,blocked_time_);
+  putOnStream(VisEventHIID(FOOTER,vdsid_),footer);
+}
+
+//##ModelId=3DF9FECD021B
+int MSInputChannel::refillStream ()
+{
+  if( state() == HEADER )
+    setState(DATA);
+  else if( state() != DATA ) // return CLOSED when no more data
   {
-    tiles_.clear();
-    close("AIPS++ error: "+err.getMesg());
     return AppEvent::CLOSED;
   }
-  return AppEvent::CLOSED;
+  Chunk chunk;
+  bool more;
+  if( prefetch_depth_ > 0 )
+  {
+    // get next chunk from prefetch thread, waiting for it if needed
+    Thread::Mutex::Lock lock(prefetch_cond_);
+    if( prefetch_queue_.empty() )
+    {
+      double t0 = wallTime();
+      while( prefetch_queue_.empty() )
+        prefetch_cond_.wait();
+      blocked_time_ += wallTime() - t0;
+      num_blocked_++;
+    }
+    PrefetchEntry &entry = prefetch_queue_.front();
+    string error = entry.error;
+    bool aips_error = entry.aips_error;
+    more = !entry.last;
+    chunk.swap(entry.events);
+    prefetch_queue_.pop_front();
+    prefetch_cond_.broadcast();
+    lock.release();
+    // the prefetch thread stops after any error, so the channel is closed
+    // either way. Errors other than AIPS++ ones are bugs, and are rethrown
+    if( !error.empty() )
+    {
+      if( !aips_error )
+      {
+        close("error: "+error);
+        Throw(error);
+      }
+      close("AIPS++ error: "+error);
+      return AppEvent::CLOSED;
+    }
+  }
+  else
+  {
+    LOFAR::Thread::Mutex::Lock lock(aipspp_mutex);
+    double t0 = wallTime();
+    try
+    {
+      more = readChunk(chunk);
+    }
+    // catch AIPS++ errors, but not our own exceptions -- these can only be
+    // caused by real bugs
+    catch( AipsError &err )
+    {
+      tiles_.clear();
+      lock.release();
+      close("AIPS++ error: "+err.getMesg());
+      return AppEvent::CLOSED;
+    }
+    double dt = wallTime() - t0;
+    read_time_ += dt;
+    blocked_time_ += dt;
+    num_blocked_++;
+  }
+  // End of MS? Generate footer, else put chunk on stream
+  if( !more )
+    putFooter();
+  else
+    for( uint i=0; i<chunk.size(); i++ )
+      putOnStream(chunk[i].id,chunk[i].ref);
+  return AppEvent::SUCCESS;
+}
+
+void * MSInputChannel::start_prefetchThread (void *args)
+{
+  return static_cast<MSInputChannel*>(args)->runPrefetch();
+}
+
+void * MSInputChannel::runPrefetch ()
+{
+  Thread::Mutex::Lock lock(prefetch_cond_);
+  while( true )
+  {
+    // wait for space in queue
+    while( !prefetch_stop_ && int(prefetch_queue_.size()) >= prefetch_depth_ )
+      prefetch_cond_.wait();
+    if( prefetch_stop_ )
+      break;
+    lock.release();
+    // read next chunk
+    PrefetchEntry entry;
+    entry.last = false;
+    entry.aips_error = false;
+    double t0 = wallTime();
+    try
+    {
+      LOFAR::Thread::Mutex::Lock aipslock(aipspp_mutex);
+      entry.last = !readChunk(entry.events);
+    }
+    catch( AipsError &err )
+    {
+      tiles_.clear();
+      entry.error = err.getMesg();
+      entry.aips_error = true;
+    }
+    catch( std::exception &exc )
+    {
+      entry.error = exc.what();
+    }
+    double dt = wallTime() - t0;
+    lock.lock(prefetch_cond_);
+    read_time_ += dt;
+    bool done = entry.last || !entry.error.empty();
+    prefetch_queue_.push_back(PrefetchEntry());
+    prefetch_queue_.back().events.swap(entry.events);
+    prefetch_queue_.back().last = entry.last;
+    prefetch_queue_.back().aips_error = entry.aips_error;
+    prefetch_queue_.back().error = entry.error;
+    prefetch_cond_.broadcast();
+    // nothing more to read after the end of the MS or an error (which
+    // closes the channel)
+    if( done )
+      break;
+  }
+  return 0;
+}
+
+void MSInputChannel::stopPrefetch ()
+{
+  Thread::Mutex::Lock lock(prefetch_cond_);
+  if( !prefetch_thread_ )
+    return;
+  prefetch_stop_ = true;
+  prefetch_cond_.broadcast();
+  lock.release();
+  prefetch_thread_.join();
+  lock.lock(prefetch_cond_);
+  prefetch_thread_ = 0;
+  prefetch_queue_.clear();
 }
 
 //##ModelId=3DFDFC060373
@@ -30,8 +30,9 @@
 #include <VisCube/VTile.h>
 
 #include <ms/MeasurementSets/MeasurementSet.h>
-#include <tables/Tables/TableIter.h>
 #include <AppAgent/FileChannel.h>
+#include <TimBase/Thread/Condition.h>
+#include <deque>
 
 namespace AppAgent
 {
@@ -63,6 +64,21 @@ using namespace VisVocabulary;
 //##                                         If !=0, then tile bitflag is
 //##                                           (ms_bitflags&flag_mask?tile_bitflag:0).| (ms_legacy_flag?legacy_bitflag:0)
 //##    +--[FApplyHanning]       (bool)      apply Hanning taper to input data
+//##    +--[FPrefetchDepth]      (int)       number of chunks to read ahead in a background
+//##                                         thread, while the preceding ones are being
+//##                                         processed (default 1). 0 to read each chunk
+//##                                         only when it is asked for.
+//##    +--[FReadIfrs]           (int[])     ifr numbers (see VisVocabulary::ifrNumber()) to read.
+//##                                         Rows of other ifrs are skipped. Default is all.
+//##    +--[FReadColumns]        (string[])  tile columns to fill from the MS: any of
+//##                                         "DATA", "PREDICT", "WEIGHT". Columns not listed
+//##                                         are not read. Default is all.
+//##    +--[FRowIndex]           (bool)      keep the selected rows, grouped by timeslot, in an
+//##                                         index file inside the MS, so that later runs
+//##                                         with the same selection need not scan the MS
+//##                                         (default true). The index is remade if rows are
+//##                                         added or removed. It is not used when
+//##                                         FSelectionString is given.
 //##    +--[FSelection]          (record)    determines MS selection:
 //##       +--[FDDID]              (int)     selects data description ID
 //##       +--[FFieldIndex]        (int)     selects field
@@ -78,6 +94,8 @@ class MSInputChannel : public FileChannel
     //##ModelId=3DF9FECD0219
       MSInputChannel ();
 
+      virtual ~MSInputChannel ();
+
     //##ModelId=3DF9FECD0235
       virtual int init (const DMI::Record &data);
 
@@ -110,10 +128,51 @@ class MSInputChannel : public FileChannel
       // prepares MS for reading
     //##ModelId=3DF9FECD025E
       void openMS     (DMI::Record &hdr,const DMI::Record &selection);
+      // the selected rows of the MS, grouped by timeslot
+      typedef struct
+      {
+        std::vector<uint> rows;       // MS row numbers, in time order
+        std::vector<int> ifrs;        // ifr number of each row, -1 for invalid antennas
+        std::vector<int> slot_start;  // index in rows of start of each timeslot, plus
+                                      // one entry for the end of the last timeslot
+        std::vector<double> times;    // time of each timeslot
+        std::vector<double> exposures;// exposure of first row of each timeslot
+      } RowIndex;
+
+      // builds a row index by reading the TIME, EXPOSURE and ANTENNA
+      // columns of the selected table
+      void scanRowIndex (RowIndex &index,const casa::Table &sel);
+      // reads a row index written by writeRowIndex(). Returns false if the
+      // file does not exist or does not match the selection key or the MS
+      bool readRowIndex (RowIndex &index,const string &filename,const string &key);
+      // writes a row index. Returns false on failure
+      bool writeRowIndex (const RowIndex &index,const string &filename,const string &key);
+      // returns values sampled from the main table, used to see if an
+      // index file is still valid for the MS
+      std::vector<double> indexCheckValues ();
+
       // fills headers from subtables
     //##ModelId=3DF9FECD0285
       void fillHeader (DMI::Record &hdr,const DMI::Record &selection);
 
+      // an event read from the MS, waiting to go on the stream
+      typedef struct { HIID id; ObjRef ref; } ChunkEvent;
+      typedef std::vector<ChunkEvent> Chunk;
+
+      // reads the next chunk (i.e. the tiles of all ifrs for the next
+      // time interval) from the MS. Returns false if past the end of the
+      // MS. Caller must hold the aipspp mutex.
+      bool readChunk (Chunk &chunk);
+
+      // puts the footer on the stream
+      void putFooter ();
+
+      // prefetch thread: reads chunks ahead into prefetch_queue_
+      static void * start_prefetchThread (void *args);
+      void * runPrefetch ();
+      // stops the prefetch thread, if running
+      void stopPrefetch ();
+
 
     //##ModelId=3DFDFC06033A
       string msname_;
@@ -134,6 +193,15 @@ class MSInputChannel : public FileChannel
       string dataColName_;
       string predictColName_;
 
+      // ifrs to read, empty for all
+      std::vector<int> read_ifrs_;
+      // read data column? (predict column is read if predictColName_ is
+      // set, weights if has_weights_ is set)
+      bool read_data_;
+      bool read_weights_;
+      // use an index file to save on scanning the MS
+      bool use_row_index_;
+
       // MS tiling specification
       //  * if tilesegs_>1, then each tile will be composed of the specified
       //    number of segments; tilesize_ must be 0.
@@ -205,9 +273,13 @@ class MSInputChannel : public FileChannel
       typedef std::map<std::pair<int,int>,LoVec_double> PrevUVWMap;
       PrevUVWMap prev_uvw_;
 
-      // iterator
-    //##ModelId=3DF9FECD01EE
-      casa::TableIterator tableiter_;
+      // timeslots of selms_: rows slot_start_[i] to slot_start_[i+1]-1
+      // of selms_ make up timeslot i, at time slot_times_[i]. Timeslots
+      // may be empty if some ifrs are not being read.
+      std::vector<int> slot_start_;
+      std::vector<double> slot_times_;
+      // next timeslot to be read
+      int current_slot_;
 
       // tile format
     //##ModelId=3DF9FECD01F6
@@ -219,6 +291,29 @@ class MSInputChannel : public FileChannel
       //##ModelId=3DF9FECD01FF
       TileCache tiles_;
 
+      // a chunk read ahead by the prefetch thread
+      typedef struct
+      {
+        Chunk events;
+        bool last;            // past end of MS, events is empty
+        bool aips_error;      // error is an AIPS++ error (which closes the channel)
+        string error;         // error message, if the read failed
+      } PrefetchEntry;
+
+      // number of chunks to read ahead, 0 for no prefetch thread
+      int prefetch_depth_;
+      // everything below is protected by prefetch_cond_
+      Thread::Condition prefetch_cond_;
+      std::deque<PrefetchEntry> prefetch_queue_;
+      bool prefetch_stop_;
+      Thread::ThrID prefetch_thread_;
+
+      // I/O statistics, put into the footer
+      int    num_chunks_read_;
+      double read_time_;      // time spent reading chunks
+      double blocked_time_;   // time refillStream() spent waiting for chunks to be read
+      int    num_blocked_;    // number of times it had to wait
+
 };
 
 };
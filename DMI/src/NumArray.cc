@@ -98,6 +98,7 @@
 #define NC_SKIP_HOOKS 1
 #include "NumArray.h"
 #include "NumArrayFuncs.h"
+#include <vector>
 
 static DMI::Container::Register reg(TpDMINumArray,true);
 
@@ -120,6 +121,36 @@ static void destroyStringArray (void *start,int num)
       ptr->~string();
 }
 
+// custom block allocators by object type. This is set up at startup, so no
+// locking is done on lookup.
+typedef std::vector<std::pair<DMI::TypeId,DMI::SmartBlock::Allocator *> > BlockAllocatorMap;
+static BlockAllocatorMap & blockAllocators ()
+{
+  static BlockAllocatorMap map;
+  return map;
+}
+
+static DMI::SmartBlock::Allocator * findBlockAllocator (DMI::TypeId realtype)
+{
+  const BlockAllocatorMap &map = blockAllocators();
+  for( uint i=0; i<map.size(); i++ )
+    if( map[i].first == realtype )
+      return map[i].second;
+  return 0;
+}
+
+void DMI::NumArray::setBlockAllocator (TypeId realtype,SmartBlock::Allocator *alloc)
+{
+  BlockAllocatorMap &map = blockAllocators();
+  for( uint i=0; i<map.size(); i++ )
+    if( map[i].first == realtype )
+    {
+      map[i].second = alloc;
+      return;
+    }
+  map.push_back(std::make_pair(realtype,alloc));
+}
+
 //##ModelId=3DB949AE039F
 DMI::NumArray::NumArray ()
 : Container (),
@@ -324,8 +355,14 @@ void DMI::NumArray::init (const LoShape & shape,int flags,TypeId realtype)
   // Align data on 8 bytes.
   itsDataOffset = (sz+7) / 8 * 8;
   sz = itsDataOffset + itsSize*itsElemSize;
-  // Allocate one SmartBlock for everything
-  itsData.unlock().attach(new SmartBlock(sz,flags&DMI::NOZERO ? 0 : DMI::ZERO)).lock();
+  // Allocate one SmartBlock for everything, using a custom allocator if
+  // one is set up for our type
+  int blockflags = flags&DMI::NOZERO ? 0 : DMI::ZERO;
+  SmartBlock::Allocator *alloc = realtype && itsScaType != Tpstring ? findBlockAllocator(realtype) : 0;
+  if( alloc )
+    itsData.unlock().attach(new SmartBlock(sz,blockflags,*alloc)).lock();
+  else
+    itsData.unlock().attach(new SmartBlock(sz,blockflags)).lock();
   void *dataptr = itsData().data();
   // fill block header
   if( !realtype )
@@ -363,6 +363,11 @@ public:
   // returns size of array element
   int elementSize () const
   { return itsElemSize; }
+
+  // Installs a custom allocator for the data blocks of arrays of the given
+  // object type (as passed in as the realtype argument of the constructors,
+  // e.g. by subclasses). Use alloc=0 to go back to the heap.
+  static void setBlockAllocator (TypeId realtype,SmartBlock::Allocator *alloc);
   
 #ifdef HAVE_AIPSPP
   // Returns contents as an AIPS++ array (by copy or reference)
@@ -30,14 +30,14 @@ namespace DMI
 {
 
 SmartBlock::SmartBlock()
-  : block(0),datasize(0),shmid(0),delete_block(false)
+  : block(0),datasize(0),shmid(0),delete_block(false),allocator(0)
 {
   dprintf(2)("default constructor\n");
 }
 
 //##ModelId=3BFE299902D7
 SmartBlock::SmartBlock (void* data, size_t size, int flags)
-  : block(0),datasize(0),shmid(0),delete_block(false)
+  : block(0),datasize(0),shmid(0),delete_block(false),allocator(0)
 {
   dprintf(2)("constructor(data=%p,size=%d,fl=%x)\n",data,size,flags);
   init(data,size,flags,0);
@@ -45,7 +45,7 @@ SmartBlock::SmartBlock (void* data, size_t size, int flags)
 
 //##ModelId=3BFA4FCA0387
 SmartBlock::SmartBlock (size_t size, int flags)
-  : block(0),datasize(0),shmid(0),delete_block(false)
+  : block(0),datasize(0),shmid(0),delete_block(false),allocator(0)
 {
   dprintf(2)("constructor(size=%d,fl=%x)\n",size,flags);
   init( new char[size],size,flags|DMI::ANON,0 );
@@ -53,15 +53,23 @@ SmartBlock::SmartBlock (size_t size, int flags)
 
 //##ModelId=3BFE303F0022
 SmartBlock::SmartBlock (size_t size, int shm_flags, int flags)
-  : block(0),datasize(0),shmid(0),delete_block(false)
+  : block(0),datasize(0),shmid(0),delete_block(false),allocator(0)
 {
   dprintf(2)("constructor(size=%d,shmfl=%x,fl=%x)",size,shm_flags,flags);
   init(0,size,flags|DMI::SHMEM,shm_flags);
 }
 
+SmartBlock::SmartBlock (size_t size, int flags, Allocator &alloc)
+  : block(0),datasize(0),shmid(0),delete_block(false),allocator(0)
+{
+  dprintf(2)("constructor(size=%d,fl=%x,allocator)\n",size,flags);
+  init( alloc.allocate(size),size,flags|DMI::ANON,0 );
+  allocator = &alloc;
+}
+
 //##ModelId=3DB934E50248
 SmartBlock::SmartBlock (const SmartBlock &other, int flags)
-  : CountedRefTarget(),block(0),datasize(0),shmid(0),delete_block(false)
+  : CountedRefTarget(),block(0),datasize(0),shmid(0),delete_block(false),allocator(0)
 {
   dprintf(2)("copy constructor(%s,%x)\n",other.debug(),flags);
   FailWhen( !(flags&DMI::CLONE),"must use DMI::CLONE to copy");
@@ -87,7 +95,11 @@ SmartBlock & SmartBlock::operator=(const SmartBlock &right)
     // clone the block
     if( !right.size() )
       return *this;
-    block = new char[ datasize = right.size() ];
+    datasize = right.size();
+    if( right.allocator )
+      block = (allocator = right.allocator)->allocate(datasize);
+    else
+      block = new char[datasize];
     delete_block = true;
     memcpy(block,*right,datasize);
   }
@@ -144,8 +156,13 @@ void SmartBlock::destroy ()
 {
   dprintf(2)("%s: destroying\n",debug());
   if( block && delete_block )
-    delete [] static_cast<char*>(block); 
-  block=0; datasize=0; shmid=0;
+  {
+    if( allocator )
+      allocator->release(block,datasize);
+    else
+      delete [] static_cast<char*>(block); 
+  }
+  block=0; datasize=0; shmid=0; allocator=0;
 }
 
 //##ModelId=3BFE23B501F4
@@ -44,6 +44,23 @@ class SmartBlock : public CountedRefTarget
   ImportDebugContext(DebugDMI);
   
   public:
+      //##Documentation
+      //## Interface for custom block allocators (e.g. memory pools). An
+      //## allocator must be thread-safe, and must outlive all blocks
+      //## allocated from it.
+      class Allocator
+      {
+        public:
+          virtual ~Allocator ()
+          {}
+
+          //## allocates a block of the given size
+          virtual void * allocate (size_t size) =0;
+
+          //## releases a block obtained from allocate(size)
+          virtual void release (void *block,size_t size) =0;
+      };
+
     //##ModelId=3BEBD44D0103
       SmartBlock();
 
@@ -64,6 +81,11 @@ class SmartBlock : public CountedRefTarget
       //## Creates a SmartBlock in shared memory.
       SmartBlock (size_t size, int shm_flags, int flags);
 
+      //##Documentation
+      //## Allocates a SmartBlock from a custom allocator. Clones of the
+      //## block are allocated from the same allocator.
+      SmartBlock (size_t size, int flags, Allocator &alloc);
+
       //##ModelId=3DB934E50248
       //##Documentation
       //## Cloning copy constructor. Must be called explicitly as Smart
@@ -166,6 +188,9 @@ class SmartBlock : public CountedRefTarget
       //##ModelId=3BFE1E930399
       bool delete_block;
 
+      // custom allocator of block, 0 if allocated from heap
+      Allocator * allocator;
+
 };
 
 DefineRefTypes(SmartBlock,BlockRef);
@@ -291,6 +291,30 @@ DMI::BObj * __construct_MeqSpline (int n) { return n>0 ? new Meq::Spline [n] : n
         AtomicID::registerId(-1723,"Append")+
         AtomicID::registerId(-1224,"File")+
         AtomicID::registerId(-1054,"Timestamp")+
+        AtomicID::registerId(-1788,"Affinity")+
+        AtomicID::registerId(-1789,"Threads")+
+        AtomicID::registerId(-1790,"Busy")+
+        AtomicID::registerId(-1791,"Blocked")+
+        AtomicID::registerId(-1792,"Orders")+
+        AtomicID::registerId(-1793,"Socket")+
+        AtomicID::registerId(-1794,"Scheduler")+
+        AtomicID::registerId(-1477,"Idle")+
+        AtomicID::registerId(-1795,"Budget")+
+        AtomicID::registerId(-1796,"Bytes")+
+        AtomicID::registerId(-1797,"Peak")+
+        AtomicID::registerId(-1798,"Entries")+
+        AtomicID::registerId(-1799,"Hits")+
+        AtomicID::registerId(-1800,"Misses")+
+        AtomicID::registerId(-1801,"Evictions")+
+        AtomicID::registerId(-1802,"Pool")+
+        AtomicID::registerId(-1770,"Limit")+
+        AtomicID::registerId(-1803,"Allocs")+
+        AtomicID::registerId(-1804,"Frees")+
+        AtomicID::registerId(-1805,"Trims")+
+        AtomicID::registerId(-1806,"Blocks")+
+        AtomicID::registerId(-1807,"Live")+
+        AtomicID::registerId(-1267,"Write")+
+        AtomicID::registerId(-1813,"Behind")+
         AtomicID::registerId(-1704,"MeqSpline")+
         TypeInfoReg::addToRegistry(-1704,TypeInfo(TypeInfo::DYNAMIC,0))+
         DynamicTypeManager::addToRegistry(-1704,__construct_MeqSpline)+
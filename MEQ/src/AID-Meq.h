@@ -23,11 +23,21 @@ const int AidActive_int = -1349;
 const DMI::AtomicID AidAdd(-1088);                // from /home/oms/LOFAR/Timba/OCTOPUSSY/src/Gateways.h:25
 const int AidAdd_int = -1088;
 #endif
+#ifndef _defined_id_AidAffinity
+#define _defined_id_AidAffinity 1
+const DMI::AtomicID AidAffinity(-1788);           // from /home/oms/LOFAR/Timba/MEQ/src/Forest.h:37
+const int AidAffinity_int = -1788;
+#endif
 #ifndef _defined_id_AidAll
 #define _defined_id_AidAll 1
 const DMI::AtomicID AidAll(-1286);                // from /home/oms/LOFAR/Timba/MEQ/src/MeqVocabulary.h:38
 const int AidAll_int = -1286;
 #endif
+#ifndef _defined_id_AidAllocs
+#define _defined_id_AidAllocs 1
+const DMI::AtomicID AidAllocs(-1803);             // from /home/oms/LOFAR/Timba/MEQ/src/VellsPool.h:35
+const int AidAllocs_int = -1803;
+#endif
 #ifndef _defined_id_AidAppend
 #define _defined_id_AidAppend 1
 const DMI::AtomicID AidAppend(-1723);             // from /home/oms/Timba/MEQ/src/Forest.h:35
@@ -48,21 +58,51 @@ const int AidAxes_int = -1346;
 const DMI::AtomicID AidAxis(-1318);               // from /home/oms/LOFAR/Timba/MEQ/src/MeqVocabulary.h:34
 const int AidAxis_int = -1318;
 #endif
+#ifndef _defined_id_AidBehind
+#define _defined_id_AidBehind 1
+const DMI::AtomicID AidBehind(-1813);             // from /home/oms/LOFAR/Timba/MEQ/src/Forest.h:38
+const int AidBehind_int = -1813;
+#endif
 #ifndef _defined_id_AidBit
 #define _defined_id_AidBit 1
 const DMI::AtomicID AidBit(-1293);                // from /home/oms/LOFAR/Timba/MEQ/src/MeqVocabulary.h:40
 const int AidBit_int = -1293;
 #endif
+#ifndef _defined_id_AidBlocked
+#define _defined_id_AidBlocked 1
+const DMI::AtomicID AidBlocked(-1791);            // from /home/oms/LOFAR/Timba/MEQ/src/Forest.h:37
+const int AidBlocked_int = -1791;
+#endif
+#ifndef _defined_id_AidBlocks
+#define _defined_id_AidBlocks 1
+const DMI::AtomicID AidBlocks(-1806);             // from /home/oms/LOFAR/Timba/MEQ/src/VellsPool.h:35
+const int AidBlocks_int = -1806;
+#endif
 #ifndef _defined_id_AidBreakpoint
 #define _defined_id_AidBreakpoint 1
 const DMI::AtomicID AidBreakpoint(-1359);         // from /home/oms/LOFAR/Timba/MEQ/src/Node.h:40
 const int AidBreakpoint_int = -1359;
 #endif
+#ifndef _defined_id_AidBudget
+#define _defined_id_AidBudget 1
+const DMI::AtomicID AidBudget(-1795);             // from /home/oms/LOFAR/Timba/MEQ/src/CacheManager.h:32
+const int AidBudget_int = -1795;
+#endif
+#ifndef _defined_id_AidBusy
+#define _defined_id_AidBusy 1
+const DMI::AtomicID AidBusy(-1790);               // from /home/oms/LOFAR/Timba/MEQ/src/Forest.h:37
+const int AidBusy_int = -1790;
+#endif
 #ifndef _defined_id_AidBy
 #define _defined_id_AidBy 1
 const DMI::AtomicID AidBy(-1297);                 // from /home/oms/LOFAR/Timba/MEQ/src/MeqVocabulary.h:38
 const int AidBy_int = -1297;
 #endif
+#ifndef _defined_id_AidBytes
+#define _defined_id_AidBytes 1
+const DMI::AtomicID AidBytes(-1796);              // from /home/oms/LOFAR/Timba/MEQ/src/CacheManager.h:32
+const int AidBytes_int = -1796;
+#endif
 #ifndef _defined_id_AidCPU
 #define _defined_id_AidCPU 1
 const DMI::AtomicID AidCPU(-1539);                // from /home/oms/LOFAR/Timba/MEQ/src/Node.h:43
@@ -273,6 +313,11 @@ const int AidEnabled_int = -1537;
 const DMI::AtomicID AidEnd(-1276);                // from /home/oms/LOFAR/Timba/AppAgent/AppUtils/src/MSVisAgentVocabulary.h:35
 const int AidEnd_int = -1276;
 #endif
+#ifndef _defined_id_AidEntries
+#define _defined_id_AidEntries 1
+const DMI::AtomicID AidEntries(-1798);            // from /home/oms/LOFAR/Timba/MEQ/src/CacheManager.h:32
+const int AidEntries_int = -1798;
+#endif
 #ifndef _defined_id_AidEpsilon
 #define _defined_id_AidEpsilon 1
 const DMI::AtomicID AidEpsilon(-1377);            // from /home/oms/LOFAR/Timba/MEQ/src/MeqVocabulary.h:39
@@ -293,6 +338,11 @@ const int AidErrors_int = -1310;
 const DMI::AtomicID AidEval(-1557);               // from /home/oms/LOFAR/Timba/MEQ/src/MeqVocabulary.h:41
 const int AidEval_int = -1557;
 #endif
+#ifndef _defined_id_AidEvictions
+#define _defined_id_AidEvictions 1
+const DMI::AtomicID AidEvictions(-1801);          // from /home/oms/LOFAR/Timba/MEQ/src/CacheManager.h:32
+const int AidEvictions_int = -1801;
+#endif
 #ifndef _defined_id_AidFail
 #define _defined_id_AidFail 1
 const DMI::AtomicID AidFail(-1248);               // from /home/oms/LOFAR/Timba/AppAgent/AppUtils/src/ApplicationBase.h:20
@@ -328,6 +378,11 @@ const int AidFlags_int = -1253;
 const DMI::AtomicID AidForce(-1498);              // from /home/oms/LOFAR/Timba/MeqNodes/src/ZeroFlagger.h:33
 const int AidForce_int = -1498;
 #endif
+#ifndef _defined_id_AidFrees
+#define _defined_id_AidFrees 1
+const DMI::AtomicID AidFrees(-1804);              // from /home/oms/LOFAR/Timba/MEQ/src/VellsPool.h:35
+const int AidFrees_int = -1804;
+#endif
 #ifndef _defined_id_AidFreq
 #define _defined_id_AidFreq 1
 const DMI::AtomicID AidFreq(-1177);               // from /home/oms/LOFAR/Timba/VisCube/src/VisVocabulary.h:31
@@ -378,11 +433,21 @@ const int AidGroups_int = -1369;
 const DMI::AtomicID AidGrow(-1355);               // from /home/oms/LOFAR/Timba/MEQ/src/MeqVocabulary.h:39
 const int AidGrow_int = -1355;
 #endif
+#ifndef _defined_id_AidHits
+#define _defined_id_AidHits 1
+const DMI::AtomicID AidHits(-1799);               // from /home/oms/LOFAR/Timba/MEQ/src/CacheManager.h:32
+const int AidHits_int = -1799;
+#endif
 #ifndef _defined_id_AidId
 #define _defined_id_AidId 1
 const DMI::AtomicID AidId(-1208);                 // from /home/oms/LOFAR/Timba/AppAgent/AppAgent/src/AppControlAgent.h:21
 const int AidId_int = -1208;
 #endif
+#ifndef _defined_id_AidIdle
+#define _defined_id_AidIdle 1
+const DMI::AtomicID AidIdle(-1477);               // from /home/oms/LOFAR/Timba/MEQ/src/Forest.h:37
+const int AidIdle_int = -1477;
+#endif
 #ifndef _defined_id_AidIgnore
 #define _defined_id_AidIgnore 1
 const DMI::AtomicID AidIgnore(-1149);             // from /home/oms/LOFAR/Timba/VisCube/src/VisVocabulary.h:36
@@ -473,6 +538,11 @@ const int AidLevel_int = -1047;
 const DMI::AtomicID AidLib(-1697);                // from /home/mevius/Timba/MEQ/src/MeqVocabulary.h:43
 const int AidLib_int = -1697;
 #endif
+#ifndef _defined_id_AidLimit
+#define _defined_id_AidLimit 1
+const DMI::AtomicID AidLimit(-1770);              // from /home/oms/LOFAR/Timba/MEQ/src/VellsPool.h:35
+const int AidLimit_int = -1770;
+#endif
 #ifndef _defined_id_AidLine
 #define _defined_id_AidLine 1
 const DMI::AtomicID AidLine(-1358);               // from /home/oms/LOFAR/Timba/MEQ/src/MeqVocabulary.h:37
@@ -488,6 +558,11 @@ const int AidLink_int = -1375;
 const DMI::AtomicID AidList(-1040);               // from /home/oms/LOFAR/Timba/OCTOPUSSY/src/GWClientWP.h:11
 const int AidList_int = -1040;
 #endif
+#ifndef _defined_id_AidLive
+#define _defined_id_AidLive 1
+const DMI::AtomicID AidLive(-1807);               // from /home/oms/LOFAR/Timba/MEQ/src/VellsPool.h:35
+const int AidLive_int = -1807;
+#endif
 #ifndef _defined_id_AidLog
 #define _defined_id_AidLog 1
 const DMI::AtomicID AidLog(-1724);                // from /home/oms/Timba/MEQ/src/Node.h:48
@@ -613,6 +688,11 @@ const int AidMetrics_int = -1363;
 const DMI::AtomicID AidMin(-1675);                // from /home/mevius/LOFAR/Timba/MEQ/src/MeqVocabulary.h:43
 const int AidMin_int = -1675;
 #endif
+#ifndef _defined_id_AidMisses
+#define _defined_id_AidMisses 1
+const DMI::AtomicID AidMisses(-1800);             // from /home/oms/LOFAR/Timba/MEQ/src/CacheManager.h:32
+const int AidMisses_int = -1800;
+#endif
 #ifndef _defined_id_AidMissing
 #define _defined_id_AidMissing 1
 const DMI::AtomicID AidMissing(-1657);            // from /home/oms/LOFAR/Timba/MEQ/src/NodeNursery.h:32
@@ -693,6 +773,11 @@ const int AidOr_int = -1368;
 const DMI::AtomicID AidOrder(-1601);              // from /home/oms/LOFAR/Timba/MEQ/src/Node.h:45
 const int AidOrder_int = -1601;
 #endif
+#ifndef _defined_id_AidOrders
+#define _defined_id_AidOrders 1
+const DMI::AtomicID AidOrders(-1792);             // from /home/oms/LOFAR/Timba/MEQ/src/Forest.h:37
+const int AidOrders_int = -1792;
+#endif
 #ifndef _defined_id_AidOrigin
 #define _defined_id_AidOrigin 1
 const DMI::AtomicID AidOrigin(-1185);             // from /home/oms/LOFAR/Timba/VisCube/src/VisVocabulary.h:35
@@ -718,6 +803,11 @@ const int AidParents_int = -1530;
 const DMI::AtomicID AidParm(-1379);               // from /home/oms/LOFAR/Timba/MEQ/src/MeqVocabulary.h:36
 const int AidParm_int = -1379;
 #endif
+#ifndef _defined_id_AidPeak
+#define _defined_id_AidPeak 1
+const DMI::AtomicID AidPeak(-1797);               // from /home/oms/LOFAR/Timba/MEQ/src/CacheManager.h:32
+const int AidPeak_int = -1797;
+#endif
 #ifndef _defined_id_AidPer
 #define _defined_id_AidPer 1
 const DMI::AtomicID AidPer(-1534);                // from /home/oms/LOFAR/Timba/MEQ/src/Node.h:42
@@ -763,6 +853,11 @@ const int AidPoll_int = -1602;
 const DMI::AtomicID AidPolling(-1603);            // from /home/oms/LOFAR/Timba/MEQ/src/Node.h:45
 const int AidPolling_int = -1603;
 #endif
+#ifndef _defined_id_AidPool
+#define _defined_id_AidPool 1
+const DMI::AtomicID AidPool(-1802);               // from /home/oms/LOFAR/Timba/MEQ/src/VellsPool.h:35
+const int AidPool_int = -1802;
+#endif
 #ifndef _defined_id_AidPositive
 #define _defined_id_AidPositive 1
 const DMI::AtomicID AidPositive(-1671);           // from /home/mevius/LOFAR/Timba/MEQ/src/MeqVocabulary.h:43
@@ -868,6 +963,11 @@ const int AidSave_int = -1332;
 const DMI::AtomicID AidScale(-1323);              // from /home/oms/LOFAR/Timba/MEQ/src/MeqVocabulary.h:38
 const int AidScale_int = -1323;
 #endif
+#ifndef _defined_id_AidScheduler
+#define _defined_id_AidScheduler 1
+const DMI::AtomicID AidScheduler(-1794);          // from /home/oms/LOFAR/Timba/MEQ/src/Forest.h:37
+const int AidScheduler_int = -1794;
+#endif
 #ifndef _defined_id_AidSecond
 #define _defined_id_AidSecond 1
 const DMI::AtomicID AidSecond(-1535);             // from /home/oms/LOFAR/Timba/MEQ/src/Node.h:42
@@ -918,6 +1018,11 @@ const int AidSize_int = -1255;
 const DMI::AtomicID AidSizes(-1560);              // from /home/mevius/LOFAR/Timba/MEQ/src/MeqVocabulary.h:43
 const int AidSizes_int = -1560;
 #endif
+#ifndef _defined_id_AidSocket
+#define _defined_id_AidSocket 1
+const DMI::AtomicID AidSocket(-1793);             // from /home/oms/LOFAR/Timba/MEQ/src/Forest.h:37
+const int AidSocket_int = -1793;
+#endif
 #ifndef _defined_id_AidSolution
 #define _defined_id_AidSolution 1
 const DMI::AtomicID AidSolution(-1525);           // from /home/oms/LOFAR/Timba/MEQ/src/Forest.h:33
@@ -1003,6 +1108,11 @@ const int AidSymdeps_int = -1322;
 const DMI::AtomicID AidTable(-1354);              // from /home/oms/LOFAR/Timba/MEQ/src/MeqVocabulary.h:35
 const int AidTable_int = -1354;
 #endif
+#ifndef _defined_id_AidThreads
+#define _defined_id_AidThreads 1
+const DMI::AtomicID AidThreads(-1789);            // from /home/oms/LOFAR/Timba/MEQ/src/Forest.h:37
+const int AidThreads_int = -1789;
+#endif
 #ifndef _defined_id_AidTicks
 #define _defined_id_AidTicks 1
 const DMI::AtomicID AidTicks(-1533);              // from /home/oms/LOFAR/Timba/MEQ/src/Node.h:42
@@ -1043,6 +1153,11 @@ const int AidTimestamp_int = -1054;
 const DMI::AtomicID AidTotal(-1139);              // from /home/oms/LOFAR/Timba/VisCube/src/VisVocabulary.h:32
 const int AidTotal_int = -1139;
 #endif
+#ifndef _defined_id_AidTrims
+#define _defined_id_AidTrims 1
+const DMI::AtomicID AidTrims(-1805);              // from /home/oms/LOFAR/Timba/MEQ/src/VellsPool.h:35
+const int AidTrims_int = -1805;
+#endif
 #ifndef _defined_id_AidU
 #define _defined_id_AidU 1
 const DMI::AtomicID AidU(-1006);                  // from /home/oms/LOFAR/Timba/DMI/src/AtomicID.h:33
@@ -1108,6 +1223,11 @@ const int AidWeight_int = -1137;
 const DMI::AtomicID AidWeights(-1285);            // from /home/oms/LOFAR/Timba/MEQ/src/MeqVocabulary.h:33
 const int AidWeights_int = -1285;
 #endif
+#ifndef _defined_id_AidWrite
+#define _defined_id_AidWrite 1
+const DMI::AtomicID AidWrite(-1267);              // from /home/oms/LOFAR/Timba/MEQ/src/Forest.h:38
+const int AidWrite_int = -1267;
+#endif
 #ifndef _defined_id_AidX
 #define _defined_id_AidX 1
 const DMI::AtomicID AidX(-1024);                  // from /home/oms/LOFAR/Timba/DMI/src/AtomicID.h:33
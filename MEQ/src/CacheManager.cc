@@ -0,0 +1,156 @@
+//
+//% $Id$
+//
+//
+// Copyright (C) 2002-2007
+// The MeqTree Foundation &
+// ASTRON (Netherlands Foundation for Research in Astronomy)
+// P.O.Box 2, 7990 AA Dwingeloo, The Netherlands
+//
+// This program is free software; you can redistribute it and/or modify
+// it under the terms of the GNU General Public License as published by
+// the Free Software Foundation; either version 2 of the License, or
+// (at your option) any later version.
+//
+// This program is distributed in the hope that it will be useful,
+// but WITHOUT ANY WARRANTY; without even the implied warranty of
+// MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+// GNU General Public License for more details.
+//
+// You should have received a copy of the GNU General Public License
+// along with this program; if not, see <http://www.gnu.org/licenses/>,
+// or write to the Free Software Foundation, Inc.,
+// 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+//
+
+#include "CacheManager.h"
+#include "Node.h"
+#include "Result.h"
+#include "VellSet.h"
+#include <algorithm>
+
+namespace Meq
+{
+
+static size_t vellsSize (const Vells &vells)
+{
+  return size_t(vells.nelements())*vells.elementSize();
+}
+
+size_t CacheManager::resultSize (const Result &res)
+{
+  size_t nbytes = 0;
+  for( int i=0; i<res.numVellSets(); i++ )
+  {
+    const VellSet &vs = res.vellSet(i);
+    if( vs.hasValue() )
+      nbytes += vellsSize(vs.getValue());
+    if( vs.hasDataFlags() )
+      nbytes += vellsSize(vs.dataFlags());
+    for( int iset=0; iset<vs.numPertSets(); iset++ )
+      for( int j=0; j<vs.numSpids(); j++ )
+        nbytes += vellsSize(vs.getPerturbedValue(j,iset));
+  }
+  return nbytes;
+}
+
+CacheManager::CacheManager ()
+  : budget_(0),bytes_(0),peak_(0),hits_(0),misses_(0),evictions_(0)
+{
+}
+
+void CacheManager::setBudget (double nbytes)
+{
+  Thread::Mutex::Lock lock(mutex_);
+  budget_ = std::max(nbytes,0.);
+  enforceBudget(0);
+}
+
+void CacheManager::insert (Node &node,size_t nbytes)
+{
+  Thread::Mutex::Lock lock(mutex_);
+  Entry &entry = node.cache_entry_;
+  if( entry.linked )
+  {
+    bytes_ -= entry.bytes;
+    lru_.splice(lru_.begin(),lru_,entry.pos);
+  }
+  else
+  {
+    lru_.push_front(&node);
+    entry.pos = lru_.begin();
+    entry.linked = true;
+  }
+  entry.bytes = nbytes;
+  bytes_ += nbytes;
+  *(node.pcbytes_) = nbytes;
+  if( bytes_ > peak_ )
+    peak_ = bytes_;
+  enforceBudget(&node);
+}
+
+void CacheManager::touchLRU (Node &node)
+{
+  Thread::Mutex::Lock lock(mutex_);
+  Entry &entry = node.cache_entry_;
+  if( entry.linked )
+    lru_.splice(lru_.begin(),lru_,entry.pos);
+}
+
+void CacheManager::remove (Node &node)
+{
+  Thread::Mutex::Lock lock(mutex_);
+  Entry &entry = node.cache_entry_;
+  if( !entry.linked )
+    return;
+  lru_.erase(entry.pos);
+  bytes_ -= entry.bytes;
+  entry.bytes = 0;
+  entry.linked = false;
+  *(node.pcbytes_) = 0;
+}
+
+void CacheManager::enforceBudget (const Node *keep)
+{
+  if( budget_ <= 0 || bytes_ <= budget_ )
+    return;
+  // walk from the least recently used end. Node::evictCache() only
+  // try-locks the node, so a cache that is busy elsewhere is skipped
+  // rather than waited for.
+  LRUList::iterator iter = lru_.end();
+  while( bytes_ > budget_ && iter != lru_.begin() )
+  {
+    --iter;
+    Node *pnode = *iter;
+    if( pnode == keep || !pnode->evictCache() )
+      continue;
+    Entry &entry = pnode->cache_entry_;
+    bytes_ -= entry.bytes;
+    entry.bytes = 0;
+    entry.linked = false;
+    *(pnode->pcbytes_) = 0;
+    evictions_++;
+    iter = lru_.erase(iter);
+  }
+}
+
+void CacheManager::resetStats ()
+{
+  Thread::Mutex::Lock lock(mutex_);
+  hits_ = misses_ = evictions_ = 0;
+  peak_ = bytes_;
+}
+
+void CacheManager::fillStats (DMI::Record &rec) const
+{
+  Thread::Mutex::Lock lock(mutex_);
+  rec[AidBudget]    = budget_;
+  rec[AidBytes]     = bytes_;
+  rec[AidPeak]      = peak_;
+  rec[AidEntries]   = int(lru_.size());
+  rec[AidHits]      = hits_;
+  rec[AidMisses]    = misses_;
+  rec[AidEvictions] = evictions_;
+}
+
+} // namespace Meq
@@ -0,0 +1,136 @@
+//
+//% $Id$
+//
+//
+// Copyright (C) 2002-2007
+// The MeqTree Foundation &
+// ASTRON (Netherlands Foundation for Research in Astronomy)
+// P.O.Box 2, 7990 AA Dwingeloo, The Netherlands
+//
+// This program is free software; you can redistribute it and/or modify
+// it under the terms of the GNU General Public License as published by
+// the Free Software Foundation; either version 2 of the License, or
+// (at your option) any later version.
+//
+// This program is distributed in the hope that it will be useful,
+// but WITHOUT ANY WARRANTY; without even the implied warranty of
+// MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+// GNU General Public License for more details.
+//
+// You should have received a copy of the GNU General Public License
+// along with this program; if not, see <http://www.gnu.org/licenses/>,
+// or write to the Free Software Foundation, Inc.,
+// 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+//
+#ifndef MEQ_CACHEMANAGER_H
+#define MEQ_CACHEMANAGER_H
+
+#include <TimBase/Thread/Mutex.h>
+#include <DMI/Record.h>
+#include <list>
+
+#pragma aid Budget Bytes Peak Entries Hits Misses Evictions
+
+namespace Meq
+{
+class Node;
+class Result;
+
+// The CacheManager keeps track of the memory held by cached node results
+// across the whole forest. Nodes register their cache with insert() when
+// they store a result and unregister it with remove() when they clear it.
+// The registered caches are kept in LRU order; when the total size goes
+// over the budget, least-recently-used caches are evicted until it fits
+// again. A cache that is still waiting for some of its parents to pick it
+// up (i.e. not all parents have issued a hold/release hint) is never
+// evicted, nor is the cache of an executing node.
+class CacheManager
+{
+  public:
+    typedef std::list<Node*> LRUList;
+
+    // per-node bookkeeping, embedded in each Node
+    class Entry
+    {
+      public:
+        Entry ()
+        : bytes(0),linked(false)
+        {}
+
+        size_t bytes;
+        bool   linked;
+        LRUList::iterator pos;
+    };
+
+    CacheManager ();
+
+    // sets the budget in bytes. 0 means no limit. Lowering the budget
+    // evicts caches immediately.
+    void setBudget (double nbytes);
+
+    double budget () const
+    { return budget_; }
+
+    // total number of bytes currently cached
+    double bytes () const
+    { return bytes_; }
+
+    // registers (or refreshes) the cache of a node, as most recently used.
+    // Caller must hold the node's execCond() lock.
+    void insert (Node &node,size_t nbytes);
+
+    // marks the cache of a node as most recently used. With no budget
+    // nothing is ever evicted, so LRU order doesn't matter and this
+    // does nothing.
+    void touch (Node &node)
+    {
+      if( budget_ > 0 )
+        touchLRU(node);
+    }
+
+    // unregisters the cache of a node
+    void remove (Node &node);
+
+    // forest-wide hit/miss counters. These are called on every cache
+    // lookup, so they are updated atomically rather than under the mutex
+    void recordHit ()
+    { __sync_add_and_fetch(&hits_,1); }
+
+    void recordMiss ()
+    { __sync_add_and_fetch(&misses_,1); }
+
+    // clears hit/miss/eviction counters and the peak size
+    void resetStats ();
+
+    // fills record with the current stats
+    void fillStats (DMI::Record &rec) const;
+
+    // returns the approximate number of bytes held by a result
+    static size_t resultSize (const Result &res);
+
+  private:
+    // moves the cache of a node to the front of the LRU list
+    void touchLRU (Node &node);
+
+    // evicts LRU caches until we're within budget. The cache of keep
+    // (if any) is never evicted.
+    void enforceBudget (const Node *keep);
+
+    mutable Thread::Mutex mutex_;
+
+    // most recently used caches go at the front
+    LRUList lru_;
+
+    double budget_;
+    double bytes_;
+    double peak_;
+
+    // updated atomically, see recordHit()/recordMiss()
+    int hits_;
+    int misses_;
+    int evictions_;
+};
+
+} // namespace Meq
+
+#endif
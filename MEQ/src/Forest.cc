@@ -23,6 +23,9 @@
 
 #include "Forest.h"
 #include "MeqVocabulary.h"
+#include "MTPool.h"
+#include "VellsPool.h"
+#include "WriteBehindParmTable.h"
 #include <DMI/DynamicTypeManager.h>
 #include <DMI/List.h>
 #include <DMI/Timestamp.h>
@@ -46,6 +49,11 @@ const HIID FProfilingEnabled = AidProfiling|AidEnabled;
 const HIID FCwd = AidCwd;
 const HIID FLogFileName = AidLog|AidFile|AidName;
 const HIID FLogAppend = AidLog|AidAppend;
+const HIID FMTAffinity = AidMT|AidAffinity;
+const HIID FCacheBudget = AidCache|AidBudget;
+const HIID FVellsPoolEnabled = AidVells|AidPool|AidEnabled;
+const HIID FVellsPoolLimit = AidVells|AidPool|AidLimit;
+const HIID FParmWriteBehind = AidParm|AidWrite|AidBehind;
 
 
 //##ModelId=3F60697A00ED
@@ -76,6 +84,8 @@ Forest::Forest ()
   log_filename_ = "meqlog.mql";
   profiling_enabled_ = true;
   abort_flag_ = false;
+  // Vells storage comes from the pool
+  VellsPool::install();
 
   // init the state record
   initDefaultState();
@@ -88,6 +98,9 @@ void Forest::clear ()
   nodes.resize(1);
   name_map.clear();
   num_valid_nodes = 0;
+  cache_manager_.resetStats();
+  // give pooled Vells storage back to the system
+  VellsPool::instance().trim();
   logger_.close();
   Axis::resetDefaultMap();
 }
@@ -278,7 +291,30 @@ void Forest::incrRequestId (RequestId &rqid,const HIID &symdep)
 int Forest::getNodeList (DMI::Record &list,int content)
 {
   Thread::Mutex::Lock lock(forestMutex());
-  int num = num_valid_nodes;
+  std::vector<int> nodeindices;
+  nodeindices.reserve(num_valid_nodes);
+  for( uint i=1; i<nodes.size(); i++ )
+    if( nodes[i].valid() )
+      nodeindices.push_back(i);
+  FailWhen(int(nodeindices.size())!=num_valid_nodes,
+      "forest inconsistency: valid node count mismatch");
+  return fillNodeList(list,content,nodeindices);
+}
+
+int Forest::getNodeList (DMI::Record &list,int content,const std::vector<int> &nodeindices)
+{
+  Thread::Mutex::Lock lock(forestMutex());
+  std::vector<int> subset;
+  subset.reserve(nodeindices.size());
+  for( uint i=0; i<nodeindices.size(); i++ )
+    if( valid(nodeindices[i]) )
+      subset.push_back(nodeindices[i]);
+  return fillNodeList(list,content,subset);
+}
+
+int Forest::fillNodeList (DMI::Record &list,int content,const std::vector<int> &nodeindices)
+{
+  int num = nodeindices.size();
   // create lists (arrays) for all known content
   DMI::Vec *lni=0,*lname=0,*lclass=0,*lstate=0,*lrqid=0,*lprof=0,*lcache=0;
   DMI::List *lchildren=0,*lstepchildren=0;
@@ -306,50 +342,46 @@ int Forest::getNodeList (DMI::Record &list,int content)
   if( num )
   {
     // fill them up
-    int i0 = 0;
-    for( uint i=1; i<nodes.size(); i++ )
-      if( nodes[i].valid() )
+    for( int i0=0; i0<num; i0++ )
+    {
+      int i = nodeindices[i0];
+      NodeFace &node = nodes[i]();
+      DMI::Record::Ref nodestate;
+      if( lni )
+        (*lni)[i0] = i;
+      if( lname )
+        (*lname)[i0] = node.name();
+      if( lclass )
+        (*lclass)[i0] = node.className();
+      Node *pnode = dynamic_cast<Node*>(&node);
+      if( pnode )
+      {
+        if( lstate )
+          (*lstate)[i0] = pnode->getControlStatus();
+        if( lrqid )
+          (*lrqid)[i0] = pnode->currentRequestId();
+      }
+      if( lchildren )
+      {
+        node.getState(nodestate);
+        DMI::Record::Hook hook(*nodestate,FChildren);
+        if( hook.exists() )
+          lchildren->addBack(hook.ref(true));
+        else
+          lchildren->addBack(new DMI::List);
+        DMI::Record::Hook hook1(*nodestate,FStepChildren);
+        if( hook1.exists() )
+          lstepchildren->addBack(hook1.ref(true));
+        else
+          lstepchildren->addBack(new DMI::List);
+      }
+      if( lprof )
       {
-        FailWhen(i0>num,"forest inconsistency: too many valid nodes");
-        NodeFace &node = nodes[i]();
-        DMI::Record::Ref nodestate;
-        if( lni )
-          (*lni)[i0] = i;
-        if( lname )
-          (*lname)[i0] = node.name();
-        if( lclass )
-          (*lclass)[i0] = node.className();
-        Node *pnode = dynamic_cast<Node*>(&node);
-        if( pnode )
-        {
-          if( lstate )
-            (*lstate)[i0] = pnode->getControlStatus();
-          if( lrqid )
-            (*lrqid)[i0] = pnode->currentRequestId();
-        }
-        if( lchildren )
-        {
-          node.getState(nodestate);
-          DMI::Record::Hook hook(*nodestate,FChildren);
-          if( hook.exists() )
-            lchildren->addBack(hook.ref(true));
-          else
-            lchildren->addBack(new DMI::List);
-          DMI::Record::Hook hook1(*nodestate,FStepChildren);
-          if( hook1.exists() )
-            lstepchildren->addBack(hook1.ref(true));
-          else
-            lstepchildren->addBack(new DMI::List);
-        }
-        if( lprof )
-        {
-          node.getSyncState(nodestate);
-          (*lprof)[i0] = (*nodestate)[FProfilingStats].ref(true);
-          (*lcache)[i0] = (*nodestate)[FCacheStats].ref(true);
-        }
-        i0++;
+        node.getSyncState(nodestate);
+        (*lprof)[i0] = (*nodestate)[FProfilingStats].ref(true);
+        (*lcache)[i0] = (*nodestate)[FCacheStats].ref(true);
       }
-    FailWhen(i0<num,"forest inconsistency: too few valid nodes found");
+    }
   }
   return num;
 }
@@ -369,9 +401,14 @@ void Forest::initDefaultState ()
   st[FDebugLevel] = debug_level_;
   st[FSymdeps] <<= symdeps().toRecord();
   st[FCachePolicy] = cache_policy_;
+  st[FCacheBudget] = cache_manager_.budget();
+  st[FVellsPoolEnabled] = VellsPool::instance().enabled();
+  st[FVellsPoolLimit] = VellsPool::instance().limit();
   st[FProfilingEnabled] = profiling_enabled_;
   st[FBreakpoint] = breakpoints;
   st[FBreakpointSingleShot] = breakpoints_ss;
+  st[FMTAffinity] = MTPool::affinityName(MTPool::affinity());
+  st[FParmWriteBehind] = WriteBehindParmTable::enabled();
 }
 
 DMI::Record::Ref Forest::state () const
@@ -401,12 +438,41 @@ void Forest::setStateImpl (DMI::Record::Ref &rec)
     rec[FAxisMap] = Axis::getAxisRecords();
   }
   rec[FCachePolicy].get(cache_policy_);
+  // cache memory budget in bytes, 0 for unlimited
+  if( rec->hasField(FCacheBudget) )
+  {
+    double budget = rec[FCacheBudget].as<double>();
+    FailWhen(budget<0,FCacheBudget.toString()+" must be >=0");
+    if( budget != cache_manager_.budget() )
+      cache_manager_.setBudget(budget);
+  }
   rec[FLogPolicy].get(log_policy_);
   rec[FLogFileName].get(log_filename_);
   rec[FLogAppend].get(log_append_);
   rec[FProfilingEnabled].get(profiling_enabled_);
   rec[FBreakpoint].get(breakpoints);
   rec[FBreakpointSingleShot].get(breakpoints_ss);
+  // Vells storage pool
+  if( rec->hasField(FVellsPoolEnabled) )
+    VellsPool::instance().enable(rec[FVellsPoolEnabled].as<bool>());
+  if( rec->hasField(FVellsPoolLimit) )
+  {
+    double limit = rec[FVellsPoolLimit].as<double>();
+    FailWhen(limit<0,FVellsPoolLimit.toString()+" must be >=0");
+    VellsPool::instance().setLimit(limit);
+  }
+  // background writing of parm tables (applies to tables opened from now on)
+  if( rec->hasField(FParmWriteBehind) )
+    WriteBehindParmTable::enable(rec[FParmWriteBehind].as<bool>());
+  // thread placement policy
+  if( rec->hasField(FMTAffinity) )
+  {
+    string name = rec[FMTAffinity].as<string>();
+    int policy = MTPool::parseAffinity(name);
+    FailWhen(policy<0,"unknown "+FMTAffinity.toString()+" policy '"+name+"'");
+    if( MTPool::enabled() && policy != MTPool::affinity() )
+      MTPool::brigade().setAffinity(policy);
+  }
 //  FailWhen(rec->hasField(FKnownSymdeps),"immutable field: "+FKnownSymdeps.toString());
 //  FailWhen(rec->hasField(FSymdeps),"immutable field: "+FSymdeps.toString());
 //   if( rec->hasField(FSymDeps) )
@@ -34,6 +34,8 @@
 
 #pragma aid Create Delete
 #pragma aid Axes Symdeps Debug Level Profiling Enabled Cwd Append File Timestamp
+#pragma aid MT Affinity Threads Busy Blocked Idle Orders Socket Scheduler
+#pragma aid Write Behind
 
 namespace Meq
 {
@@ -104,9 +106,16 @@ class Forest
     int maxNodeIndex () const
     { return nodes.size()-1; }
 
+    // number of valid nodes in the repository
+    int numNodes () const
+    { return num_valid_nodes; }
+
     // fills DMI::Record with list of valid nodes, including information
     // specified by content
     int getNodeList (DMI::Record &list,int content = NL_DEFAULT);
+    // same, but only for the specified subset of node indices (invalid
+    // indices are skipped)
+    int getNodeList (DMI::Record &list,int content,const std::vector<int> &nodeindices);
 
     DMI::Record::Ref state () const;
 
@@ -149,6 +158,13 @@ class Forest
     void setCachePolicy (int pol)
     { cache_policy_ = pol; }
 
+    // returns the forest-wide cache manager
+    CacheManager & cacheManager ()
+    { return cache_manager_; }
+
+    const CacheManager & cacheManager () const
+    { return cache_manager_; }
+
     // returns or sets the default log policy
     int logPolicy () const
     { return log_policy_; }
@@ -297,6 +313,9 @@ class Forest
     void initDefaultState ();
     void setStateImpl (DMI::Record::Ref &rec);
 
+    // helper for getNodeList(): fills list for the given (valid) nodes
+    int fillNodeList (DMI::Record &list,int content,const std::vector<int> &nodeindices);
+
     mutable DMI::Record::Ref staterec_;
 
     int breakpoints;
@@ -313,6 +332,10 @@ class Forest
     void (*node_breakpoint_callback)(Node&,int,bool);
     void (*event_callback)(const HIID &,const ObjRef &);
 
+    // keeps track of cached results against the memory budget. Declared
+    // ahead of the repository, since nodes unregister from it on destruction
+    CacheManager cache_manager_;
+
     //##ModelId=3F60697903A7
     typedef std::vector<NodeFace::Ref> Repository;
     //##ModelId=3F5F439203E2
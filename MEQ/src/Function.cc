@@ -100,6 +100,11 @@ void Function::evaluateFlags (Vells::Ref &out,const Request &,const LoShape &,co
       Vells::mergeFlags(out,pvs[i]->dataFlags(),flagmask_[i]);
 }
 
+bool Function::isMissingResult (const vector<const Vells*> &) const
+{
+  return false;
+}
+
 //##ModelId=3F86886E03DD
 int Function::getResult (Result::Ref &resref,
                          const std::vector<Result::Ref> &childres,
@@ -196,10 +201,10 @@ int Function::getResult (Result::Ref &resref,
     // If every child value is missing, then we return no data for this VellSet
     // Otherwise, we have a case of some values present, and some missing. This is only supported by some node classes:
     // these will have called allowMissingData() in their constructor. If this is not supported, then we return no
-    // data as well.
+    // data as well. Such a class may still find that the remaining values give no result (see isMissingResult()).
     if( nmissing )
     {
-      if( nmissing == nrch || !allow_missing_data_ )
+      if( nmissing == nrch || !allow_missing_data_ || isMissingResult(values) )
       {
         missing_planes++;
         continue;
@@ -81,6 +81,12 @@ protected:
     //##ModelId=3F86886F00B0
   virtual void evaluateFlags (Vells::Ref &out,const Request &req,const LoShape &shape,const vector<const VellSet *> &pvs);
 
+  // Called when some (but not all) child values are missing, and
+  // allowMissingData() has been called. Returns true if the result is
+  // missing nevertheless, in which case the VellSet is left empty, as
+  // when all child values are missing. Default version returns false.
+  virtual bool isMissingResult (const vector<const Vells*> &values) const;
+
 
   virtual void setStateImpl (DMI::Record::Ref &rec,bool initializing);
 
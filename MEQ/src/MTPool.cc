@@ -25,6 +25,11 @@
 
 #include "MTPool.h"
 #include <vector>
+#include <map>
+#include <stdio.h>
+#include <string.h>
+#include <unistd.h>
+#include <sys/time.h>
 
 namespace Meq
 {
@@ -42,13 +47,97 @@ int Brigade::max_brigade_id_ = 0;
 
 Brigade *main_brigade_ = 0;
 int max_busy_ = 1;
+int scheduler_ = SCHED_LIFO;
 
-void start (int nwork,int max_busy)
+// CPU topology, discovered once at startup: the online cores in the order
+// in which they are handed out to threads (interleaving the sockets), and
+// the socket of each core
+static std::vector<int> cpu_order_;
+static std::vector<int> cpu_socket_;
+
+static void discoverTopology ()
+{
+  if( !cpu_order_.empty() )
+    return;
+  int ncpu = sysconf(_SC_NPROCESSORS_ONLN);
+  if( ncpu < 1 )
+    ncpu = 1;
+  cpu_socket_.resize(ncpu,0);
+  std::map<int,std::vector<int> > sockets;
+  for( int i=0; i<ncpu; i++ )
+  {
+    int sock = 0;
+    string path = Debug::ssprintf("/sys/devices/system/cpu/cpu%d/topology/physical_package_id",i);
+    FILE *f = fopen(path.c_str(),"r");
+    if( f )
+    {
+      if( fscanf(f,"%d",&sock) != 1 || sock < 0 )
+        sock = 0;
+      fclose(f);
+    }
+    cpu_socket_[i] = sock;
+    sockets[sock].push_back(i);
+  }
+  for( uint k=0; cpu_order_.size() < uint(ncpu); k++ )
+    for( std::map<int,std::vector<int> >::const_iterator iter = sockets.begin();
+         iter != sockets.end(); iter++ )
+      if( k < iter->second.size() )
+        cpu_order_.push_back(iter->second[k]);
+  dprintf(1)("%d cores on %d sockets\n",ncpu,int(sockets.size()));
+}
+
+static inline double wallTime ()
+{
+  struct timeval tv;
+  gettimeofday(&tv,0);
+  return tv.tv_sec + tv.tv_usec*1e-6;
+}
+
+int parseAffinity (const string &name)
+{
+  if( name == "none" )
+    return AFFINITY_NONE;
+  else if( name == "core" )
+    return AFFINITY_CORE;
+  else if( name == "socket" )
+    return AFFINITY_SOCKET;
+  return -1;
+}
+
+string affinityName (int policy)
+{
+  switch( policy )
+  {
+    case AFFINITY_CORE:   return "core";
+    case AFFINITY_SOCKET: return "socket";
+    default:              return "none";
+  }
+}
+
+int affinity ()
+{
+  return main_brigade_ ? main_brigade_->affinity() : int(AFFINITY_NONE);
+}
+
+int parseScheduler (const string &name)
+{
+  if( name == "lifo" )
+    return SCHED_LIFO;
+  else if( name == "steal" )
+    return SCHED_STEAL;
+  return -1;
+}
+
+void start (int nwork,int max_busy,int sched,int affinity)
 {
   FailWhen(main_brigade_,"MTPool already started");
-  dprintf(0)("pid %d starting pool of %d threads, max busy is %d\n",getpid(),nwork,max_busy);
-  main_brigade_ = new Brigade(nwork,max_busy);
+  dprintf(0)("pid %d starting pool of %d threads, max busy is %d, %s scheduler, affinity %s\n",
+             getpid(),nwork,max_busy,sched == SCHED_STEAL ? "work-stealing" : "LIFO",
+             affinityName(affinity).c_str());
+  discoverTopology();
+  main_brigade_ = new Brigade(nwork,max_busy,0,sched,affinity);
   max_busy_ = max_busy;
+  scheduler_ = sched;
 }
 
 void stop  ()
@@ -61,9 +150,9 @@ void stop  ()
 }
 
 
-Brigade::Brigade (int nwork,int max_busy,Thread::Mutex::Lock *plock)
+Brigade::Brigade (int nwork,int max_busy,Thread::Mutex::Lock *plock,int sched,int affinity)
 {
-  workers_.reserve(128);
+  workers_.reserve(WS_MAX_DEQUES);
   Thread::Mutex::Lock lock;
   if( !plock )
     plock = &lock;
@@ -72,36 +161,165 @@ Brigade::Brigade (int nwork,int max_busy,Thread::Mutex::Lock *plock)
   max_busy_ = max_busy;
   nthr_.resize(100,0);
   nidle_ = nwork;
+  work_stealing_ = ( sched == SCHED_STEAL );
+  ws_num_deques_ = 1;  // deque 0 is shared by non-brigade threads
+  ws_queued_ = 0;
+  for( int i=0; i<WS_MAX_DEPTH; i++ )
+    ws_nthr_[i] = 0;
+  affinity_ = affinity;
+  pid_ = getpid();
   // spawn worker threads
   for( int i=0; i<nwork; i++ )
   {
-    workers_.push_back(WorkerData());
-    WorkerData &wd = workers_.back();
-    wd.state = IDLE;
-    wd.brigade = this;
+    WorkerData &wd = addWorker(IDLE);
     wd.thread_id = Thread::create(startWorker,&wd);
+    placeWorker(wd,i);
   }
-  pid_ = getpid();
 }
 
-// adds thread to brigade
-void Brigade::join (int state,int depth)
+// adds a WorkerData entry, and gives it its own WO deque if possible
+// (threads beyond WS_MAX_DEQUES share deque 0)
+WorkerData & Brigade::addWorker (int state)
 {
-  Thread::Mutex::Lock lock(cond());
   workers_.push_back(WorkerData());
   WorkerData &wd = workers_.back();
   wd.state = state;
+  wd.brigade = this;
+  wd.launched_by_us = false;
+  if( work_stealing_ && ws_num_deques_ < WS_MAX_DEQUES )
+    wd.deque = ws_num_deques_++;
+  else
+    wd.deque = 0;
+  wd.cpu = wd.socket = -1;
+  wd.stat_state = state;
+  wd.stat_since = wallTime();
+  for( int i=0; i<3; i++ )
+  {
+    wd.stat_time[i] = 0;
+    wd.stat_count[i] = 0;
+  }
+  wd.stat_count[state] = 1;
+  wd.num_orders = 0;
+  return wd;
+}
+
+void Brigade::placeWorker (WorkerData &wd,int index)
+{
+  // nothing to do for a thread that was never pinned
+  if( affinity_ == AFFINITY_NONE && wd.socket < 0 )
+    return;
+  discoverTopology();
+  int ncpu = cpu_order_.size();
+  wd.cpu = wd.socket = -1;
+  #if defined(__linux__)
+  cpu_set_t cpus;
+  CPU_ZERO(&cpus);
+  if( affinity_ == AFFINITY_NONE )
+  {
+    for( int i=0; i<ncpu; i++ )
+      CPU_SET(i,&cpus);
+  }
+  else
+  {
+    int cpu = cpu_order_[index%ncpu];
+    wd.socket = cpu_socket_[cpu];
+    if( affinity_ == AFFINITY_CORE )
+    {
+      wd.cpu = cpu;
+      CPU_SET(cpu,&cpus);
+    }
+    else
+    {
+      for( int i=0; i<ncpu; i++ )
+        if( cpu_socket_[i] == wd.socket )
+          CPU_SET(i,&cpus);
+    }
+  }
+  int err = pthread_setaffinity_np(wd.thread_id,sizeof(cpus),&cpus);
+  if( err )
+  {
+    dprintf(0)("failed to set affinity of thread %d: %s\n",index,strerror(err));
+    wd.cpu = wd.socket = -1;
+  }
+  #else
+  dprintf(0)("thread affinity not supported on this platform, ignoring\n");
+  #endif
+  if( wd.deque > 0 )
+    ws_deques_[wd.deque].socket = wd.socket;
+}
+
+void Brigade::setAffinity (int policy)
+{
+  Thread::Mutex::Lock lock(cond());
+  dprintf(1)("setting thread affinity policy to %s\n",affinityName(policy).c_str());
+  affinity_ = policy;
+  for( uint i=0; i<workers_.size(); i++ )
+    placeWorker(workers_[i],i);
+}
+
+void Brigade::setStatState (WorkerData &wd,int state)
+{
+  if( wd.stat_state == state )
+    return;
+  double now = wallTime();
+  wd.stat_time[wd.stat_state] += now - wd.stat_since;
+  wd.stat_since = now;
+  wd.stat_state = state;
+  wd.stat_count[state]++;
+}
+
+void Brigade::fillThreadStats (DMI::Record &rec)
+{
+  Thread::Mutex::Lock lock(cond());
+  double now = wallTime();
+  int n = workers_.size();
+  std::vector<int> state(n),nbusy(n),nblocked(n),norders(n),cpu(n),socket(n);
+  std::vector<double> tidle(n),tbusy(n),tblocked(n);
+  for( int i=0; i<n; i++ )
+  {
+    const WorkerData &wd = workers_[i];
+    double t[3] = { wd.stat_time[IDLE],wd.stat_time[BUSY],wd.stat_time[BLOCKED] };
+    state[i] = wd.stat_state;
+    t[state[i]] += now - wd.stat_since;
+    tidle[i] = t[IDLE];
+    tbusy[i] = t[BUSY];
+    tblocked[i] = t[BLOCKED];
+    nbusy[i] = wd.stat_count[BUSY];
+    nblocked[i] = wd.stat_count[BLOCKED];
+    norders[i] = wd.num_orders;
+    cpu[i] = wd.cpu;
+    socket[i] = wd.socket;
+  }
+  rec[AidScheduler] = string(work_stealing_ ? "steal" : "lifo");
+  rec[AidAffinity] = affinityName(affinity_);
+  rec[AidState] = state;
+  rec[AidIdle] = tidle;
+  rec[AidBusy] = tbusy;
+  rec[AidBlocked] = tblocked;
+  rec[AidNum|AidBusy] = nbusy;
+  rec[AidNum|AidBlocked] = nblocked;
+  rec[AidOrders] = norders;
+  rec[AidCPU] = cpu;
+  rec[AidSocket] = socket;
+}
+
+// adds thread to brigade
+void Brigade::join (int state,int depth)
+{
+  Thread::Mutex::Lock lock(cond());
+  WorkerData &wd = addWorker(state);
   if( state == IDLE )
     nidle_++;
+  else if( work_stealing_ )
+    __sync_add_and_fetch(&ws_nthr_[ws_depthSlot(depth)],1);
   else
   {
     if( nthr_.size() >= uint(depth) )
       nthr_.resize(depth+100,0);
     nthr_[depth]++;
   }
-  wd.brigade = this;
   wd.thread_id = Thread::self();
-  wd.launched_by_us = false;
+  placeWorker(wd,workers_.size()-1);
   context_pointer_.set(&wd);
   cdebug1(1)<<sdebug(1)+" joined brigade\n";
 }
@@ -116,7 +334,7 @@ string Brigade::sdebug (int detail)
     s = ssprintf("%d B%dT%d",pid_,brigade_id_,Thread::getThreadNum(Thread::self())+1);
   if( detail>=0 || detail==-1 )
   {
-    Debug::appendf(s,"q:%d",wo_queue_.size());
+    Debug::appendf(s,"q:%d",work_stealing_ ? int(ws_queued_) : int(wo_queue_.size()));
   }
   return s;
 }
@@ -138,6 +356,11 @@ void * Brigade::startWorker (void *pwd)
 // we're expected to hold a lock on cond()
 void Brigade::awakenWorker ()
 {
+  if( work_stealing_ )
+  {
+    ws_awakenWorker();
+    return;
+  }
   if( wo_queue_.empty() )
     return;
   const AbstractWorkOrder &wo = *(wo_queue_.front());
@@ -154,12 +377,10 @@ void Brigade::awakenWorker ()
   {
     dprintf(1)("awakenWorker() queue %s, %d threads running but none idle, creating new worker\n",
                wo.sdebug().c_str(),nthr_[depth]);
-    workers_.push_back(WorkerData());
-    WorkerData &wd = workers_.back();
+    WorkerData &wd = addWorker(IDLE);
     nidle_++;
-    wd.state = IDLE;
-    wd.brigade = this;
     wd.thread_id = Thread::create(startWorker,&wd);
+    placeWorker(wd,workers_.size()-1);
   }
   // else simply awaken an idle worker
   else
@@ -181,7 +402,7 @@ void * Brigade::workerLoop ()
     // check for cancellation
     Thread::testCancel();
     // wait on the queue condition for a work order to show up
-    lock.relock(cond());
+    lockQueue(lock);
     AbstractWorkOrder *wo = getWorkOrder(true);
     lock.release();
     // execute order if any
@@ -202,6 +423,8 @@ void * Brigade::workerLoop ()
 // assume we have a lock on cond()
 AbstractWorkOrder * Brigade::getWorkOrder (bool wait,int mindepth)
 {
+  if( work_stealing_ )
+    return ws_getWorkOrder(wait,mindepth);
   WorkerData &wd = workerData();
   while( true )
   {
@@ -214,6 +437,7 @@ AbstractWorkOrder * Brigade::getWorkOrder (bool wait,int mindepth)
       if( wd.state != IDLE )
       {
         wd.state = IDLE;
+        setStatState(wd,IDLE);
         ++nidle_;
         dprintf(1)("no WOs queued, %d threads now idle\n",nidle_);
       }
@@ -250,6 +474,7 @@ AbstractWorkOrder * Brigade::getWorkOrder (bool wait,int mindepth)
         else
           --nidle_;
         wd.state = BUSY;
+        setStatState(wd,BUSY);
       }
       // second case: we're still counted as busy, so see if we should grab another WO
       else if( wd.state == BUSY )
@@ -261,6 +486,7 @@ AbstractWorkOrder * Brigade::getWorkOrder (bool wait,int mindepth)
             return 0;
           dprintf(2)("nthr_[%d]=%d, going to sleep\n",depth,nthr_[depth]);
           wd.state = IDLE;
+          setStatState(wd,IDLE);
           ++nidle_;
           cond().wait();
           continue;
@@ -273,6 +499,7 @@ AbstractWorkOrder * Brigade::getWorkOrder (bool wait,int mindepth)
       }
       wo_queue_.pop_front();
       ++nthr_[depth];
+      wd.num_orders++;
       cdebug1(2)<<sdebug(1)+" got queued order\n";
       // if there's more stuff on the queue, can we wake up another thread?
       awakenWorker();
@@ -283,6 +510,15 @@ AbstractWorkOrder * Brigade::getWorkOrder (bool wait,int mindepth)
 
 void Brigade::finishWithWorkOrder (AbstractWorkOrder *wo)
 {
+  if( work_stealing_ )
+  {
+    ws_releaseDepth(wo->depth());
+    delete wo;
+    // a thread may have been kept idle by the busy count at this depth
+    if( ws_queued_ > 0 && nidle_ > 0 )
+      ws_awakenWorker();
+    return;
+  }
   Thread::Mutex::Lock lock(cond());
   int depth = wo->depth();
   if( nthr_[depth] <=0 )
@@ -296,6 +532,27 @@ void Brigade::finishWithWorkOrder (AbstractWorkOrder *wo)
 
 void Brigade::clearQueue (const NodeNursery &client)
 {
+  if( work_stealing_ )
+  {
+    for( int i=0; i<ws_num_deques_; i++ )
+    {
+      WorkDeque &dq = ws_deques_[i];
+      Thread::Mutex::Lock lock(dq.mutex);
+      for( std::deque<AbstractWorkOrder *>::iterator iter = dq.orders.begin(); iter != dq.orders.end(); )
+      {
+        WorkOrder *wo = dynamic_cast<WorkOrder*>(*iter);
+        if( wo && &(wo->clientref) == &client )
+        {
+          iter = dq.orders.erase(iter);
+          __sync_sub_and_fetch(&ws_queued_,1);
+        }
+        else
+          ++iter;
+      }
+      dq.size = dq.orders.size();
+    }
+    return;
+  }
   Thread::Mutex::Lock lock(cond());
   for( WorkOrderQueue::iterator iter = wo_queue_.begin(); iter != wo_queue_.end(); )
   {
@@ -307,9 +564,198 @@ void Brigade::clearQueue (const NodeNursery &client)
   }
 }
 
+// ----------------------------------------------------------------------------
+// work-stealing scheduler
+// Each thread pushes the orders it places onto its own deque, and pops its
+// own orders newest-first (the same order as the shared LIFO queue, which
+// keeps a node's children on the thread that polled them). A thread that
+// runs out of orders steals the oldest order from another deque, picking the
+// deque whose oldest order is shallowest, since such orders tend to carry
+// the biggest subtrees. Threads only ever lock one deque at a time, and the
+// brigade lock is only taken to put threads to sleep or to wake them up.
+// ----------------------------------------------------------------------------
+
+bool Brigade::ws_claimDepth (int depth,int maxcount)
+{
+  volatile int &n = ws_nthr_[ws_depthSlot(depth)];
+  if( __sync_add_and_fetch(&n,1) <= maxcount )
+    return true;
+  __sync_sub_and_fetch(&n,1);
+  return false;
+}
+
+void Brigade::ws_placeWorkOrder (AbstractWorkOrder *wo)
+{
+  WorkerData *pwd = static_cast<WorkerData*>(context_pointer_.get());
+  WorkDeque &dq = ws_deques_[ pwd && pwd->brigade == this ? pwd->deque : 0 ];
+  Thread::Mutex::Lock lock(dq.mutex);
+  dq.orders.push_back(wo);
+  dq.size = dq.orders.size();
+  __sync_add_and_fetch(&ws_queued_,1);
+}
+
+// wakes up an idle worker, or starts a new one if none are idle. Same policy
+// as the LIFO scheduler, with the caller's newest order standing in for the
+// head of the queue.
+void Brigade::ws_awakenWorker ()
+{
+  if( ws_queued_ <= 0 )
+    return;
+  WorkerData *pwd = static_cast<WorkerData*>(context_pointer_.get());
+  WorkDeque &dq = ws_deques_[ pwd && pwd->brigade == this ? pwd->deque : 0 ];
+  int depth = -1;
+  {
+    Thread::Mutex::Lock lock(dq.mutex);
+    if( !dq.orders.empty() )
+      depth = dq.orders.back()->depth();
+  }
+  Thread::Mutex::Lock lock(cond());
+  if( depth >= 0 && ws_nthr_[ws_depthSlot(depth)] >= max_busy_ )
+  {
+    dprintf(1)("awakenWorker(), %d threads already running at depth %d, no action\n",
+               ws_nthr_[ws_depthSlot(depth)],depth);
+    return;
+  }
+  if( !nidle_ )
+  {
+    dprintf(1)("awakenWorker(), no idle workers, creating new worker\n");
+    WorkerData &wd = addWorker(IDLE);
+    nidle_++;
+    wd.thread_id = Thread::create(startWorker,&wd);
+    placeWorker(wd,workers_.size()-1);
+  }
+  else
+  {
+    dprintf(2)("awakenWorker(), awakening a worker\n");
+    cond().signal();
+  }
+}
+
+AbstractWorkOrder * Brigade::ws_findWorkOrder (WorkerData &wd,int mindepth,bool &gated)
+{
+  // idle threads may only start an order if fewer than max_busy_ threads are
+  // busy at its depth. Busy threads (i.e. ones waiting on their children) are
+  // already counted at their own depth, so one more is allowed.
+  int maxcount = wd.state == IDLE ? max_busy_ : max_busy_+1;
+  gated = false;
+  // own deque first, newest order
+  WorkDeque &own = ws_deques_[wd.deque];
+  if( own.size > 0 )
+  {
+    Thread::Mutex::Lock lock(own.mutex);
+    if( !own.orders.empty() )
+    {
+      AbstractWorkOrder *wo = own.orders.back();
+      if( wo->depth() >= mindepth )
+      {
+        if( ws_claimDepth(wo->depth(),maxcount) )
+        {
+          own.orders.pop_back();
+          own.size = own.orders.size();
+          __sync_sub_and_fetch(&ws_queued_,1);
+          return wo;
+        }
+        gated = true;
+      }
+    }
+  }
+  // find a victim: the deque with the shallowest eligible oldest order.
+  // When threads are pinned, deques owned by threads on our own socket are
+  // preferred, since their orders were placed by a parent whose results
+  // (and probably its children's data) live in that socket's memory
+  int victim = -1, victim_depth = 0;
+  bool victim_remote = false;
+  int ndeques = ws_num_deques_;
+  for( int i=0; i<ndeques; i++ )
+  {
+    WorkDeque &dq = ws_deques_[i];
+    if( i == wd.deque || dq.size <= 0 )
+      continue;
+    Thread::Mutex::Lock lock(dq.mutex);
+    if( dq.orders.empty() )
+      continue;
+    int depth = dq.orders.front()->depth();
+    if( depth < mindepth )
+      continue;
+    bool remote = wd.socket >= 0 && dq.socket >= 0 && dq.socket != wd.socket;
+    if( victim<0 || remote < victim_remote ||
+        ( remote == victim_remote && depth<victim_depth ) )
+    {
+      victim = i;
+      victim_depth = depth;
+      victim_remote = remote;
+    }
+  }
+  if( victim < 0 )
+    return 0;
+  WorkDeque &dq = ws_deques_[victim];
+  Thread::Mutex::Lock lock(dq.mutex);
+  // recheck, since the victim may have been raided in the meantime
+  if( dq.orders.empty() || dq.orders.front()->depth() < mindepth )
+    return 0;
+  AbstractWorkOrder *wo = dq.orders.front();
+  if( !ws_claimDepth(wo->depth(),maxcount) )
+  {
+    gated = true;
+    return 0;
+  }
+  dq.orders.pop_front();
+  dq.size = dq.orders.size();
+  __sync_sub_and_fetch(&ws_queued_,1);
+  cdebug1(2)<<sdebug(1)+Debug::ssprintf(" stole order from deque %d\n",victim);
+  return wo;
+}
+
+AbstractWorkOrder * Brigade::ws_getWorkOrder (bool wait,int mindepth)
+{
+  WorkerData &wd = workerData();
+  while( true )
+  {
+    bool gated;
+    AbstractWorkOrder *wo = ws_findWorkOrder(wd,mindepth,gated);
+    if( wo )
+    {
+      if( wd.state == IDLE )
+      {
+        Thread::Mutex::Lock lock(cond());
+        if( nidle_ <= 0 )
+        {
+          dprintf(0)("worker is going idle->busy, but nidle_=%d\n",nidle_);
+        }
+        else
+          --nidle_;
+        wd.state = BUSY;
+        setStatState(wd,BUSY);
+      }
+      wd.num_orders++;
+      cdebug1(2)<<sdebug(1)+" got queued order\n";
+      // if there's more stuff queued, can we wake up another thread?
+      if( ws_queued_ > 0 && nidle_ > 0 )
+        ws_awakenWorker();
+      return wo;
+    }
+    if( !wait )
+      return 0;
+    // nothing we can take, so go idle. The brigade lock is held while
+    // rechecking the queue count, and waking workers takes the same lock
+    // after an order is queued, so a wakeup can't be missed here.
+    Thread::Mutex::Lock lock(cond());
+    if( wd.state != IDLE )
+    {
+      wd.state = IDLE;
+      setStatState(wd,IDLE);
+      ++nidle_;
+      dprintf(1)("no WOs available, %d threads now idle\n",nidle_);
+    }
+    if( gated || ws_queued_ <= 0 )
+      cond().wait();
+  }
+}
+
 // marks thread as blocked or unblocked
-void Brigade::markAsBlocked (const string &where,WorkerData &)
+void Brigade::markAsBlocked (const string &where,WorkerData &wd)
 {
+  setStatState(wd,BLOCKED);
 /*  Thread::Mutex::Lock lock(cond());
   if( wd.state != BLOCKED )
   {
@@ -323,8 +769,9 @@ void Brigade::markAsBlocked (const string &where,WorkerData &)
   cdebug1(1)<<sdebug(1)+" thread blocked in "+where+"\n";
 }
 
-void Brigade::markAsUnblocked (const string &where,WorkerData &,bool)
+void Brigade::markAsUnblocked (const string &where,WorkerData &wd,bool)
 {
+  setStatState(wd,wd.state);
 /*  Thread::Mutex::Lock lock(cond());
   DbgAssert(wd.state==BLOCKED);
   nthr_[BLOCKED]--;
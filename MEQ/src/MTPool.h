@@ -28,7 +28,10 @@
 #include <TimBase/Thread/Condition.h>
 #include <TimBase/Timer.h>
 #include <MEQ/NodeNursery.h>
+#include <DMI/Record.h>
 #include <list>
+#include <deque>
+#include <algorithm>
 
 namespace Meq
 {
@@ -37,8 +40,29 @@ namespace Meq
   {
     class Brigade;
 
+    // work order schedulers
+    typedef enum
+    {
+      // one LIFO queue per brigade, guarded by the brigade lock
+      SCHED_LIFO  = 0,
+      // a deque per thread; idle threads steal from the deques of others
+      SCHED_STEAL = 1
+    } Scheduler;
+
+    // worker thread placement policies
+    typedef enum
+    {
+      // leave placement to the OS
+      AFFINITY_NONE   = 0,
+      // pin each thread to a core of its own
+      AFFINITY_CORE   = 1,
+      // pin each thread to all the cores of one socket
+      AFFINITY_SOCKET = 2
+    } Affinity;
+
     extern Brigade * main_brigade_;
     extern int max_busy_;
+    extern int scheduler_;
 
     inline bool enabled ()
     { return main_brigade_ != 0; }
@@ -46,10 +70,24 @@ namespace Meq
     inline int num_threads ()
     { return max_busy_; }
 
+    inline int scheduler ()
+    { return scheduler_; }
+
     inline Brigade & brigade ()
     { return *main_brigade_; }
 
-    void start (int nwork,int max_busy);
+    // parses a scheduler name ("lifo" or "steal"), returns -1 if unknown
+    int parseScheduler (const string &name);
+
+    // parses an affinity policy name ("none", "core" or "socket"),
+    // returns -1 if unknown
+    int parseAffinity (const string &name);
+    string affinityName (int policy);
+
+    // current affinity policy of the main brigade
+    int affinity ();
+
+    void start (int nwork,int max_busy,int sched=SCHED_LIFO,int affinity=AFFINITY_NONE);
     void stop  ();
 
     // This class represents an abstract work order for a worker thread.
@@ -119,13 +157,25 @@ namespace Meq
       Brigade       *brigade;
       Thread::ThrID  thread_id;
       bool           launched_by_us;
+      int            deque;        // own WO deque (SCHED_STEAL only)
+      int            cpu;          // core the thread is pinned to, or -1
+      int            socket;       // socket the thread is pinned to, or -1
+      // thread statistics: the state as seen by the stats (which, unlike
+      // 'state', includes BLOCKED), time spent and number of entries
+      // into each ThreadState, and number of WOs taken
+      int            stat_state;
+      double         stat_since;
+      double         stat_time[3];
+      int            stat_count[3];
+      int            num_orders;
     } WorkerData;
 
     // a brigate is a set of worker threads sharing a WO queue
     class Brigade
     {
       public:
-        Brigade (int nwork,int maxbusy,Thread::Mutex::Lock *plock=0);
+        Brigade (int nwork,int maxbusy,Thread::Mutex::Lock *plock=0,
+                 int sched=SCHED_LIFO,int affinity=AFFINITY_NONE);
 
         int id () const
         { return brigade_id_; }
@@ -133,15 +183,33 @@ namespace Meq
         Thread::Condition & cond ()
         { return cond_; }
 
+        bool workStealing () const
+        { return work_stealing_; }
+
+        // obtains the lock that callers of placeWorkOrder(), getWorkOrder(),
+        // queueEmpty() and awakenWorker() must hold. This is a lock on cond()
+        // with the LIFO scheduler; the work-stealing scheduler does its own
+        // (per-deque) locking, so the lock is left alone.
+        void lockQueue (Thread::Mutex::Lock &lock)
+        {
+          if( !work_stealing_ )
+            lock.relock(cond_);
+        }
+
         // adds current thread to brigade, marks it as having the given state
         // if state is BUSY, a depth needs to be supplied (normally 0)
         void join (int state,int depth);
 
         // puts a new work order on the brigade's queue.
-        // !!! The caller must obtain a lock on cond() before calling this.
+        // !!! The caller must obtain a lock via lockQueue() before calling this.
         // Ownership of order object is transferred to the queue.
         inline void placeWorkOrder (AbstractWorkOrder *wo)
         {
+          if( work_stealing_ )
+          {
+            ws_placeWorkOrder(wo);
+            return;
+          }
           // queue is LIFO so orders are pushed in the front
           wo_queue_.push_front(wo);
           // resize vector of thread counters if needed
@@ -154,7 +222,7 @@ namespace Meq
         void clearQueue (const NodeNursery &client);
 
         // gets next work order from the queue.
-        // !!! The caller must obtain a lock on cond() before calling this.
+        // !!! The caller must obtain a lock via lockQueue() before calling this.
         // If head of queue has a WO with a depth>=mindepth, returns the WO.
         // If head of queue has a WO with a depth<mindepth, returns 0.
         // If queue is empty OR too many threads are busy and wait=false, returns 0.
@@ -170,16 +238,25 @@ namespace Meq
         void finishWithWorkOrder (AbstractWorkOrder *wo);
 
         // checks if queue is empty
-        // !!! The caller must obtain a lock on cond() before calling this.
+        // !!! The caller must obtain a lock via lockQueue() before calling this.
         bool queueEmpty () const
-        { return wo_queue_.empty(); }
+        { return work_stealing_ ? ws_queued_ <= 0 : wo_queue_.empty(); }
 
         // wakes up a worker thread. If no idle workers are available,
         // and not too many workers are already running (or always_spawn is true),
         // spawns a new worker thread.
-        // !!! The caller must obtain a lock on cond() before calling this.
+        // !!! The caller must obtain a lock via lockQueue() before calling this.
         void awakenWorker ();
 
+        // sets the thread placement policy, and (re)places all threads
+        void setAffinity (int policy);
+
+        int affinity () const
+        { return affinity_; }
+
+        // fills record with per-thread statistics
+        void fillThreadStats (DMI::Record &rec);
+
         // marks current thread as blocked/unblocked
         void markAsBlocked   (const string &where,WorkerData &wd);
         void markAsUnblocked (const string &where,WorkerData &wd,bool can_stop=true);
@@ -212,6 +289,30 @@ namespace Meq
         void * workerLoop ();
         // static method to start a worker thread
         static void * startWorker (void *brigade);
+        // adds a new WorkerData entry (caller must hold a lock on cond())
+        WorkerData & addWorker (int state);
+        // pins thread according to the affinity policy. The threads are
+        // spread over the sockets round-robin, so that every socket gets
+        // its share. (caller must hold a lock on cond())
+        void placeWorker (WorkerData &wd,int index);
+        // accounts a change of thread state in the thread statistics
+        static void setStatState (WorkerData &wd,int state);
+
+        // work-stealing versions of the queue methods
+        void ws_placeWorkOrder (AbstractWorkOrder *wo);
+        AbstractWorkOrder * ws_getWorkOrder (bool wait,int mindepth);
+        void ws_awakenWorker ();
+        // looks for a WO in the thread's own deque, then tries to steal one.
+        // Sets gated=true if an eligible WO was found but too many threads
+        // are already busy at its depth.
+        AbstractWorkOrder * ws_findWorkOrder (WorkerData &wd,int mindepth,bool &gated);
+        // atomically counts another busy thread at the given depth, provided
+        // that no more than maxcount will then be busy there
+        bool ws_claimDepth (int depth,int maxcount);
+        void ws_releaseDepth (int depth)
+        { __sync_sub_and_fetch(&ws_nthr_[ws_depthSlot(depth)],1); }
+        static int ws_depthSlot (int depth)
+        { return std::min(std::max(depth,0),WS_MAX_DEPTH-1); }
 
         int brigade_id_; // brigade id
 
@@ -238,6 +339,34 @@ namespace Meq
         // number of idle threads
         int nidle_;
 
+        // work-stealing scheduler state
+        bool work_stealing_;
+        // a work order deque. The owner thread pushes and pops at the back,
+        // thieves take the oldest orders from the front. Deque 0 is shared
+        // by threads that have not joined the brigade (e.g. the MPI thread).
+        class WorkDeque
+        {
+          public:
+            Thread::Mutex mutex;
+            std::deque<AbstractWorkOrder *> orders;
+            volatile int size;   // unlocked hint, for skipping empty deques
+            int socket;          // socket of the owner thread, or -1
+
+            WorkDeque () : size(0),socket(-1) {}
+        };
+        static const int WS_MAX_DEQUES = 128;
+        WorkDeque ws_deques_[WS_MAX_DEQUES];
+        volatile int ws_num_deques_;
+        // number of orders in all deques
+        volatile int ws_queued_;
+        // number of busy threads per tree depth; depths beyond the last
+        // slot share it
+        static const int WS_MAX_DEPTH = 1024;
+        volatile int ws_nthr_[WS_MAX_DEPTH];
+
+        // thread placement policy
+        int affinity_;
+
           // thread key used to hold context structure for each thread
         static Thread::Key context_pointer_;
 
@@ -0,0 +1,855 @@
+//# MappedParmTable.cc: parameter table in a memory-mapped file
+//#
+//# Copyright (C) 2002-2007
+//# ASTRON (Netherlands Foundation for Research in Astronomy)
+//# and The MeqTree Foundation
+//# P.O.Box 2, 7990 AA Dwingeloo, The Netherlands, seg@astron.nl
+//#
+//# This program is free software; you can redistribute it and/or modify
+//# it under the terms of the GNU General Public License as published by
+//# the Free Software Foundation; either version 2 of the License, or
+//# (at your option) any later version.
+//#
+//# This program is distributed in the hope that it will be useful,
+//# but WITHOUT ANY WARRANTY; without even the implied warranty of
+//# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+//# GNU General Public License for more details.
+//#
+//# You should have received a copy of the GNU General Public License
+//# along with this program; if not, write to the Free Software
+//# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+//#
+//# $Id$
+
+#include <MEQ/MappedParmTable.h>
+#include <MEQ/Polc.h>
+#include <MEQ/MeqVocabulary.h>
+#include <TimBase/Debug.h>
+#include <DMI/BlockSet.h>
+#include <DMI/DynamicTypeManager.h>
+#include <algorithm>
+#include <unistd.h>
+#include <fcntl.h>
+#include <sys/types.h>
+#include <sys/stat.h>
+#include <sys/mman.h>
+#include <sys/file.h>
+#include <string.h>
+#include <float.h>
+#include <math.h>
+#include <errno.h>
+
+namespace Meq
+{
+
+static const char FileMagic[8] = { 'M','E','Q','M','P','T','\0','\0' };
+
+// rounds size up to a multiple of 8
+static inline int64_t align8 (int64_t size)
+{ return (size+7)&~int64_t(7); }
+
+// checks that a section of n items of the given size, starting at
+// offset, is aligned and fits into a file of the given size
+static inline bool sectionOk (int64_t offset,int64_t n,int64_t itemsize,int64_t filesize)
+{
+  return offset >= 0 && n >= 0 && !(offset&7) &&
+         n <= (filesize-offset)/itemsize;
+}
+
+// writes n bytes to the file, padded to a multiple of 8
+static bool writePadded (FILE *f,const void *data,int64_t n)
+{
+  static const char zeroes[8] = { 0,0,0,0,0,0,0,0 };
+  if( n && fwrite(data,1,n,f) != size_t(n) )
+    return false;
+  int64_t npad = align8(n)-n;
+  return !npad || fwrite(zeroes,1,npad,f) == size_t(npad);
+}
+
+MappedParmTable::MappedParmTable (const string& tablename)
+ : table_name_(tablename),snapshot_(0),num_retired_(0),num_readers_(0),has_pending_(0)
+{
+  funklets_file_ = tablename + "/funklets.map";
+  lock_file_ = tablename + "/lock";
+  Snapshot *snap = new Snapshot;
+  try
+  {
+    if( snap->map(funklets_file_) )
+      dprintf(1)("mapped %lld funklets of %lld parms\n",
+                 (long long)snap->header->nfunklets,(long long)snap->header->nparms);
+  }
+  catch(...)
+  {
+    delete snap;
+    throw;
+  }
+  snapshot_ = snap;
+}
+
+MappedParmTable::~MappedParmTable()
+{
+  if( !pending_.empty() )
+  {
+    try
+    {
+      flush();
+    }
+    catch( std::exception &exc )
+    {
+      cerr<<"Warning: failed to write out funklets to "<<table_name_<<": "<<exc.what()<<endl;
+    }
+  }
+  delete snapshot_;
+  for( uint i=0; i<retired_.size(); i++ )
+    delete retired_[i];
+}
+
+void MappedParmTable::throwErrno (const string &message)
+{
+  int errno0 = errno;
+  Throw(Debug::ssprintf("%s: %s (errno=%d)",
+        Debug::ssprintf(message.c_str(),table_name_.c_str()).c_str(),strerror(errno0),errno0));
+}
+
+int MappedParmTable::numFunklets () const
+{
+  Reader reader(const_cast<MappedParmTable&>(*this));
+  const Snapshot *snap = snapshot_;
+  return snap->header ? snap->header->nfunklets : 0;
+}
+
+MappedParmTable::Reader::~Reader ()
+{
+  // the last reader out unmaps retired snapshots, unless a flush is in
+  // progress, in which case the flush will do it
+  if( !__sync_sub_and_fetch(&table_.num_readers_,1) && table_.num_retired_ &&
+      !table_.mutex_.trylock() )
+  {
+    table_.releaseRetired();
+    table_.mutex_.unlock();
+  }
+}
+
+void MappedParmTable::publishSnapshot (Snapshot *snap)
+{
+  __sync_synchronize();
+  retired_.push_back(snapshot_);
+  num_retired_ = retired_.size();
+  snapshot_ = snap;
+  releaseRetired();
+}
+
+void MappedParmTable::releaseRetired ()
+{
+  // a lookup that starts after this check picks up the current snapshot,
+  // so if there are no lookups in progress, none can be using a retired one
+  if( __sync_add_and_fetch(&num_readers_,0) )
+    return;
+  for( uint i=0; i<retired_.size(); i++ )
+    delete retired_[i];
+  retired_.clear();
+  num_retired_ = 0;
+}
+
+void MappedParmTable::refreshSnapshot ()
+{
+  struct stat st;
+  if( stat(funklets_file_.c_str(),&st) < 0 )
+    return;
+  {
+    Reader reader(*this);
+    if( snapshot_->isFile(st) )
+      return;
+  }
+  Thread::Mutex::Lock lock(mutex_);
+  if( snapshot_->isFile(st) )
+    return;
+  Snapshot *snap = new Snapshot;
+  try
+  {
+    if( !snap->map(funklets_file_) )
+    {
+      delete snap;
+      return;
+    }
+  }
+  catch(...)
+  {
+    delete snap;
+    throw;
+  }
+  dprintf(1)("%s has been replaced, mapped %lld funklets of %lld parms\n",
+             funklets_file_.c_str(),
+             (long long)snap->header->nfunklets,(long long)snap->header->nparms);
+  publishSnapshot(snap);
+}
+
+//-----------------------------------------------------------------------------
+// Snapshot: a mapped file
+//-----------------------------------------------------------------------------
+MappedParmTable::Snapshot::Snapshot ()
+  : base(0),size(0),dev(0),ino(0),mtime(0),
+    header(0),names(0),parms(0),funklets(0),coeffs(0),blobs(0)
+{}
+
+bool MappedParmTable::Snapshot::isFile (const struct stat &st) const
+{
+  // a flush always writes a new file and renames it into place, so a
+  // replaced file shows up as a different inode
+  return base && st.st_dev == dev && st.st_ino == ino &&
+         st.st_mtime == mtime && size_t(st.st_size) == size;
+}
+
+MappedParmTable::Snapshot::~Snapshot ()
+{
+  if( base )
+    munmap(base,size);
+}
+
+bool MappedParmTable::Snapshot::map (const string &filename)
+{
+  int fd = open(filename.c_str(),O_RDONLY);
+  if( fd < 0 )
+  {
+    if( errno == ENOENT )
+      return false;
+    Throw("can't open '"+filename+"': "+strerror(errno));
+  }
+  struct stat stat_buf;
+  if( fstat(fd,&stat_buf) < 0 )
+  {
+    int errno0 = errno;
+    close(fd);
+    Throw("can't stat '"+filename+"': "+strerror(errno0));
+  }
+  if( stat_buf.st_size < off_t(sizeof(FileHeader)) )
+  {
+    close(fd);
+    Throw("'"+filename+"' is truncated or corrupt");
+  }
+  // the mapping stays valid after the descriptor is closed. Since
+  // the file is never written to once it's there, other processes can
+  // safely map it too, and will share the same pages
+  size  = stat_buf.st_size;
+  dev   = stat_buf.st_dev;
+  ino   = stat_buf.st_ino;
+  mtime = stat_buf.st_mtime;
+  void *ptr = mmap(0,size,PROT_READ,MAP_SHARED,fd,0);
+  int errno0 = errno;
+  close(fd);
+  if( ptr == MAP_FAILED )
+    Throw("can't map '"+filename+"': "+strerror(errno0));
+  base = ptr;
+  // check the header and the section layout
+  const char *pbase = static_cast<const char *>(base);
+  const FileHeader &hdr = *reinterpret_cast<const FileHeader *>(pbase);
+  FailWhen(memcmp(hdr.magic,FileMagic,sizeof(FileMagic)),
+      "'"+filename+"' is not a mapped parm table");
+  FailWhen(hdr.version != FormatVersion || hdr.maxaxis != Axis::MaxAxis,
+      Debug::ssprintf("'%s' has format version %d (with %d axes), expected %d (with %d axes)",
+        filename.c_str(),hdr.version,hdr.maxaxis,FormatVersion,Axis::MaxAxis));
+  int64_t fsize = size;
+  FailWhen(hdr.file_size != fsize ||
+           !sectionOk(hdr.names_offset,hdr.names_size,1,fsize) ||
+           !sectionOk(hdr.parms_offset,hdr.nparms,sizeof(ParmEntry),fsize) ||
+           !sectionOk(hdr.funklets_offset,hdr.nfunklets,sizeof(FunkletEntry),fsize) ||
+           !sectionOk(hdr.coeffs_offset,hdr.ncoeffs,sizeof(double),fsize) ||
+           !sectionOk(hdr.blobs_offset,hdr.blobs_size,1,fsize),
+      "'"+filename+"' is truncated or corrupt");
+  header   = &hdr;
+  names    = pbase + hdr.names_offset;
+  parms    = reinterpret_cast<const ParmEntry *>(pbase + hdr.parms_offset);
+  funklets = reinterpret_cast<const FunkletEntry *>(pbase + hdr.funklets_offset);
+  coeffs   = reinterpret_cast<const double *>(pbase + hdr.coeffs_offset);
+  blobs    = pbase + hdr.blobs_offset;
+  // check parm entries. Funklet entries are checked as they're read
+  for( int64_t i=0; i<hdr.nparms; i++ )
+  {
+    const ParmEntry &pe = parms[i];
+    FailWhen(pe.name_offset < 0 || pe.name_length < 0 ||
+             pe.name_length > hdr.names_size - pe.name_offset ||
+             pe.first < 0 || pe.count < 0 || pe.count > hdr.nfunklets - pe.first,
+        "'"+filename+"' is truncated or corrupt");
+  }
+  return true;
+}
+
+int MappedParmTable::Snapshot::findParm (const string &name) const
+{
+  if( !header )
+    return -1;
+  int i0 = 0, i1 = header->nparms;
+  while( i0 < i1 )
+  {
+    int i = (i0+i1)/2;
+    int cmp = name.compare(0,string::npos,names+parms[i].name_offset,parms[i].name_length);
+    if( !cmp )
+      return i;
+    if( cmp < 0 )
+      i1 = i;
+    else
+      i0 = i+1;
+  }
+  return -1;
+}
+
+//-----------------------------------------------------------------------------
+// FunkletEntry
+//-----------------------------------------------------------------------------
+bool MappedParmTable::FunkletEntry::match (const FunkletEntry &other) const
+{
+  if( defined != other.defined )
+    return false;
+  for( int i=0; i<Axis::MaxAxis; i++ )
+    if( defined&(1<<i) &&
+        ( fabs(start[i]-other.start[i]) > 1e-16 ||
+          fabs(end[i]-other.end[i]) > 1e-16 ) )
+      return false;
+  return true;
+}
+
+bool MappedParmTable::FunkletEntry::overlaps (const Domain &dom) const
+{
+  for( int i=0; i<Axis::MaxAxis; i++ )
+  {
+    if( defined&(1<<i) && dom.isDefined(i) )
+    {
+      if( start[i] >= dom.end(i) ||
+          end[i] <= dom.start(i)  )
+        return false;
+    }
+  }
+  return true;
+}
+
+void MappedParmTable::FunkletEntry::setDomain (const Domain &dom)
+{
+  defined = 0;
+  for( int i=0; i<Axis::MaxAxis; i++ )
+  {
+    if( dom.isDefined(i) )
+    {
+      defined |= 1<<i;
+      start[i] = dom.start(i);
+      end[i]   = dom.end(i);
+    }
+    else
+      start[i] = end[i] = 0;
+  }
+  key_start = dom.isDefined(0) ? start[0] : -DBL_MAX;
+}
+
+Domain * MappedParmTable::FunkletEntry::makeDomain () const
+{
+  Domain *dom = new Domain;
+  for( int i=0; i<Axis::MaxAxis; i++ )
+    if( defined&(1<<i) )
+      dom->defineAxis(i,start[i],end[i]);
+  return dom;
+}
+
+//-----------------------------------------------------------------------------
+// funklet encoding and decoding
+//-----------------------------------------------------------------------------
+
+// A polc can be stored as an entry plus its coefficients if it has no
+// fields other than the standard ones, and its coefficient array matches
+// its rank.
+static bool isPlainPolc (const Funklet &funklet)
+{
+  if( funklet.objectType() != TpMeqPolc || !funklet.ncoeff() )
+    return false;
+  const DMI::NumArray &coeff = funklet.coeff();
+  int rank = funklet.rank();
+  if( coeff.elementType() != Tpdouble || rank > 2 ||
+      ( rank ? coeff.rank() != rank : coeff.size() != 1 ) )
+    return false;
+  for( DMI::Record::const_iterator iter = funklet.begin(); iter != funklet.end(); iter++ )
+  {
+    const HIID &id = iter.id();
+    if( id != FClass && id != FCoeff && id != FDomain &&
+        id != FAxisIndex && id != FOffset && id != FScale &&
+        id != FPerturbation && id != FWeight && id != FDbId )
+      return false;
+  }
+  return true;
+}
+
+void MappedParmTable::encodeFunklet (PendingFunklet &pf,const Funklet &funklet)
+{
+  FunkletEntry &entry = pf.entry;
+  memset(&entry,0,sizeof(entry));
+  entry.setDomain(funklet.domain());
+  entry.max_end = entry.defined&1 ? entry.end[0] : DBL_MAX;
+  entry.pert = funklet.getPerturbation();
+  entry.weight = funklet.getWeight();
+  pf.coeffs.clear();
+  pf.blob.clear();
+  if( isPlainPolc(funklet) )
+  {
+    const DMI::NumArray &coeff = funklet.coeff();
+    entry.type = POLC;
+    entry.rank = funklet.rank();
+    for( int i=0; i<entry.rank; i++ )
+    {
+      entry.shape[i]  = coeff.shape()[i];
+      entry.axes[i]   = funklet.getAxis(i);
+      entry.offset[i] = funklet.getOffset(i);
+      entry.scale[i]  = funklet.getScale(i);
+    }
+    const double *pc = static_cast<const double*>(coeff.getConstDataPtr());
+    pf.coeffs.assign(pc,pc+coeff.size());
+    entry.data_size = pf.coeffs.size();
+  }
+  // generic funklet stored as blockset, in the same way as FastParmTable
+  // does: # of blocks, block sizes, block data
+  else
+  {
+    entry.type = BLOB;
+    BlockSet bset;
+    funklet.toBlock(bset);
+    size_t totsize = (bset.size()+1)*sizeof(size_t);
+    for( BlockSet::const_iterator iter = bset.begin(); iter != bset.end(); iter++ )
+      totsize += (*iter)->size();
+    pf.blob.resize(totsize);
+    size_t *pdata = reinterpret_cast<size_t*>(&(pf.blob[0]));
+    *pdata++ = bset.size();
+    char *cdata = reinterpret_cast<char*>(pdata+bset.size());
+    for( BlockSet::const_iterator iter = bset.begin(); iter != bset.end(); iter++,pdata++ )
+    {
+      size_t sz = *pdata = (*iter)->size();
+      memcpy(cdata,(*iter)->data(),sz);
+      cdata += sz;
+    }
+    entry.data_size = totsize;
+  }
+}
+
+void MappedParmTable::makeFunklet (Funklet::Ref &ref,const FunkletEntry &entry,
+                                   const double *coeffs,const char *blob,int dbid)
+{
+  if( entry.type == POLC )
+  {
+    Polc *polc;
+    // the polc constructors copy the coefficients, so it's safe to
+    // point the arrays at the mapped file
+    double *pc = const_cast<double*>(coeffs);
+    if( entry.rank == 0 )
+      polc = new Polc(pc[0],entry.pert,entry.weight);
+    else if( entry.rank == 1 )
+      polc = new Polc(LoVec_double(pc,LoShape1(entry.shape[0]),blitz::neverDeleteData),
+                      entry.axes[0],entry.offset[0],entry.scale[0],
+                      entry.pert,entry.weight);
+    else
+      polc = new Polc(LoMat_double(pc,LoShape2(entry.shape[0],entry.shape[1]),blitz::neverDeleteData),
+                      entry.axes,entry.offset,entry.scale,entry.pert,entry.weight);
+    ref <<= polc;
+    polc->setDomain(entry.makeDomain());
+  }
+  // other funklets carry their domain in the blockset
+  else
+  {
+    const size_t *dptr = reinterpret_cast<const size_t*>(blob);
+    size_t totsize = sizeof(size_t);
+    FailWhen(entry.data_size < int64_t(totsize),"malformed funklet block in parm table");
+    int nblocks = dptr[0];
+    const size_t *block_sizes = dptr+1;
+    totsize += sizeof(size_t)*nblocks;
+    FailWhen(nblocks < 0 || entry.data_size < int64_t(totsize),"malformed funklet block in parm table");
+    for( int i=0; i<nblocks; i++ )
+      totsize += block_sizes[i];
+    FailWhen(entry.data_size != int64_t(totsize),"malformed funklet block in parm table");
+    const char *dataptr = reinterpret_cast<const char*>(block_sizes+nblocks);
+    BlockSet bset;
+    for( int i=0; i<nblocks; i++ )
+    {
+      SmartBlock *block = new SmartBlock(block_sizes[i]);
+      bset.pushNew().attach(block);
+      memcpy(block->data(),dataptr,block_sizes[i]);
+      dataptr += block_sizes[i];
+    }
+    ref.copy(DynamicTypeManager::construct(0,bset));
+  }
+  ref().setDbId(dbid);
+}
+
+//-----------------------------------------------------------------------------
+// lookup
+//-----------------------------------------------------------------------------
+void MappedParmTable::checkEntry (const FunkletEntry &entry,const Snapshot &snap) const
+{
+  bool ok;
+  if( entry.type == POLC )
+    ok = entry.rank >= 0 && entry.rank <= 2 &&
+         entry.shape[0] >= 0 && entry.shape[1] >= 0 && entry.data_offset >= 0 &&
+         entry.data_size == ( entry.rank ? entry.shape[0]*(entry.rank>1?entry.shape[1]:1) : 1 ) &&
+         entry.data_size <= snap.header->ncoeffs - entry.data_offset;
+  else
+    ok = entry.type == BLOB && entry.data_offset >= 0 && entry.data_size >= 0 &&
+         entry.data_size <= snap.header->blobs_size - entry.data_offset;
+  FailWhen(!ok,"malformed funklet entry in '"+funklets_file_+"'");
+}
+
+void MappedParmTable::findFunklets (std::vector<int> &found,const Snapshot &snap,
+                                    int iparm,const Domain &domain)
+{
+  const ParmEntry &pe = snap.parms[iparm];
+  const FunkletEntry *fe = snap.funklets + pe.first;
+  double qstart = -DBL_MAX, qend = DBL_MAX;
+  if( domain.isDefined(0) )
+  {
+    qstart = domain.start(0);
+    qend   = domain.end(0);
+  }
+  // entries are sorted by start, so [0,i1) are the ones that start before
+  // the end of the domain. max_end is non-decreasing, so [i0,n) are the
+  // ones of which some entry at or before them ends after the start of the
+  // domain. Only [i0,i1) can overlap the domain along axis 0.
+  int i0 = 0;
+  for( int n = pe.count; n > 0; )
+  {
+    int half = n/2;
+    if( fe[i0+half].max_end <= qstart )
+    {
+      i0 += half+1;
+      n -= half+1;
+    }
+    else
+      n = half;
+  }
+  int i1 = i0;
+  for( int n = pe.count-i0; n > 0; )
+  {
+    int half = n/2;
+    if( fe[i1+half].key_start < qend )
+    {
+      i1 += half+1;
+      n -= half+1;
+    }
+    else
+      n = half;
+  }
+  for( int i=i0; i<i1; i++ )
+    if( fe[i].overlaps(domain) )
+      found.push_back(pe.first+i);
+}
+
+int MappedParmTable::lookup (vector<Funklet::Ref> &funklets,const Snapshot &snap,
+                             const PendingList *pending,const string &parmName,
+                             const Domain &domain)
+{
+  std::vector<int> found;
+  int iparm = snap.findParm(parmName);
+  if( iparm >= 0 )
+    findFunklets(found,snap,iparm,domain);
+  int nfile = found.size();
+  int npend = pending ? pending->size() : 0;
+  funklets.resize(nfile+npend);
+  int ifunk = 0;
+  for( int i=0; i<nfile; i++ )
+  {
+    const FunkletEntry &entry = snap.funklets[found[i]];
+    // skip funklets that have been replaced by pending ones
+    bool replaced = false;
+    for( int j=0; j<npend && !replaced; j++ )
+      replaced = (*pending)[j].entry.match(entry);
+    if( replaced )
+      continue;
+    checkEntry(entry,snap);
+    if( entry.type == POLC )
+      makeFunklet(funklets[ifunk++],entry,snap.coeffs + entry.data_offset,0,found[i]);
+    else
+      makeFunklet(funklets[ifunk++],entry,0,snap.blobs + entry.data_offset,found[i]);
+  }
+  for( int j=0; j<npend; j++ )
+  {
+    const PendingFunklet &pf = (*pending)[j];
+    if( pf.entry.overlaps(domain) )
+      makeFunklet(funklets[ifunk++],pf.entry,
+                  pf.coeffs.empty() ? 0 : &(pf.coeffs[0]),
+                  pf.blob.empty() ? 0 : &(pf.blob[0]),pf.dbid);
+  }
+  funklets.resize(ifunk);
+  dprintf(2)("%d matching funklets found\n",ifunk);
+  return ifunk;
+}
+
+int MappedParmTable::getFunklets (vector<Funklet::Ref> &funklets,const string& parmName,const Domain& domain)
+{
+  dprintf(2)("getFunklets() for '%s' domain %lf,%lf %lf,%lf\n",parmName.c_str(),
+                domain.start(0),domain.end(0),domain.start(1),domain.end(1));
+  // pick up the file if another process has flushed to it
+  refreshSnapshot();
+  // if there's anything pending, we have to lock to look at it, and to
+  // make sure the snapshot is not switched underneath us
+  if( has_pending_ )
+  {
+    Thread::Mutex::Lock lock(mutex_);
+    PendingMap::const_iterator iter = pending_.find(parmName);
+    return lookup(funklets,*snapshot_,iter == pending_.end() ? 0 : &(iter->second),
+                  parmName,domain);
+  }
+  // else just read the current snapshot. A flush() publishes a new
+  // snapshot before clearing has_pending_, so this is never older than
+  // the flag. The reader keeps the snapshot mapped while we use it
+  Reader reader(*this);
+  __sync_synchronize();
+  return lookup(funklets,*snapshot_,0,parmName,domain);
+}
+
+//-----------------------------------------------------------------------------
+// writing
+//-----------------------------------------------------------------------------
+Funklet::DbId MappedParmTable::putCoeff (const string& parmName,const Funklet& funklet,
+                                         bool)
+{
+  Thread::Mutex::Lock lock(mutex_);
+  dprintf(2)("putCoeff() for %s, c00 is %lf, domain %lf,%lf %lf,%lf\n",
+        parmName.c_str(),funklet.getCoeff0(),
+        funklet.domain().start(0),funklet.domain().end(0),
+        funklet.domain().start(1),funklet.domain().end(1));
+  PendingFunklet pf;
+  encodeFunklet(pf,funklet);
+  // look for the same domain in the file: first check the entry indicated
+  // by the funklet's dbid, else look through all entries of this parm
+  pf.dbid = -1;
+  const Snapshot &snap = *snapshot_;
+  int iparm = snap.findParm(parmName);
+  if( iparm >= 0 )
+  {
+    const ParmEntry &pe = snap.parms[iparm];
+    int dbid = funklet.getDbId();
+    if( dbid >= pe.first && dbid < pe.first+pe.count &&
+        snap.funklets[dbid].match(pf.entry) )
+      pf.dbid = dbid;
+    else
+      for( int i=0; i<pe.count; i++ )
+        if( snap.funklets[pe.first+i].match(pf.entry) )
+        {
+          pf.dbid = pe.first+i;
+          break;
+        }
+  }
+  dprintf(2)("matched funklet #%d\n",pf.dbid);
+  // replace pending funklet with the same domain, if any
+  PendingList &list = pending_[parmName];
+  uint i = 0;
+  while( i<list.size() && !list[i].entry.match(pf.entry) )
+    i++;
+  if( i<list.size() )
+    list[i] = pf;
+  else
+    list.push_back(pf);
+  __sync_synchronize();
+  has_pending_ = 1;
+  return pf.dbid;
+}
+
+void MappedParmTable::writeFile (const string &filename,const Snapshot &snap)
+{
+  // build up all sections in memory. Parms come out in sorted order, as
+  // the file's parm list and the pending map are both sorted by name.
+  std::vector<ParmEntry> parms;
+  std::vector<FunkletEntry> entries;
+  std::vector<double> coeffs;
+  std::vector<char> blobs;
+  std::string names;
+  std::vector<FunkletEntry> list;
+  int nparm0 = snap.header ? snap.header->nparms : 0;
+  int iparm = 0;
+  PendingMap::const_iterator piter = pending_.begin();
+  while( iparm < nparm0 || piter != pending_.end() )
+  {
+    const ParmEntry *pe = 0;
+    const PendingList *pending = 0;
+    string name;
+    if( iparm < nparm0 )
+    {
+      pe = &( snap.parms[iparm] );
+      name.assign(snap.names + pe->name_offset,pe->name_length);
+    }
+    if( piter != pending_.end() && ( !pe || piter->first <= name ) )
+    {
+      if( !pe || piter->first < name )
+        pe = 0;
+      name = piter->first;
+      pending = &(piter->second);
+      piter++;
+    }
+    if( pe )
+      iparm++;
+    list.clear();
+    // copy over entries from file, unless they're replaced by pending ones
+    for( int i=0; pe && i<pe->count; i++ )
+    {
+      const FunkletEntry &entry = snap.funklets[pe->first+i];
+      bool replaced = false;
+      for( uint j=0; pending && j<pending->size() && !replaced; j++ )
+        replaced = (*pending)[j].entry.match(entry);
+      if( replaced )
+        continue;
+      list.push_back(entry);
+      checkEntry(entry,snap);
+      FunkletEntry &newentry = list.back();
+      if( entry.type == POLC )
+      {
+        newentry.data_offset = coeffs.size();
+        coeffs.insert(coeffs.end(),snap.coeffs + entry.data_offset,
+                      snap.coeffs + entry.data_offset + entry.data_size);
+      }
+      else
+      {
+        newentry.data_offset = blobs.size();
+        blobs.insert(blobs.end(),snap.blobs + entry.data_offset,
+                     snap.blobs + entry.data_offset + entry.data_size);
+        blobs.resize(align8(blobs.size()));
+      }
+    }
+    // add pending entries
+    for( uint j=0; pending && j<pending->size(); j++ )
+    {
+      const PendingFunklet &pf = (*pending)[j];
+      list.push_back(pf.entry);
+      FunkletEntry &newentry = list.back();
+      if( pf.entry.type == POLC )
+      {
+        newentry.data_offset = coeffs.size();
+        coeffs.insert(coeffs.end(),pf.coeffs.begin(),pf.coeffs.end());
+      }
+      else
+      {
+        newentry.data_offset = blobs.size();
+        blobs.insert(blobs.end(),pf.blob.begin(),pf.blob.end());
+        blobs.resize(align8(blobs.size()));
+      }
+    }
+    // sort by start, and fill in running max of end
+    std::stable_sort(list.begin(),list.end());
+    double max_end = -DBL_MAX;
+    for( uint i=0; i<list.size(); i++ )
+    {
+      double end = list[i].defined&1 ? list[i].end[0] : DBL_MAX;
+      list[i].max_end = max_end = std::max(max_end,end);
+    }
+    ParmEntry newpe;
+    newpe.name_offset = names.size();
+    newpe.name_length = name.length();
+    newpe.first = entries.size();
+    newpe.count = list.size();
+    parms.push_back(newpe);
+    names += name;
+    entries.insert(entries.end(),list.begin(),list.end());
+  }
+  // fill in header
+  FileHeader hdr;
+  memset(&hdr,0,sizeof(hdr));
+  memcpy(hdr.magic,FileMagic,sizeof(FileMagic));
+  hdr.version   = FormatVersion;
+  hdr.maxaxis   = Axis::MaxAxis;
+  hdr.nparms    = parms.size();
+  hdr.nfunklets = entries.size();
+  hdr.ncoeffs   = coeffs.size();
+  hdr.names_size = names.size();
+  hdr.blobs_size = blobs.size();
+  hdr.names_offset    = align8(sizeof(hdr));
+  hdr.parms_offset    = hdr.names_offset + align8(hdr.names_size);
+  hdr.funklets_offset = hdr.parms_offset + hdr.nparms*sizeof(ParmEntry);
+  hdr.coeffs_offset   = hdr.funklets_offset + hdr.nfunklets*sizeof(FunkletEntry);
+  hdr.blobs_offset    = hdr.coeffs_offset + hdr.ncoeffs*sizeof(double);
+  hdr.file_size       = hdr.blobs_offset + align8(hdr.blobs_size);
+  dprintf(1)("writing %d funklets of %d parms to %s\n",
+             int(hdr.nfunklets),int(hdr.nparms),filename.c_str());
+  // write out the file, and make sure it's on disk before it's renamed
+  FILE *f = fopen(filename.c_str(),"wb");
+  if( !f )
+    throwErrno("can't create '"+filename+"'");
+  bool ok = writePadded(f,&hdr,sizeof(hdr)) &&
+            writePadded(f,names.data(),names.size()) &&
+            writePadded(f,parms.empty() ? 0 : &(parms[0]),parms.size()*sizeof(ParmEntry)) &&
+            writePadded(f,entries.empty() ? 0 : &(entries[0]),entries.size()*sizeof(FunkletEntry)) &&
+            writePadded(f,coeffs.empty() ? 0 : &(coeffs[0]),coeffs.size()*sizeof(double)) &&
+            writePadded(f,blobs.empty() ? 0 : &(blobs[0]),blobs.size()) &&
+            !fflush(f) && !fsync(fileno(f));
+  int errno0 = errno;
+  ok = !fclose(f) && ok;
+  if( !ok )
+  {
+    unlink(filename.c_str());
+    errno = errno0;
+    throwErrno("error writing '"+filename+"'");
+  }
+}
+
+void MappedParmTable::flush ()
+{
+  Thread::Mutex::Lock lock(mutex_);
+  if( pending_.empty() )
+    return;
+  if( mkdir(table_name_.c_str(),0777) < 0 && errno != EEXIST )
+    throwErrno("can't create '%s'");
+  // the lock file keeps other processes from flushing at the same time
+  int lockfd = open(lock_file_.c_str(),O_RDWR|O_CREAT,0666);
+  if( lockfd < 0 )
+    throwErrno("can't open '%s/lock'");
+  if( flock(lockfd,LOCK_EX) < 0 )
+  {
+    int errno0 = errno;
+    close(lockfd);
+    errno = errno0;
+    throwErrno("can't lock '%s/lock'");
+  }
+  Snapshot *snap = new Snapshot;
+  try
+  {
+    // another process may have flushed since we mapped our snapshot, so
+    // merge with whatever is on disk now
+    snap->map(funklets_file_);
+    string tmpfile = funklets_file_ + Debug::ssprintf(".%d",int(getpid()));
+    writeFile(tmpfile,*snap);
+    if( rename(tmpfile.c_str(),funklets_file_.c_str()) < 0 )
+    {
+      int errno0 = errno;
+      unlink(tmpfile.c_str());
+      errno = errno0;
+      throwErrno("can't rename new '%s/funklets.map'");
+    }
+    delete snap;
+    snap = new Snapshot;
+    snap->map(funklets_file_);
+  }
+  catch(...)
+  {
+    delete snap;
+    close(lockfd);  // releases the lock
+    throw;
+  }
+  close(lockfd);
+  // publish new snapshot, then clear pending funklets. The old snapshot
+  // stays mapped until no lock-free readers are using it
+  publishSnapshot(snap);
+  pending_.clear();
+  __sync_synchronize();
+  has_pending_ = 0;
+}
+
+#ifdef HAVE_FASTPARMTABLE
+int MappedParmTable::importTable (FastParmTable &src)
+{
+  int n = 0;
+  string name;
+  int idom;
+  for( bool more = src.firstFunklet(name,idom); more; more = src.nextFunklet(name,idom) )
+  {
+    Funklet::Ref ref;
+    if( src.getFunklet(ref,name,idom) )
+    {
+      putCoeff(name,*ref);
+      n++;
+    }
+  }
+  flush();
+  return n;
+}
+#endif
+
+} // namespace Meq
@@ -0,0 +1,286 @@
+//# MappedParmTable.h: parameter table in a memory-mapped file
+//#
+//# Copyright (C) 2002-2007
+//# ASTRON (Netherlands Foundation for Research in Astronomy)
+//# and The MeqTree Foundation
+//# P.O.Box 2, 7990 AA Dwingeloo, The Netherlands, seg@astron.nl
+//#
+//# This program is free software; you can redistribute it and/or modify
+//# it under the terms of the GNU General Public License as published by
+//# the Free Software Foundation; either version 2 of the License, or
+//# (at your option) any later version.
+//#
+//# This program is distributed in the hope that it will be useful,
+//# but WITHOUT ANY WARRANTY; without even the implied warranty of
+//# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+//# GNU General Public License for more details.
+//#
+//# You should have received a copy of the GNU General Public License
+//# along with this program; if not, write to the Free Software
+//# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+//#
+//# $Id$
+
+#ifndef MEQ_MAPPEDPARMTABLE_H
+#define MEQ_MAPPEDPARMTABLE_H
+
+#include <MEQ/ParmTable.h>
+#include <MEQ/FastParmTable.h>
+#include <stdint.h>
+#include <sys/types.h>
+#include <sys/stat.h>
+#include <map>
+
+namespace Meq {
+
+// A MappedParmTable is a directory holding a single file of funklets. The
+// file is never modified once written: it is mapped read-only (and shared
+// between all processes that open the table), and looked up without any
+// locking. The file consists of:
+//    * a header;
+//    * a list of parm names, sorted, each pointing to a range of...
+//    * ...funklet entries. The entries of one parm are sorted by the start
+//      of their domain along the first axis, and also carry the running
+//      maximum of the domain end, so that the funklets overlapping a domain
+//      are found by two binary searches;
+//    * the coefficients of all plain polcs, as one contiguous array of
+//      doubles. Such polcs are made directly from the entry and the
+//      coefficients, without going through DMI;
+//    * any other funklets, as serialized blocksets.
+// Funklets that are put into the table are kept in memory until flush()
+// (or the destructor), which merges them with the current contents of
+// the file, writes a new file, and renames it over the old one. Readers
+// that have the old file mapped carry on using it; the table in this
+// process switches over to the new file, and the tables in other processes
+// switch over on their next lookup, as they check whether the file has
+// been replaced. The old mapping is released once no lookup is using it.
+// A lock file serializes flushes by different processes, so that no
+// updates are lost. Since every flush rewrites the whole file, it is meant
+// to be done once per solution, not once per funklet.
+class MappedParmTable : public ParmTable
+{
+public:
+  // opens table. The directory is created on the first flush()
+  explicit MappedParmTable (const string& tableName);
+
+  virtual ~MappedParmTable();
+
+  // Get the parameter values for the given funklet and domain.
+  // Note that the requested domain may contain multiple funklets.
+  // Returns # of funklets in vector
+  int getFunklets (vector<Funklet::Ref> &funklets,const string& parmName, const Domain& domain);
+
+  // Put the coefficients for the given funklet and domain. The funklet
+  // is held in memory until the next flush().
+  // Returns the DbId of the funklet, if it is already in the file,
+  // or -1 if it is new.
+  Funklet::DbId putCoeff (const string& parmName, const Funklet& funklet,bool domain_is_key=false);
+
+  const string& name() const
+  { return table_name_; }
+
+  // writes out all funklets put since the last flush
+  void flush ();
+
+  // number of funklets in the file currently mapped
+  int numFunklets () const;
+
+#ifdef HAVE_FASTPARMTABLE
+  // puts all funklets of a FastParmTable into this table (and flushes).
+  // Returns the number of funklets copied.
+  int importTable (FastParmTable &src);
+#endif
+
+  // file format version
+  static const int FormatVersion = 1;
+
+private:
+  // on-disk structures. All are multiples of 8 bytes in size, so
+  // that every section of the file is aligned
+  class FileHeader
+  {
+    public:
+      char     magic[8];
+      int32_t  version;
+      int32_t  maxaxis;
+      int64_t  nparms;
+      int64_t  nfunklets;
+      int64_t  ncoeffs;
+      int64_t  names_offset;
+      int64_t  names_size;
+      int64_t  parms_offset;
+      int64_t  funklets_offset;
+      int64_t  coeffs_offset;
+      int64_t  blobs_offset;
+      int64_t  blobs_size;
+      int64_t  file_size;
+  };
+
+  class ParmEntry
+  {
+    public:
+      int64_t  name_offset;
+      int64_t  name_length;
+      int64_t  first;     // index of first funklet entry
+      int64_t  count;     // number of funklet entries
+  };
+
+  typedef enum
+  {
+    POLC = 1,     // plain polc, coefficients in coeffs section
+    BLOB = 2      // anything else, blockset in blobs section
+  } EntryType;
+
+  class FunkletEntry
+  {
+    public:
+      double   start[Axis::MaxAxis];
+      double   end[Axis::MaxAxis];
+      double   key_start;  // start along axis 0, or -DBL_MAX if undefined
+      double   max_end;    // max of end along axis 0 over this and preceding entries
+      double   offset[2];
+      double   scale[2];
+      double   pert;
+      double   weight;
+      int64_t  data_offset;  // coeff index for POLC, byte offset for BLOB
+      int64_t  data_size;    // number of coeffs for POLC, bytes for BLOB
+      int32_t  defined;      // bitmask of defined axes
+      int32_t  type;
+      int32_t  rank;         // polc rank, 0 to 2
+      int32_t  shape[2];
+      int32_t  axes[2];
+      int32_t  pad;
+
+      // returns True if domains of the two entries match
+      bool match (const FunkletEntry &other) const;
+      // returns True if dom overlaps entry
+      bool overlaps (const Domain &dom) const;
+      // sets up domain fields (but not max_end) from domain
+      void setDomain (const Domain &dom);
+      // makes a Meq::Domain object from the entry
+      Domain * makeDomain () const;
+
+      // entries are sorted by start
+      bool operator < (const FunkletEntry &other) const
+      { return key_start < other.key_start; }
+  };
+
+  // a mapped file
+  class Snapshot
+  {
+    public:
+      Snapshot ();
+      ~Snapshot ();
+
+      // maps the given file, returns false if it does not exist
+      bool map (const string &filename);
+
+      // returns index of parm entry, or -1 if not found
+      int findParm (const string &name) const;
+
+      // returns true if the stat buffer describes the file that is mapped
+      bool isFile (const struct stat &st) const;
+
+      void *   base;
+      size_t   size;
+      dev_t    dev;
+      ino_t    ino;
+      time_t   mtime;
+      const FileHeader *   header;
+      const char *         names;
+      const ParmEntry *    parms;
+      const FunkletEntry * funklets;
+      const double *       coeffs;
+      const char *         blobs;
+  };
+
+  // a funklet that has been put, but not yet flushed
+  class PendingFunklet
+  {
+    public:
+      FunkletEntry entry;
+      int dbid;               // index of entry it replaces in file, or -1
+      std::vector<double> coeffs;
+      std::vector<char>   blob;
+  };
+  typedef std::vector<PendingFunklet> PendingList;
+  typedef std::map<string,PendingList> PendingMap;
+
+  // makes a funklet from an entry
+  static void makeFunklet (Funklet::Ref &ref,const FunkletEntry &entry,
+                           const double *coeffs,const char *blob,int dbid);
+
+  // makes an entry (plus data) from a funklet
+  static void encodeFunklet (PendingFunklet &pf,const Funklet &funklet);
+
+  // throws an exception if an entry of the file is not valid
+  void checkEntry (const FunkletEntry &entry,const Snapshot &snap) const;
+
+  // looks up funklets in snapshot, plus pending ones (if not 0)
+  int lookup (vector<Funklet::Ref> &funklets,const Snapshot &snap,
+              const PendingList *pending,const string &parmName,const Domain &domain);
+
+  // finds funklets of the given parm overlapping the given domain in the
+  // snapshot, and appends their indices to the vector
+  static void findFunklets (std::vector<int> &found,const Snapshot &snap,
+                            int iparm,const Domain &domain);
+
+  // writes a new file from the given snapshot plus pending funklets
+  void writeFile (const string &filename,const Snapshot &snap);
+
+  // maps the file again if it has been replaced by another process
+  void refreshSnapshot ();
+
+  // makes snap the current snapshot, and retires the old one. Caller must
+  // hold mutex_.
+  void publishSnapshot (Snapshot *snap);
+
+  // unmaps retired snapshots if no lock-free lookups are in progress.
+  // Caller must hold mutex_.
+  void releaseRetired ();
+
+  // lock-free lookups hold one of these while they use the current
+  // snapshot, so that it is not unmapped underneath them
+  class Reader
+  {
+    public:
+      Reader (MappedParmTable &table)
+      : table_(table)
+      { __sync_add_and_fetch(&table_.num_readers_,1); }
+
+      ~Reader ();
+
+    private:
+      MappedParmTable &table_;
+  };
+  friend class Reader;
+
+  // helper function to throw an error from errno
+  void throwErrno (const string &message);
+
+  std::string table_name_;
+  std::string funklets_file_;
+  std::string lock_file_;
+
+  Thread::Mutex mutex_;
+
+  // current snapshot. Readers pick this up without locking; retired
+  // snapshots stay mapped for as long as any lock-free lookup is in
+  // progress, since it may still be reading them
+  Snapshot * volatile snapshot_;
+  std::vector<Snapshot *> retired_;
+  volatile int num_retired_;
+
+  // number of lock-free lookups in progress, see Reader
+  volatile int num_readers_;
+
+  // pending funklets, per parm name. has_pending_ is nonzero if
+  // there are any, in which case readers have to lock the mutex.
+  PendingMap pending_;
+  volatile int has_pending_;
+};
+
+
+} // namespace Meq
+
+#endif
@@ -103,6 +103,7 @@ Node::Node (int nchildren,const HIID *labels,int nmandatory)
     pcs_new_   = reinterpret_cast<CacheStats*>(vec_new[HIID()].as_wp<int>());
     pcparents_ = reinterpret_cast<CacheParentInfo*>(vec_par[HIID()].as_wp<int>());
     pcrescode_ = ( rec[FResultCode] <<= new DMI::Vec(Tpint,-1) )[HIID()].as_wp<int>();
+    pcbytes_   = ( rec[AidBytes] <<= new DMI::Vec(Tpdouble,1) )[HIID()].as_wp<double>();
   }
   // init profiling stats
   {
@@ -122,6 +123,8 @@ Node::Node (int nchildren,const HIID *labels,int nmandatory)
 //##ModelId=3F5F44A401BC
 Node::~Node()
 {
+  if( cache_entry_.linked && forest_ )
+    forest().cacheManager().remove(*this);
 }
 
 int Node::childLabelToNumber (const HIID &label) const
@@ -486,6 +489,8 @@ void Node::clearCache (bool recursive,long marker) throw()
     return;
   cache_.last_clear_cache_marker_ = marker;
   cache_.clear();
+  if( cache_entry_.linked )
+    forest().cacheManager().remove(*this);
   if( control_status_ & CS_CACHED )
     setControlStatus(control_status_&~CS_CACHED,recursive); // sync if recursive
   if( recursive )
@@ -513,6 +518,7 @@ bool Node::getCachedResult (int &retcode,Result::Ref &ref,const Request &req)
     pcs_total_->none++;
     if( new_request_ )
       pcs_new_->none++;
+    forest().cacheManager().recordMiss();
     return false;
   }
   if( has_state_dep_ )
@@ -578,6 +584,8 @@ bool Node::getCachedResult (int &retcode,Result::Ref &ref,const Request &req)
     pcs_total_->hits++;
     if( new_request_ )
       pcs_new_->hits++;
+    forest().cacheManager().recordHit();
+    forest().cacheManager().touch(*this);
 //     fprintf(flog,"%s: reusing cache, cache cells are %x, req cells are %x\n",
 //         name().c_str(),
 //         (ref->hasCells() ? int(&(ref->cells())) : 0),
@@ -595,6 +603,7 @@ bool Node::getCachedResult (int &retcode,Result::Ref &ref,const Request &req)
   pcs_total_->miss++;
   if( new_request_ )
     pcs_new_->miss++;
+  forest().cacheManager().recordMiss();
 //  fprintf(flog,"%s: cache missed\n",name().c_str());
   // no match -- clear cache and return
   clearCache(false);
@@ -676,6 +685,9 @@ int Node::cacheResult (const Result::Ref &ref,const Request &req,int retcode)
     // OMS: 04/12 no no this plays hell with Jan's reqseqs. Reverting
 //    cache_.set(ref,req,retcode&~RES_UPDATED|(cache_.rescode&forest().getStateDependMask()));
     cache_.set(ref,req,retcode&~RES_UPDATED);
+    // register with the forest cache manager. This may evict the caches of
+    // other nodes to keep within the memory budget
+    forest().cacheManager().insert(*this,CacheManager::resultSize(*ref));
     cdebug(3)<<"caching result "<<req.id()<<" with code "<<ssprintf("0x%x",retcode&~RES_UPDATED)<<endl;
     // control status set directly (not via setControlStatus call) because
     // caller (execute(), presumably) is going to update status anyway
@@ -705,6 +717,26 @@ int Node::cacheResult (const Result::Ref &ref,const Request &req,int retcode)
   return retcode;
 }
 
+bool Node::evictCache ()
+{
+  // never wait on a busy node, as the cache manager is holding its own lock
+  if( execCond().trylock() )
+    return false;
+  bool evict = !executing_ && cache_.valid() && !(cache_.rescode&RES_FAIL) &&
+               pcparents_->nhint >= ( pcparents_->nact ? pcparents_->nact : pcparents_->npar );
+  if( evict )
+  {
+    cdebug(3)<<"cache evicted by cache manager\n";
+    cache_.clear();
+    // control status set directly, as setControlStatus() may call back into
+    // the forest, and we're called with the cache manager lock held
+    control_status_ &= ~CS_CACHED;
+    pcs_total_->evicted++;
+  }
+  execCond().unlock();
+  return evict;
+}
+
 void Node::setPublishingLevel (int level)
 {
   wstate()[FPublishingLevel] = publishing_level_ = level;
@@ -33,6 +33,7 @@
 #include <MEQ/RequestId.h>
 #include <MEQ/Request.h>
 #include <MEQ/Cells.h>
+#include <MEQ/CacheManager.h>
 #include <MEQ/AID-Meq.h>
 #include <MEQ/TID-Meq.h>
 #include <map>
@@ -152,6 +153,7 @@ class Node : public NodeFace
 {
   public:
     friend class MeqPython::PyNodeAccessor;
+    friend class CacheManager;
     typedef CountedRef<Node> Ref;
 
     //## Control state bitmasks. These are set in the control_status_ field
@@ -667,6 +669,12 @@ class Node : public NodeFace
     //## Returns the retcode.
     int  cacheResult   (const Result::Ref &ref,const Request &req,int retcode);
 
+    //## Called by the forest cache manager to evict our cache when over
+    //## budget. Does nothing and returns false if the cache can't be evicted
+    //## right now: node is busy or executing, the cache holds a fail, or
+    //## not all parents have checked in for the result.
+    bool evictCache ();
+
     //## MakeNodeException creates an exception with the given message,
     //## and insert the node identifier
     #define MakeNodeExceptionOfType(exctype,msg) exctype(msg,description(),__HERE__)
@@ -980,6 +988,9 @@ class Node : public NodeFace
 
     Cache cache_;
 
+    //## our entry in the forest cache manager
+    CacheManager::Entry cache_entry_;
+
     //## flag: release cache when all parents allow it
     bool parents_release_cache_;
 
@@ -993,6 +1004,7 @@ class Node : public NodeFace
       int none;       //## total number of requests with no cache available
       int cached;     //## total number of all cached results
       int longcached; //## total number of results cached persistently
+      int evicted;    //## total number of caches evicted by the cache manager
     } CacheStats;
     //## total cache stats (including same requests)
     CacheStats * pcs_total_;
@@ -1008,6 +1020,8 @@ class Node : public NodeFace
     CacheParentInfo * pcparents_;
     //## another copy of the result code goes here
     int * pcrescode_;
+    //## size of cached result, as tracked by the cache manager
+    double * pcbytes_;
 
     //## profiling stats
     DMI::Record::Ref profile_stats_;
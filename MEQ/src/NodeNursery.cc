@@ -164,7 +164,7 @@ AtomicID NodeNursery::validatePolicy (AtomicID policy)
 
 
 // Checks if an MT poll is possible, returns brigade if it is. Sets
-// a lock on the brigade's cond() mutex/variable.
+// a lock on the brigade's queue (see MTPool::Brigade::lockQueue()).
 // If MT is not possible (i.e. must poll serially in same thread), returns 0.
 // As a side effect, inits mt.old_brigade_ if the current thread
 // switches brigades.
@@ -178,7 +178,7 @@ MTPool::Brigade * NodeNursery::mt_checkBrigadeAvailability (Thread::Mutex::Lock
   else
   {
     mt.cur_brigade_ = &( MTPool::brigade() );
-    lock.relock(mt.cur_brigade_->cond());
+    mt.cur_brigade_->lockQueue(lock);
     return mt.cur_brigade_;
   }
 }
@@ -303,7 +303,8 @@ void NodeNursery::mt_waitForEndOfPoll ()
   while( mt.child_retcount_ < mt.numchildren_ && !mt.abandon_ )
   {
     // else grab a work order for ourselves
-    Thread::Mutex::Lock lock2(mt.cur_brigade_->cond());
+    Thread::Mutex::Lock lock2;
+    mt.cur_brigade_->lockQueue(lock2);
     MTPool::AbstractWorkOrder *wo = mt.cur_brigade_->getWorkOrder(false,polling_depth_); // wait=false
     // if there's nothing on the queue, then we have to wait for all worker
     // threads to finish and deliver a result, so just go to sleep
@@ -370,7 +371,8 @@ int NodeNursery::awaitChildResult (int &rescode,Result::Ref &resref,const Reques
       }
       // no result on queue, so we can grab a work order from the brigade queue
       lock.release();
-      Thread::Mutex::Lock lock2(mt.cur_brigade_->cond());
+      Thread::Mutex::Lock lock2;
+      mt.cur_brigade_->lockQueue(lock2);
       MTPool::AbstractWorkOrder *wo = mt.cur_brigade_->getWorkOrder(false,polling_depth_); // wait=false
       // if there's nothing on the queue, then we have to wait for all worker
       // threads to finish and deliver a result, so just go to sleep
@@ -520,7 +522,7 @@ int NodeNursery::syncPoll (Result::Ref &resref,std::vector<Result::Ref> &childre
         {
           wo->execute(*mt.cur_brigade_);
           mt.cur_brigade_->finishWithWorkOrder(wo);
-          lock.relock(mt.cur_brigade_->cond());
+          mt.cur_brigade_->lockQueue(lock);
           continue;
         }
         // null from queue means either no more work orders, or too many busy threads busy
@@ -537,7 +539,7 @@ int NodeNursery::syncPoll (Result::Ref &resref,std::vector<Result::Ref> &childre
         else
           break;
         lock2.release();
-        lock.relock(mt.cur_brigade_->cond());
+        mt.cur_brigade_->lockQueue(lock);
       }
       lock.release();
       // finish up
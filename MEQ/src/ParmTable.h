@@ -81,6 +81,11 @@ public:
   virtual void flush ()
   {}
 
+  // flushes data to disk, and waits until it is there. Tables that
+  // write synchronously need not distinguish this from flush().
+  virtual void sync ()
+  { flush(); }
+
   
   // define a debug context
   LocalDebugContext;
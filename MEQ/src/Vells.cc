@@ -23,6 +23,7 @@
 
 // #define MEQVELLS_SKIP_FUNCTIONS 1
 #include <MEQ/Vells.h>
+#include <MEQ/VellsKernels.h>
 #include <TimBase/Debug.h>
 #include <DMI/Global-Registry.h>
 #include <cmath>
@@ -662,6 +663,85 @@ inline double arg (const double x)
 #endif
 
 
+// -----------------------------------------------------------------------
+// vectorized kernels
+// The templates below look up a kernel from VellsKernels by operation and
+// argument types. Kernels are only applied when every operand is either
+// a scalar or of the same shape as the result, so that storage is
+// contiguous; anything else (and the scalar kernel set) falls through to
+// the generic loops.
+// -----------------------------------------------------------------------
+#define declareKernelId(FUNCNAME,x) VK_##FUNCNAME,
+enum
+{
+  VK_NONE = 0,
+  VK_ADD,VK_SUB,VK_MUL,VK_DIV,VK_POLAR,
+  DoForAllUnaryFuncs1(declareKernelId,)
+  // in-place operators map to the same kernels
+  VK_ADD1 = VK_ADD, VK_SUB1 = VK_SUB, VK_MUL1 = VK_MUL, VK_DIV1 = VK_DIV
+};
+#undef declareKernelId
+
+// kernels are not worth calling for fewer elements than this
+const int MinKernelSize = 8;
+
+template<int OP,class TY,class TA,class TB>
+struct BinaryKernelOf
+{ static VellsKernels::BinaryKernel get () { return 0; } };
+
+template<int OP,class TY,class TX>
+struct UnaryKernelOf
+{ static VellsKernels::UnaryKernel get () { return 0; } };
+
+#define defineBinaryKernel(OP,TY,TA,TB,field) \
+  template<> struct BinaryKernelOf<OP,TY,TA,TB> \
+  { static VellsKernels::BinaryKernel get () { return VellsKernels::kernels.field; } };
+#define defineUnaryKernel(OP,TY,TX,field) \
+  template<> struct UnaryKernelOf<OP,TY,TX> \
+  { static VellsKernels::UnaryKernel get () { return VellsKernels::kernels.field; } };
+
+defineBinaryKernel(VK_ADD,double,double,double,add_dd)
+defineBinaryKernel(VK_SUB,double,double,double,sub_dd)
+defineBinaryKernel(VK_MUL,double,double,double,mul_dd)
+defineBinaryKernel(VK_DIV,double,double,double,div_dd)
+defineBinaryKernel(VK_ADD,dcomplex,dcomplex,dcomplex,add_cc)
+defineBinaryKernel(VK_SUB,dcomplex,dcomplex,dcomplex,sub_cc)
+defineBinaryKernel(VK_MUL,dcomplex,dcomplex,dcomplex,mul_cc)
+defineBinaryKernel(VK_DIV,dcomplex,dcomplex,dcomplex,div_cc)
+defineBinaryKernel(VK_MUL,dcomplex,double,dcomplex,mul_dc)
+defineBinaryKernel(VK_MUL,dcomplex,dcomplex,double,mul_cd)
+defineBinaryKernel(VK_POLAR,dcomplex,double,double,polar)
+defineUnaryKernel(VK_sqrt,double,double,sqrt_d)
+defineUnaryKernel(VK_exp,double,double,exp_d)
+defineUnaryKernel(VK_sin,double,double,sin_d)
+defineUnaryKernel(VK_cos,double,double,cos_d)
+defineUnaryKernel(VK_exp,dcomplex,dcomplex,exp_c)
+
+// applies y = kernel(a,b) if a kernel is available and the shapes allow
+// it. Returns false if not applied.
+template<class TY,class TA,class TB>
+static inline bool applyBinaryKernel (VellsKernels::BinaryKernel kernel,
+      TY *py,const TA *pa,const TB *pb,int ny,int na,int nb)
+{
+  if( !kernel || ny < MinKernelSize ||
+      ( na != ny && na != 1 ) || ( nb != ny && nb != 1 ) )
+    return false;
+  (*kernel)(reinterpret_cast<double*>(py),
+            reinterpret_cast<const double*>(pa),na != 1,
+            reinterpret_cast<const double*>(pb),nb != 1,ny);
+  return true;
+}
+
+template<class TY,class TX>
+static inline bool applyUnaryKernel (VellsKernels::UnaryKernel kernel,
+      TY *py,const TX *px,int ny,int nx)
+{
+  if( !kernel || ny < MinKernelSize || nx != ny )
+    return false;
+  (*kernel)(reinterpret_cast<double*>(py),reinterpret_cast<const double*>(px),ny);
+  return true;
+}
+
 // -----------------------------------------------------------------------
 // definitions for unary operators
 // defined for all types, preserves type
@@ -669,11 +749,17 @@ inline double arg (const double x)
 // defines a templated implementation of an unary function
 //    y = FUNC(x)
 #define defineUnaryOperTemplate(FUNC,FUNCNAME,dum) \
+  defineUnaryKernelTemplate(FUNC,FUNCNAME,VK_NONE)
+// same, but tries the vectorized kernel KERNEL first
+#define defineUnaryKernelTemplate(FUNC,FUNCNAME,KERNEL) \
   template<class TY,class TX> \
   static void implement_##FUNCNAME (Meq::Vells &y,const Meq::Vells &x) \
   { const TX *px = x.getStorage(Type2Type<TX>()); \
     TY *py = y.begin(Type2Type<TY>()), \
        *py_end = y.end(Type2Type<TY>());  \
+    if( applyUnaryKernel(UnaryKernelOf<KERNEL,TY,TX>::get(),py,px, \
+                         y.nelements(),x.nelements()) ) \
+      return; \
     for( ; py < py_end; px++,py++ ) \
       *py = FUNC(*px); \
   }
@@ -708,7 +794,7 @@ DoForAllUnaryFlagOperators(implementUnaryFlagOperator,);
 #define defineUnaryFuncTemplate(FUNC,x) defineUnaryOperTemplate(FUNC,FUNC,x)
 
 #define implementUnaryFunc1(FUNCNAME,x) \
-  defineUnaryFuncTemplate(FUNCNAME,x) \
+  defineUnaryKernelTemplate(FUNCNAME,FUNCNAME,VK_##FUNCNAME) \
   Meq::Vells::UnaryOperPtr Meq::Vells::unifunc_##FUNCNAME##_lut[VELLS_LUT_SIZE] = \
     ExpandMethodList(FUNCNAME);
 
@@ -932,6 +1018,9 @@ Meq::Vells::UnaryRdFuncWSPtr Meq::Vells::unifunc_nelements_lut[VELLS_LUT_SIZE] =
 // defines a templated implementation of a binary function
 //    y = FUNC(a,b)
 #define defineBinaryFuncTemplate(FUNC,FUNCNAME,dum) \
+  defineBinaryKernelTemplate(FUNC,FUNCNAME,VK_NONE)
+// same, but tries the vectorized kernel KERNEL first
+#define defineBinaryKernelTemplate(FUNC,FUNCNAME,KERNEL) \
   template<class TY,class TA,class TB> \
   static void implement_binary_##FUNCNAME (Meq::Vells &y,\
                   const Meq::Vells &a,const Meq::Vells &b,\
@@ -939,6 +1028,9 @@ Meq::Vells::UnaryRdFuncWSPtr Meq::Vells::unifunc_nelements_lut[VELLS_LUT_SIZE] =
   { TY *py = y.getStorage(Type2Type<TY>()); \
     const TA *pa = a.getStorage(Type2Type<TA>()); \
     const TB *pb = b.getStorage(Type2Type<TB>()); \
+    if( applyBinaryKernel(BinaryKernelOf<KERNEL,TY,TA,TB>::get(),py,pa,pb, \
+                          y.nelements(),a.nelements(),b.nelements()) ) \
+      return; \
     if( a.isScalar() && b.isScalar() ) \
       *py = FUNC(*pa,*pb); \
     else { \
@@ -1014,7 +1106,7 @@ Meq::Vells::UnaryRdFuncWSPtr Meq::Vells::unifunc_nelements_lut[VELLS_LUT_SIZE] =
 
 // Implements all binary operators via the template above
 #define implementBinaryOperator(OPER,OPERNAME,dum) \
-  defineBinaryFuncTemplate(OPERNAME,OPERNAME,dum) \
+  defineBinaryKernelTemplate(OPERNAME,OPERNAME,VK_##OPERNAME) \
   Meq::Vells::BinaryOperPtr Meq::Vells::binary_##OPERNAME##_lut[VELLS_LUT_SIZE][VELLS_LUT_SIZE] = \
     ExpandBinaryLUTMatrix(OPERNAME);
 
@@ -1075,6 +1167,9 @@ DoForAllBinaryFlagOperators(implementBinaryFlagOperator,);
                   const Meq::Vells::Strides &strides_x) \
   { TOut *py = y.getStorage(Type2Type<TOut>()); \
     const TX *px = x.getStorage(Type2Type<TX>()); \
+    if( applyBinaryKernel(BinaryKernelOf<VK_##OPERNAME,TOut,TOut,TX>::get(),py,py,px, \
+                          y.nelements(),y.nelements(),x.nelements()) ) \
+      return; \
     if( y.isScalar() && x.isScalar() ) \
       *py OPER##= *px; \
     else { \
@@ -1200,7 +1295,7 @@ Meq::Vells::BinaryOperPtr Meq::Vells::binfunc_tocomplex_lut[VELLS_LUT_SIZE][VELL
 // polreptocomplex()
 #define polar(x,y) (x)*exp(make_dcomplex(0,y))
 // define standard template (will only be invoked for real arguments)
-defineBinaryFuncTemplate(polar,polar,);
+defineBinaryKernelTemplate(polar,polar,VK_POLAR);
 // error function for complex arguments
 defineErrorFunc2(error_binary_polar,"polar() can only be applied to two real Meq::Vells");
 // LUT
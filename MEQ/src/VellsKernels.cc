@@ -0,0 +1,302 @@
+//
+//% $Id$
+//
+//
+// Copyright (C) 2002-2007
+// The MeqTree Foundation &
+// ASTRON (Netherlands Foundation for Research in Astronomy)
+// P.O.Box 2, 7990 AA Dwingeloo, The Netherlands
+//
+// This program is free software; you can redistribute it and/or modify
+// it under the terms of the GNU General Public License as published by
+// the Free Software Foundation; either version 2 of the License, or
+// (at your option) any later version.
+//
+// This program is distributed in the hope that it will be useful,
+// but WITHOUT ANY WARRANTY; without even the implied warranty of
+// MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+// GNU General Public License for more details.
+//
+// You should have received a copy of the GNU General Public License
+// along with this program; if not, see <http://www.gnu.org/licenses/>,
+// or write to the Free Software Foundation, Inc.,
+// 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+//
+
+#include "VellsKernels.h"
+#include <cmath>
+#include <cstdlib>
+#include <strings.h>
+
+// The vector kernels are compiled with per-function target attributes, so
+// that the rest of the library need not be built for a particular CPU.
+// This needs an x86-64 gcc; other builds only get the scalar (null) set.
+#if defined(__x86_64__) && defined(__GNUC__) && !defined(__clang__) && __GNUC__ >= 5
+  #define VELLS_KERNELS_SIMD 1
+  #include <immintrin.h>
+#endif
+
+namespace Meq
+{
+
+namespace VellsKernels
+{
+
+#ifdef VELLS_KERNELS_SIMD
+
+// No contraction into FMAs: results must match the scalar code, which is
+// built without them.
+#pragma GCC push_options
+#pragma GCC target("avx2")
+#pragma GCC optimize("fp-contract=off")
+
+namespace AVX2
+{
+  typedef __m256d V;
+  typedef __m256d M;
+  static const size_t W = 4;
+
+  static inline V load  (const double *p)  { return _mm256_loadu_pd(p); }
+  static inline void store (double *p,V x) { _mm256_storeu_pd(p,x); }
+  static inline V set1  (double x)         { return _mm256_set1_pd(x); }
+  static inline V add   (V a,V b)          { return _mm256_add_pd(a,b); }
+  static inline V sub   (V a,V b)          { return _mm256_sub_pd(a,b); }
+  static inline V mul   (V a,V b)          { return _mm256_mul_pd(a,b); }
+  static inline V div   (V a,V b)          { return _mm256_div_pd(a,b); }
+  static inline V vsqrt (V x)              { return _mm256_sqrt_pd(x); }
+  static inline V vfloor (V x)             { return _mm256_floor_pd(x); }
+  static inline V vabs  (V x)              { return _mm256_andnot_pd(_mm256_set1_pd(-0.),x); }
+
+  // comparisons are ordered, so NaNs compare false
+  static inline M lt    (V a,V b)          { return _mm256_cmp_pd(a,b,_CMP_LT_OQ); }
+  static inline M eq    (V a,V b)          { return _mm256_cmp_pd(a,b,_CMP_EQ_OQ); }
+  static inline M mor   (M a,M b)          { return _mm256_or_pd(a,b); }
+  static inline M mand  (M a,M b)          { return _mm256_and_pd(a,b); }
+  static inline M mxor  (M a,M b)          { return _mm256_xor_pd(a,b); }
+  static inline bool allof (M m)           { return _mm256_movemask_pd(m) == 0xF; }
+  static inline V select (M m,V a,V b)     { return _mm256_blendv_pd(b,a,m); }
+  static inline V negif (M m,V x)
+  { return _mm256_xor_pd(x,_mm256_and_pd(m,_mm256_set1_pd(-0.))); }
+  // x with its sign flipped where s is negative (including -0)
+  static inline V xorsign (V x,V s)
+  { return _mm256_xor_pd(x,_mm256_and_pd(s,_mm256_set1_pd(-0.))); }
+
+  // x*2^n for integral n in the normal exponent range
+  static inline V ldexp (V x,V n)
+  {
+    __m256i e = _mm256_cvtepi32_epi64(_mm256_cvtpd_epi32(n));
+    e = _mm256_slli_epi64(_mm256_add_epi64(e,_mm256_set1_epi64x(1023)),52);
+    return _mm256_mul_pd(x,_mm256_castsi256_pd(e));
+  }
+
+  // (re,im) broadcast to all complex lanes
+  static inline V dupcomplex (const double *p)
+  { return _mm256_broadcast_pd(reinterpret_cast<const __m128d*>(p)); }
+
+  // W/2 reals, each duplicated into a complex lane pair
+  static inline V real2complex (const double *p)
+  {
+    __m128d r = _mm_loadu_pd(p);
+    return _mm256_permute4x64_pd(_mm256_castpd128_pd256(r),0x50);
+  }
+
+  // complex multiply of W/2 lane pairs: (ar*br-ai*bi,ai*br+ar*bi)
+  static inline V cmul (V a,V b)
+  {
+    V t1 = _mm256_mul_pd(a,_mm256_movedup_pd(b));
+    V t2 = _mm256_mul_pd(_mm256_permute_pd(a,0x5),_mm256_permute_pd(b,0xF));
+    return _mm256_addsub_pd(t1,t2);
+  }
+
+  // W reals and W imaginaries to W interleaved complex values
+  static inline void interleave (V re,V im,double *p)
+  {
+    V lo = _mm256_unpacklo_pd(re,im);   // r0 i0 r2 i2
+    V hi = _mm256_unpackhi_pd(re,im);   // r1 i1 r3 i3
+    _mm256_storeu_pd(p,_mm256_permute2f128_pd(lo,hi,0x20));
+    _mm256_storeu_pd(p+4,_mm256_permute2f128_pd(lo,hi,0x31));
+  }
+
+  static inline void deinterleave (const double *p,V &re,V &im)
+  {
+    V a = _mm256_loadu_pd(p);           // r0 i0 r1 i1
+    V b = _mm256_loadu_pd(p+4);         // r2 i2 r3 i3
+    V lo = _mm256_permute2f128_pd(a,b,0x20);  // r0 i0 r2 i2
+    V hi = _mm256_permute2f128_pd(a,b,0x31);  // r1 i1 r3 i3
+    re = _mm256_unpacklo_pd(lo,hi);
+    im = _mm256_unpackhi_pd(lo,hi);
+  }
+
+  #include "VellsKernelsImpl.h"
+};
+
+#pragma GCC pop_options
+
+#pragma GCC push_options
+#pragma GCC target("avx512f")
+#pragma GCC optimize("fp-contract=off")
+
+namespace AVX512
+{
+  typedef __m512d V;
+  typedef __mmask8 M;
+  static const size_t W = 8;
+
+  static inline V load  (const double *p)  { return _mm512_loadu_pd(p); }
+  static inline void store (double *p,V x) { _mm512_storeu_pd(p,x); }
+  static inline V set1  (double x)         { return _mm512_set1_pd(x); }
+  static inline V add   (V a,V b)          { return _mm512_add_pd(a,b); }
+  static inline V sub   (V a,V b)          { return _mm512_sub_pd(a,b); }
+  static inline V mul   (V a,V b)          { return _mm512_mul_pd(a,b); }
+  static inline V div   (V a,V b)          { return _mm512_div_pd(a,b); }
+  static inline V vsqrt (V x)              { return _mm512_sqrt_pd(x); }
+  static inline V vfloor (V x)
+  { return _mm512_roundscale_pd(x,_MM_FROUND_TO_NEG_INF|_MM_FROUND_NO_EXC); }
+  static inline V vabs  (V x)
+  {
+    return _mm512_castsi512_pd(_mm512_andnot_epi64(
+        _mm512_set1_epi64(0x8000000000000000LL),_mm512_castpd_si512(x)));
+  }
+
+  static inline M lt    (V a,V b)          { return _mm512_cmp_pd_mask(a,b,_CMP_LT_OQ); }
+  static inline M eq    (V a,V b)          { return _mm512_cmp_pd_mask(a,b,_CMP_EQ_OQ); }
+  static inline M mor   (M a,M b)          { return a|b; }
+  static inline M mand  (M a,M b)          { return a&b; }
+  static inline M mxor  (M a,M b)          { return a^b; }
+  static inline bool allof (M m)           { return m == 0xFF; }
+  static inline V select (M m,V a,V b)     { return _mm512_mask_blend_pd(m,b,a); }
+  static inline V negif (M m,V x)
+  {
+    __m512i xi = _mm512_castpd_si512(x);
+    return _mm512_castsi512_pd(_mm512_mask_xor_epi64(xi,m,xi,
+        _mm512_set1_epi64(0x8000000000000000LL)));
+  }
+  static inline V xorsign (V x,V s)
+  {
+    return _mm512_castsi512_pd(_mm512_xor_epi64(_mm512_castpd_si512(x),
+        _mm512_and_epi64(_mm512_castpd_si512(s),_mm512_set1_epi64(0x8000000000000000LL))));
+  }
+
+  static inline V ldexp (V x,V n)
+  { return _mm512_scalef_pd(x,n); }
+
+  static inline V dupcomplex (const double *p)
+  { return _mm512_set4_pd(p[1],p[0],p[1],p[0]); }
+
+  static inline V real2complex (const double *p)
+  {
+    __m256d r = _mm256_loadu_pd(p);
+    return _mm512_permutexvar_pd(_mm512_set_epi64(3,3,2,2,1,1,0,0),
+                                 _mm512_castpd256_pd512(r));
+  }
+
+  static inline V cmul (V a,V b)
+  {
+    V t1 = _mm512_mul_pd(a,_mm512_movedup_pd(b));
+    V t2 = _mm512_mul_pd(_mm512_permute_pd(a,0x55),_mm512_permute_pd(b,0xFF));
+    // negate t2 in the real lanes, then add: same as addsub
+    __m512i ti = _mm512_castpd_si512(t2);
+    t2 = _mm512_castsi512_pd(_mm512_mask_xor_epi64(ti,0x55,ti,
+        _mm512_set1_epi64(0x8000000000000000LL)));
+    return _mm512_add_pd(t1,t2);
+  }
+
+  static inline void interleave (V re,V im,double *p)
+  {
+    _mm512_storeu_pd(p,_mm512_permutex2var_pd(re,
+        _mm512_set_epi64(11,3,10,2,9,1,8,0),im));
+    _mm512_storeu_pd(p+8,_mm512_permutex2var_pd(re,
+        _mm512_set_epi64(15,7,14,6,13,5,12,4),im));
+  }
+
+  static inline void deinterleave (const double *p,V &re,V &im)
+  {
+    V a = _mm512_loadu_pd(p);
+    V b = _mm512_loadu_pd(p+8);
+    re = _mm512_permutex2var_pd(a,_mm512_set_epi64(14,12,10,8,6,4,2,0),b);
+    im = _mm512_permutex2var_pd(a,_mm512_set_epi64(15,13,11,9,7,5,3,1),b);
+  }
+
+  #include "VellsKernelsImpl.h"
+};
+
+#pragma GCC pop_options
+
+#endif
+
+static KernelTable tables_[3];
+static InstructionSet isa_ = ISA_SCALAR;
+
+KernelTable kernels;
+
+// builds the tables and selects the best instruction set at startup. The
+// MEQ_VELLS_ISA environment variable (scalar, avx2, avx512) can be used to
+// select a lower one.
+static bool initTables ()
+{
+  // tables_[ISA_SCALAR] stays all null
+#ifdef VELLS_KERNELS_SIMD
+  AVX2::fillTable(tables_[ISA_AVX2]);
+  AVX512::fillTable(tables_[ISA_AVX512]);
+#endif
+  InstructionSet best = detectISA();
+  const char *env = getenv("MEQ_VELLS_ISA");
+  if( env )
+  {
+    for( int i=0; i<=int(best); i++ )
+      if( !strcasecmp(env,isaName(InstructionSet(i))) )
+        best = InstructionSet(i);
+  }
+  setISA(best);
+  return true;
+}
+
+InstructionSet detectISA ()
+{
+#ifdef VELLS_KERNELS_SIMD
+  __builtin_cpu_init();
+  if( __builtin_cpu_supports("avx512f") )
+    return ISA_AVX512;
+  if( __builtin_cpu_supports("avx2") )
+    return ISA_AVX2;
+#endif
+  return ISA_SCALAR;
+}
+
+const KernelTable & kernelTable (InstructionSet isa)
+{
+  return tables_[isa];
+}
+
+InstructionSet isa ()
+{
+  return isa_;
+}
+
+InstructionSet setISA (InstructionSet isa)
+{
+  InstructionSet best = detectISA();
+  if( int(isa) > int(best) )
+    isa = best;
+  if( int(isa) < 0 )
+    isa = ISA_SCALAR;
+  isa_ = isa;
+  kernels = tables_[isa];
+  return isa;
+}
+
+const char * isaName (InstructionSet isa)
+{
+  switch( isa )
+  {
+    case ISA_AVX2:    return "avx2";
+    case ISA_AVX512:  return "avx512";
+    default:          return "scalar";
+  }
+}
+
+static bool init_ = initTables();
+
+};
+
+};
@@ -0,0 +1,102 @@
+//
+//% $Id$
+//
+//
+// Copyright (C) 2002-2007
+// The MeqTree Foundation &
+// ASTRON (Netherlands Foundation for Research in Astronomy)
+// P.O.Box 2, 7990 AA Dwingeloo, The Netherlands
+//
+// This program is free software; you can redistribute it and/or modify
+// it under the terms of the GNU General Public License as published by
+// the Free Software Foundation; either version 2 of the License, or
+// (at your option) any later version.
+//
+// This program is distributed in the hope that it will be useful,
+// but WITHOUT ANY WARRANTY; without even the implied warranty of
+// MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+// GNU General Public License for more details.
+//
+// You should have received a copy of the GNU General Public License
+// along with this program; if not, see <http://www.gnu.org/licenses/>,
+// or write to the Free Software Foundation, Inc.,
+// 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+//
+#ifndef MEQ_VELLSKERNELS_H
+#define MEQ_VELLSKERNELS_H
+
+#include <stddef.h>
+
+namespace Meq
+{
+
+// Vectorized element-wise kernels for the hot Vells operations. All
+// kernels work on contiguous arrays of n elements; complex arrays are
+// stored as interleaved (re,im) pairs of doubles. The output may be the
+// same array as one of the inputs.
+//
+// The kernel set is chosen at startup from the instruction sets supported
+// by the CPU (AVX-512, AVX2). The scalar set has no kernels at all, in
+// which case Vells falls back to its templated loops.
+//
+// Add, subtract, multiply, divide and sqrt give results bit-identical to
+// the scalar code. exp, sin, cos and polar use polynomial
+// approximations good to a couple of ulps, and fall back to the libm
+// functions for arguments outside the range where these hold.
+namespace VellsKernels
+{
+  typedef enum
+  {
+    ISA_SCALAR  = 0,
+    ISA_AVX2    = 1,
+    ISA_AVX512  = 2
+  } InstructionSet;
+
+  // binary kernel: y = a OP b. A stride of 0 (sa, sb) means the operand
+  // is a scalar, and a[0] (or b[0]) is used for all elements.
+  typedef void (*BinaryKernel)(double *y,const double *a,int sa,
+                               const double *b,int sb,size_t n);
+
+  // unary kernel: y = FUNC(x)
+  typedef void (*UnaryKernel)(double *y,const double *x,size_t n);
+
+  class KernelTable
+  {
+    public:
+      // real arithmetic
+      BinaryKernel add_dd,sub_dd,mul_dd,div_dd;
+      // complex arithmetic
+      BinaryKernel add_cc,sub_cc,mul_cc,div_cc;
+      // real*complex and complex*real
+      BinaryKernel mul_dc,mul_cd;
+      // polar(amplitude,phase) = amplitude*exp(i*phase), real inputs
+      BinaryKernel polar;
+      // real functions
+      UnaryKernel sqrt_d,exp_d,sin_d,cos_d;
+      // complex exponent
+      UnaryKernel exp_c;
+  };
+
+  // the current kernel set
+  extern KernelTable kernels;
+
+  // returns the kernel set of the given instruction set (all null for
+  // ISA_SCALAR, or if not compiled in)
+  const KernelTable & kernelTable (InstructionSet isa);
+
+  // best instruction set supported by both the CPU and the build
+  InstructionSet detectISA ();
+
+  // currently selected instruction set
+  InstructionSet isa ();
+
+  // selects the kernel set for the given instruction set, or the best
+  // supported one below it. Returns the instruction set actually selected.
+  InstructionSet setISA (InstructionSet isa);
+
+  const char * isaName (InstructionSet isa);
+};
+
+};
+
+#endif
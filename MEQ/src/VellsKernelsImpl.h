@@ -0,0 +1,519 @@
+//
+//% $Id$
+//
+//
+// Copyright (C) 2002-2007
+// The MeqTree Foundation &
+// ASTRON (Netherlands Foundation for Research in Astronomy)
+// P.O.Box 2, 7990 AA Dwingeloo, The Netherlands
+//
+// This program is free software; you can redistribute it and/or modify
+// it under the terms of the GNU General Public License as published by
+// the Free Software Foundation; either version 2 of the License, or
+// (at your option) any later version.
+//
+// This program is distributed in the hope that it will be useful,
+// but WITHOUT ANY WARRANTY; without even the implied warranty of
+// MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+// GNU General Public License for more details.
+//
+// You should have received a copy of the GNU General Public License
+// along with this program; if not, see <http://www.gnu.org/licenses/>,
+// or write to the Free Software Foundation, Inc.,
+// 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+//
+
+// Instruction-set independent part of the vectorized Vells kernels.
+// This file is included by VellsKernels.cc once per instruction set, inside
+// a namespace that defines the vector type V (W doubles), the mask type M,
+// and the primitive operations on them (load, store, add, ...). Not to be
+// included anywhere else.
+
+// ---------------------------------------------------------------------
+// binary kernels
+// ---------------------------------------------------------------------
+class OpAdd
+{
+  public:
+    static V vec (V a,V b)             { return add(a,b); }
+    static double sca (double a,double b) { return a+b; }
+};
+
+class OpSub
+{
+  public:
+    static V vec (V a,V b)             { return sub(a,b); }
+    static double sca (double a,double b) { return a-b; }
+};
+
+class OpMul
+{
+  public:
+    static V vec (V a,V b)             { return mul(a,b); }
+    static double sca (double a,double b) { return a*b; }
+};
+
+class OpDiv
+{
+  public:
+    static V vec (V a,V b)             { return div(a,b); }
+    static double sca (double a,double b) { return a/b; }
+};
+
+// y = a OP b over n doubles
+template<class Op>
+static void binary_dd (double *y,const double *a,int sa,const double *b,int sb,size_t n)
+{
+  size_t i=0;
+  if( sa && sb )
+    for( ; i+W<=n; i+=W )
+      store(y+i,Op::vec(load(a+i),load(b+i)));
+  else if( sa )
+  {
+    V vb = set1(*b);
+    for( ; i+W<=n; i+=W )
+      store(y+i,Op::vec(load(a+i),vb));
+  }
+  else if( sb )
+  {
+    V va = set1(*a);
+    for( ; i+W<=n; i+=W )
+      store(y+i,Op::vec(va,load(b+i)));
+  }
+  for( ; i<n; i++ )
+    y[i] = Op::sca(a[sa*i],b[sb*i]);
+}
+
+// complex add/subtract is real add/subtract over 2n doubles, with scalar
+// operands broadcast as (re,im) pairs
+template<class Op>
+static void binary_cc (double *y,const double *a,int sa,const double *b,int sb,size_t n)
+{
+  if( sa && sb )
+  {
+    binary_dd<Op>(y,a,1,b,1,2*n);
+    return;
+  }
+  size_t i=0;
+  if( sa )
+  {
+    V vb = dupcomplex(b);
+    for( ; 2*i+W<=2*n; i+=W/2 )
+      store(y+2*i,Op::vec(load(a+2*i),vb));
+  }
+  else if( sb )
+  {
+    V va = dupcomplex(a);
+    for( ; 2*i+W<=2*n; i+=W/2 )
+      store(y+2*i,Op::vec(va,load(b+2*i)));
+  }
+  for( ; i<n; i++ )
+  {
+    const double *pa = a+2*sa*i, *pb = b+2*sb*i;
+    y[2*i]   = Op::sca(pa[0],pb[0]);
+    y[2*i+1] = Op::sca(pa[1],pb[1]);
+  }
+}
+
+static void add_dd (double *y,const double *a,int sa,const double *b,int sb,size_t n)
+{ binary_dd<OpAdd>(y,a,sa,b,sb,n); }
+static void sub_dd (double *y,const double *a,int sa,const double *b,int sb,size_t n)
+{ binary_dd<OpSub>(y,a,sa,b,sb,n); }
+static void mul_dd (double *y,const double *a,int sa,const double *b,int sb,size_t n)
+{ binary_dd<OpMul>(y,a,sa,b,sb,n); }
+static void div_dd (double *y,const double *a,int sa,const double *b,int sb,size_t n)
+{ binary_dd<OpDiv>(y,a,sa,b,sb,n); }
+static void add_cc (double *y,const double *a,int sa,const double *b,int sb,size_t n)
+{ binary_cc<OpAdd>(y,a,sa,b,sb,n); }
+static void sub_cc (double *y,const double *a,int sa,const double *b,int sb,size_t n)
+{ binary_cc<OpSub>(y,a,sa,b,sb,n); }
+
+// complex multiply, evaluated as (ar*br-ai*bi,ai*br+ar*bi) like the
+// scalar code
+static void mul_cc (double *y,const double *a,int sa,const double *b,int sb,size_t n)
+{
+  size_t i=0;
+  if( sa && sb )
+    for( ; 2*i+W<=2*n; i+=W/2 )
+      store(y+2*i,cmul(load(a+2*i),load(b+2*i)));
+  else if( sa )
+  {
+    V vb = dupcomplex(b);
+    for( ; 2*i+W<=2*n; i+=W/2 )
+      store(y+2*i,cmul(load(a+2*i),vb));
+  }
+  else if( sb )
+  {
+    V va = dupcomplex(a);
+    for( ; 2*i+W<=2*n; i+=W/2 )
+      store(y+2*i,cmul(va,load(b+2*i)));
+  }
+  for( ; i<n; i++ )
+  {
+    const double *pa = a+2*sa*i, *pb = b+2*sb*i;
+    double re = pa[0]*pb[0] - pa[1]*pb[1];
+    double im = pa[1]*pb[0] + pa[0]*pb[1];
+    y[2*i] = re;
+    y[2*i+1] = im;
+  }
+}
+
+// real a times complex b
+static void mul_dc (double *y,const double *a,int sa,const double *b,int sb,size_t n)
+{
+  size_t i=0;
+  if( sa && sb )
+    for( ; 2*i+W<=2*n; i+=W/2 )
+      store(y+2*i,mul(real2complex(a+i),load(b+2*i)));
+  else if( sa )
+  {
+    V vb = dupcomplex(b);
+    for( ; 2*i+W<=2*n; i+=W/2 )
+      store(y+2*i,mul(real2complex(a+i),vb));
+  }
+  else if( sb )
+  {
+    V va = set1(*a);
+    for( ; 2*i+W<=2*n; i+=W/2 )
+      store(y+2*i,mul(va,load(b+2*i)));
+  }
+  for( ; i<n; i++ )
+  {
+    double ar = a[sa*i];
+    const double *pb = b+2*sb*i;
+    y[2*i]   = ar*pb[0];
+    y[2*i+1] = ar*pb[1];
+  }
+}
+
+// complex a times real b: the per-component products commute exactly
+static void mul_cd (double *y,const double *a,int sa,const double *b,int sb,size_t n)
+{ mul_dc(y,b,sb,a,sa,n); }
+
+// Complex divide. This has to give the same results as the compiler's own
+// complex division (libgcc's __divdc3), which is Smith's algorithm plus
+// scaling and special cases for very large, very small and non-finite
+// operands. When every part of both operands is either zero or within
+// [DivMinArg,DivMaxArg], no intermediate result over- or underflows, any
+// scaling is by a power of two and thus exact, and none of the special
+// cases apply, so plain Smith's algorithm gives the same bits. Blocks with
+// any other operand are left to the compiler.
+static const double DivMinArg = 1e-60;
+static const double DivMaxArg = 1e+60;
+
+// returns mask of elements that are zero or within [DivMinArg,DivMaxArg]
+static inline M divArgOk (V x)
+{
+  V ax = vabs(x);
+  return mor(eq(x,set1(0.)),mand(lt(set1(DivMinArg),ax),lt(ax,set1(DivMaxArg))));
+}
+
+// y = a/b for one complex element, by the compiler
+static inline void cdiv1 (double *y,const double *a,const double *b)
+{
+  __complex__ double za,zb,zy;
+  __real__ za = a[0]; __imag__ za = a[1];
+  __real__ zb = b[0]; __imag__ zb = b[1];
+  zy = za/zb;
+  y[0] = __real__ zy;
+  y[1] = __imag__ zy;
+}
+
+static void div_cc (double *y,const double *a,int sa,const double *b,int sb,size_t n)
+{
+  // scalar operands are broadcast once, others are loaded per block
+  V ar = set1(a[0]), ai = set1(a[1]), br = set1(b[0]), bi = set1(b[1]);
+  size_t i=0;
+  for( ; i+W<=n; i+=W )
+  {
+    if( sa )
+      deinterleave(a+2*i,ar,ai);
+    if( sb )
+      deinterleave(b+2*i,br,bi);
+    // the larger part of b is p, the smaller q
+    M swap = lt(vabs(br),vabs(bi));
+    V p = select(swap,bi,br), q = select(swap,br,bi);
+    M ok = mand(mand(divArgOk(ar),divArgOk(ai)),mand(divArgOk(br),divArgOk(bi)));
+    if( !allof(mand(ok,lt(set1(0.),vabs(p)))) )
+    {
+      for( size_t k=i; k<i+W; k++ )
+        cdiv1(y+2*k,a+2*sa*k,b+2*sb*k);
+      continue;
+    }
+    V ratio = div(q,p);
+    V denom = add(mul(q,ratio),p);
+    V yr = div(add(mul(select(swap,ar,ai),ratio),select(swap,ai,ar)),denom);
+    V yi = div(select(swap,sub(mul(ai,ratio),ar),sub(ai,mul(ar,ratio))),denom);
+    interleave(yr,yi,y+2*i);
+  }
+  for( ; i<n; i++ )
+    cdiv1(y+2*i,a+2*sa*i,b+2*sb*i);
+}
+
+// ---------------------------------------------------------------------
+// transcendental functions
+// ---------------------------------------------------------------------
+// sin/cos follow the Cephes library: reduction modulo pi/4 with a 3-part
+// extended-precision pi/4, then minimax polynomials on [-pi/4,pi/4].
+// Reduction is accurate as long as |x| < SinCosMaxArg; beyond that,
+// (and for NaNs and Infs) the libm functions are used.
+static const double SinCosMaxArg = 1e+8;
+static const double FOPI = 1.27323954473516268615;   // 4/pi
+static const double DP1 = 7.85398125648498535156E-1;
+static const double DP2 = 3.77489470793079817668E-8;
+static const double DP3 = 2.69515142907905952645E-15;
+
+static inline V polySin (V z,V zz)
+{
+  V p = set1(1.58962301576546568060E-10);
+  p = add(mul(p,zz),set1(-2.50507477628578072866E-8));
+  p = add(mul(p,zz),set1(2.75573136213857245213E-6));
+  p = add(mul(p,zz),set1(-1.98412698295895385996E-4));
+  p = add(mul(p,zz),set1(8.33333333332211858878E-3));
+  p = add(mul(p,zz),set1(-1.66666666666666307295E-1));
+  return add(z,mul(mul(z,zz),p));
+}
+
+static inline V polyCos (V zz)
+{
+  V p = set1(-1.13585365213876817300E-11);
+  p = add(mul(p,zz),set1(2.08757008419747316778E-9));
+  p = add(mul(p,zz),set1(-2.75573141792967388112E-7));
+  p = add(mul(p,zz),set1(2.48015872888517045348E-5));
+  p = add(mul(p,zz),set1(-1.38888888888730564116E-3));
+  p = add(mul(p,zz),set1(4.16666666666665929218E-2));
+  return add(sub(set1(1.),mul(set1(.5),zz)),mul(mul(zz,zz),p));
+}
+
+// computes sin and cos of W values. Returns false (without touching s
+// and c) if any value is out of range
+static inline bool vsincos (V x,V &s,V &c)
+{
+  V ax = vabs(x);
+  if( !allof(lt(ax,set1(SinCosMaxArg))) )
+    return false;
+  // octant, rounded up to an even number
+  V j = vfloor(mul(ax,set1(FOPI)));
+  j = add(j,sub(j,mul(set1(2.),vfloor(mul(j,set1(.5))))));
+  V z = sub(sub(sub(ax,mul(j,set1(DP1))),mul(j,set1(DP2))),mul(j,set1(DP3)));
+  V zz = mul(z,z);
+  V ps = polySin(z,zz);
+  V pc = polyCos(zz);
+  // j mod 8 is one of 0,2,4,6
+  V j8 = sub(j,mul(set1(8.),vfloor(mul(j,set1(.125)))));
+  M swap = mor(eq(j8,set1(2.)),eq(j8,set1(6.)));
+  M upper = lt(set1(3.),j8);
+  s = xorsign(negif(upper,select(swap,pc,ps)),x);
+  c = negif(mxor(upper,swap),select(swap,ps,pc));
+  return true;
+}
+
+// exp() follows the Cephes library: reduction modulo ln2, then a Pade
+// approximation. Used for |x| < ExpMaxArg, libm beyond that.
+static const double ExpMaxArg = 700;
+static const double LOG2E = 1.4426950408889634073599;
+static const double C1 = 6.93145751953125E-1;
+static const double C2 = 1.42860682030941723212E-6;
+
+static inline bool vexp (V x,V &y)
+{
+  if( !allof(lt(vabs(x),set1(ExpMaxArg))) )
+    return false;
+  V px = vfloor(add(mul(x,set1(LOG2E)),set1(.5)));
+  x = sub(sub(x,mul(px,set1(C1))),mul(px,set1(C2)));
+  V xx = mul(x,x);
+  V p = set1(1.26177193074810590878E-4);
+  p = add(mul(p,xx),set1(3.02994407707441961300E-2));
+  p = add(mul(p,xx),set1(9.99999999999999999910E-1));
+  p = mul(p,x);
+  V q = set1(3.00198505138664455042E-6);
+  q = add(mul(q,xx),set1(2.52448340349684104192E-3));
+  q = add(mul(q,xx),set1(2.27265548208155028766E-1));
+  q = add(mul(q,xx),set1(2.00000000000000000009E0));
+  x = div(p,sub(q,p));
+  x = add(set1(1.),mul(set1(2.),x));
+  y = ldexp(x,px);
+  return true;
+}
+
+// Applies a vector function over n doubles: full vectors are done in
+// place, the tail is padded out to a vector. Vectors for which the
+// function fails (argument out of range) are done by the scalar function.
+template<class Func>
+static void unary_d (double *y,const double *x,size_t n)
+{
+  size_t i=0;
+  V v;
+  for( ; i+W<=n; i+=W )
+  {
+    if( Func::vec(load(x+i),v) )
+      store(y+i,v);
+    else
+      for( size_t k=i; k<i+W; k++ )
+        y[k] = Func::sca(x[k]);
+  }
+  if( i<n )
+  {
+    double tmp[W];
+    for( size_t k=0; k<W; k++ )
+      tmp[k] = i+k<n ? x[i+k] : 0;
+    if( Func::vec(load(tmp),v) )
+      store(tmp,v);
+    else
+      for( size_t k=0; k<W; k++ )
+        tmp[k] = Func::sca(tmp[k]);
+    for( size_t k=0; i<n; i++,k++ )
+      y[i] = tmp[k];
+  }
+}
+
+class FuncSqrt
+{
+  public:
+    static bool vec (V x,V &y)  { y = vsqrt(x); return true; }
+    static double sca (double x) { return std::sqrt(x); }
+};
+
+class FuncExp
+{
+  public:
+    static bool vec (V x,V &y)  { return vexp(x,y); }
+    static double sca (double x) { return std::exp(x); }
+};
+
+class FuncSin
+{
+  public:
+    static bool vec (V x,V &y)  { V c; return vsincos(x,y,c); }
+    static double sca (double x) { return std::sin(x); }
+};
+
+class FuncCos
+{
+  public:
+    static bool vec (V x,V &y)  { V s; return vsincos(x,s,y); }
+    static double sca (double x) { return std::cos(x); }
+};
+
+static void sqrt_d (double *y,const double *x,size_t n)
+{ unary_d<FuncSqrt>(y,x,n); }
+static void exp_d (double *y,const double *x,size_t n)
+{ unary_d<FuncExp>(y,x,n); }
+static void sin_d (double *y,const double *x,size_t n)
+{ unary_d<FuncSin>(y,x,n); }
+static void cos_d (double *y,const double *x,size_t n)
+{ unary_d<FuncCos>(y,x,n); }
+
+// amp*exp(i*phase) for a block of W phases and amplitudes, written out
+// as W interleaved complex values. amp==0 means amplitude 1.
+static inline void polarBlock (double *y,const double *amp,int samp,const double *phase)
+{
+  V s,c;
+  if( vsincos(load(phase),s,c) )
+  {
+    if( amp )
+    {
+      V va = samp ? load(amp) : set1(*amp);
+      s = mul(va,s);
+      c = mul(va,c);
+    }
+    interleave(c,s,y);
+  }
+  else
+    for( size_t k=0; k<W; k++ )
+    {
+      double a = amp ? amp[samp*k] : 1;
+      y[2*k]   = a*std::cos(phase[k]);
+      y[2*k+1] = a*std::sin(phase[k]);
+    }
+}
+
+static void polar_n (double *y,const double *amp,int samp,const double *phase,int sphase,size_t n)
+{
+  // scalar phase: compute once and broadcast
+  if( !sphase )
+  {
+    double c = std::cos(*phase), s = std::sin(*phase);
+    if( amp )
+    {
+      const double cs[2] = { c,s };
+      mul_dc(y,amp,samp,cs,0,n);
+    }
+    else
+      for( size_t i=0; i<n; i++ )
+      {
+        y[2*i] = c;
+        y[2*i+1] = s;
+      }
+    return;
+  }
+  size_t i=0;
+  for( ; i+W<=n; i+=W )
+    polarBlock(y+2*i,amp ? amp+samp*i : 0,samp,phase+i);
+  if( i<n )
+  {
+    double ph[W],am[W],tmp[2*W];
+    for( size_t k=0; k<W; k++ )
+    {
+      ph[k] = i+k<n ? phase[i+k] : 0;
+      am[k] = amp && i+k<n ? amp[samp*(i+k)] : 1;
+    }
+    polarBlock(tmp,am,1,ph);
+    for( size_t k=0; i<n; i++,k++ )
+    {
+      y[2*i] = tmp[2*k];
+      y[2*i+1] = tmp[2*k+1];
+    }
+  }
+}
+
+// a unit scalar amplitude (i.e. exp(i*phase)) is common enough to skip
+// the multiply for
+static void polar (double *y,const double *a,int sa,const double *b,int sb,size_t n)
+{ polar_n(y,!sa && *a == 1 ? 0 : a,sa,b,sb,n); }
+
+// exp(re+i*im) = exp(re)*(cos(im)+i*sin(im))
+static void exp_c (double *y,const double *x,size_t n)
+{
+  size_t i=0;
+  for( ; 2*i+2*W<=2*n; i+=W )
+  {
+    V re,im,e,s,c;
+    deinterleave(x+2*i,re,im);
+    if( vexp(re,e) && vsincos(im,s,c) )
+      interleave(mul(e,c),mul(e,s),y+2*i);
+    else
+      for( size_t k=i; k<i+W; k++ )
+      {
+        double e = std::exp(x[2*k]), ph = x[2*k+1];
+        y[2*k]   = e*std::cos(ph);
+        y[2*k+1] = e*std::sin(ph);
+      }
+  }
+  for( ; i<n; i++ )
+  {
+    double e = std::exp(x[2*i]), ph = x[2*i+1];
+    y[2*i]   = e*std::cos(ph);
+    y[2*i+1] = e*std::sin(ph);
+  }
+}
+
+static void fillTable (KernelTable &tab)
+{
+  tab.add_dd = add_dd;
+  tab.sub_dd = sub_dd;
+  tab.mul_dd = mul_dd;
+  tab.div_dd = div_dd;
+  tab.add_cc = add_cc;
+  tab.sub_cc = sub_cc;
+  tab.mul_cc = mul_cc;
+  tab.div_cc = div_cc;
+  tab.mul_dc = mul_dc;
+  tab.mul_cd = mul_cd;
+  tab.polar  = polar;
+  tab.sqrt_d = sqrt_d;
+  tab.exp_d  = exp_d;
+  tab.sin_d  = sin_d;
+  tab.cos_d  = cos_d;
+  tab.exp_c  = exp_c;
+}
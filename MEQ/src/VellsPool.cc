@@ -0,0 +1,269 @@
+//
+//% $Id$
+//
+//
+// Copyright (C) 2002-2007
+// The MeqTree Foundation &
+// ASTRON (Netherlands Foundation for Research in Astronomy)
+// P.O.Box 2, 7990 AA Dwingeloo, The Netherlands
+//
+// This program is free software; you can redistribute it and/or modify
+// it under the terms of the GNU General Public License as published by
+// the Free Software Foundation; either version 2 of the License, or
+// (at your option) any later version.
+//
+// This program is distributed in the hope that it will be useful,
+// but WITHOUT ANY WARRANTY; without even the implied warranty of
+// MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+// GNU General Public License for more details.
+//
+// You should have received a copy of the GNU General Public License
+// along with this program; if not, see <http://www.gnu.org/licenses/>,
+// or write to the Free Software Foundation, Inc.,
+// 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+//
+
+#include "VellsPool.h"
+#include "Vells.h"
+#include <DMI/NumArray.h>
+#include <algorithm>
+
+namespace Meq
+{
+
+// the pool is never deleted, since Vells may well be released during
+// static destruction
+static VellsPool *pool_ = 0;
+
+VellsPool & VellsPool::instance ()
+{
+  if( !pool_ )
+    pool_ = new VellsPool;
+  return *pool_;
+}
+
+void VellsPool::install ()
+{
+  DMI::NumArray::setBlockAllocator(TpMeqVells,&instance());
+}
+
+VellsPool::VellsPool ()
+  : thread_cache_(releaseThreadCache),
+    enabled_(true),limit_(0),generation_(0),
+    num_allocs_(0),num_frees_(0),num_hits_(0),num_misses_(0),num_trims_(0),
+    pooled_bytes_(0),pooled_blocks_(0),live_bytes_(0)
+{
+}
+
+// Size classes are the multiples of 1/8th of the enclosing power of two,
+// so no more than 12.5% of a block is ever wasted. Vells of the same shape
+// and type always fall into the same class.
+size_t VellsPool::classSize (size_t size)
+{
+  size_t pow2 = MinPooledSize;
+  while( pow2 <= size/2 )
+    pow2 <<= 1;
+  size_t step = pow2/8;
+  return (size+step-1)/step*step;
+}
+
+VellsPool::ThreadCache & VellsPool::threadCache ()
+{
+  ThreadCache *ptc = static_cast<ThreadCache*>(thread_cache_.get());
+  if( !ptc )
+  {
+    ptc = new ThreadCache(generation_);
+    thread_cache_.set(ptc);
+  }
+  else if( ptc->generation != generation_ )
+    flushThreadCache(*ptc);
+  return *ptc;
+}
+
+void VellsPool::flushThreadCache (ThreadCache &tc)
+{
+  tc.generation = generation_;
+  for( FreeLists::iterator iter = tc.lists.begin(); iter != tc.lists.end(); iter++ )
+  {
+    size_t sz = iter->first;
+    FreeList &list = iter->second;
+    for( uint i=0; i<list.size(); i++ )
+    {
+      delete [] static_cast<char*>(list[i]);
+      __sync_sub_and_fetch(&pooled_bytes_,long(sz));
+      __sync_sub_and_fetch(&pooled_blocks_,1);
+      __sync_add_and_fetch(&num_trims_,1);
+    }
+    list.clear();
+  }
+  tc.bytes = 0;
+}
+
+void VellsPool::releaseThreadCache (void *pcache)
+{
+  ThreadCache *ptc = static_cast<ThreadCache*>(pcache);
+  VellsPool &pool = instance();
+  Thread::Mutex::Lock lock(pool.mutex_);
+  for( FreeLists::iterator iter = ptc->lists.begin(); iter != ptc->lists.end(); iter++ )
+  {
+    size_t sz = iter->first;
+    FreeList &list = iter->second;
+    for( uint i=0; i<list.size(); i++ )
+    {
+      __sync_sub_and_fetch(&pool.pooled_bytes_,long(sz));
+      __sync_sub_and_fetch(&pool.pooled_blocks_,1);
+      pool.releaseShared(list[i],sz);
+    }
+  }
+  delete ptc;
+}
+
+void * VellsPool::allocate (size_t size)
+{
+  __sync_add_and_fetch(&num_allocs_,1);
+  if( size < MinPooledSize )
+  {
+    __sync_add_and_fetch(&live_bytes_,long(size));
+    return new char[size];
+  }
+  size_t sz = classSize(size);
+  __sync_add_and_fetch(&live_bytes_,long(sz));
+  if( enabled_ )
+  {
+    void *block = 0;
+    // try our own cache first
+    ThreadCache &tc = threadCache();
+    FreeLists::iterator iter = tc.lists.find(sz);
+    if( iter != tc.lists.end() && !iter->second.empty() )
+    {
+      block = iter->second.back();
+      iter->second.pop_back();
+      tc.bytes -= sz;
+    }
+    // else try the shared pool
+    else
+    {
+      Thread::Mutex::Lock lock(mutex_);
+      iter = shared_.find(sz);
+      if( iter != shared_.end() && !iter->second.empty() )
+      {
+        block = iter->second.back();
+        iter->second.pop_back();
+      }
+    }
+    if( block )
+    {
+      __sync_sub_and_fetch(&pooled_bytes_,long(sz));
+      __sync_sub_and_fetch(&pooled_blocks_,1);
+      __sync_add_and_fetch(&num_hits_,1);
+      return block;
+    }
+  }
+  __sync_add_and_fetch(&num_misses_,1);
+  return new char[sz];
+}
+
+void VellsPool::release (void *block,size_t size)
+{
+  __sync_add_and_fetch(&num_frees_,1);
+  if( size < MinPooledSize )
+  {
+    __sync_sub_and_fetch(&live_bytes_,long(size));
+    delete [] static_cast<char*>(block);
+    return;
+  }
+  size_t sz = classSize(size);
+  __sync_sub_and_fetch(&live_bytes_,long(sz));
+  if( !enabled_ )
+  {
+    delete [] static_cast<char*>(block);
+    return;
+  }
+  // keep in our own cache if there's room. The thread caches count
+  // towards the limit as well
+  ThreadCache &tc = threadCache();
+  FreeList &list = tc.lists[sz];
+  if( list.size() < ThreadCacheDepth && tc.bytes + sz <= ThreadCacheBytes &&
+      ( limit_ <= 0 || double(pooled_bytes_+long(sz)) <= limit_ ) )
+  {
+    list.push_back(block);
+    tc.bytes += sz;
+    __sync_add_and_fetch(&pooled_bytes_,long(sz));
+    __sync_add_and_fetch(&pooled_blocks_,1);
+    return;
+  }
+  Thread::Mutex::Lock lock(mutex_);
+  releaseShared(block,sz);
+}
+
+void VellsPool::releaseShared (void *block,size_t sz)
+{
+  if( !enabled_ || ( limit_ > 0 && double(pooled_bytes_+long(sz)) > limit_ ) )
+  {
+    __sync_add_and_fetch(&num_trims_,1);
+    delete [] static_cast<char*>(block);
+    return;
+  }
+  shared_[sz].push_back(block);
+  __sync_add_and_fetch(&pooled_bytes_,long(sz));
+  __sync_add_and_fetch(&pooled_blocks_,1);
+}
+
+void VellsPool::trimShared (double limit)
+{
+  for( FreeLists::iterator iter = shared_.begin(); iter != shared_.end(); iter++ )
+  {
+    FreeList &list = iter->second;
+    while( !list.empty() && pooled_bytes_ > limit )
+    {
+      delete [] static_cast<char*>(list.back());
+      list.pop_back();
+      __sync_sub_and_fetch(&pooled_bytes_,long(iter->first));
+      __sync_sub_and_fetch(&pooled_blocks_,1);
+      __sync_add_and_fetch(&num_trims_,1);
+    }
+  }
+}
+
+void VellsPool::enable (bool enable)
+{
+  enabled_ = enable;
+  if( !enable )
+    trim();
+}
+
+void VellsPool::setLimit (double nbytes)
+{
+  Thread::Mutex::Lock lock(mutex_);
+  limit_ = std::max(nbytes,0.);
+  if( limit_ > 0 )
+  {
+    trimShared(limit_);
+    // what's left over the limit is in thread caches
+    if( double(pooled_bytes_) > limit_ )
+      __sync_add_and_fetch(&generation_,1);
+  }
+}
+
+void VellsPool::trim ()
+{
+  Thread::Mutex::Lock lock(mutex_);
+  trimShared(0);
+  __sync_add_and_fetch(&generation_,1);
+}
+
+void VellsPool::fillStats (DMI::Record &rec) const
+{
+  rec[AidEnabled] = enabled_;
+  rec[AidLimit]   = limit_;
+  rec[AidAllocs]  = double(num_allocs_);
+  rec[AidFrees]   = double(num_frees_);
+  rec[AidHits]    = double(num_hits_);
+  rec[AidMisses]  = double(num_misses_);
+  rec[AidTrims]   = double(num_trims_);
+  rec[AidBytes]   = double(pooled_bytes_);
+  rec[AidBlocks]  = int(pooled_blocks_);
+  rec[AidLive]    = double(live_bytes_);
+}
+
+} // namespace Meq
@@ -0,0 +1,158 @@
+//
+//% $Id$
+//
+//
+// Copyright (C) 2002-2007
+// The MeqTree Foundation &
+// ASTRON (Netherlands Foundation for Research in Astronomy)
+// P.O.Box 2, 7990 AA Dwingeloo, The Netherlands
+//
+// This program is free software; you can redistribute it and/or modify
+// it under the terms of the GNU General Public License as published by
+// the Free Software Foundation; either version 2 of the License, or
+// (at your option) any later version.
+//
+// This program is distributed in the hope that it will be useful,
+// but WITHOUT ANY WARRANTY; without even the implied warranty of
+// MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+// GNU General Public License for more details.
+//
+// You should have received a copy of the GNU General Public License
+// along with this program; if not, see <http://www.gnu.org/licenses/>,
+// or write to the Free Software Foundation, Inc.,
+// 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+//
+#ifndef MEQ_VELLSPOOL_H
+#define MEQ_VELLSPOOL_H
+
+#include <TimBase/Thread/Mutex.h>
+#include <TimBase/Thread/Key.h>
+#include <DMI/SmartBlock.h>
+#include <DMI/Record.h>
+#include <map>
+#include <vector>
+
+#pragma aid Pool Limit Allocs Frees Trims Blocks Live
+
+namespace Meq
+{
+
+// VellsPool is a size-class pooled allocator for the data blocks of Vells.
+// Evaluating a tree over a tile creates and frees many identically shaped
+// (and thus identically sized) Vells, so freed blocks are kept on free
+// lists keyed by size class and handed out again on the next allocation.
+// Each thread keeps a small cache of free blocks of its own; overflow goes
+// to a shared pool. If a limit is set, blocks freed while the pooled total
+// (thread caches included) is over the limit are returned to the heap
+// (high-water trimming). Thread caches can't be emptied by another thread,
+// so trim() bumps a generation counter instead, and each thread empties its
+// cache the next time it allocates or releases a block.
+// Blocks below MinPooledSize are not worth pooling and always come from
+// the heap.
+class VellsPool : public DMI::SmartBlock::Allocator
+{
+  public:
+    // smallest block size that is pooled
+    static const size_t MinPooledSize = 1024;
+    // max number of free blocks per size class in a thread's cache
+    static const size_t ThreadCacheDepth = 16;
+    // max number of bytes in a thread's cache
+    static const size_t ThreadCacheBytes = 64<<20;
+
+    // returns the global pool, creating it on first call
+    static VellsPool & instance ();
+
+    // installs the pool as the block allocator of Vells
+    static void install ();
+
+    virtual void * allocate (size_t size);
+
+    virtual void release (void *block,size_t size);
+
+    // enables or disables pooling. When disabled, freed blocks go
+    // straight back to the heap.
+    void enable (bool enable=true);
+
+    bool enabled () const
+    { return enabled_; }
+
+    // sets the limit on pooled (i.e. free) bytes, 0 for no limit. The
+    // shared pool is trimmed immediately if over the limit; if that is not
+    // enough, thread caches are emptied as with trim().
+    void setLimit (double nbytes);
+
+    double limit () const
+    { return limit_; }
+
+    // returns all blocks in the shared pool to the heap. Thread caches are
+    // returned to the heap by their threads on their next allocate() or
+    // release().
+    void trim ();
+
+    // fills record with allocation counts and pool occupancy
+    void fillStats (DMI::Record &rec) const;
+
+  private:
+    typedef std::vector<void*> FreeList;
+    typedef std::map<size_t,FreeList> FreeLists;
+
+    // per-thread cache of free blocks
+    class ThreadCache
+    {
+      public:
+        ThreadCache (long gen)
+        : bytes(0),generation(gen)
+        {}
+
+        FreeLists lists;
+        size_t bytes;
+        // value of VellsPool::generation_ when cache was last emptied
+        long generation;
+    };
+
+    VellsPool ();
+
+    // returns size class of block
+    static size_t classSize (size_t size);
+
+    // returns cache of calling thread, creating it if needed. The cache
+    // is emptied first if trim() has been called since it was last used.
+    ThreadCache & threadCache ();
+
+    // returns all blocks in a thread cache to the heap
+    void flushThreadCache (ThreadCache &tc);
+
+    // key destructor: moves blocks of an exiting thread to the shared pool
+    static void releaseThreadCache (void *pcache);
+
+    // moves or frees block into shared pool. Caller must hold mutex_.
+    void releaseShared (void *block,size_t sz);
+
+    // frees blocks from shared pool until within limit. Caller must hold mutex_.
+    void trimShared (double limit);
+
+    mutable Thread::Mutex mutex_;
+    FreeLists shared_;
+
+    Thread::Key thread_cache_;
+
+    bool enabled_;
+    double limit_;
+
+    // incremented by trim() to tell threads to empty their caches
+    long generation_;
+
+    // stats, updated atomically
+    long num_allocs_;
+    long num_frees_;
+    long num_hits_;
+    long num_misses_;
+    long num_trims_;
+    long pooled_bytes_;
+    long pooled_blocks_;
+    long live_bytes_;
+};
+
+} // namespace Meq
+
+#endif
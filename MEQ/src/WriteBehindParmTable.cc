@@ -0,0 +1,254 @@
+//# WriteBehindParmTable.cc: writes funklets to a parm table in the background
+//#
+//# Copyright (C) 2002-2007
+//# ASTRON (Netherlands Foundation for Research in Astronomy)
+//# and The MeqTree Foundation
+//# P.O.Box 2, 7990 AA Dwingeloo, The Netherlands, seg@astron.nl
+//#
+//# This program is free software; you can redistribute it and/or modify
+//# it under the terms of the GNU General Public License as published by
+//# the Free Software Foundation; either version 2 of the License, or
+//# (at your option) any later version.
+//#
+//# This program is distributed in the hope that it will be useful,
+//# but WITHOUT ANY WARRANTY; without even the implied warranty of
+//# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+//# GNU General Public License for more details.
+//#
+//# You should have received a copy of the GNU General Public License
+//# along with this program; if not, write to the Free Software
+//# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+//#
+//# $Id$
+
+#include <MEQ/WriteBehindParmTable.h>
+#include <TimBase/Timer.h>
+
+namespace Meq
+{
+
+bool WriteBehindParmTable::enabled_ = true;
+
+WriteBehindParmTable::WriteBehindParmTable (ParmTable *table)
+  : table_(table),
+    hold_(0),nwaiting_(0),stop_(false),
+    nflush_requested_(0),nflush_done_(0),
+    nput_(0),nreplaced_(0),nwritten_(0),nbatches_(0),write_time_(0)
+{
+  writer_thread_ = Thread::create(startWriter,this);
+}
+
+WriteBehindParmTable::~WriteBehindParmTable ()
+{
+  try
+  {
+    sync();
+  }
+  catch( std::exception &exc )
+  {
+    cerr<<"Warning: failed to write out funklets to "<<name()<<": "<<exc.what()<<endl;
+  }
+  Thread::Mutex::Lock lock(cond_);
+  stop_ = true;
+  cond_.broadcast();
+  lock.release();
+  writer_thread_.join();
+  dprintf(1)("%s: %d funklets put, %d replaced while queued, %d written in %d batches, %.3fs writing\n",
+             name().c_str(),nput_,nreplaced_,nwritten_,nbatches_,write_time_);
+  delete table_;
+}
+
+string WriteBehindParmTable::makeKey (const string &parmName,const Domain &domain)
+{
+  // the parm name, plus the binary start and end of all defined axes
+  string key = parmName;
+  key += '\0';
+  for( int i=0; i<Axis::MaxAxis; i++ )
+    if( domain.isDefined(i) )
+    {
+      double se[2] = { domain.start(i),domain.end(i) };
+      key += char(i);
+      key.append(reinterpret_cast<const char*>(se),sizeof(se));
+    }
+  return key;
+}
+
+void WriteBehindParmTable::checkError ()
+{
+  if( !error_.empty() )
+  {
+    string err = error_;
+    error_ = "";
+    Throw("error writing to parm table "+name()+": "+err);
+  }
+}
+
+int WriteBehindParmTable::getFunklets (vector<Funklet::Ref> &funklets,const string& parmName,const Domain& domain)
+{
+  Thread::Mutex::Lock lock(cond_);
+  // wait for any queued funklets of this parm to be written out first.
+  // A waiting reader makes the writer go ahead even between lock() and
+  // unlock(), else this would never happen
+  std::map<string,int>::const_iterator iter;
+  while( ( iter = parm_pending_.find(parmName) ) != parm_pending_.end() && iter->second > 0 )
+  {
+    if( !nwaiting_++ )
+      cond_.broadcast();
+    cond_.wait();
+    nwaiting_--;
+  }
+  lock.release();
+  return table_->getFunklets(funklets,parmName,domain);
+}
+
+Funklet::DbId WriteBehindParmTable::putCoeff (const string& parmName,const Funklet& funklet,bool)
+{
+  Thread::Mutex::Lock lock(cond_);
+  checkError();
+  nput_++;
+  Item item;
+  item.parm = parmName;
+  item.key = makeKey(parmName,funklet.domain());
+  // queue a copy, since the caller will carry on modifying the funklet
+  item.funklet <<= static_cast<Funklet*>(funklet.clone(DMI::DEEP,0));
+  // replace a queued funklet with the same domain, or append to queue
+  std::map<string,int>::const_iterator iq = queue_index_.find(item.key);
+  if( iq != queue_index_.end() )
+  {
+    queue_[iq->second] = item;
+    nreplaced_++;
+  }
+  else
+  {
+    queue_index_[item.key] = queue_.size();
+    queue_.push_back(item);
+    parm_pending_[parmName]++;
+  }
+  if( !hold_ )
+    cond_.signal();
+  // return the DbId if known already; otherwise the writer will look it
+  // up when it writes the funklet
+  if( funklet.getDbId() >= 0 )
+    return funklet.getDbId();
+  std::map<string,Funklet::DbId>::const_iterator id = dbids_.find(item.key);
+  return id == dbids_.end() ? -1 : id->second;
+}
+
+void WriteBehindParmTable::lock ()
+{
+  Thread::Mutex::Lock lock(cond_);
+  hold_++;
+}
+
+void WriteBehindParmTable::unlock ()
+{
+  Thread::Mutex::Lock lock(cond_);
+  if( hold_ > 0 && !--hold_ )
+    cond_.broadcast();
+}
+
+void WriteBehindParmTable::flush ()
+{
+  Thread::Mutex::Lock lock(cond_);
+  checkError();
+  nflush_requested_++;
+  cond_.broadcast();
+}
+
+void WriteBehindParmTable::sync ()
+{
+  Thread::Mutex::Lock lock(cond_);
+  int target = ++nflush_requested_;
+  cond_.broadcast();
+  while( nflush_done_ < target && error_.empty() )
+    cond_.wait();
+  checkError();
+}
+
+void * WriteBehindParmTable::startWriter (void *table)
+{
+  return static_cast<WriteBehindParmTable*>(table)->runWriter();
+}
+
+void * WriteBehindParmTable::runWriter ()
+{
+  LOFAR::NSTimer timer;
+  Thread::Mutex::Lock lock(cond_);
+  while( true )
+  {
+    // flush requests and waiting readers override lock()
+    while( !stop_ && nflush_done_ == nflush_requested_ &&
+           ( queue_.empty() || ( hold_ && !nwaiting_ ) ) )
+      cond_.wait();
+    if( stop_ && queue_.empty() && nflush_done_ == nflush_requested_ )
+      break;
+    // take over the whole queue as one batch
+    std::vector<Item> batch;
+    batch.swap(queue_);
+    queue_index_.clear();
+    int nflush = nflush_requested_;
+    // funklets that were not given a DbId may have been written before
+    // with the same domain; the table needs the DbId to update them in
+    // place rather than add them again
+    for( uint i=0; i<batch.size(); i++ )
+      if( batch[i].funklet->getDbId() < 0 )
+      {
+        std::map<string,Funklet::DbId>::const_iterator id = dbids_.find(batch[i].key);
+        if( id != dbids_.end() )
+          batch[i].funklet().setDbId(id->second);
+      }
+    lock.release();
+    // write out batch
+    std::vector<Funklet::DbId> ids(batch.size(),-1);
+    string error;
+    timer.start();
+    try
+    {
+      if( !batch.empty() )
+      {
+        table_->lock();
+        try
+        {
+          for( uint i=0; i<batch.size(); i++ )
+            ids[i] = table_->putCoeff(batch[i].parm,*(batch[i].funklet));
+        }
+        catch( ... )
+        {
+          table_->unlock();
+          throw;
+        }
+        table_->unlock();
+      }
+      if( nflush > nflush_done_ )
+        table_->flush();
+    }
+    catch( std::exception &exc )
+    {
+      error = exc.what();
+    }
+    timer.stop();
+    lock.lock(cond_);
+    write_time_ += timer.totalTime()*1e-6/LOFAR::NSTimer::cpuSpeedInMHz();
+    timer.reset();
+    for( uint i=0; i<batch.size(); i++ )
+    {
+      if( ids[i] >= 0 )
+        dbids_[batch[i].key] = ids[i];
+      parm_pending_[batch[i].parm]--;
+    }
+    if( !error.empty() )
+    {
+      cdebug(0)<<"error writing to parm table "<<name()<<": "<<error<<endl;
+      error_ = error;
+    }
+    else
+      nwritten_ += batch.size();
+    if( !batch.empty() )
+      nbatches_++;
+    nflush_done_ = nflush;
+    cond_.broadcast();
+  }
+  return 0;
+}
+
+} // namespace Meq
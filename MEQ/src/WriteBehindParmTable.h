@@ -0,0 +1,149 @@
+//# WriteBehindParmTable.h: writes funklets to a parm table in the background
+//#
+//# Copyright (C) 2002-2007
+//# ASTRON (Netherlands Foundation for Research in Astronomy)
+//# and The MeqTree Foundation
+//# P.O.Box 2, 7990 AA Dwingeloo, The Netherlands, seg@astron.nl
+//#
+//# This program is free software; you can redistribute it and/or modify
+//# it under the terms of the GNU General Public License as published by
+//# the Free Software Foundation; either version 2 of the License, or
+//# (at your option) any later version.
+//#
+//# This program is distributed in the hope that it will be useful,
+//# but WITHOUT ANY WARRANTY; without even the implied warranty of
+//# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+//# GNU General Public License for more details.
+//#
+//# You should have received a copy of the GNU General Public License
+//# along with this program; if not, write to the Free Software
+//# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+//#
+//# $Id$
+
+#ifndef MEQ_WRITEBEHINDPARMTABLE_H
+#define MEQ_WRITEBEHINDPARMTABLE_H
+
+#include <MEQ/ParmTable.h>
+#include <TimBase/Thread/Condition.h>
+#include <map>
+
+namespace Meq {
+
+// A WriteBehindParmTable sits in front of another parm table, and hands
+// all putCoeff() calls to a background writer thread, so that saving
+// funklets after a solve does not hold up the tree.
+//    * putCoeff() queues a copy of the funklet and returns at once. A
+//      funklet put again (same parm, same domain) before it's written
+//      replaces the queued one.
+//    * The writer takes everything queued as one batch, and writes it
+//      between lock() and unlock() of the underlying table. Funklets put
+//      between lock() and unlock() of this table are held back until
+//      unlock(), so that they're written as one batch.
+//    * flush() asks the writer to flush the underlying table once it has
+//      written everything queued so far, and returns at once.
+//    * sync() is the durability barrier: it waits until everything queued
+//      so far is written and flushed.
+//    * getFunklets() for a parm waits until any queued funklets of that
+//      parm have been written, and then reads from the underlying table.
+// An error in the writer is thrown by the next call to putCoeff(),
+// flush() or sync().
+class WriteBehindParmTable : public ParmTable
+{
+public:
+  // takes over the table, which is deleted along with this object
+  explicit WriteBehindParmTable (ParmTable *table);
+
+  // writes out and flushes everything queued, then deletes the table
+  virtual ~WriteBehindParmTable ();
+
+  virtual int getFunklets (vector<Funklet::Ref> &funklets,const string& parmName, const Domain& domain);
+
+  // Returns the DbId of the funklet, if known at this point, or -1.
+  virtual Funklet::DbId putCoeff (const string& parmName, const Funklet& funklet,bool domain_is_key=false);
+
+  virtual int getInitCoeff (Funklet::Ref &funklet,const string &parmName)
+  { return table_->getInitCoeff(funklet,parmName); }
+
+  virtual const string& name() const
+  { return table_->name(); }
+
+  virtual void lock();
+
+  virtual void unlock();
+
+  virtual void flush ();
+
+  virtual void sync ();
+
+  // the underlying table
+  ParmTable & table ()
+  { return *table_; }
+
+  // enables or disables write-behind for tables opened from now on
+  static void enable (bool enable=true)
+  { enabled_ = enable; }
+
+  static bool enabled ()
+  { return enabled_; }
+
+private:
+  // a queued funklet
+  class Item
+  {
+    public:
+      string parm;
+      string key;
+      Funklet::Ref funklet;
+  };
+
+  static void * startWriter (void *table);
+
+  void * runWriter ();
+
+  // makes a key from the parm name and funklet domain
+  static string makeKey (const string &parmName,const Domain &domain);
+
+  // throws the writer's error, if any. Must be called with cond_ locked
+  void checkError ();
+
+  ParmTable * table_;
+
+  // everything below is protected by cond_
+  Thread::Condition cond_;
+
+  std::vector<Item> queue_;
+  // index of each key in queue_
+  std::map<string,int> queue_index_;
+  // number of queued and in-flight funklets per parm
+  std::map<string,int> parm_pending_;
+  // DbIds assigned by the underlying table, per key
+  std::map<string,Funklet::DbId> dbids_;
+
+  int hold_;            // lock() depth
+  int nwaiting_;        // number of readers in getFunklets() waiting for the writer
+  bool stop_;
+
+  // number of flush requests made, and carried out. sync() waits for the
+  // latter to catch up with the former
+  int nflush_requested_;
+  int nflush_done_;
+
+  string error_;
+
+  // statistics, reported when the table is closed
+  int nput_;
+  int nreplaced_;
+  int nwritten_;
+  int nbatches_;
+  double write_time_;
+
+  Thread::ThrID writer_thread_;
+
+  static bool enabled_;
+};
+
+
+} // namespace Meq
+
+#endif
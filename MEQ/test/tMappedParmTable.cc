@@ -0,0 +1,175 @@
+//
+//% $Id$
+//
+//
+// Copyright (C) 2002-2007
+// The MeqTree Foundation &
+// ASTRON (Netherlands Foundation for Research in Astronomy)
+// P.O.Box 2, 7990 AA Dwingeloo, The Netherlands
+//
+// This program is free software; you can redistribute it and/or modify
+// it under the terms of the GNU General Public License as published by
+// the Free Software Foundation; either version 2 of the License, or
+// (at your option) any later version.
+//
+// This program is distributed in the hope that it will be useful,
+// but WITHOUT ANY WARRANTY; without even the implied warranty of
+// MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+// GNU General Public License for more details.
+//
+// You should have received a copy of the GNU General Public License
+// along with this program; if not, see <http://www.gnu.org/licenses/>,
+// or write to the Free Software Foundation, Inc.,
+// 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+//
+
+// Writes funklets to a MappedParmTable, reads them back before and after
+// flushing, and from a second table object, and checks that updates from
+// two table objects are seen by each other and merged. Returns non-zero on
+// any mismatch.
+
+#include <MEQ/MappedParmTable.h>
+#include <MEQ/Polc.h>
+#include <MEQ/MeqVocabulary.h>
+#include <stdlib.h>
+#include <unistd.h>
+#include <algorithm>
+
+using namespace LOFAR;
+using namespace DMI;
+using namespace DebugDefault;
+using namespace Meq;
+
+static int nfail = 0;
+
+static void check (const string &name,bool ok)
+{
+  cout<<name<<": "<<(ok?"OK":"FAIL")<<endl;
+  if( !ok )
+    nfail++;
+}
+
+// makes a time-frequency domain
+static Domain makeDomain (double t0,double t1,double f0=0,double f1=1e+9)
+{
+  Domain dom;
+  dom.defineAxis(Axis::TIME,t0,t1);
+  dom.defineAxis(Axis::FREQ,f0,f1);
+  return dom;
+}
+
+// makes a 2x3 polc with the given c00
+static Polc * makePolc (double c00)
+{
+  LoMat_double coeff(2,3);
+  coeff = 0;
+  coeff(0,0) = c00;
+  coeff(1,2) = 2*c00;
+  return new Polc(coeff);
+}
+
+// puts a polc with the given c00 and domain into the table
+static void put (ParmTable &table,const string &name,Polc *polc,const Domain &dom)
+{
+  Funklet::Ref ref(polc);
+  polc->setDomain(dom);
+  table.putCoeff(name,*ref);
+}
+
+// returns the c00s of all funklets of the parm overlapping the domain, in order of time
+static std::vector<double> get (ParmTable &table,const string &name,const Domain &dom)
+{
+  vector<Funklet::Ref> funklets;
+  table.getFunklets(funklets,name,dom);
+  std::vector<std::pair<double,double> > c00s;
+  for( uint i=0; i<funklets.size(); i++ )
+    c00s.push_back(std::make_pair(funklets[i]->domain().start(Axis::TIME),funklets[i]->getCoeff0()));
+  std::sort(c00s.begin(),c00s.end());
+  std::vector<double> result;
+  for( uint i=0; i<c00s.size(); i++ )
+    result.push_back(c00s[i].second);
+  return result;
+}
+
+static std::vector<double> vec (double a,double b=-1,double c=-1)
+{
+  std::vector<double> v(1,a);
+  if( b >= 0 ) v.push_back(b);
+  if( c >= 0 ) v.push_back(c);
+  return v;
+}
+
+int main (int argc,const char *argv[])
+{
+  Debug::getDebugContext().setLevel(0);
+  CountedRefBase::getDebugContext().setLevel(0);
+  Debug::initLevels(argc,argv);
+
+  string tabname = Debug::ssprintf("/tmp/tMappedParmTable.%d.mmep",int(getpid()));
+  try
+  {
+    {
+      MappedParmTable table(tabname);
+      // ten time slots for "a", constant polcs for "b", and a polc with an
+      // extra field for "c" (which has to go into the table as a blockset)
+      for( int i=0; i<10; i++ )
+        put(table,"a",makePolc(i),makeDomain(i,i+1));
+      put(table,"b",new Polc(5.),makeDomain(0,5));
+      put(table,"b",new Polc(6.),makeDomain(5,10));
+      Polc *polc = makePolc(7);
+      (*polc)[FCoeffMask] <<= new DMI::NumArray(Tpbool,LoShape(2,3));
+      put(table,"c",polc,makeDomain(0,10));
+      check("pending lookup",get(table,"a",makeDomain(2.5,4.5)) == vec(2,3,4));
+      table.flush();
+      check("flushed",table.numFunklets() == 13);
+      check("lookup",get(table,"a",makeDomain(2.5,4.5)) == vec(2,3,4));
+      check("lookup at edge",get(table,"a",makeDomain(3,4)) == vec(3));
+      check("lookup outside",get(table,"a",makeDomain(10,11)).empty());
+      check("lookup other freq",get(table,"a",makeDomain(0,1,2e+9,3e+9)).empty());
+      check("constant polcs",get(table,"b",makeDomain(4,6)) == vec(5,6));
+      check("missing parm",get(table,"x",makeDomain(0,10)).empty());
+      // replace a funklet, and check that the pending one is seen instead
+      put(table,"a",makePolc(30),makeDomain(3,4));
+      check("replaced before flush",get(table,"a",makeDomain(2.5,4.5)) == vec(2,30,4));
+    }
+    // destructor has flushed; reopen and check coefficients in detail
+    MappedParmTable table(tabname);
+    check("reopened",table.numFunklets() == 13);
+    check("replaced after flush",get(table,"a",makeDomain(2.5,4.5)) == vec(2,30,4));
+    vector<Funklet::Ref> funklets;
+    table.getFunklets(funklets,"a",makeDomain(7.2,7.8));
+    check("one funklet",funklets.size() == 1);
+    if( funklets.size() == 1 )
+    {
+      const Funklet &funk = *funklets[0];
+      check("polc type",funk.objectType() == TpMeqPolc);
+      check("polc coeffs",funk.getCoeffShape() == LoShape(2,3) &&
+            funk.getCoeff2()(0,0) == 7 && funk.getCoeff2()(1,2) == 14);
+      check("polc domain",funk.domain().start(Axis::TIME) == 7 && funk.domain().end(Axis::TIME) == 8);
+    }
+    table.getFunklets(funklets,"c",makeDomain(0,1));
+    check("blockset funklet",funklets.size() == 1 && funklets[0]->getCoeff0() == 7 &&
+          (*funklets[0])[FCoeffMask].exists());
+    // a second table object flushes a new parm; the first one must not lose it
+    {
+      MappedParmTable table2(tabname);
+      put(table2,"d",makePolc(40),makeDomain(0,10));
+    }
+    check("flush by other table seen",get(table,"d",makeDomain(0,1)) == vec(40) &&
+          table.numFunklets() == 14);
+    put(table,"a",makePolc(50),makeDomain(10,11));
+    table.flush();
+    check("merged",table.numFunklets() == 15 &&
+          get(table,"d",makeDomain(0,1)) == vec(40) &&
+          get(table,"a",makeDomain(9.5,10.5)) == vec(9,50));
+  }
+  catch( std::exception &err )
+  {
+    cerr<<"\nCaught exception:\n"<<err.what()<<endl;
+    nfail++;
+  }
+  system(("rm -rf "+tabname).c_str());
+  if( nfail )
+    cout<<nfail<<" test(s) FAILED\n";
+  return nfail ? 1 : 0;
+}
@@ -0,0 +1,208 @@
+//
+//% $Id$
+//
+//
+// Copyright (C) 2002-2007
+// The MeqTree Foundation &
+// ASTRON (Netherlands Foundation for Research in Astronomy)
+// P.O.Box 2, 7990 AA Dwingeloo, The Netherlands
+//
+// This program is free software; you can redistribute it and/or modify
+// it under the terms of the GNU General Public License as published by
+// the Free Software Foundation; either version 2 of the License, or
+// (at your option) any later version.
+//
+// This program is distributed in the hope that it will be useful,
+// but WITHOUT ANY WARRANTY; without even the implied warranty of
+// MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+// GNU General Public License for more details.
+//
+// You should have received a copy of the GNU General Public License
+// along with this program; if not, see <http://www.gnu.org/licenses/>,
+// or write to the Free Software Foundation, Inc.,
+// 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+//
+
+// Checks the vectorized Vells kernels of every instruction set supported
+// by the CPU against the scalar code, and times them. Exact operations must match bit for bit, transcendental functions
+// to within a relative tolerance. Returns non-zero on any mismatch.
+// Use -q to skip the timings.
+
+#include <TimBase/Stopwatch.h>
+#include <MEQ/Vells.h>
+#include <MEQ/VellsKernels.h>
+#include <stdlib.h>
+#include <math.h>
+
+using namespace LOFAR;
+using namespace DMI;
+using namespace DebugDefault;
+using namespace Meq;
+using namespace Meq::VellsMath;
+
+namespace VK = Meq::VellsKernels;
+
+typedef Vells (*TestFunc)(const Vells &a,const Vells &b);
+
+static Vells v_add  (const Vells &a,const Vells &b) { return a+b; }
+static Vells v_sub  (const Vells &a,const Vells &b) { return a-b; }
+static Vells v_mul  (const Vells &a,const Vells &b) { return a*b; }
+static Vells v_div  (const Vells &a,const Vells &b) { return a/b; }
+static Vells v_iadd (const Vells &a,const Vells &b) { Vells y(a,DMI::DEEP); y += b; return y; }
+static Vells v_imul (const Vells &a,const Vells &b) { Vells y(a,DMI::DEEP); y *= b; return y; }
+static Vells v_idiv (const Vells &a,const Vells &b) { Vells y(a,DMI::DEEP); y /= b; return y; }
+static Vells v_polar(const Vells &a,const Vells &b) { return polar(a,b); }
+static Vells v_sqrt (const Vells &a,const Vells &)  { return sqrt(a); }
+static Vells v_exp  (const Vells &a,const Vells &)  { return exp(a); }
+static Vells v_sin  (const Vells &a,const Vells &)  { return sin(a); }
+static Vells v_cos  (const Vells &a,const Vells &)  { return cos(a); }
+
+static int nfail = 0;
+
+// compares two Vells element by element, as doubles
+static void compare (const string &name,const Vells &x,const Vells &y,double tol)
+{
+  if( x.elementType() != y.elementType() || x.nelements() != y.nelements() )
+  {
+    cout<<name<<": FAIL, type or shape mismatch\n";
+    nfail++;
+    return;
+  }
+  int n = x.nelements()*(x.isComplex() ? 2 : 1);
+  const double *px = static_cast<const double*>(x.getConstDataPtr());
+  const double *py = static_cast<const double*>(y.getConstDataPtr());
+  double maxerr = 0;
+  int ndiff = 0;
+  for( int i=0; i<n; i++ )
+  {
+    if( px[i] == py[i] || ( isnan(px[i]) && isnan(py[i]) ) )
+      continue;
+    ndiff++;
+    maxerr = std::max(maxerr,fabs(px[i]-py[i])/std::max(fabs(px[i]),1.));
+  }
+  bool ok = tol > 0 ? maxerr <= tol : !ndiff;
+  cout<<name<<": "<<(ok?"OK":"FAIL")<<", "<<ndiff<<" of "<<n<<" differ";
+  if( ndiff )
+    cout<<", max rel error "<<maxerr;
+  cout<<endl;
+  if( !ok )
+    nfail++;
+}
+
+// runs func over a and b with the scalar kernels and with the kernels of
+// every instruction set up to best, compares the results, and optionally
+// times them all
+static void runTest (const string &name,TestFunc func,const Vells &a,const Vells &b,
+                     double tol,VK::InstructionSet best,bool timing)
+{
+  VK::setISA(VK::ISA_SCALAR);
+  Vells ref = func(a,b);
+  for( int isa=VK::ISA_SCALAR+1; isa<=int(best); isa++ )
+  {
+    VK::setISA(VK::InstructionSet(isa));
+    Vells res = func(a,b);
+    compare(name+" ("+VK::isaName(VK::InstructionSet(isa))+")",ref,res,tol);
+  }
+  if( !timing )
+    return;
+  for( int isa=VK::ISA_SCALAR; isa<=int(best); isa++ )
+  {
+    VK::setISA(VK::InstructionSet(isa));
+    Stopwatch watch(1.0);
+    long long ndone = 0;
+    while( !watch.fired() )
+    {
+      for( int i=0; i<100; i++ )
+        func(a,b);
+      ndone += 100*ref.nelements();
+    }
+    cout<<"  "<<watch.dump(VK::isaName(VK::InstructionSet(isa)),ndone)<<endl;
+  }
+}
+
+int main (int argc,const char *argv[])
+{
+  Debug::getDebugContext().setLevel(0);
+  CountedRefBase::getDebugContext().setLevel(0);
+  Debug::initLevels(argc,argv);
+
+  bool timing = true;
+  for( int i=1; i<argc; i++ )
+    if( string(argv[i]) == "-q" )
+      timing = false;
+
+  VK::InstructionSet best = VK::detectISA();
+  cout<<"Best instruction set: "<<VK::isaName(best)<<endl;
+  if( best == VK::ISA_SCALAR )
+  {
+    cout<<"No vector kernels available, nothing to compare\n";
+    return 0;
+  }
+
+  try
+  {
+    // odd size, to exercise the tails
+    const int nt = 101, nf = 37;
+    Vells ra(0.,makeLoShape(nt,nf),false), rb(0.,makeLoShape(nt,nf),false);
+    Vells ca(make_dcomplex(0,0),makeLoShape(nt,nf),false), cb(make_dcomplex(0,0),makeLoShape(nt,nf),false);
+    Vells phase(0.,makeLoShape(nt,nf),false);
+    srand48(1);
+    double *pra = ra.begin<double>(), *prb = rb.begin<double>(), *pph = phase.begin<double>();
+    dcomplex *pca = ca.begin<dcomplex>(), *pcb = cb.begin<dcomplex>();
+    for( int i=0; i<nt*nf; i++ )
+    {
+      pra[i] = drand48()*20-10;
+      prb[i] = drand48()*20-9.5;
+      pph[i] = (drand48()-.5)*2e+4;
+      pca[i] = make_dcomplex(drand48()*4-2,drand48()*200-100);
+      pcb[i] = make_dcomplex(drand48()*4-2,drand48()*4-2);
+    }
+    Vells rs(1.5), cs(make_dcomplex(.3,-.7));
+    // zeros, infinities, NaNs and extreme magnitudes, which the complex
+    // divide kernel must leave to the compiler
+    Vells cspecial(ca,DMI::DEEP);
+    const double specials[] = { 0.,-0.,1e-310,1e+300,-1e+300,HUGE_VAL,-HUGE_VAL,NAN };
+    for( int i=0; i<nt*nf; i+=5 )
+      cspecial.begin<dcomplex>()[i] = make_dcomplex(specials[i%8],specials[(i/8)%8]);
+    Vells vtime(0.,makeLoShape(nt,1),false);   // not applicable: must fall back
+    for( int i=0; i<nt; i++ )
+      vtime.begin<double>()[i] = i*.1;
+
+    // exact operations
+    runTest("real+real",v_add,ra,rb,0,best,timing);
+    runTest("real-scalar",v_sub,ra,rs,0,best,false);
+    runTest("scalar/real",v_div,rs,rb,0,best,false);
+    runTest("real*real",v_mul,ra,rb,0,best,false);
+    runTest("real/real",v_div,ra,rb,0,best,false);
+    runTest("complex+complex",v_add,ca,cb,0,best,false);
+    runTest("complex-scalar",v_sub,ca,cs,0,best,false);
+    runTest("complex*complex",v_mul,ca,cb,0,best,timing);
+    runTest("scalar*complex",v_mul,cs,cb,0,best,false);
+    runTest("complex/complex",v_div,ca,cb,0,best,timing);
+    runTest("complex/scalar",v_div,ca,cs,0,best,false);
+    runTest("scalar/complex",v_div,cs,cb,0,best,false);
+    runTest("complex/=complex",v_idiv,ca,cb,0,best,false);
+    runTest("complex/complex, special values",v_div,cspecial,cb,0,best,false);
+    runTest("real*complex",v_mul,ra,cb,0,best,false);
+    runTest("complex*real",v_mul,ca,rb,0,best,false);
+    runTest("complex+=complex",v_iadd,ca,cb,0,best,false);
+    runTest("complex*=real",v_imul,ca,rb,0,best,false);
+    runTest("real+time",v_add,ra,vtime,0,best,false);
+    runTest("sqrt(real)",v_sqrt,rb,rb,0,best,false);
+    // transcendental functions
+    runTest("exp(real)",v_exp,ra,ra,1e-15,best,timing);
+    runTest("exp(complex)",v_exp,ca,ca,1e-14,best,timing);
+    runTest("sin(phase)",v_sin,phase,phase,1e-14,best,false);
+    runTest("cos(phase)",v_cos,phase,phase,1e-14,best,false);
+    runTest("polar(1,phase)",v_polar,Vells(1.),phase,1e-14,best,timing);
+    runTest("polar(real,phase)",v_polar,ra,phase,1e-14,best,false);
+  }
+  catch( std::exception &err )
+  {
+    cerr<<"\nCaught exception:\n"<<err.what()<<endl;
+    return 1;
+  }
+  if( nfail )
+    cout<<nfail<<" test(s) FAILED\n";
+  return nfail ? 1 : 0;
+}
@@ -0,0 +1,124 @@
+//
+//% $Id$
+//
+//
+// Copyright (C) 2002-2007
+// The MeqTree Foundation &
+// ASTRON (Netherlands Foundation for Research in Astronomy)
+// P.O.Box 2, 7990 AA Dwingeloo, The Netherlands
+//
+// This program is free software; you can redistribute it and/or modify
+// it under the terms of the GNU General Public License as published by
+// the Free Software Foundation; either version 2 of the License, or
+// (at your option) any later version.
+//
+// This program is distributed in the hope that it will be useful,
+// but WITHOUT ANY WARRANTY; without even the implied warranty of
+// MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+// GNU General Public License for more details.
+//
+// You should have received a copy of the GNU General Public License
+// along with this program; if not, see <http://www.gnu.org/licenses/>,
+// or write to the Free Software Foundation, Inc.,
+// 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+//
+
+// Writes funklets through a WriteBehindParmTable in front of a
+// MappedParmTable, and checks that they are read back before and after
+// sync(), that funklets put again before they are written replace the
+// queued ones, and that everything is on disk once the table is closed.
+// Returns non-zero on any mismatch.
+
+#include <MEQ/WriteBehindParmTable.h>
+#include <MEQ/MappedParmTable.h>
+#include <MEQ/Polc.h>
+#include <stdlib.h>
+#include <unistd.h>
+
+using namespace LOFAR;
+using namespace DMI;
+using namespace DebugDefault;
+using namespace Meq;
+
+static int nfail = 0;
+
+static void check (const string &name,bool ok)
+{
+  cout<<name<<": "<<(ok?"OK":"FAIL")<<endl;
+  if( !ok )
+    nfail++;
+}
+
+static Domain makeDomain (double t0,double t1)
+{
+  Domain dom;
+  dom.defineAxis(Axis::TIME,t0,t1);
+  dom.defineAxis(Axis::FREQ,0,1e+9);
+  return dom;
+}
+
+static void put (ParmTable &table,const string &name,double c00,double t0,double t1)
+{
+  Polc *polc = new Polc(c00);
+  Funklet::Ref ref(polc);
+  polc->setDomain(makeDomain(t0,t1));
+  table.putCoeff(name,*ref);
+}
+
+// returns sum of c00s of all funklets of the parm overlapping the domain,
+// or -1 if there are none
+static double get (ParmTable &table,const string &name,double t0,double t1)
+{
+  vector<Funklet::Ref> funklets;
+  table.getFunklets(funklets,name,makeDomain(t0,t1));
+  if( funklets.empty() )
+    return -1;
+  double sum = 0;
+  for( uint i=0; i<funklets.size(); i++ )
+    sum += funklets[i]->getCoeff0();
+  return sum;
+}
+
+int main (int argc,const char *argv[])
+{
+  Debug::getDebugContext().setLevel(0);
+  CountedRefBase::getDebugContext().setLevel(0);
+  Debug::initLevels(argc,argv);
+
+  string tabname = Debug::ssprintf("/tmp/tWriteBehindParmTable.%d.mmep",int(getpid()));
+  try
+  {
+    {
+      WriteBehindParmTable table(new MappedParmTable(tabname));
+      // many puts of the same funklets, as a solver would do after each iteration
+      for( int iter=0; iter<20; iter++ )
+        for( int i=0; i<10; i++ )
+          put(table,"a",iter*100+i,i,i+1);
+      check("read through queue",get(table,"a",3.2,3.8) == 1903);
+      // funklets put between lock() and unlock() are still seen by readers
+      table.lock();
+      put(table,"b",5,0,10);
+      check("read while locked",get(table,"b",0,1) == 5);
+      put(table,"b",6,0,10);
+      table.unlock();
+      table.sync();
+      check("synced",static_cast<MappedParmTable&>(table.table()).numFunklets() == 11);
+      check("read after sync",get(table,"a",0.5,2.5) == 1900+1901+1902 && get(table,"b",0,1) == 6);
+      put(table,"c",7,0,10);
+      table.flush();
+    }
+    // destructor has synced; reopen the table directly
+    MappedParmTable table(tabname);
+    check("reopened",table.numFunklets() == 12);
+    check("read after reopen",get(table,"a",9.5,10) == 1909 && get(table,"c",0,1) == 7);
+  }
+  catch( std::exception &err )
+  {
+    cerr<<"\nCaught exception:\n"<<err.what()<<endl;
+    nfail++;
+  }
+  system(("rm -rf "+tabname).c_str());
+  if( nfail )
+    cout<<nfail<<" test(s) FAILED\n";
+  return nfail ? 1 : 0;
+}
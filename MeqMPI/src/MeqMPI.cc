@@ -97,6 +97,8 @@ Thread::ThrID MeqMPI::initialize (int argc,const char *argv[])
     for( int i=0; i<argc; i++ )
       rec["Argv"][i] = string(argv[i]);
     rec["mt"] = Meq::MTPool::num_threads();
+    rec["mtsched"] = Meq::MTPool::scheduler();
+    rec["mtaffinity"] = Meq::MTPool::affinity();
     postCommand(TAG_INIT,-1,ref);
   }
   return comm_thread_;
@@ -32,11 +32,13 @@ void MeqMPI::procInit (int source,const char *msgbuf,int msgsize)
   Debug::initLevels(argc,argv);
   // init multithreading
   int mt = rec["mt"].as<int>();
-  cdebug(1)<<"INIT message from remote, mt "<<mt<<endl;
+  int sched = rec["mtsched"].as<int>(MTPool::SCHED_LIFO);
+  int affinity = rec["mtaffinity"].as<int>(MTPool::AFFINITY_NONE);
+  cdebug(1)<<"INIT message from remote, mt "<<mt<<", scheduler "<<sched<<endl;
   if( mt<1 )
     mt = 1;
   if( !MTPool::enabled() )
-    MTPool::start(mt*2,mt);
+    MTPool::start(mt*2,mt,sched,affinity);
   // post a reply
   if( header.endpoint )
     postReply(source,header.endpoint);
@@ -317,7 +319,8 @@ void MeqMPI::procNodeExecute (int source,const char *msgbuf,int msgsize)
   NodeFace &node = forest().get(header.nodeindex);
   cdebug(2)<<"enqueueing execute() request on node "<<node.name()<<endl;
   // enqueue a workorder and wake up worker thread
-  Thread::Mutex::Lock lock(MTPool::brigade().cond());
+  Thread::Mutex::Lock lock;
+  MTPool::brigade().lockQueue(lock);
   MTPool::brigade().placeWorkOrder(new MpiExecWorkOrder(node,ref.as<Request>(),header.arg,*this,source,header.endpoint));
   MTPool::brigade().awakenWorker();
 }
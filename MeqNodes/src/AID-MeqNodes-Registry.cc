@@ -76,6 +76,8 @@ DMI::BObj * __construct_MeqFMod (int n) { return n>0 ? new Meq::FMod [n] : new M
 DMI::BObj * __construct_MeqFreq (int n) { return n>0 ? new Meq::Freq [n] : new Meq::Freq; }
 #include "Functional.h"
 DMI::BObj * __construct_MeqFunctional (int n) { return n>0 ? new Meq::Functional [n] : new Meq::Functional; }
+#include "Fused.h"
+DMI::BObj * __construct_MeqFused (int n) { return n>0 ? new Meq::Fused [n] : new Meq::Fused; }
 #include "GaussNoise.h"
 DMI::BObj * __construct_MeqGaussNoise (int n) { return n>0 ? new Meq::GaussNoise [n] : new Meq::GaussNoise; }
 #include "Grid.h"
@@ -408,6 +410,9 @@ DMI::BObj * __construct_MeqZeroFlagger (int n) { return n>0 ? new Meq::ZeroFlagg
         AtomicID::registerId(-1673,"MeqFunctional")+
         TypeInfoReg::addToRegistry(-1673,TypeInfo(TypeInfo::DYNAMIC,0))+
         DynamicTypeManager::addToRegistry(-1673,__construct_MeqFunctional)+
+        AtomicID::registerId(-1808,"MeqFused")+
+        TypeInfoReg::addToRegistry(-1808,TypeInfo(TypeInfo::DYNAMIC,0))+
+        DynamicTypeManager::addToRegistry(-1808,__construct_MeqFused)+
         AtomicID::registerId(-1449,"MeqGaussNoise")+
         TypeInfoReg::addToRegistry(-1449,TypeInfo(TypeInfo::DYNAMIC,0))+
         DynamicTypeManager::addToRegistry(-1449,__construct_MeqGaussNoise)+
@@ -768,6 +773,10 @@ DMI::BObj * __construct_MeqZeroFlagger (int n) { return n>0 ? new Meq::ZeroFlagg
         AtomicID::registerId(-1424,"GE")+
         AtomicID::registerId(-1498,"Force")+
         AtomicID::registerId(-1241,"Output")+
+        AtomicID::registerId(-1809,"Program")+
+        AtomicID::registerId(-1810,"Block")+
+        AtomicID::registerId(-1811,"Fill")+
+        AtomicID::registerId(-1812,"Slices")+
     0;
     return res;
   }
@@ -78,6 +78,11 @@ const int AidBegin_int = -1643;
 const DMI::AtomicID AidBit(-1293);                // from /home/oms/LOFAR/Timba/MEQ/src/MeqVocabulary.h:40
 const int AidBit_int = -1293;
 #endif
+#ifndef _defined_id_AidBlock
+#define _defined_id_AidBlock 1
+const DMI::AtomicID AidBlock(-1810);              // from /home/oms/LOFAR/Timba/MeqNodes/src/Fused.h:31
+const int AidBlock_int = -1810;
+#endif
 #ifndef _defined_id_AidBrick
 #define _defined_id_AidBrick 1
 const DMI::AtomicID AidBrick(-1685);              // from /home/oms/LOFAR/Timba/MeqNodes/src/UVInterpol.h:34
@@ -238,6 +243,11 @@ const int AidFile_int = -1224;
 const DMI::AtomicID AidFilename(-1576);           // from /home/oms/LOFAR/Timba/DMI/src/Exception.h:30
 const int AidFilename_int = -1576;
 #endif
+#ifndef _defined_id_AidFill
+#define _defined_id_AidFill 1
+const DMI::AtomicID AidFill(-1811);               // from /home/oms/LOFAR/Timba/MeqNodes/src/Solver.h:39
+const int AidFill_int = -1811;
+#endif
 #ifndef _defined_id_AidFixed
 #define _defined_id_AidFixed 1
 const DMI::AtomicID AidFixed(-1780);              // from PSVTensor.h:34
@@ -583,6 +593,11 @@ const int AidMeqFreq_int = -1420;
 const DMI::AtomicID AidMeqFunctional(-1673);      // from /home/mevius/LOFAR/Timba/MeqNodes/src/Functional.h:33
 const int AidMeqFunctional_int = -1673;
 #endif
+#ifndef _defined_id_AidMeqFused
+#define _defined_id_AidMeqFused 1
+const DMI::AtomicID AidMeqFused(-1808);           // from /home/oms/LOFAR/Timba/MeqNodes/src/Fused.h:31
+const int AidMeqFused_int = -1808;
+#endif
 #ifndef _defined_id_AidMeqGaussNoise
 #define _defined_id_AidMeqGaussNoise 1
 const DMI::AtomicID AidMeqGaussNoise(-1449);      // from /home/oms/LOFAR/Timba/MeqNodes/src/GaussNoise.h:31
@@ -1150,6 +1165,11 @@ const int AidPos_int = -1169;
 const DMI::AtomicID AidProfile(-1433);            // from /home/oms/LOFAR/Timba/MeqNodes/src/DataCollect.h:30
 const int AidProfile_int = -1433;
 #endif
+#ifndef _defined_id_AidProgram
+#define _defined_id_AidProgram 1
+const DMI::AtomicID AidProgram(-1809);            // from /home/oms/LOFAR/Timba/MeqNodes/src/Fused.h:31
+const int AidProgram_int = -1809;
+#endif
 #ifndef _defined_id_AidQuota
 #define _defined_id_AidQuota 1
 const DMI::AtomicID AidQuota(-1627);              // from /home/oms/LOFAR/Timba/MeqNodes/src/Solver.h:35
@@ -1230,6 +1250,11 @@ const int AidSize_int = -1255;
 const DMI::AtomicID AidSkeleton(-1389);           // from /home/oms/LOFAR/Timba/MeqNodes/src/DataConcat.h:31
 const int AidSkeleton_int = -1389;
 #endif
+#ifndef _defined_id_AidSlices
+#define _defined_id_AidSlices 1
+const DMI::AtomicID AidSlices(-1812);             // from /home/oms/LOFAR/Timba/MeqNodes/src/Solver.h:39
+const int AidSlices_int = -1812;
+#endif
 #ifndef _defined_id_AidSmear
 #define _defined_id_AidSmear 1
 const DMI::AtomicID AidSmear(-1768);              // from TFSmearFactorApprox.h:33
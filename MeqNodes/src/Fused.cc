@@ -0,0 +1,423 @@
+//# Fused.cc: evaluates a fused expression of elementwise functions
+//#
+//# Copyright (C) 2002-2007
+//# ASTRON (Netherlands Foundation for Research in Astronomy)
+//# and The MeqTree Foundation
+//# P.O.Box 2, 7990 AA Dwingeloo, The Netherlands, seg@astron.nl
+//#
+//# This program is free software; you can redistribute it and/or modify
+//# it under the terms of the GNU General Public License as published by
+//# the Free Software Foundation; either version 2 of the License, or
+//# (at your option) any later version.
+//#
+//# This program is distributed in the hope that it will be useful,
+//# but WITHOUT ANY WARRANTY; without even the implied warranty of
+//# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+//# GNU General Public License for more details.
+//#
+//# You should have received a copy of the GNU General Public License
+//# along with this program; if not, write to the Free Software
+//# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+//#
+//# $Id$
+
+#include <MeqNodes/Fused.h>
+#include <MEQ/VellSet.h>
+#include <map>
+#include <sstream>
+#include <stdlib.h>
+#include <string.h>
+
+namespace Meq {
+
+using Debug::ssprintf;
+
+const HIID FProgram   = AidProgram;
+const HIID FBlockSize = AidBlock|AidSize;
+
+// Blocks are kept to a multiple of this many cells, and never made
+// smaller, so that the vectorized Vells kernels see the same groups of
+// elements as they would in the full array, and give identical results.
+const int BlockAlign = 8;
+
+typedef Vells (*UnaryFunc)(const Vells &);
+typedef Vells (*BinaryFunc)(const Vells &,const Vells &);
+
+// these do what MeqNegate, MeqInvert and MeqDivide do
+static Vells negate (const Vells &a)
+{ return a * -1; }
+
+static Vells invert (const Vells &a)
+{ return 1 / a; }
+
+static Vells divide (const Vells &a,const Vells &b)
+{ return a / b; }
+
+static const std::map<string,UnaryFunc> & unaryFuncs ()
+{
+  static std::map<string,UnaryFunc> funcs;
+  static bool init = false;
+  if( !init )
+  {
+    #define registerUnaryFunc(FUNCNAME,x) funcs[#FUNCNAME] = &VellsMath::FUNCNAME;
+    DoForAllUnaryFuncs(registerUnaryFunc,);
+    #undef registerUnaryFunc
+    funcs["neg"] = &negate;
+    funcs["inv"] = &invert;
+    init = true;
+  }
+  return funcs;
+}
+
+static const std::map<string,BinaryFunc> & binaryFuncs ()
+{
+  static std::map<string,BinaryFunc> funcs;
+  static bool init = false;
+  if( !init )
+  {
+    #define registerBinaryFunc(FUNCNAME,x) funcs[#FUNCNAME] = &VellsMath::FUNCNAME;
+    DoForAllBinaryFuncs(registerBinaryFunc,);
+    #undef registerBinaryFunc
+    funcs["div"] = &divide;
+    init = true;
+  }
+  return funcs;
+}
+
+// copies n cells from a[ia] to y[iy]. Both must be of the same type.
+static void copyCells (Vells &y,int iy,const Vells &a,int ia,int n)
+{
+  int sz = y.elementSize();
+  memcpy(static_cast<char*>(y.getDataPtr())+iy*sz,
+         static_cast<const char*>(a.getConstDataPtr())+ia*sz,n*sz);
+}
+
+
+Fused::Fused()
+  : block_size_(2048)
+{
+  // build the function tables now, while we're still single-threaded
+  unaryFuncs();
+  binaryFuncs();
+}
+
+Fused::~Fused()
+{}
+
+void Fused::setStateImpl (DMI::Record::Ref &rec,bool initializing)
+{
+  Function::setStateImpl(rec,initializing);
+  std::vector<string> prog;
+  if( rec[FProgram].get_vector(prog) )
+    setProgram(prog);
+  else
+  {
+    FailWhen(initializing,"no "+FProgram.toString()+" specified");
+  }
+  if( rec[FBlockSize].get(block_size_,initializing) )
+  {
+    FailWhen(block_size_<=0,FBlockSize.toString()+" must be positive");
+    block_size_ = (block_size_+BlockAlign-1)/BlockAlign*BlockAlign;
+  }
+}
+
+void Fused::setProgram (const std::vector<string> &prog)
+{
+  std::vector<Step> program(prog.size());
+  bool missing_data = false;
+  int depth = 0;
+  for( uint i=0; i<prog.size(); i++ )
+  {
+    Step &step = program[i];
+    step.unary = 0;
+    step.binary = 0;
+    step.arg = 1;
+    std::istringstream str(prog[i]);
+    string op;
+    str>>op;
+    FailWhen(op.empty(),ssprintf("empty opcode at step %d",i));
+    if( op[0] == '$' )
+    {
+      step.type = OP_PUSH;
+      step.arg = atoi(op.c_str()+1);
+      FailWhen(step.arg<0,"illegal child number in opcode '"+prog[i]+"'");
+      depth++;
+      continue;
+    }
+    if( op == "add" || op == "sub" || op == "mul" )
+    {
+      step.type = op == "add" ? OP_ADD : ( op == "sub" ? OP_SUB : OP_MUL );
+      step.arg = 2;
+      str>>step.arg;
+      FailWhen(step.arg<1,"illegal number of operands in opcode '"+prog[i]+"'");
+      // these two skip missing operands, like MeqAdd and MeqMultiply do
+      if( step.type != OP_SUB )
+        missing_data = true;
+    }
+    else
+    {
+      std::map<string,UnaryFunc>::const_iterator iter1 = unaryFuncs().find(op);
+      std::map<string,BinaryFunc>::const_iterator iter2 = binaryFuncs().find(op);
+      if( iter1 != unaryFuncs().end() )
+      {
+        step.type = OP_UNARY;
+        step.unary = iter1->second;
+      }
+      else if( iter2 != binaryFuncs().end() )
+      {
+        step.type = OP_BINARY;
+        step.binary = iter2->second;
+        step.arg = 2;
+      }
+      else
+      {
+        Throw("unknown opcode '"+prog[i]+"'");
+      }
+    }
+    FailWhen(depth<step.arg,ssprintf("stack underflow at step %d (%s)",i,prog[i].c_str()));
+    depth -= step.arg-1;
+  }
+  FailWhen(depth!=1,ssprintf("program leaves %d values on the stack, 1 expected",depth));
+  program_ = program;
+  if( missing_data )
+    allowMissingData();
+}
+
+bool Fused::runProgram (Vells &result,const vector<const Vells*> &values) const
+{
+  // missing operands are tracked separately, since a null Vells is a
+  // perfectly good value (zero)
+  std::vector<Vells> stack(program_.size());
+  std::vector<bool> present(program_.size());
+  int sp = 0;
+  for( uint i=0; i<program_.size(); i++ )
+  {
+    const Step &step = program_[i];
+    int first = sp - step.arg;
+    switch( step.type )
+    {
+      case OP_PUSH:
+        FailWhen(step.arg>=int(values.size()),ssprintf("program refers to child %d, which does not exist",step.arg));
+        present[sp] = values[step.arg] != 0;
+        if( present[sp] )
+          stack[sp] = *(values[step.arg]);
+        sp++;
+        break;
+
+      case OP_ADD:    // as MeqAdd
+      {
+        Vells sum;
+        bool any = false;
+        for( int k=first; k<sp; k++ )
+          if( present[k] )
+          {
+            sum += stack[k];
+            any = true;
+          }
+        stack[first] = sum;
+        present[first] = any;
+        sp = first+1;
+        break;
+      }
+
+      case OP_MUL:    // as MeqMultiply
+      {
+        Vells prod(present[first] ? stack[first] : Vells::Unity());
+        bool any = present[first];
+        for( int k=first+1; k<sp; k++ )
+          if( present[k] )
+          {
+            prod *= stack[k];
+            any = true;
+          }
+        stack[first] = prod;
+        present[first] = any;
+        sp = first+1;
+        break;
+      }
+
+      case OP_SUB:    // as MeqSubtract
+      {
+        bool all = true;
+        for( int k=first; k<sp; k++ )
+          all = all && present[k];
+        if( all )
+        {
+          Vells diff(stack[first]);
+          for( int k=first+1; k<sp; k++ )
+            diff -= stack[k];
+          stack[first] = diff;
+        }
+        present[first] = all;
+        sp = first+1;
+        break;
+      }
+
+      case OP_UNARY:
+        if( present[first] )
+          stack[first] = (*step.unary)(stack[first]);
+        break;
+
+      case OP_BINARY:
+        present[first] = present[first] && present[first+1];
+        if( present[first] )
+          stack[first] = (*step.binary)(stack[first],stack[first+1]);
+        sp = first+1;
+        break;
+    }
+  }
+  result = stack[0];
+  return present[0];
+}
+
+bool Fused::isMissingResult (const vector<const Vells*> &values) const
+{
+  // the same rules as in runProgram(), applied to presence only
+  std::vector<bool> present(program_.size());
+  int sp = 0;
+  for( uint i=0; i<program_.size(); i++ )
+  {
+    const Step &step = program_[i];
+    int first = sp - step.arg;
+    switch( step.type )
+    {
+      case OP_PUSH:
+        present[sp++] = step.arg < int(values.size()) && values[step.arg];
+        break;
+
+      case OP_ADD:    // present if any operand is
+      case OP_MUL:
+      {
+        bool any = false;
+        for( int k=first; k<sp; k++ )
+          any = any || present[k];
+        present[first] = any;
+        sp = first+1;
+        break;
+      }
+
+      case OP_SUB:    // present if all operands are
+      case OP_BINARY:
+      {
+        bool all = true;
+        for( int k=first; k<sp; k++ )
+          all = all && present[k];
+        present[first] = all;
+        sp = first+1;
+        break;
+      }
+
+      case OP_UNARY:
+        break;
+    }
+  }
+  return !present[0];
+}
+
+bool Fused::evaluateBlockwise (Vells &result,const LoShape &shape,
+                               const vector<const Vells*> &values) const
+{
+  int nel = shape.product();
+  vector<Vells> blocks(values.size());
+  vector<const Vells*> blockvalues(values.size());
+  for( int i0=0; i0<nel; )
+  {
+    // the last block takes up any remainder too small to be a block itself
+    int n = nel-i0 < block_size_+BlockAlign ? nel-i0 : block_size_;
+    // make copies of this block of the full-size operands; scalars and
+    // missing operands are used as they are
+    for( uint i=0; i<values.size(); i++ )
+    {
+      const Vells *v = values[i];
+      if( v && !v->isScalar() )
+      {
+        if( blocks[i].nelements() != n || blocks[i].elementType() != v->elementType() )
+          blocks[i] = Vells(*v,LoShape(n),false);
+        copyCells(blocks[i],0,*v,i0,n);
+        blockvalues[i] = &blocks[i];
+      }
+      else
+        blockvalues[i] = v;
+    }
+    Vells y;
+    FailWhen(!runProgram(y,blockvalues),"expression evaluates to missing data");
+    // if the expression does not come out as a block of cells (e.g. it was
+    // multiplied by zero somewhere), it's up to the caller to do it whole
+    if( y.nelements() != n || ( i0 && y.elementType() != result.elementType() ) )
+      return false;
+    if( !i0 )
+      result = Vells(y,shape,false);
+    copyCells(result,i0,y,0,n);
+    i0 += n;
+  }
+  return true;
+}
+
+Vells Fused::evaluate (const Request &,const LoShape &shape,
+                       const vector<const Vells*>& values)
+{
+  Vells result;
+  // Blockwise evaluation needs every operand to be either a scalar, or of
+  // the full result shape, so that blocks of cells line up. Anything else
+  // (e.g. a time-only child) is evaluated as a whole.
+  bool blockwise = shape.product() >= block_size_+BlockAlign;
+  bool fullsize = false;
+  for( uint i=0; blockwise && i<values.size(); i++ )
+    if( values[i] && !values[i]->isScalar() )
+    {
+      if( values[i]->shape() == shape )
+        fullsize = true;
+      else
+        blockwise = false;
+    }
+  if( blockwise && fullsize && evaluateBlockwise(result,shape,values) )
+    return result;
+  FailWhen(!runProgram(result,values),"expression evaluates to missing data");
+  return result;
+}
+
+void Fused::evaluateFlags (Vells::Ref &out,const Request &,const LoShape &,const vector<const VellSet *> &pvs)
+{
+  // Flags are merged from all children, except where a MeqMultiply would
+  // have left its output unflagged, i.e. when one of its operands is a
+  // null child. (A null intermediate value can't be seen here.) Each
+  // stack entry holds the set of children whose flags it carries, and
+  // the child it was pushed from, if any.
+  int nch = pvs.size();
+  std::vector<std::vector<bool> > flagged(program_.size());
+  std::vector<int> leaf(program_.size());
+  int sp = 0;
+  for( uint i=0; i<program_.size(); i++ )
+  {
+    const Step &step = program_[i];
+    int first = sp - step.arg;
+    if( step.type == OP_PUSH )
+    {
+      FailWhen(step.arg>=nch,ssprintf("program refers to child %d, which does not exist",step.arg));
+      flagged[sp].assign(nch,false);
+      flagged[sp][step.arg] = true;
+      leaf[sp++] = step.arg;
+      continue;
+    }
+    bool unflagged = false;
+    if( step.type == OP_MUL )
+      for( int k=first; k<sp; k++ )
+        if( leaf[k] >= 0 && pvs[leaf[k]] && pvs[leaf[k]]->isNull() )
+          unflagged = true;
+    if( unflagged )
+      flagged[first].assign(nch,false);
+    else
+      for( int k=first+1; k<sp; k++ )
+        for( int ich=0; ich<nch; ich++ )
+          if( flagged[k][ich] )
+            flagged[first][ich] = true;
+    leaf[first] = -1;
+    sp = first+1;
+  }
+  for( int i=0; i<nch; i++ )
+    if( flagged[0][i] && pvs[i] && !pvs[i]->isNull() && pvs[i]->hasDataFlags() )
+      Vells::mergeFlags(out,pvs[i]->dataFlags(),flagmask_[i]);
+}
+
+
+} // namespace Meq
@@ -0,0 +1,128 @@
+//# Fused.h: evaluates a fused expression of elementwise functions
+//#
+//# Copyright (C) 2002-2007
+//# ASTRON (Netherlands Foundation for Research in Astronomy)
+//# and The MeqTree Foundation
+//# P.O.Box 2, 7990 AA Dwingeloo, The Netherlands, seg@astron.nl
+//#
+//# This program is free software; you can redistribute it and/or modify
+//# it under the terms of the GNU General Public License as published by
+//# the Free Software Foundation; either version 2 of the License, or
+//# (at your option) any later version.
+//#
+//# This program is distributed in the hope that it will be useful,
+//# but WITHOUT ANY WARRANTY; without even the implied warranty of
+//# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+//# GNU General Public License for more details.
+//#
+//# You should have received a copy of the GNU General Public License
+//# along with this program; if not, write to the Free Software
+//# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+//#
+//# $Id$
+
+#ifndef MEQNODES_FUSED_H
+#define MEQNODES_FUSED_H
+
+#include <MEQ/Function.h>
+
+#include <MeqNodes/TID-MeqNodes.h>
+#pragma aidgroup MeqNodes
+#pragma types #Meq::Fused
+#pragma aid Program Block Size
+
+// The comments below are used to automatically generate a default
+// init-record for the class
+
+//defrec begin MeqFused
+//  Evaluates an expression made up of elementwise functions of its
+//  children in one node. This replaces a chain of single-parent nodes
+//  (MeqAdd, MeqMultiply, MeqExp, etc.), and is normally created by the
+//  TDL resolve step rather than by hand (see Settings.fuse_expressions).
+//  Where all children are scalars or have the full result shape, the
+//  expression is evaluated one block of cells at a time, so intermediate
+//  values stay in cache instead of making a full-size Vells per operator.
+//  The results are the same as those of the original chain of nodes.
+//field: program []
+//  The expression in postfix order, as a vector of strings. "$N" pushes
+//  the value of child N. "add N", "sub N" and "mul N" pop N operands
+//  (default 2) and push the result, as MeqAdd, MeqSubtract and
+//  MeqMultiply would. "div", "neg" and "inv" correspond to MeqDivide,
+//  MeqNegate and MeqInvert. Any other opcode is the name of a unary
+//  (exp, sin, sqr, abs, conj, ...) or binary (polar, pow, atan2, fmod,
+//  tocomplex, ...) Vells function. The program must leave exactly one
+//  value on the stack.
+//field: block_size 2048
+//  Number of cells evaluated at a time.
+//defrec end
+
+namespace Meq {
+
+
+class Fused : public Function
+{
+public:
+  Fused();
+
+  virtual ~Fused();
+
+  virtual TypeId objectType() const
+    { return TpMeqFused; }
+
+protected:
+  virtual void setStateImpl (DMI::Record::Ref &rec,bool initializing);
+
+  virtual void evaluateFlags (Vells::Ref &out,const Request &req,const LoShape &shp,const vector<const VellSet *> &pvs);
+
+  virtual Vells evaluate (const Request&,const LoShape &shape,
+                          const vector<const Vells*>& values);
+
+  // true if the program gives no result for the given missing operands
+  virtual bool isMissingResult (const vector<const Vells*> &values) const;
+
+private:
+  typedef Vells (*UnaryOp)(const Vells &);
+  typedef Vells (*BinaryOp)(const Vells &,const Vells &);
+
+  typedef enum
+  {
+    OP_PUSH  = 0,
+    OP_ADD   = 1,
+    OP_SUB   = 2,
+    OP_MUL   = 3,
+    OP_UNARY = 4,
+    OP_BINARY = 5
+  } OpType;
+
+  // one step of the program
+  class Step
+  {
+    public:
+      OpType   type;
+      int      arg;         // child number for OP_PUSH, else # of operands
+      UnaryOp  unary;
+      BinaryOp binary;
+  };
+
+  // parses the program, throws an exception on errors
+  void setProgram (const std::vector<string> &prog);
+
+  // runs the program over the given operands. Returns false if the result
+  // is missing (i.e. the operands of some function were all missing)
+  bool runProgram (Vells &result,const vector<const Vells*> &values) const;
+
+  // runs the program one block of cells at a time. Returns false if the
+  // result does not come out cell by cell, in which case it must be
+  // evaluated over the whole shape instead
+  bool evaluateBlockwise (Vells &result,const LoShape &shape,
+                          const vector<const Vells*> &values) const;
+
+  std::vector<Step> program_;
+
+  int block_size_;
+};
+
+
+} // namespace Meq
+
+#endif
@@ -66,7 +66,10 @@
 //  if true, the parm represents an integration -- result value will be 
 //  multiplied by cell size
 //field: table_name '' 
-//  MEP table name. If empty, then the default parameter value is used
+//  MEP table name. If empty, then the default parameter value is used.
+//  Names ending in ".mep" are casa tables, names ending in ".mmep" are
+//  memory-mapped tables (which may be shared by many processes), anything
+//  else is a FastParmTable (if built with gdbm).
 //field: parm_name '' 
 //  MEP parm name used to look inside the table. If empty, then the node 
 //  name is used instead.
@@ -26,6 +26,8 @@
 #include <MeqNodes/ParmTableUtils.h>
 #include <MeqNodes/CasaParmTable.h>
 #include <MEQ/FastParmTable.h>
+#include <MEQ/MappedParmTable.h>
+#include <MEQ/WriteBehindParmTable.h>
 
 namespace Meq {
 
@@ -42,16 +44,22 @@ ParmTable* ParmTableUtils::openTable (const string& tablename,int type)
   }
   // determine type of table to open
   int len = tablename.length();
-#ifdef HAVE_FASTPARMTABLE
   ParmTable *tab;
-  if( len>5 && ( !tablename.compare(len-4,4,".mep") || 
+  if( len>6 && ( !tablename.compare(len-5,5,".mmep") || 
+                 !tablename.compare(len-6,6,".mmep/") ) )
+    tab = new MappedParmTable(tablename);
+#ifdef HAVE_FASTPARMTABLE
+  else if( len>5 && ( !tablename.compare(len-4,4,".mep") || 
                  !tablename.compare(len-5,5,".mep/") ) )
     tab = new CasaParmTable(tablename);
   else
     tab = new FastParmTable(tablename);
 #else
-  ParmTable *tab = new CasaParmTable(tablename);
+  else
+    tab = new CasaParmTable(tablename);
 #endif
+  if( WriteBehindParmTable::enabled() )
+    tab = new WriteBehindParmTable(tab);
   open_tables_[tablename] = tab;
   return tab;
 }
@@ -98,6 +106,16 @@ void ParmTableUtils::flushTables()
   }
 }
 
+void ParmTableUtils::syncTables()
+{
+  Thread::Mutex::Lock lock(static_table_mutex_);
+  for (std::map<string,ParmTable*>::const_iterator iter = open_tables_.begin();
+       iter != open_tables_.end();
+       ++iter) {
+    iter->second->sync();
+  }
+}
+
 } // namespace Meq
 
 #endif
@@ -49,9 +49,13 @@ public:
   // Unlock all tables.
   static void unlockTables();
   
-  // Flush all tables.
+  // Flush all tables. Tables opened with write-behind are flushed in
+  // the background.
   static void flushTables();
 
+  // Flush all tables, and wait until everything is written out.
+  static void syncTables();
+
 private:
   static std::map<string, ParmTable*> open_tables_;
   
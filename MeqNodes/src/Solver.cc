@@ -82,6 +82,7 @@ const HIID
     FInterruptSolution = AidInterrupt|AidSolution,
 
     FMTSolve         = AidMT|AidSolve,
+    FMTFillSlices    = AidMT|AidFill|AidSlices,
 
     // Solver result rider
     FMetrics         = AidMetrics,
@@ -97,6 +98,8 @@ const HIID
     FChi0            = AidChi|0,
     FReady           = AidReady,            // ready code, new Apr 06
     FReadyString     = AidReady|AidString,  // ready string, new Apr 06
+    FTimeFill        = AidTime|AidFill,     // time spent filling equations, ms
+    FTimeSolve       = AidTime|AidSolve,    // time spent solving, ms
 
     FDebug           = AidDebug;
 
@@ -157,6 +160,8 @@ Solver::Solver()
   // enable multithreading by default if available
   enableMultiThreadedPolling();
   mt_solve_ = true;
+  mt_fill_slices_ = 0;
+  wo_pending_ = 0;
 
   interrupt_ = false;
   write_debug_= false;
@@ -167,7 +172,6 @@ Solver::~Solver()
 {
   if( strides_ )
     delete [] strides_;
-  stopWorkerThreads();
 }
 
 //##ModelId=400E53550263
@@ -255,6 +259,26 @@ bool Solver::Tiling::advance (int idim)
   return cur_tile != old_tile;
 }
 
+void Solver::Tiling::tileBox (LoShape &box0,LoShape &boxshape,int itile,const LoShape &shape) const
+{
+  int rank = shape.size();
+  box0.resize(rank);
+  boxshape.resize(rank);
+  for( int i=0; i<rank; i++ )
+  {
+    if( num_tiles[i] )
+    {
+      box0[i] = ((itile/tile_stride[i])%num_tiles[i])*tile_size[i];
+      boxshape[i] = std::min(tile_size[i],shape[i]-box0[i]);
+    }
+    else
+    {
+      box0[i] = 0;
+      boxshape[i] = shape[i];
+    }
+  }
+}
+
 DMI::Record::Ref Solver::Tiling::asRecord () const
 {
   DMI::Record::Ref ref(DMI::ANONWR);
@@ -782,6 +806,200 @@ void Solver::fillEquations (const VellSet &vs)
 //  }
 }
 
+void Solver::queueEquations (const VellSet &vs,const Result::Ref &res)
+{
+  int npert = vs.numSpids();
+  FailWhen(npert>num_spids_,ssprintf("child %d returned %d spids, but only "
+            "%d were reported during spid discovery",cur_child_,npert,num_spids_));
+  const Vells &diffval = vs.getValue();
+  const Vells * pweight = vs.hasDataWeights() ? &( vs.dataWeights() ) : &( Vells::Unity() );
+  // look up spids, and check that all shapes fit into the cells, since
+  // fillSubsolver() iterates over the cells only
+  EquationSet eqs;
+  eqs.pvs = &vs;
+  eqs.pspi.resize(npert);
+  const Vells::Shape * shapes[npert+4];
+  shapes[0] = &( cells_shape_ );
+  shapes[1] = &( diffval.shape() );
+  shapes[2] = &( diffval.flagShape() );
+  shapes[3] = &( pweight->shape() );
+  for( int i=0; i<npert; i++ )
+  {
+    SpidType spid = vs.getSpid(i);
+    SpidMap::iterator iter = spids_.find(spid);
+    FailWhen(iter == spids_.end(),ssprintf("child %d returned spid %d that was "
+             "not reported during spid discovery",cur_child_,spid));
+    eqs.pspi[i] = &( iter->second );
+    shapes[i+4] = &( vs.getPerturbedValue(i).shape() );
+  }
+  Vells::Shape outshape;
+  Vells::computeStrides(outshape,strides_,npert+4,shapes,"Solver::getResult");
+  FailWhen(outshape != cells_shape_,ssprintf("child %d returned a result "
+           "that does not match the shape of the cells",cur_child_));
+  eqsets_.push_back(eqs);
+  eqset_results_.push_back(res);
+}
+
+// Computes strides for iterating over a box of cells within a Vells of
+// the given shape, in the form used by Vells::ConstStridedIterator (i.e.
+// last axis first; incr(ndim) adds up the first ndim strides, so each
+// stride also undoes the roll-over of the axes inside it). Axes along
+// which the Vells is constant do not advance. Returns the offset of the
+// first cell of the box.
+static int computeBoxStrides (Vells::Strides &strides,const Vells::Shape &shape,
+                              const LoShape &box0,const LoShape &boxshape)
+{
+  int rank = boxshape.size();
+  int offset = 0;
+  int stride = 1;     // stride of current axis in the Vells
+  int rewind = 0;     // how far back we go when the inner axes roll over
+  int prev_step = 0;  // total step when incrementing the previous axis
+  for( int i=rank; i<Axis::MaxAxis; i++ )
+    strides[i] = 0;
+  for( int i=0; i<rank; i++ )
+  {
+    int iaxis = rank-1-i;
+    int n = iaxis < int(shape.size()) ? shape[iaxis] : 1;
+    int axis_stride = n > 1 ? stride : 0;
+    int step = axis_stride - rewind;
+    strides[i] = step - prev_step;
+    prev_step = step;
+    rewind += (boxshape[iaxis]-1)*axis_stride;
+    offset += box0[iaxis]*axis_stride;
+    stride *= n;
+  }
+  return offset;
+}
+
+// helpers for fillSubsolver(): add the equation(s) for one point to a
+// solver, given its derivatives. A complex point makes two equations.
+static inline void addNorm (casa::LSQaips &solver,int &neq,int nderiv,int uk_index[],
+                            double deriv[],double [],double [],double weight,double diff)
+{
+  solver.makeNorm(nderiv,uk_index,deriv,weight,diff);
+  neq++;
+}
+
+static inline void addNorm (casa::LSQaips &solver,int &neq,int nderiv,int uk_index[],
+                            dcomplex deriv[],double deriv_real[],double deriv_imag[],
+                            double weight,dcomplex diff)
+{
+  for( int i=0; i<nderiv; i++ )
+  {
+    deriv_real[i] = creal(deriv[i]);
+    deriv_imag[i] = cimag(deriv[i]);
+  }
+  solver.makeNorm(nderiv,uk_index,deriv_real,weight,double(creal(diff)));
+  solver.makeNorm(nderiv,uk_index,deriv_imag,weight,double(cimag(diff)));
+  neq += 2;
+}
+
+// moves a pointer from the start of one row of a box to the start of the
+// next, given the strides from computeBoxStrides() and the number of
+// dimensions incremented by the DimCounter
+template<typename T>
+static inline void nextRow (const T * &ptr,const Vells::Strides &strides,int ndim,int rowlen)
+{
+  ptr += (rowlen-1)*strides[0];
+  for( int i=0; i<ndim; i++ )
+    ptr += strides[i];
+}
+
+// Fills in equations from a queued VellSet. Rather than going over the
+// whole hypercube like fillEquations(), we only go over the given box of
+// cells (the subsolver's tile, or a part of it). Since all equations of
+// a tile are generated in the same order either way, the subsolver ends
+// up with exactly the same normal equations.
+// The box is processed one row (along the last axis) at a time: the
+// points that make usable equations are picked out first, in simple loops
+// over the row that the compiler can vectorize, and only then are the
+// equations added.
+template<typename T>
+void Solver::fillSubsolver (casa::LSQaips &solver,int &neq,const Subsolver &ss,
+                            const LoShape &box0,const LoShape &box_shape,
+                            const EquationSet &eqs)
+{
+  const VellSet &vs = *eqs.pvs;
+  int npert = eqs.pspi.size();
+  // find the derivatives that belong to our solve group, and their unknowns
+  int ideriv[npert];
+  int uk_index[npert];
+  int nderiv = 0;
+  for( int i=0; i<npert; i++ )
+  {
+    const SpidInfo &spi = *(eqs.pspi[i]);
+    if( spi.solvegroup == ss.solvegroup )
+    {
+      ideriv[nderiv] = i;
+      uk_index[nderiv++] = spi.ssuki[ss.itile];
+    }
+  }
+  if( !nderiv )
+    return;
+  const Vells &diffval = vs.getValue();
+  const Vells * pweight = vs.hasDataWeights() ? &( vs.dataWeights() ) : &( Vells::Unity() );
+  // get pointers to the start of the box, and strides, for all vells
+  Vells::Strides strides[npert+3];
+  const T *pdiff = diffval.begin(Type2Type<T>()) +
+        computeBoxStrides(strides[0],diffval.shape(),box0,box_shape);
+  const VellsFlagType *pflag = diffval.beginFlags() +
+        computeBoxStrides(strides[1],diffval.flagShape(),box0,box_shape);
+  const double *pwt = pweight->begin(Type2Type<double>()) +
+        computeBoxStrides(strides[2],pweight->shape(),box0,box_shape);
+  const T *pderiv[npert];
+  for( int i=0; i<npert; i++ )
+  {
+    const Vells &deriv = vs.getPerturbedValue(i);
+    pderiv[i] = deriv.begin(Type2Type<T>()) +
+        computeBoxStrides(strides[i+3],deriv.shape(),box0,box_shape);
+  }
+  // the counter goes over rows of the box
+  int rank = box_shape.size();
+  int rowlen = rank ? box_shape[rank-1] : 1;
+  LoShape rows(box_shape);
+  if( rank )
+    rows[rank-1] = 1;
+  Vells::DimCounter counter(rows);
+  std::vector<char> usable(rowlen);
+  std::vector<T> deriv(nderiv);
+  double deriv_real[nderiv];
+  double deriv_imag[nderiv];
+  while( true )
+  {
+    // pick out the points of this row that are unflagged, weighted, and
+    // free of NANs and INFs in the value and (as in fillEqVectors()) in any
+    // of the derivatives, including those for other solve groups
+    int sd = strides[0][0], sf = strides[1][0], sw = strides[2][0];
+    for( int j=0; j<rowlen; j++ )
+      usable[j] = !(pflag[j*sf]&flag_mask_) & (pwt[j*sw] > 0) & isvalid(pdiff[j*sd]);
+    for( int i=0; i<npert; i++ )
+    {
+      const T *pd = pderiv[i];
+      int st = strides[i+3][0];
+      for( int j=0; j<rowlen; j++ )
+        usable[j] &= isvalid(pd[j*st]);
+    }
+    // add the equations
+    for( int j=0; j<rowlen; j++ )
+      if( usable[j] )
+      {
+        for( int k=0; k<nderiv; k++ )
+          deriv[k] = pderiv[ideriv[k]][j*strides[ideriv[k]+3][0]];
+        addNorm(solver,neq,nderiv,uk_index,&deriv[0],deriv_real,deriv_imag,
+                pwt[j*sw],pdiff[j*sd]);
+      }
+    // go on to the next row
+    int ndim = counter.incr();
+    if( !ndim )    // break out when counter is finished
+      break;
+    nextRow(pdiff,strides[0],ndim,rowlen);
+    nextRow(pflag,strides[1],ndim,rowlen);
+    nextRow(pwt,strides[2],ndim,rowlen);
+    for( int i=0; i<npert; i++ )
+      nextRow(pderiv[i],strides[i+3],ndim,rowlen);
+  }
+}
+
 
 
 // helper method to flatten a list of records into an array
@@ -970,8 +1188,17 @@ int Solver::getResult (Result::Ref &resref,
   int uk0 = 0;
   settings_.max_iter = max_num_iter_; // this is the same for all solvers
   for( int i=0; i<numSubsolvers(); i++ )
-    subsolvers_[i].initSolution(uk0,incr_solutions,settings_,metricsList.valid(),debugList.valid());
+  {
+    Subsolver &ss = subsolvers_[i];
+    ss.initSolution(uk0,incr_solutions,settings_,metricsList.valid(),debugList.valid());
+    ss.itile = i%numSubtiles();
+    ss.solvegroup = i/numSubtiles();
+    psolver_tiling_->tileBox(ss.box0,ss.box_shape,ss.itile,cells_shape_);
+  }
   cdebug(2)<<numSubsolvers()<<" sub-solvers initialized for "<<num_unknowns_<<" unknowns\n";
+  // fill and solve subsolvers in work orders, if we can
+  bool mt_subsolvers = mt_solve_ && MTPool::enabled() &&
+                       ( numSubsolvers() > 1 || mt_fill_slices_ > 1 );
   // how many subsolvers need to converge
   need_conv_ = std::min(numSubsolvers(),int(ceil(numSubsolvers()*conv_quota_)));
   num_conv_ = 0;
@@ -1013,6 +1240,8 @@ int Solver::getResult (Result::Ref &resref,
     reqref().setId(rqid);
     reqref().setNextId(next_rqid);
     num_equations_ = 0;
+    eqsets_.clear();
+    eqset_results_.clear();
     // start async child poll
     timers().getresult.stop();
     setExecState(CS_ES_POLLING);
@@ -1048,7 +1277,9 @@ int Solver::getResult (Result::Ref &resref,
           continue;
         nvs_returned++;
         timers().getresult.start();
-        if( vs.getValue().isReal() )
+        if( mt_subsolvers )
+          queueEquations(vs,child_res);
+        else if( vs.getValue().isReal() )
           fillEquations<double>(vs);
         else
           fillEquations<dcomplex>(vs);
@@ -1059,6 +1290,17 @@ int Solver::getResult (Result::Ref &resref,
     if( forest().abortFlag() )
       return RES_ABORT;
     setExecState(CS_ES_EVALUATING);
+    // in mt mode, now is the time to fill in the equations
+    if( mt_subsolvers && !eqsets_.empty() )
+    {
+      timers().getresult.start();
+      runSubsolverOrders(SS_FILL);
+      for( int i=0; i<numSubsolvers(); i++ )
+        num_equations_ += subsolvers_[i].neq;
+      eqsets_.clear();
+      eqset_results_.clear();
+      timers().getresult.stop();
+    }
     // **for debug purposes, count number of converged solvers
 //    int nc1=0;
 //    for( int i=0; i<numSubsolvers(); i++ )
@@ -1086,11 +1328,8 @@ int Solver::getResult (Result::Ref &resref,
     num_conv_ = 0;
     // call all subsolvers and count how many have converged
     // use mt solving if enabled, and if >1 subsolver has not yet converged
-    if( !worker_threads_.empty() && nremain > 1 )
-    {
-      num_conv_ = 0;
-      activateSubsolverWorkers();
-    }
+    if( mt_subsolvers && nremain > 1 )
+      runSubsolverOrders(SS_SOLVE);
     else // single-threaded loop
     {
       for( int i=0; i<numSubsolvers(); i++ )
@@ -1264,6 +1503,8 @@ int Solver::getResult (Result::Ref &resref,
       metrics[FFlag]   = flattenScalarList<bool>(*metricsList,AtomicID(i)|AidSlash|FFlag);
       metrics[FMu]     = flattenScalarList<double>(*metricsList,AtomicID(i)|AidSlash|FMu);
       metrics[FStdDev] = flattenScalarList<double>(*metricsList,AtomicID(i)|AidSlash|FStdDev);
+      metrics[FTimeFill]  = flattenScalarList<double>(*metricsList,AtomicID(i)|AidSlash|FTimeFill);
+      metrics[FTimeSolve] = flattenScalarList<double>(*metricsList,AtomicID(i)|AidSlash|FTimeSolve);
     }
   }
   if( debugList.valid() )
@@ -1319,6 +1560,12 @@ static DMI::NumArray::Ref triMatrix (T *tridata,int n)
   return out;
 }
 
+void Solver::Subsolver::initPartial (casa::LSQaips &part) const
+{
+  part.set(nuk);
+  part.set(settings.colin_factor,settings.lm_factor);
+}
+
 void Solver::Subsolver::initSolution (int &uk0_,LoMat_double &incr_sol,
                               const SolverSettings &set,bool usemetrics,bool usedebug)
 {
@@ -1349,6 +1596,8 @@ void Solver::Subsolver::initSolution (int &uk0_,LoMat_double &incr_sol,
   chi0 = chi = 0;
   neq = 0;
   rank = 0;
+  fill_timer.reset();
+  solve_timer.reset();
 }
 
 bool Solver::Subsolver::solve (int step)
@@ -1356,7 +1605,11 @@ bool Solver::Subsolver::solve (int step)
   solution = 0;
   // if converged or no equations were generated, do nothing
   if( converged || !neq )
+  {
+    fill_timer.reset();
     return true;
+  }
+  solve_timer.start();
   // reset neq -- will be re-incremented when filling equations
   neq = 0;
   // get debug info -- only valid before a solveLoop() call
@@ -1434,6 +1687,16 @@ bool Solver::Subsolver::solve (int step)
     tmp.getErrors(static_cast<double*>(errors.getDataPtr()));
   }
 
+  solve_timer.stop();
+  if( use_metrics )
+  {
+    const double scale = 1e-3/LOFAR::NSTimer::cpuSpeedInMHz();
+    metrics()[FTimeFill]  = fill_timer.totalTime()*scale;
+    metrics()[FTimeSolve] = solve_timer.totalTime()*scale;
+  }
+  fill_timer.reset();
+  solve_timer.reset();
+
   // check if converged;
 #ifdef USE_OLD_LSQFIT
   converged = ((abs(fit) <= settings.epsilon) && fit <= 0.0);
@@ -1530,10 +1793,7 @@ void Solver::setStateImpl (DMI::Record::Ref & newst,bool initializing)
   newst[FInterruptSolution].get(interrupt_);
 
   newst[FMTSolve].get(mt_solve_,initializing);
-  if( mt_solve_ && worker_threads_.empty() )
-    startWorkerThreads();
-  else if( !mt_solve_ )
-    stopWorkerThreads();
+  newst[FMTFillSlices].get(mt_fill_slices_,initializing);
   //// SBY open file for writing, and write all names of children
   if (newst[FDebugFile].get(debug_filename_,initializing)) {
     write_debug_=true;
@@ -1552,205 +1812,246 @@ void Solver::setStateImpl (DMI::Record::Ref & newst,bool initializing)
   ////////////////////////////////////
 }
 
-void Solver::startWorkerThreads ()
+// A SubsolverWorkOrder runs one phase (filling or solving) of one
+// subsolver on the MTPool brigade
+class Solver::SubsolverWorkOrder : public MTPool::AbstractWorkOrder
 {
-  // do nothing if -mt is not configured
-  int nt = MTPool::num_threads();
-  if( nt<2 )
-    return;
-  // start workers
-  wt_flush_tables_ = wt_solve_loop_ = false;
-  wt_num_active_ = 0;
-  cdebug(0)<<"starting "<<nt-1<<" worker threads\n";
-  worker_threads_.resize(nt-1);
-  wt_info_.resize(nt-1);
-  wt_active_.resize(nt-1);
-  wt_active_.assign(nt-1,false);
-  for( int i=0; i<nt-1; i++ )
-  {
-    wt_info_[i].solver = this;
-    wt_info_[i].wt_num = i;
-    worker_threads_[i] = Thread::create(runWorkerThread,&(wt_info_[i]));
-  }
-}
+  public:
+    SubsolverWorkOrder (Solver &solver,int isolver,int phase,int depth)
+    : MTPool::AbstractWorkOrder(depth),
+      solver_(solver),isolver_(isolver),phase_(phase)
+    {}
 
-void Solver::stopWorkerThreads ()
-{
-  if( worker_threads_.empty() )
-    return;
-  cdebug(0)<<"stopping worker threads\n";
-  // set mt_solve_ to false and wake all workers
-  Thread::Mutex::Lock lock(worker_cond_);
-  mt_solve_ = false;
-  worker_cond_.broadcast();
-  lock.release();
-  // rejoin
-  cdebug(1)<<"rejoining worker threads\n";
-  for( uint i=0; i<worker_threads_.size(); i++ )
-    worker_threads_[i].join();
-  worker_threads_.clear();
-}
+    virtual void execute (MTPool::Brigade &)
+    { solver_.executeSubsolverOrder(isolver_,phase_); }
+
+    virtual string sdebug (int=0) const
+    { return Debug::ssprintf("%s SS%d/%d",solver_.name().c_str(),isolver_,phase_); }
+
+  private:
+    Solver &solver_;
+    int isolver_;
+    int phase_;
+};
 
-// static function starts up a worker thread
-void * Solver::runWorkerThread (void *pinfo_void)
+void Solver::runSubsolverOrders (int phase)
 {
-  WorkerThreadInfo *pinfo = static_cast<WorkerThreadInfo*>(pinfo_void);
-  return pinfo->solver->workerLoop(pinfo->wt_num);
+  // converged subsolvers need no work order: they are not filled, and
+  // solve() returns immediately
+  std::vector<int> active;
+  active.reserve(numSubsolvers());
+  for( int i=0; i<numSubsolvers(); i++ )
+  {
+    Subsolver &ss = subsolvers_[i];
+    if( !ss.converged )
+      active.push_back(i);
+    else if( phase == SS_SOLVE )
+    {
+      ss.solve(cur_iter_);
+      num_conv_++;
+    }
+  }
+  if( phase == SS_FILL && mt_fill_slices_ > 1 && !active.empty() )
+  {
+    makeFillSlices(active);
+    runWorkOrders(active,SS_FILL_SLICE);
+    mergeFillSlices();
+  }
+  else
+    runWorkOrders(active,phase);
 }
 
-// Activates all worker threads to process subsolvers.
-// Process what we can in this thread too, and return when all jobs are
-// complete.
-// Any exceptions generated by the subsolvers are stored, and
-// eventually rethrown from here
-void Solver::activateSubsolverWorkers ()
+void Solver::runWorkOrders (const std::vector<int> &jobs,int phase)
 {
-  // init queue and clear error list
-  Thread::Mutex::Lock lock(worker_cond_);
-  Thread::Mutex::Lock lock1(worker_exit_cond_);
-  cdebug(3)<<"T"<<Thread::self()<<" activating workers"<<endl;
-  wt_num_ss_ = 0;
-  wt_exceptions_.clear();
-  // wakeup threads, we expect all to be active
-  wt_solve_loop_ = true;
-  wt_num_active_ = worker_threads_.size();
-  wt_active_.assign(wt_active_.size(),true);
-  worker_cond_.broadcast();
-  // go into our own loop to start processing subsolvers
-  processSolversLoop(lock);
-  lock.release();
-  // wait for worker threads to become inactive
-  bool active = true;
-  while( active )
+  wo_exceptions_.clear();
+  // with a single order, there's no point in going through the queue
+  if( jobs.size() == 1 )
+  {
+    wo_pending_ = 1;
+    executeSubsolverOrder(jobs.front(),phase);
+  }
+  else if( !jobs.empty() )
   {
-    worker_exit_cond_.wait();
-    // if amny thread is still active, flag will be re-raised
-    active = false;
-    for( uint i=0; i<wt_active_.size(); i++ )
-      if( wt_active_[i] )
+    MTPool::Brigade &brigade = MTPool::brigade();
+    int depth = currentRequestDepth()+1;
+    wo_pending_ = jobs.size();
+    cdebug(3)<<"placing "<<wo_pending_<<" subsolver work orders for phase "<<phase<<endl;
+    Thread::Mutex::Lock lock;
+    brigade.lockQueue(lock);
+    // since later orders are executed sooner, place them in reverse
+    for( int i=jobs.size()-1; i>=0; i-- )
+      brigade.placeWorkOrder(new SubsolverWorkOrder(*this,jobs[i],phase,depth));
+    brigade.awakenWorker();
+    lock.release();
+    // now execute work orders ourselves until all are complete
+    lock.relock(wo_cond_);
+    while( wo_pending_ > 0 )
+    {
+      Thread::Mutex::Lock lock2;
+      brigade.lockQueue(lock2);
+      MTPool::AbstractWorkOrder *wo = brigade.getWorkOrder(false,depth); // wait=false
+      // if there's nothing on the queue, wait for the workers to finish
+      if( !wo )
       {
-        active = true;
-        break;
+        MTPool::Brigade::markThreadAsBlocked(name());
+        lock2.release();
+        wo_cond_.wait();
+        MTPool::Brigade::markThreadAsUnblocked(name());
+        continue;
       }
+      lock2.release();
+      lock.release();
+      wo->execute(brigade);
+      brigade.finishWithWorkOrder(wo);
+      lock.relock(wo_cond_);
+    }
+    cdebug(3)<<"all subsolver work orders completed"<<endl;
   }
-  cdebug(3)<<"T"<<Thread::self()<<" all workers finished"<<endl;
   // if any exceptions have accumulated, throw them
-  if( !wt_exceptions_.empty() )
-    throw wt_exceptions_;
+  if( !wo_exceptions_.empty() )
+    throw wo_exceptions_;
 }
 
-// If a worker thread is available, wakes it up to flush parm tables
-// Otherwise flushes table directly in here.
-void Solver::flushTablesInWorkerThread ()
+void Solver::makeFillSlices (std::vector<int> &isolvers)
 {
-#ifndef HAVE_PARMDB
-  // if no worker threads available, flush tables
-  if( worker_threads_.empty() )
+  int nslices = mt_fill_slices_;
+  int neqsets = eqsets_.size();
+  // Slice the queued VellSets if there are enough of them, else slice the
+  // cells, along the longest axis of the subsolver's box. Work out the
+  // number of slices first, since the partial solvers are too big to be
+  // copied around as the vector grows.
+  std::vector<int> nparts(isolvers.size());
+  std::vector<int> cut_axis(isolvers.size(),-1);
+  int total = 0;
+  for( uint i=0; i<isolvers.size(); i++ )
   {
-    ParmTableUtils::flushTables();
+    const Subsolver &ss = subsolvers_[isolvers[i]];
+    nparts[i] = std::min(nslices,neqsets);
+    if( neqsets < nslices )
+    {
+      int maxext = 1;
+      for( uint iaxis=0; iaxis<ss.box_shape.size(); iaxis++ )
+        if( ss.box_shape[iaxis] > maxext )
+        {
+          maxext = ss.box_shape[iaxis];
+          cut_axis[i] = iaxis;
+        }
+      if( cut_axis[i] >= 0 )
+        nparts[i] = std::min(nslices,maxext);
+    }
+    total += nparts[i];
   }
-  // else wake a worker
-  else
+  fill_slices_.clear();
+  fill_slices_.resize(total);
+  int islice = 0;
+  for( uint i=0; i<isolvers.size(); i++ )
   {
-    Thread::Mutex::Lock lock(worker_cond_);
-    cdebug(3)<<"T"<<Thread::self()<<" activating a worker to flush tables"<<endl;
-    wt_flush_tables_ = true;
-    worker_cond_.signal();
+    const Subsolver &ss = subsolvers_[isolvers[i]];
+    int n = nparts[i];
+    int iaxis = cut_axis[i];
+    for( int k=0; k<n; k++,islice++ )
+    {
+      FillSlice &slice = fill_slices_[islice];
+      slice.isolver = isolvers[i];
+      slice.box0 = ss.box0;
+      slice.box_shape = ss.box_shape;
+      if( iaxis >= 0 )
+      {
+        int ext = ss.box_shape[iaxis];
+        slice.eq0 = 0;
+        slice.eq1 = neqsets;
+        slice.box0[iaxis] += k*ext/n;
+        slice.box_shape[iaxis] = (k+1)*ext/n - k*ext/n;
+      }
+      else
+      {
+        slice.eq0 = k*neqsets/n;
+        slice.eq1 = (k+1)*neqsets/n;
+      }
+      ss.initPartial(slice.solver);
+      slice.neq = 0;
+      slice.timer.reset();
+    }
   }
-#endif
+  cdebug(3)<<isolvers.size()<<" subsolvers split into "<<total<<" slices"<<endl;
+  isolvers.resize(total);
+  for( int i=0; i<total; i++ )
+    isolvers[i] = i;
 }
 
-
-// processes subsolvers in a loop, until all complete, or an exception
-// occurs. On entry, lock is a lock on worker_cond_.
-void Solver::processSolversLoop (Thread::Mutex::Lock &lock)
+void Solver::mergeFillSlices ()
 {
-  cdebug(3)<<"T"<<Thread::self()<<" subsolver loop started"<<endl;
-  // loop until all subsolvers are processed
-  while( wt_num_ss_ < numSubsolvers() )
+  // merge in order of slices, so that results do not depend on which
+  // thread finished first
+  for( uint i=0; i<fill_slices_.size(); i++ )
   {
-    // at this point we hold a lock on worker_cond_. We only ever release
-    // it on the inside, when we go to process a subsolver
-    // grab a non-converged subsolver
-    cdebug(3)<<"T"<<Thread::self()<<" grabbing subsolver "<<wt_num_ss_<<endl;
-    Subsolver &ss = subsolvers_[wt_num_ss_++];
-    // if solver is converged, grab the next one (but do clear its solution vector)
-    if( ss.converged )
-    {
-      ss.solution = 0;
-      num_conv_++;
-//      cerr<<"processSolversLoop: thread "<<Thread::self()<<" already converged, num_conv "<<num_conv_<<endl;
-      continue;
-    }
-    // release lock to give the other threads a chance to grab their own
-    lock.release();
-    // process the subsolver
-    bool converged = false;
-    try
-    {
-      converged = ss.solve(cur_iter_);
-    }
-    // break out on error
-    catch( std::exception &exc )
-    {
-      lock.lock(worker_cond_);
-      wt_exceptions_.add(exc);
-      break;
-    }
-    // relock worker_cond_
-    lock.lock(worker_cond_);
-    if( converged )
+    FillSlice &slice = fill_slices_[i];
+    Subsolver &ss = subsolvers_[slice.isolver];
+    if( slice.neq )
     {
-      num_conv_++;
-//      cerr<<"processSolversLoop: thread "<<Thread::self()<<" converged, num_conv "<<num_conv_<<endl;
+      FailWhen(!ss.solver.merge(slice.solver),ssprintf("failed to merge partial "
+               "equations into subsolver %d, try setting mt_fill_slices=0",slice.isolver));
+      ss.neq += slice.neq;
     }
+    ss.fill_timer.add(slice.timer);
   }
-  // at this point we have a lock on worker_cond
-  wt_solve_loop_ = false;
-  cdebug(3)<<"T"<<Thread::self()<<" subsolver loop finished"<<endl;
+  fill_slices_.clear();
 }
 
-void * Solver::workerLoop (int wt_num)
+void Solver::executeSubsolverOrder (int ijob,int phase)
 {
-  Thread::Mutex::Lock lock(worker_cond_);
-  while( true )
+  bool converged = false;
+  try
   {
-    // wait on condition variable until awoken with active subsolvers,
-    // or with worker threads being stopped
-    while( mt_solve_ && !wt_active_[wt_num] && !wt_flush_tables_ )
-      worker_cond_.wait();
-    // stop condition
-    if( !mt_solve_ )
-      return 0;
-    // flush parmtables
-    if( wt_flush_tables_ )
+    if( phase == SS_FILL )
     {
-#ifndef HAVE_PARMDB
-      ParmTableUtils::flushTables();
-#endif
-      wt_flush_tables_ = false;
+      Subsolver &ss = subsolvers_[ijob];
+      ss.fill_timer.start();
+      for( uint i=0; i<eqsets_.size(); i++ )
+      {
+        if( eqsets_[i].pvs->getValue().isReal() )
+          fillSubsolver<double>(ss.solver,ss.neq,ss,ss.box0,ss.box_shape,eqsets_[i]);
+        else
+          fillSubsolver<dcomplex>(ss.solver,ss.neq,ss,ss.box0,ss.box_shape,eqsets_[i]);
+      }
+      ss.fill_timer.stop();
     }
-    // do a solving loop
-    if( wt_solve_loop_ )
-      processSolversLoop(lock);
-    if( wt_active_[wt_num] )
+    else if( phase == SS_FILL_SLICE )
     {
-      // release lock, lock exit condition variable, mark ourselves as inactive
-      lock.release();
-      lock.lock(worker_exit_cond_);
-      wt_active_[wt_num] = false;
-      int num_active = 0;
-      for( uint i=0; i<wt_active_.size(); i++ )
-        if( wt_active_[i] )
-          num_active++;
-//      cerr<<"Thread "<<Thread::self()<<" exiting: "<<num_active<<" threads still active"<<endl;
-      if( !num_active )
-        worker_exit_cond_.broadcast();
-      // reacquire lock on condition variable
-      lock.release();
-      lock.lock(worker_cond_);
+      FillSlice &slice = fill_slices_[ijob];
+      const Subsolver &ss = subsolvers_[slice.isolver];
+      slice.timer.start();
+      for( int i=slice.eq0; i<slice.eq1; i++ )
+      {
+        if( eqsets_[i].pvs->getValue().isReal() )
+          fillSubsolver<double>(slice.solver,slice.neq,ss,slice.box0,slice.box_shape,eqsets_[i]);
+        else
+          fillSubsolver<dcomplex>(slice.solver,slice.neq,ss,slice.box0,slice.box_shape,eqsets_[i]);
+      }
+      slice.timer.stop();
+    }
+    else
+    {
+      Subsolver &ss = subsolvers_[ijob];
+      converged = ss.solve(cur_iter_);
+      cdebug(5)<<"subsolver "<<ijob<<" fit is "<<ss.fit<<", converged "<<ss.converged<<endl;
     }
   }
+  catch( std::exception &exc )
+  {
+    Thread::Mutex::Lock lock(wo_cond_);
+    wo_exceptions_.add(exc);
+  }
+  catch( ... )
+  {
+    Thread::Mutex::Lock lock(wo_cond_);
+    wo_exceptions_.add(LOFAR::Exception(ssprintf("unknown exception in subsolver work order %d",ijob)));
+  }
+  Thread::Mutex::Lock lock(wo_cond_);
+  if( converged )
+    num_conv_++;
+  wo_pending_--;
+  wo_cond_.broadcast();
 }
 
 
@@ -26,6 +26,7 @@
 
 #include <MEQ/Node.h>
 #include <MEQ/VellSet.h>
+#include <TimBase/Timer.h>
 #include <scimath/Fitting/LSQaips.h>
 
 #include <set>
@@ -36,7 +37,7 @@
 #pragma aid Converged Array Convergence Quota Tiling Tilings Super Size Stride
 #pragma aid Total SS Uk Unknown Unknowns Spid Set Stride Map Colin LM Factor MT
 #pragma aid Begin End Deriv Balanced Equations Ready String
-#pragma aid Debug File Interrupt Solution Flush Tables
+#pragma aid Debug File Interrupt Solution Flush Tables Time Fill Slices
 
 // The comments below are used to automatically generate a default
 // init-record for the class
@@ -64,6 +65,19 @@
 //  Send up a Save.Funklets command after solve
 //field: flush_tables F
 //  Flush parmtables at end of every solution. Default is not to flush.
+//field: mt_solve T
+//  When the forest runs multithreaded, fill and solve the subsolvers
+//  (one per solver tile and solve group) in parallel, as work orders on
+//  the thread pool. The time spent filling and solving each subsolver is
+//  reported in its metrics record (time.fill and time.solve, in ms).
+//field: mt_fill_slices 0
+//  If >1, the equations of each subsolver are accumulated in this many
+//  slices in parallel (of the condeq results, or of the cells if there
+//  are fewer results than slices). Each slice gets its own set of
+//  partial normal equations, which are merged into the subsolver at the
+//  end (time.fill is then the total over all slices). Useful when there
+//  are few subsolvers but many condeqs. Only used when mt_solve is in
+//  effect.
 //field: parm_group hiid('parm')
 //  HIID of the parameter group to use.
 //field: solvable [=]
@@ -306,6 +320,11 @@ private:
       // has changed.
       bool advance (int idim);
 
+      // computes the box of cells covered by tile #itile, given the
+      // hypercube shape: box0 is the first cell of the box, boxshape
+      // its shape
+      void tileBox (LoShape &box0,LoShape &boxshape,int itile,const LoShape &shape) const;
+
       // creates a record describing the tiling
       DMI::Record::Ref asRecord () const;
   };
@@ -374,11 +393,26 @@ private:
       // raised once solver has converged to a solution
       bool converged;
 
+      // solver tile and solve group of this subsolver, and the box of
+      // cells covered by the tile (see Tiling::tileBox())
+      int itile;
+      int solvegroup;
+      LoShape box0;
+      LoShape box_shape;
+
+      // time spent filling and solving in the current step
+      LOFAR::NSTimer fill_timer;
+      LOFAR::NSTimer solve_timer;
+
       // constructor
       Subsolver ()
-      : nuk(0),converged(false)
+      : nuk(0),converged(false),itile(0),solvegroup(0)
       {}
 
+      // inits a solver object for accumulating a partial set of normal
+      // equations, to be merged into ours
+      void initPartial (casa::LSQaips &part) const;
+
       // called prior to starting a solution.
       // inits the solver object and various internals.
       // uk0 is a global count of unknowns, which is incremented by this subsolver's count.
@@ -462,49 +496,85 @@ private:
 
   // mt-related methods and members
   bool mt_solve_;
-  std::vector<Thread::ThrID> worker_threads_;
 
-  // start/stop worker pool
-  void startWorkerThreads ();
-  void stopWorkerThreads ();
+  // In mt mode, the VellSets returned by children are not turned into
+  // equations as they arrive. Instead they are queued up here (with their
+  // spids already looked up), and once all children have returned, each
+  // subsolver fills in its own equations in a separate work order.
+  class EquationSet
+  {
+    public:
+      const VellSet *pvs;
+      std::vector<SpidInfo *> pspi;
+  };
+  std::vector<EquationSet> eqsets_;
+  // refs to child results, to keep the queued VellSets alive
+  std::vector<Result::Ref> eqset_results_;
+
+  // called from getResult() to queue up a VellSet in mt mode
+  void queueEquations (const VellSet &vs,const Result::Ref &res);
 
-  // run a worker thread loop
-  static void * runWorkerThread (void *pinfo);
-  void * workerLoop (int wt_num);
+  // Fills equations from a queued VellSet into a solver object, for
+  // the given subsolver and box of cells. With the subsolver's own solver
+  // and box, this produces the same equations, in the same order, as
+  // fillEquations() would. neq is incremented by the number of equations.
+  template<typename T>
+  void fillSubsolver (casa::LSQaips &solver,int &neq,const Subsolver &ss,
+                      const LoShape &box0,const LoShape &box_shape,
+                      const EquationSet &eqs);
 
+  // number of slices for parallel accumulation of a subsolver's equations
+  int mt_fill_slices_;
 
-  // Processes subsolvers in a loop, until all complete, or an exception
-  // occurs. Lock is a lock on worker_cond_, must be held when
-  // calling this function (and will also be held when it returns).
-  void processSolversLoop (Thread::Mutex::Lock &lock);
-  // void processSolversLoop ();
+  // a slice of a subsolver's equations, accumulated in a work order
+  class FillSlice
+  {
+    public:
+      int isolver;              // subsolver being filled
+      int eq0,eq1;              // range of queued VellSets
+      LoShape box0,box_shape;   // box of cells
+      casa::LSQaips solver;     // partial normal equations
+      int neq;                  // number of equations
+      LOFAR::NSTimer timer;
+  };
+  std::vector<FillSlice> fill_slices_;
+
+  // splits the given subsolvers into slices, replaces isolvers with the
+  // list of slices
+  void makeFillSlices (std::vector<int> &isolvers);
+  // merges the accumulated slices into their subsolvers
+  void mergeFillSlices ();
 
-  // Activates all worker threads to process subsolvers.
-  // Process what we can in this thread, and returns when all jobs are
-  // complete.
-  void activateSubsolverWorkers ();
-  // activates a worker thread to flush parm tables
-  void flushTablesInWorkerThread ();
+  // phases of processing a subsolver in a work order
+  typedef enum
+  {
+    SS_FILL  = 0,       // fill equations from the queued VellSets
+    SS_SOLVE = 1,       // do a solve step
+    SS_FILL_SLICE = 2   // fill a slice of equations (see FillSlice)
+  } SubsolverPhase;
 
+  // Runs the given phase for all subsolvers that have not converged,
+  // as work orders on the MTPool brigade. The calling thread executes
+  // work orders too, and returns when all are complete. Any exceptions
+  // generated by the subsolvers are collected and rethrown from here.
+  void runSubsolverOrders (int phase);
 
-  int wt_num_ss_;         // number of subsolvers taken by workers
+  // places work orders for the given phase and jobs (subsolvers or
+  // slices), and waits for them to complete
+  void runWorkOrders (const std::vector<int> &jobs,int phase);
 
-    // condition var to signal worker threads to wake up
-  Thread::Condition worker_cond_;
-  bool wt_solve_loop_;    // flag: worker was woken to call processSolversLoop()
-  bool wt_flush_tables_;  // flag: worker was woken to call ParmTableUtils::flushTables();
+  // called from a work order to run a phase for job #ijob
+  void executeSubsolverOrder (int ijob,int phase);
 
-  // structure of per-worker-thread info, passed during Thread::create()
-  typedef struct { Solver *solver; int wt_num; } WorkerThreadInfo;
-  std::vector<WorkerThreadInfo> wt_info_;
+  class SubsolverWorkOrder;
+  friend class SubsolverWorkOrder;
 
-  int wt_num_active_;     // number of active workers
-  std::vector<bool> wt_active_;  // flag: worker is active
-  // condition var to signal main thread that workers have finished (wt_num_active=0)
-  Thread::Condition worker_exit_cond_;
+  // condition var signalled as subsolver work orders complete
+  Thread::Condition wo_cond_;
+  int wo_pending_;        // number of work orders not yet completed
 
-  // exceptions raised by workers are accumulated here
-  DMI::ExceptionList wt_exceptions_;
+  // exceptions raised by subsolver work orders are accumulated here
+  DMI::ExceptionList wo_exceptions_;
 
   // set to True to interrupt solving, reset at start of each solution
   bool interrupt_;
@@ -692,6 +692,25 @@ namespace Meq { class Functional; };
               };
             };
 #endif
+#ifndef _defined_id_TpMeqFused
+#define _defined_id_TpMeqFused 1
+const DMI::TypeId TpMeqFused(-1808);              // from /home/oms/LOFAR/Timba/MeqNodes/src/Fused.h:31
+const int TpMeqFused_int = -1808;
+namespace Meq { class Fused; };
+            namespace DMI {
+              template<>
+              class DMIBaseTypeTraits<Meq::Fused> : public TypeTraits<Meq::Fused>
+              {
+                public:
+                enum { isContainable = true };
+                enum { typeId = TpMeqFused_int };
+                enum { TypeCategory = TypeCategories::DYNAMIC };
+                enum { ParamByRef = true, ReturnByRef = true };
+                typedef const Meq::Fused & ContainerReturnType;
+                typedef const Meq::Fused & ContainerParamType;
+              };
+            };
+#endif
 #ifndef _defined_id_TpMeqGaussNoise
 #define _defined_id_TpMeqGaussNoise 1
 const DMI::TypeId TpMeqGaussNoise(-1449);         // from /home/oms/LOFAR/Timba/MeqNodes/src/GaussNoise.h:31
@@ -54,6 +54,7 @@
         Do(Meq::FMod,arg) separator \
         Do(Meq::Freq,arg) separator \
         Do(Meq::Functional,arg) separator \
+        Do(Meq::Fused,arg) separator \
         Do(Meq::GaussNoise,arg) separator \
         Do(Meq::Grid,arg) separator \
         Do(Meq::GridPoints,arg) separator \
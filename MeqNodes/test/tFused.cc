@@ -0,0 +1,264 @@
+//# tFused.cc: checks MeqFused against the chain of nodes it replaces
+//#
+//# Copyright (C) 2002-2007
+//# ASTRON (Netherlands Foundation for Research in Astronomy)
+//# and The MeqTree Foundation
+//# P.O.Box 2, 7990 AA Dwingeloo, The Netherlands, seg@astron.nl
+//#
+//# This program is free software; you can redistribute it and/or modify
+//# it under the terms of the GNU General Public License as published by
+//# the Free Software Foundation; either version 2 of the License, or
+//# (at your option) any later version.
+//#
+//# This program is distributed in the hope that it will be useful,
+//# but WITHOUT ANY WARRANTY; without even the implied warranty of
+//# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+//# GNU General Public License for more details.
+//#
+//# You should have received a copy of the GNU General Public License
+//# along with this program; if not, write to the Free Software
+//# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+//#
+//# $Id$
+
+// Evaluates the expression
+//    exp(p1*c) + z/(p2+3) - sqr(z)*p1
+// once as a chain of MeqMultiply, MeqExp, etc. nodes, and once as a single
+// MeqFused node (with the default and with a small block size), and checks
+// that the main and perturbed values are identical. p1 is a solvable parm
+// varying over the cells, p2 a solvable constant parm, c a complex constant
+// and z a complex array, so this covers real and complex operands, and
+// scalars mixed with arrays. The same is then done with missing data in
+// place of z, and for an expression that comes out missing altogether.
+// Returns non-zero on any mismatch.
+
+#include <TimBase/Debug.h>
+#include <MEQ/Forest.h>
+#include <MEQ/Node.h>
+#include <MEQ/Request.h>
+#include <MEQ/VellSet.h>
+#include <MEQ/Polc.h>
+#include <MEQ/TID-Meq.h>
+#include <MeqNodes/TID-MeqNodes.h>
+#include <DMI/NumArray.h>
+#include <DMI/Global-Registry.h>
+#include <exception>
+#include <string.h>
+
+using namespace Meq;
+using namespace std;
+
+static int dum = aidRegistry_Global() +
+                 aidRegistry_Meq() +
+                 aidRegistry_MeqNodes();
+
+static int nfail = 0;
+
+static void check (const string &name,bool ok)
+{
+  cout<<name<<": "<<(ok?"OK":"FAIL")<<endl;
+  if( !ok )
+    nfail++;
+}
+
+// returns true if the two Vells are of the same type and shape, and have
+// the same bits
+static bool identical (const Vells &a,const Vells &b)
+{
+  if( a.elementType() != b.elementType() || a.shape() != b.shape() )
+    return false;
+  return !memcmp(a.getConstDataPtr(),b.getConstDataPtr(),
+                 a.nelements()*a.elementSize());
+}
+
+// creates a node with the given class, name and (up to two) children,
+// adding the fields of rec (if given) to its init-record. Returns its index.
+static int makeNode (Forest &forest,const string &cls,const string &name,
+                     int ch0=-1,int ch1=-1,const DMI::Record *rec=0)
+{
+  DMI::Record::Ref initrec;
+  if( rec )
+    initrec <<= new DMI::Record(*rec,DMI::DEEP);
+  else
+    initrec <<= new DMI::Record;
+  initrec()["Class"] = cls;
+  initrec()["Name"] = name;
+  std::vector<int> children;
+  if( ch0 >= 0 )
+    children.push_back(ch0);
+  if( ch1 >= 0 )
+    children.push_back(ch1);
+  if( !children.empty() )
+    initrec()["Children"] = children;
+  int index;
+  forest.create(index,initrec);
+  return index;
+}
+
+// creates a solvable parm
+static int makeParm (Forest &forest,const string &name,const LoMat_double &coeff)
+{
+  DMI::Record rec;
+  rec["Default.Funklet"] <<= new Polc(coeff);
+  rec["Solvable"] = true;
+  return makeNode(forest,"MeqParm",name,-1,-1,&rec);
+}
+
+// the expression exp(p1*c) + z/(p2+3) - sqr(z)*p1, children [p1,c,p2,3,z]
+static const char *program1[] = { "$0","$1","mul","exp","$4","$2","$3","add","div","add",
+                                  "$4","sqr","$0","mul","sub" };
+// the expression (p1-m) + exp(m), children [m,p1]
+static const char *program2[] = { "$1","$0","sub","$0","exp","add" };
+
+#define PROGRAM(p) std::vector<string>(p,p+sizeof(p)/sizeof(p[0]))
+
+// creates a MeqFused node for the program over the given children, with
+// the given block size (0 for default)
+static int makeFused (Forest &forest,const string &name,const std::vector<string> &program,
+                      const std::vector<int> &children,int block_size)
+{
+  DMI::Record::Ref rec(DMI::ANONWR);
+  rec["Class"] = "MeqFused";
+  rec["Name"] = name;
+  rec["Program"] = program;
+  if( block_size )
+    rec["Block.Size"] = block_size;
+  rec["Children"] = children;
+  int index;
+  forest.create(index,rec);
+  return index;
+}
+
+// compares the results of two nodes
+static void compare (const string &name,Forest &forest,int node1,int node2,const Request &req)
+{
+  Result::Ref res1,res2;
+  forest.get(node1).execute(res1,req,0);
+  forest.get(node2).execute(res2,req,0);
+  if( res1->hasFails() || res2->hasFails() || res1->numVellSets() != 1 || res2->numVellSets() != 1 )
+  {
+    check(name+": results",false);
+    return;
+  }
+  const VellSet &vs1 = res1->vellSet(0);
+  const VellSet &vs2 = res2->vellSet(0);
+  check(name+": main value",identical(vs1.getValue(),vs2.getValue()));
+  bool ok = vs1.numSpids() > 0 && vs1.numSpids() == vs2.numSpids() &&
+            vs1.numPertSets() == vs2.numPertSets();
+  for( int i=0; ok && i<vs1.numSpids(); i++ )
+  {
+    ok = vs1.getSpid(i) == vs2.getSpid(i);
+    for( int iset=0; ok && iset<vs1.numPertSets(); iset++ )
+      ok = identical(vs1.getPerturbedValue(i,iset),vs2.getPerturbedValue(i,iset));
+  }
+  check(name+": perturbed values",ok);
+}
+
+// checks that both nodes return missing data
+static void compareMissing (const string &name,Forest &forest,int node1,int node2,const Request &req)
+{
+  Result::Ref res1,res2;
+  int code1 = forest.get(node1).execute(res1,req,0);
+  int code2 = forest.get(node2).execute(res2,req,0);
+  check(name+": result codes",(code1&NodeFace::RES_MISSING) && (code2&NodeFace::RES_MISSING));
+  check(name+": results",res1->numVellSets() == 1 && res2->numVellSets() == 1 &&
+                         res1->vellSet(0).isEmpty() && res2->vellSet(0).isEmpty());
+}
+
+int main (int argc,const char* argv[])
+{
+  Debug::initLevels(argc,argv);
+  try
+  {
+    Forest forest;
+    // children: p1 varies over the cells, p2 is constant
+    LoMat_double coeff1(2,3);
+    coeff1 = .1;
+    coeff1(0,0) = .5;
+    coeff1(1,2) = -.2;
+    int p1 = makeParm(forest,"p1",coeff1);
+    LoMat_double coeff2(1,1);
+    coeff2 = 1.5;
+    int p2 = makeParm(forest,"p2",coeff2);
+    DMI::Record rec;
+    rec["Value"] = dcomplex(.3,-.7);
+    int c = makeNode(forest,"MeqConstant","c",-1,-1,&rec);
+    rec["Value"] = double(3);
+    int c3 = makeNode(forest,"MeqConstant","c3",-1,-1,&rec);
+    int z = makeNode(forest,"MeqPolar","z",p2,p1);
+
+    // the expression as a chain of nodes
+    int p1c      = makeNode(forest,"MeqMultiply","p1c",p1,c);
+    int exp_p1c  = makeNode(forest,"MeqExp","exp_p1c",p1c);
+    int p2_3     = makeNode(forest,"MeqAdd","p2_3",p2,c3);
+    int z_p2_3   = makeNode(forest,"MeqDivide","z_p2_3",z,p2_3);
+    int sum      = makeNode(forest,"MeqAdd","sum",exp_p1c,z_p2_3);
+    int sqr_z    = makeNode(forest,"MeqSqr","sqr_z",z);
+    int sqr_z_p1 = makeNode(forest,"MeqMultiply","sqr_z_p1",sqr_z,p1);
+    int chain    = makeNode(forest,"MeqSubtract","chain",sum,sqr_z_p1);
+
+    // the same as fused nodes
+    std::vector<int> leaves;
+    leaves.push_back(p1);
+    leaves.push_back(c);
+    leaves.push_back(p2);
+    leaves.push_back(c3);
+    leaves.push_back(z);
+    int fused = makeFused(forest,"fused",PROGRAM(program1),leaves,0);
+    int fused_blocks = makeFused(forest,"fused_blocks",PROGRAM(program1),leaves,16);
+
+    // missing data: a deactivated node returns an empty result, which a
+    // tensor-mode composer turns into an empty VellSet
+    DMI::Record offrec;
+    offrec["Value"] = double(1);
+    offrec["Control.Status"] = 0;
+    int off = makeNode(forest,"MeqConstant","off",-1,-1,&offrec);
+    DMI::Record comprec;
+    comprec["Dims"] = std::vector<int>(1,0);
+    int m = makeNode(forest,"MeqComposer","m",off,-1,&comprec);
+    // the first expression with m in place of z: MeqAdd and MeqMultiply
+    // skip the missing operand, the rest propagate it
+    int m_div    = makeNode(forest,"MeqDivide","m_div",m,p2_3);
+    int m_sum    = makeNode(forest,"MeqAdd","m_sum",exp_p1c,m_div);
+    int m_sqr    = makeNode(forest,"MeqSqr","m_sqr",m);
+    int m_sqr_p1 = makeNode(forest,"MeqMultiply","m_sqr_p1",m_sqr,p1);
+    int m_chain  = makeNode(forest,"MeqSubtract","m_chain",m_sum,m_sqr_p1);
+    leaves[4] = m;
+    int m_fused = makeFused(forest,"m_fused",PROGRAM(program1),leaves,0);
+    int m_fused_blocks = makeFused(forest,"m_fused_blocks",PROGRAM(program1),leaves,16);
+    // an expression that is missing as a whole, although one child is not
+    int e_sub    = makeNode(forest,"MeqSubtract","e_sub",p1,m);
+    int e_exp    = makeNode(forest,"MeqExp","e_exp",m);
+    int e_chain  = makeNode(forest,"MeqAdd","e_chain",e_sub,e_exp);
+    std::vector<int> leaves2;
+    leaves2.push_back(m);
+    leaves2.push_back(p1);
+    int e_fused = makeFused(forest,"e_fused",PROGRAM(program2),leaves2,0);
+
+    forest.initAll();
+    check("init",!forest.numInitErrors());
+
+    // odd numbers of cells, so that blocks have remainders
+    Domain domain(1,4,-2,3);
+    Request::Ref reqref;
+    Request &req = reqref <<= new Request(new Cells(domain,9,7));
+    req.setRequestType(RequestType::EVAL_SINGLE);
+    compare("fused",forest,chain,fused,req);
+    compare("fused in blocks",forest,chain,fused_blocks,req);
+    compare("missing operand",forest,m_chain,m_fused,req);
+    compare("missing operand in blocks",forest,m_chain,m_fused_blocks,req);
+    compareMissing("missing result",forest,e_chain,e_fused,req);
+  }
+  catch( std::exception& x )
+  {
+    cout << "Caught exception: " << x.what() << endl;
+    return 1;
+  }
+  if( nfail )
+  {
+    cout<<nfail<<" test(s) FAILED\n";
+    return 1;
+  }
+  cout << "OK" << endl;
+  return 0;
+}
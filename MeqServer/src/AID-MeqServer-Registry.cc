@@ -41,6 +41,9 @@ DMI::BObj * __construct_MeqPyTensorFuncNode (int n) { return n>0 ? new Meq::PyTe
         AtomicID::registerId(-1305,"Children")+
         AtomicID::registerId(-1040,"List")+
         AtomicID::registerId(-1563,"Batch")+
+        AtomicID::registerId(-1183,"Field")+
+        AtomicID::registerId(-1787,"Delta")+
+        AtomicID::registerId(-1786,"Deleted")+
         AtomicID::registerId(-1203,"App")+
         AtomicID::registerId(-1204,"Command")+
         AtomicID::registerId(-1483,"Args")+
@@ -148,6 +151,11 @@ DMI::BObj * __construct_MeqPyTensorFuncNode (int n) { return n>0 ? new Meq::PyTe
         AtomicID::registerId(-1721,"MeqPyTensorFuncNode")+
         TypeInfoReg::addToRegistry(-1721,TypeInfo(TypeInfo::DYNAMIC,0))+
         DynamicTypeManager::addToRegistry(-1721,__construct_MeqPyTensorFuncNode)+
+        AtomicID::registerId(-1791,"Blocked")+
+        AtomicID::registerId(-1816,"Async")+
+        AtomicID::registerId(-1531,"Stats")+
+        AtomicID::registerId(-1817,"Pipeline")+
+        AtomicID::registerId(-1741,"Depth")+
     0;
     return res;
   }
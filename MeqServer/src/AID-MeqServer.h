@@ -28,11 +28,21 @@ const int AidApp_int = -1203;
 const DMI::AtomicID AidArgs(-1483);               // from /home/oms/LOFAR/Timba/MeqServer/src/MeqServer.h:13
 const int AidArgs_int = -1483;
 #endif
+#ifndef _defined_id_AidAsync
+#define _defined_id_AidAsync 1
+const DMI::AtomicID AidAsync(-1816);              // from /home/oms/LOFAR/Timba/MeqServer/src/VisDataMux.h:37
+const int AidAsync_int = -1816;
+#endif
 #ifndef _defined_id_AidBatch
 #define _defined_id_AidBatch 1
 const DMI::AtomicID AidBatch(-1563);              // from /home/oms/LOFAR/Timba/MeqServer/src/MeqServer.h:13
 const int AidBatch_int = -1563;
 #endif
+#ifndef _defined_id_AidBlocked
+#define _defined_id_AidBlocked 1
+const DMI::AtomicID AidBlocked(-1791);            // from /home/oms/LOFAR/Timba/MeqServer/src/VisDataMux.h:37
+const int AidBlocked_int = -1791;
+#endif
 #ifndef _defined_id_AidBreakpoint
 #define _defined_id_AidBreakpoint 1
 const DMI::AtomicID AidBreakpoint(-1359);         // from /home/oms/LOFAR/Timba/MEQ/src/Node.h:40
@@ -138,6 +148,21 @@ const int AidDebug_int = -1482;
 const DMI::AtomicID AidDelete(-1336);             // from /home/oms/LOFAR/Timba/MEQ/src/Forest.h:31
 const int AidDelete_int = -1336;
 #endif
+#ifndef _defined_id_AidDeleted
+#define _defined_id_AidDeleted 1
+const DMI::AtomicID AidDeleted(-1786);            // from /home/oms/LOFAR/Timba/MeqServer/src/MeqServer.h:13
+const int AidDeleted_int = -1786;
+#endif
+#ifndef _defined_id_AidDelta
+#define _defined_id_AidDelta 1
+const DMI::AtomicID AidDelta(-1787);              // from /home/oms/LOFAR/Timba/MeqServer/src/MeqServer.h:13
+const int AidDelta_int = -1787;
+#endif
+#ifndef _defined_id_AidDepth
+#define _defined_id_AidDepth 1
+const DMI::AtomicID AidDepth(-1741);              // from /home/oms/LOFAR/Timba/MeqServer/src/VisDataMux.h:38
+const int AidDepth_int = -1741;
+#endif
 #ifndef _defined_id_AidDisable
 #define _defined_id_AidDisable 1
 const DMI::AtomicID AidDisable(-1471);            // from /home/oms/LOFAR/Timba/MeqServer/src/MeqServer.h:15
@@ -178,6 +203,11 @@ const int AidExecute_int = -1479;
 const DMI::AtomicID AidExecuting(-1623);          // from /home/oms/LOFAR/Timba/MeqServer/src/MeqServer.h:20
 const int AidExecuting_int = -1623;
 #endif
+#ifndef _defined_id_AidField
+#define _defined_id_AidField 1
+const DMI::AtomicID AidField(-1183);              // from /home/oms/LOFAR/Timba/MeqServer/src/MeqServer.h:13
+const int AidField_int = -1183;
+#endif
 #ifndef _defined_id_AidFile
 #define _defined_id_AidFile 1
 const DMI::AtomicID AidFile(-1224);               // from /home/oms/LOFAR/Timba/AppAgent/AppAgent/src/BOIOSink.h:9
@@ -363,6 +393,11 @@ const int AidOpen_int = -1045;
 const DMI::AtomicID AidOutput(-1241);             // from /home/oms/LOFAR/Timba/AppAgent/AppAgent/src/VisAgentVocabulary.h:10
 const int AidOutput_int = -1241;
 #endif
+#ifndef _defined_id_AidPipeline
+#define _defined_id_AidPipeline 1
+const DMI::AtomicID AidPipeline(-1817);           // from /home/oms/LOFAR/Timba/MeqServer/src/VisDataMux.h:38
+const int AidPipeline_int = -1817;
+#endif
 #ifndef _defined_id_AidPost
 #define _defined_id_AidPost 1
 const DMI::AtomicID AidPost(-1231);               // from /home/oms/LOFAR/Timba/AppAgent/AppAgent/src/OctoEventSink.h:12
@@ -523,6 +558,11 @@ const int AidState_int = -1072;
 const DMI::AtomicID AidStation(-1131);            // from /home/oms/LOFAR/Timba/VisCube/src/VisVocabulary.h:30
 const int AidStation_int = -1131;
 #endif
+#ifndef _defined_id_AidStats
+#define _defined_id_AidStats 1
+const DMI::AtomicID AidStats(-1531);              // from /home/oms/LOFAR/Timba/MeqServer/src/VisDataMux.h:37
+const int AidStats_int = -1531;
+#endif
 #ifndef _defined_id_AidStatus
 #define _defined_id_AidStatus 1
 const DMI::AtomicID AidStatus(-1209);             // from /home/oms/LOFAR/Timba/AppAgent/AppAgent/src/AppControlAgent.h:21
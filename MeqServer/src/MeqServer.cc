@@ -31,6 +31,7 @@
 #include <MEQ/Request.h>
 #include <MEQ/Result.h>
 #include <MEQ/MTPool.h>
+#include <MEQ/VellsPool.h>
 
 #include "config.h"
 #ifdef HAVE_MPI
@@ -121,7 +122,7 @@ const int AppState_Debug   = -( AidDebug.id() );
 
 //##ModelId=3F5F195E0140
 MeqServer::MeqServer()
-    : forest_serial(1)
+    : forest_serial(1),forest_journal_base_(1)
 {
   if( mqs_ )
     Throw1("A singleton MeqServer has already been created");
@@ -160,9 +161,12 @@ MeqServer::MeqServer()
 //  sync_commands["Save.Forest"] = &MeqServer::saveForest;
 //  sync_commands["Load.Forest"] = &MeqServer::loadForest;
   sync_commands["Clear.Forest"] = &MeqServer::clearForest;
+  sync_commands["Sync.Parm.Tables"] = &MeqServer::syncParmTables;
 
   // per-node commands
   async_commands["Node.Get.State"] = &MeqServer::nodeGetState;
+  async_commands["Node.Get.State.Batch"] = &MeqServer::nodeGetStateBatch;
+  async_commands["Node.Set.State.Batch"] = &MeqServer::nodeSetStateBatch;
   sync_commands["Node.Execute"] = &MeqServer::nodeExecute;
   // commands with a 0 pointer are automatically mapped to
   // Node::processCommand() with the Node prefix truncated.
@@ -184,6 +188,7 @@ MeqServer::MeqServer()
   async_commands["Debug.Continue"] = &MeqServer::debugContinue;
 
   debug_next_node = 0;
+  batch_num_created_ = batch_num_preexisting_ = 0;
   running_ = executing_ = clear_stop_flag_ = false;
   forest_breakpoint_ = 0;
 }
@@ -234,6 +239,53 @@ NodeFace & MeqServer::resolveNode (bool &getstate,const DMI::Record &rec)
   return forest.findNode(name);
 }
 
+int MeqServer::resolveNodeList (std::vector<NodeFace*> &nodes,
+                                std::vector<string> &errors,const DMI::Record &rec)
+{
+  std::vector<int> indices;
+  std::vector<string> names;
+  rec[AidNodeIndex].get_vector(indices);
+  rec[AidName].get_vector(names);
+  int nn = indices.size() + names.size();
+  nodes.assign(nn,0);
+  errors.assign(nn,string());
+  int nerr = 0;
+  for( int i=0; i<nn; i++ )
+  {
+    try
+    {
+      if( i < int(indices.size()) )
+        nodes[i] = &( forest.get(indices[i]) );
+      else
+        nodes[i] = &( forest.findNode(names[i-indices.size()]) );
+    }
+    catch( std::exception &exc )
+    {
+      errors[i] = exc.what();
+      nerr++;
+    }
+  }
+  cdebug(3)<<"resolved "<<nn-nerr<<" of "<<nn<<" nodes"<<endl;
+  return nerr;
+}
+
+void MeqServer::journalForestChange (int nodeindex,bool created)
+{
+  // keep the journal bounded: dropping the oldest entries simply means
+  // that clients older than the new base get a full nodelist instead
+  const uint max_journal_size = 1<<20;
+  while( forest_journal_.size() >= max_journal_size )
+  {
+    forest_journal_base_ = forest_journal_.front().serial;
+    forest_journal_.pop_front();
+  }
+  ForestChange change;
+  change.serial = forest_serial+1;
+  change.nodeindex = nodeindex;
+  change.created = created;
+  forest_journal_.push_back(change);
+}
+
 
 void MeqServer::halt (DMI::Record::Ref &out,DMI::Record::Ref &)
 {
@@ -322,6 +374,7 @@ void MeqServer::createNode (DMI::Record::Ref &out,DMI::Record::Ref &initrec)
   cdebug(2)<<endl;
   int nodeindex;
   NodeFace & node = forest.create(nodeindex,initrec);
+  journalForestChange(nodeindex,true);
   // form a response message
   const string & name = node.name();
   string classname = node.className();
@@ -333,14 +386,24 @@ void MeqServer::createNode (DMI::Record::Ref &out,DMI::Record::Ref &initrec)
   out[FForestChanged] = incrementForestSerial();
 }
 
+// A large batch may be uploaded in chunks: every chunk but the last is
+// sent with init=False. Nodes are created as each chunk arrives, while
+// initialization (which resolves children across chunks) and the forest
+// serial increment are deferred to the final chunk.
 void MeqServer::createNodeBatch (DMI::Record::Ref &out,DMI::Record::Ref &in)
 {
   setState(AidConstructing);
   script_name_ = in[AidScript|AidName].as<string>("");
+  bool init = in[AidInit].as<bool>(true);
   DMI::Container &batch = in[AidBatch].as_wr<DMI::Container>();
   int nn = batch.size();
-  postMessage(ssprintf("creating %d nodes, please wait",nn));
-  cdebug(2)<<"batch-creating "<<nn<<" nodes";
+  if( !batch_num_created_ )
+  {
+    batch_num_preexisting_ = forest.numNodes();
+    postMessage(init ? ssprintf("creating %d nodes, please wait",nn)
+                     : string("creating nodes, please wait"));
+  }
+  cdebug(2)<<"batch-creating "<<nn<<" nodes"<<(init?"":" (more to follow)")<<endl;
   for( int i=0; i<nn; i++ )
   {
     ObjRef ref;
@@ -351,17 +414,32 @@ void MeqServer::createNodeBatch (DMI::Record::Ref &out,DMI::Record::Ref &in)
     try
     {
       forest.create(nodeindex,recref);
+      journalForestChange(nodeindex,true);
     }
     catch( std::exception &exc )
     {
       postError(exc);
     }
   }
+  batch_num_created_ += nn;
+  // more chunks to follow? Report progress only
+  if( !init )
+  {
+    out[AidMessage] = ssprintf("created %d nodes so far",batch_num_created_);
+    out[AidNum] = batch_num_created_;
+    return;
+  }
+  nn = batch_num_created_;
+  batch_num_created_ = 0;
   // if no errors, initialize
+  bool relinked = false;
   if( !forest.numInitErrors() )
   {
     postMessage("initializing nodes, please wait");
     forest.initAll();
+    // initAll() re-resolves the children of nodes that existed before
+    // this batch as well, so these may have changed
+    relinked = batch_num_preexisting_ > 0;
   }
   // form a response message
   if( forest.numInitErrors() )
@@ -370,6 +448,10 @@ void MeqServer::createNodeBatch (DMI::Record::Ref &out,DMI::Record::Ref &in)
   else
     out[AidMessage] = ssprintf("successfully created %d nodes",nn);
   out[FForestChanged] = incrementForestSerial();
+  // the journal does not record relinked nodes, so clients holding a list
+  // from before this batch must get a full list
+  if( relinked )
+    resetForestJournal();
   fillForestStatus(out(),in[FGetForestStatus].as<int>(1));
 }
 
@@ -380,7 +462,25 @@ void MeqServer::createNodeBatch_Mpi (DMI::Record::Ref &out,DMI::Record::Ref &in)
   setState(AidConstructing);
   script_name_ = in[AidScript|AidName].as<string>("");
   DMI::Container &batch = in[AidBatch].as_wr<DMI::Container>();
-  int nn = batch.size();
+  // remote processors rebuild their forests from a single list, so the
+  // chunks of a chunked upload are held until the final one arrives
+  if( !batch_pending_.valid() )
+    batch_pending_ <<= new DMI::List;
+  for( int i=0; i<batch.size(); i++ )
+  {
+    ObjRef ref;
+    batch[i].detach(&ref);
+    batch_pending_().addBack(ref);
+  }
+  int nn = batch_pending_->size();
+  if( !in[AidInit].as<bool>(true) )
+  {
+    out[AidMessage] = ssprintf("received %d node definitions so far",nn);
+    out[AidNum] = nn;
+    return;
+  }
+  DMI::List::Ref specs;
+  specs.xfer(batch_pending_);
   postMessage(ssprintf("creating %d nodes, please wait",nn));
   cdebug(2)<<"splitting up nodes among MPI processors"<<endl;
   // create lists of node specifications per processor
@@ -389,12 +489,10 @@ void MeqServer::createNodeBatch_Mpi (DMI::Record::Ref &out,DMI::Record::Ref &in)
   for( int i=0; i<nproc; i++ )
     nodelist[i] <<= new DMI::List;
   // now, go through list of node specifications, and distribute it into per-processor lists
-  for( int i=0; i<nn; i++ )
+  for( DMI::List::iterator iter = specs().begin(); iter != specs().end(); iter++ )
   {
-    ObjRef ref;
-    batch[i].detach(&ref);
-    DMI::Record::Ref recref(ref);
-    ref.detach();
+    DMI::Record::Ref recref(*iter);
+    iter->detach();
     // get processor index from node state
     int proc = recref[AidProc].as<int>(0);
     if( proc < 0 || proc >= nproc )
@@ -455,6 +553,8 @@ void MeqServer::createNodeBatch_Mpi (DMI::Record::Ref &out,DMI::Record::Ref &in)
   // form a response message
   out[AidMessage] = ssprintf("created %d nodes",nn);
   out[FForestChanged] = incrementForestSerial();
+  // nodes created here are not journaled, so no delta can span this serial
+  resetForestJournal();
   fillForestStatus(out(),in[FGetForestStatus].as<int>(0));
 }
 #endif
@@ -475,6 +575,7 @@ void MeqServer::deleteNode (DMI::Record::Ref &out,DMI::Record::Ref &in)
   cdebug(2)<<"deleting node "<<name<<"("<<nodeindex<<")\n";
   // remove from forest
   forest.remove(nodeindex);
+  journalForestChange(nodeindex,false);
   // do not use node below: ref no longer valid
   out[AidMessage] = "deleted " + makeNodeLabel(name,nodeindex);
   // fill optional response fields
@@ -493,6 +594,104 @@ void MeqServer::nodeGetState (DMI::Record::Ref &out,DMI::Record::Ref &in)
   cdebug(5)<<"Returned state is: "<<out->sdebug(20)<<endl;
 }
 
+void MeqServer::nodeGetStateBatch (DMI::Record::Ref &out,DMI::Record::Ref &in)
+{
+  std::vector<NodeFace*> nodes;
+  std::vector<string> errors;
+  int nerr = resolveNodeList(nodes,errors,*in);
+  // optional subset of state fields to return; field names may use
+  // underscores or dots as separators (i.e. "cache_policy")
+  std::vector<string> fieldnames;
+  std::vector<HIID> fields;
+  if( in[AidField].get_vector(fieldnames) )
+    for( uint i=0; i<fieldnames.size(); i++ )
+      fields.push_back(HIID(fieldnames[i],false,"._"));
+  int nn = nodes.size();
+  cdebug(2)<<"getState for "<<nn<<" nodes, "<<fields.size()<<" fields"<<endl;
+  DMI::Vec *pvec;
+  out[AidState] <<= pvec = new DMI::Vec(TpDMIRecord,nn);
+  for( int i=0; i<nn; i++ )
+  {
+    DMI::Record::Ref ref;
+    if( nodes[i] )
+    {
+      try
+      {
+        nodes[i]->getSyncState(ref);
+        if( !fields.empty() )
+        {
+          DMI::Record::Ref subset(new DMI::Record);
+          for( uint j=0; j<fields.size(); j++ )
+            if( ref->hasField(fields[j]) )
+              subset[fields[j]] = (*ref)[fields[j]].ref();
+          ref = subset;
+        }
+      }
+      catch( std::exception &exc )
+      {
+        errors[i] = exc.what();
+        nerr++;
+        ref.detach();
+      }
+    }
+    // failed nodes get an error record in their slot
+    if( !ref.valid() )
+    {
+      ref <<= new DMI::Record;
+      ref[AidError] = errors[i];
+    }
+    (*pvec)[i] = ref;
+  }
+  if( nerr )
+    out[AidError] = ssprintf("%d of %d nodes failed",nerr,nn);
+  fillForestStatus(out(),in[FGetForestStatus].as<int>(0));
+}
+
+void MeqServer::nodeSetStateBatch (DMI::Record::Ref &out,DMI::Record::Ref &in)
+{
+  std::vector<NodeFace*> nodes;
+  std::vector<string> errors;
+  int nerr = resolveNodeList(nodes,errors,*in);
+  int nn = nodes.size();
+  // a state record may be given for all nodes, or the batch field may
+  // contain a list of per-node state records
+  const DMI::Container *batch = in[AidBatch].as_po<DMI::Container>();
+  FailWhen( batch && batch->size() != nn,
+      ssprintf("batch contains %d state records for %d nodes",batch->size(),nn));
+  FailWhen( !batch && !in->hasField(AidState),"state or batch must be specified");
+  bool getstate = in[FGetState].as<bool>(false);
+  cdebug(2)<<"setState for "<<nn<<" nodes"<<endl;
+  DMI::Vec *pvec = 0;
+  if( getstate )
+    out[FNodeState] <<= pvec = new DMI::Vec(TpDMIRecord,nn);
+  for( int i=0; i<nn; i++ )
+  {
+    if( !nodes[i] )
+      continue;
+    try
+    {
+      DMI::Record::Ref ref = batch ? (*batch)[i].ref() : in[AidState].ref();
+      nodes[i]->setState(ref);
+      if( pvec )
+        (*pvec)[i] = nodes[i]->syncState();
+    }
+    catch( std::exception &exc )
+    {
+      errors[i] = exc.what();
+      nerr++;
+    }
+  }
+  // report per-node errors; empty strings mark successful nodes
+  if( nerr )
+  {
+    postError(ssprintf("setState failed for %d of %d nodes",nerr,nn));
+    out[AidError] = errors;
+  }
+  else
+    out[AidMessage] = ssprintf("set state of %d nodes",nn);
+  fillForestStatus(out(),in[FGetForestStatus].as<int>(0));
+}
+
 void MeqServer::getNodeIndex (DMI::Record::Ref &out,DMI::Record::Ref &in)
 {
   string name = in[AidName].as<string>();
@@ -518,15 +717,51 @@ void MeqServer::getNodeList (DMI::Record::Ref &out,DMI::Record::Ref &in)
   cdebug(2)<<"getNodeList: building list"<<endl;
   DMI::Record &list = out <<= new DMI::Record;
   int serial = in[FForestSerial].as<int>(0);
-  if( !serial || serial != forest_serial )
+  bool profiling = in[FProfilingStats].as<bool>(false);
+  int content =
+    ( in[AidNodeIndex].as<bool>(true) ? Forest::NL_NODEINDEX : 0 ) |
+    ( in[AidName].as<bool>(true) ? Forest::NL_NAME : 0 ) |
+    ( in[AidClass].as<bool>(true) ? Forest::NL_CLASS : 0 ) |
+    ( in[AidChildren].as<bool>(false) ? Forest::NL_CHILDREN : 0 ) |
+    ( in[FControlStatus].as<bool>(false) ? Forest::NL_CONTROL_STATUS : 0 ) |
+    ( profiling ? Forest::NL_PROFILING_STATS : 0 );
+  // a client that already holds the list for some earlier serial may ask
+  // for a delta: only nodes created or deleted since then are sent, plus
+  // (if profiling stats were requested) a status/stats update for all nodes
+  if( in[AidDelta].as<bool>(false) && serial >= forest_journal_base_ &&
+      serial <= forest_serial && ( serial != forest_serial || profiling ) )
+  {
+    // net change per node: the last journal entry wins
+    std::map<int,bool> changes;
+    for( std::deque<ForestChange>::const_iterator iter = forest_journal_.begin();
+         iter != forest_journal_.end(); iter++ )
+      if( iter->serial > serial )
+        changes[iter->nodeindex] = iter->created;
+    std::vector<int> created,deleted;
+    for( std::map<int,bool>::const_iterator iter = changes.begin();
+         iter != changes.end(); iter++ )
+    {
+      if( iter->second && forest.valid(iter->first) )
+        created.push_back(iter->first);
+      else
+        deleted.push_back(iter->first);
+    }
+    int count = forest.getNodeList(list,content&~Forest::NL_PROFILING_STATS,created);
+    if( !deleted.empty() )
+      list[AidDeleted] = deleted;
+    if( profiling )
+    {
+      DMI::Record &update = list[AidUpdate] <<= new DMI::Record;
+      forest.getNodeList(update,Forest::NL_NODEINDEX|Forest::NL_CONTROL_STATUS|
+                                Forest::NL_PROFILING_STATS);
+    }
+    cdebug(2)<<"getNodeList: delta from serial "<<serial<<": "<<count<<" created, "
+             <<deleted.size()<<" deleted"<<endl;
+    list[AidDelta] = true;
+    out[FForestSerial] = forest_serial;
+  }
+  else if( !serial || serial != forest_serial )
   {
-    int content =
-      ( in[AidNodeIndex].as<bool>(true) ? Forest::NL_NODEINDEX : 0 ) |
-      ( in[AidName].as<bool>(true) ? Forest::NL_NAME : 0 ) |
-      ( in[AidClass].as<bool>(true) ? Forest::NL_CLASS : 0 ) |
-      ( in[AidChildren].as<bool>(false) ? Forest::NL_CHILDREN : 0 ) |
-      ( in[FControlStatus].as<bool>(false) ? Forest::NL_CONTROL_STATUS : 0 ) |
-      ( in[FProfilingStats].as<bool>(false) ? Forest::NL_PROFILING_STATS : 0 );
     int count = forest.getNodeList(list,content);
     cdebug(2)<<"getNodeList: got list of "<<count<<" nodes"<<endl;
     out[FForestSerial] = forest_serial;
@@ -786,6 +1021,10 @@ void MeqServer::clearForest (DMI::Record::Ref &out,DMI::Record::Ref &in)
   setState(AidUpdating);
   cdebug(1)<<"clearing forest: deleting all nodes"<<endl;
   forest.clear();
+  batch_num_created_ = 0;
+  #ifdef HAVE_MPI
+  batch_pending_.detach();
+  #endif
   MeqPython::forceModuleReload();
 // ****
 // **** added this to relinquish parm tables --- really ought to go away
@@ -796,6 +1035,19 @@ void MeqServer::clearForest (DMI::Record::Ref &out,DMI::Record::Ref &in)
   out[AidMessage] = "all nodes deleted";
   fillForestStatus(out(),in[FGetForestStatus].as<int>(0));
   out[FForestChanged] = incrementForestSerial();
+  // nothing before the clear can be expressed as a delta
+  resetForestJournal();
+}
+
+void MeqServer::syncParmTables (DMI::Record::Ref &out,DMI::Record::Ref &)
+{
+#ifndef HAVE_PARMDB
+  cdebug(1)<<"syncing parm tables"<<endl;
+  ParmTableUtils::syncTables();
+  out[AidMessage] = "parm tables synced";
+#else
+  out[AidMessage] = "parm tables are written synchronously";
+#endif
 }
 
 void MeqServer::disablePublishResults (DMI::Record::Ref &out,DMI::Record::Ref &in)
@@ -1007,6 +1259,13 @@ void MeqServer::fillForestStatus  (DMI::Record &rec,int level)
   fst[AidExecuting] = executing_;
   fst[AidDebug|AidLevel] = forest.debugLevel();
   fst[AidStopped] = forest.isStopFlagRaised() && !clear_stop_flag_;
+  // forest-wide result cache usage
+  forest.cacheManager().fillStats(fst[AidCache|AidStats] <<= new DMI::Record);
+  // Vells storage allocation counts and pool occupancy
+  VellsPool::instance().fillStats(fst[AidVells|AidPool] <<= new DMI::Record);
+  // per-thread statistics of the worker brigade
+  if( MTPool::enabled() )
+    MTPool::brigade().fillThreadStats(fst[AidMT|AidThreads] <<= new DMI::Record);
 }
 
 void MeqServer::processBreakpoint (Node &node,int bpmask,bool global)
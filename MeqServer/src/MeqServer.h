@@ -30,11 +30,12 @@
 #include <MEQ/Forest.h>
 #include <AppAgent/EventChannel.h>
 #include <MeqServer/AID-MeqServer.h>
+#include <deque>
 
 #pragma aidgroup MeqServer    
 #pragma aid MeqClient
 #pragma aid Node Name NodeIndex MeqServer Meq CWD Proc MPI Num 
-#pragma aid Create Delete Get Set State Request Resolve Child Children List Batch
+#pragma aid Create Delete Get Set State Request Resolve Child Children List Batch Field Delta Deleted
 #pragma aid App Command Args Result Data Processing Error Message Code
 #pragma aid Execute Clear Cache Save Load Forest Recursive Forest Header Version 
 #pragma aid Publish Results Enable Disable Event Id Silent Idle Stream 
@@ -128,6 +129,9 @@ class MeqServer : public DMI::EventRecepient
     void nodeGetState (DMI::Record::Ref &out,DMI::Record::Ref &in);
     //##ModelId=3F61920F02A4
     void nodeSetState (DMI::Record::Ref &out,DMI::Record::Ref &in);
+    // batch versions of the above: operate on a list of nodes in one command
+    void nodeGetStateBatch (DMI::Record::Ref &out,DMI::Record::Ref &in);
+    void nodeSetStateBatch (DMI::Record::Ref &out,DMI::Record::Ref &in);
     //##ModelId=3F98D91B0064
     void getNodeList  (DMI::Record::Ref &out,DMI::Record::Ref &in);
     
@@ -141,6 +145,8 @@ class MeqServer : public DMI::EventRecepient
     void loadForest (DMI::Record::Ref &out,DMI::Record::Ref &in);*/
     //##ModelId=400E5B6C0324
     void clearForest (DMI::Record::Ref &out,DMI::Record::Ref &in);
+    // waits until all saved funklets are written out to the parm tables
+    void syncParmTables (DMI::Record::Ref &out,DMI::Record::Ref &in);
     
     void disablePublishResults (DMI::Record::Ref &out,DMI::Record::Ref &in);
 
@@ -208,6 +214,11 @@ class MeqServer : public DMI::EventRecepient
       
     //##ModelId=3F6196800325
     NodeFace & resolveNode (bool &getstate,const DMI::Record &rec);
+    // resolves the lists of node indices and names given in a batch
+    // command record, in that order. Nodes that cannot be resolved are
+    // returned as 0, with the error message placed into errors[i]
+    int resolveNodeList (std::vector<NodeFace*> &nodes,
+                         std::vector<string> &errors,const DMI::Record &rec);
 
     void reportNodeStatus  (Node &node,int oldstat,int newstat);
 
@@ -228,6 +239,15 @@ class MeqServer : public DMI::EventRecepient
     
     // current script name
     string script_name_;
+    // nodes created so far by a chunked Create.Node.Batch upload, i.e.
+    // by chunks received with init=False (see createNodeBatch())
+    int batch_num_created_;
+    // nodes that already existed when a Create.Node.Batch upload started
+    int batch_num_preexisting_;
+    #ifdef HAVE_MPI
+    // node specs of a chunked upload, held until the final chunk arrives
+    DMI::List::Ref batch_pending_;
+    #endif
     // current session name
     string session_name_;
     
@@ -235,9 +255,31 @@ class MeqServer : public DMI::EventRecepient
     int incrementForestSerial ()
     { 
       if( ++forest_serial < 1 )
+      {
         forest_serial = 1;
+        resetForestJournal();
+      }
       return forest_serial;
     }
+    
+    // journal of node creations and deletions, used to answer incremental
+    // ("delta") nodelist requests. Each entry is stamped with the forest
+    // serial produced by the change, i.e. the one following the current
+    // serial (all forest-changing commands increment the serial when done).
+    // Node state sets cannot change names or children (these fields are
+    // protected), so other changes to existing nodes only come from
+    // re-initialization, and commands doing that reset the journal instead.
+    typedef struct { int serial; int nodeindex; bool created; } ForestChange;
+    std::deque<ForestChange> forest_journal_;
+    // oldest forest serial from which a delta can still be formed
+    int forest_journal_base_;
+    
+    void journalForestChange (int nodeindex,bool created);
+    void resetForestJournal ()
+    {
+      forest_journal_.clear();
+      forest_journal_base_ = forest_serial;
+    }
   
     //##ModelId=3F61920F0158
     typedef void (MeqServer::*PtrCommandMethod)(DMI::Record::Ref &out,DMI::Record::Ref &in);
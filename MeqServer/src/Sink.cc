@@ -92,11 +92,14 @@ int Sink::getResult (Result::Ref &resref,
                      const std::vector<Result::Ref> &childres,
                      const Request &req,bool)
 {
-  FailWhen(req.id() != cur_rqid,"expected rqid "+cur_rqid.toString()+", got "+req.id().toString());
-  FailWhen(!cur_tile.valid(),"this sink did not receive a tile");
+  // we're called with the state mutex locked, so the pending tiles are safe
+  PendingTiles::iterator pending = pending_tiles_.find(req.id());
+  FailWhen(pending == pending_tiles_.end(),"this sink did not receive a tile for rqid "+req.id().toString());
   VisCube::VTile::Ref tileref;
   // this will invalidate the pending refs
-  tileref.xfer(cur_tile);
+  tileref.xfer(pending->second.tile);
+  LoRange cur_range = pending->second.range;
+  pending_tiles_.erase(pending);
   const HIID &tile_id = tileref->tileId();
   cdebug(3)<<"procPendingTile: processing tile "<<tile_id<<" of "
             <<tileref->ntime()<<" timeslots"<<endl;
@@ -338,22 +341,33 @@ int Sink::deliverHeader (const DMI::Record&,const VisCube::VTile::Format &outfor
 {
   output_format.attach(outformat);
   cdebug(3)<<"deliverHeader: got format "<<outformat.sdebug(2)<<endl;
-  cur_tile.detach();
+  Thread::Mutex::Lock lock(stateMutex());
+  pending_tiles_.clear();
   return 0;
 }
 
 //##ModelId=3F98DAE6021E
 int Sink::deliverTile (const Request &req,VisCube::VTile::Ref &tileref,const LoRange &range)
 {
-  cur_rqid = req.id();
-  cur_tile.copy(tileref);
-  cur_range = range;
+  // with several requests in flight, we may be executing an earlier one,
+  // so the pending tiles are locked with the state mutex
+  Thread::Mutex::Lock lock(stateMutex());
+  PendingTile &pending = pending_tiles_[req.id()];
+  pending.tile.copy(tileref);
+  pending.range = range;
   return 0;
 }
 
+void Sink::releaseTile (const Request &req)
+{
+  Thread::Mutex::Lock lock(stateMutex());
+  pending_tiles_.erase(req.id());
+}
+
 int Sink::deliverFooter (const DMI::Record &)
 {
-  cur_tile.detach();
+  Thread::Mutex::Lock lock(stateMutex());
+  pending_tiles_.clear();
   return 0;
 }
 
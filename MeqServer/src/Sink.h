@@ -28,6 +28,7 @@
     
 #include <MeqServer/VisHandlerNode.h>
 #include <MeqServer/TID-MeqServer.h>
+#include <map>
 
 #pragma aid Sink 
 #pragma aid Output Col Corr Index
@@ -79,6 +80,8 @@ class Sink : public VisHandlerNode
                                const VisCube::VTile::Format &);
     
     virtual int deliverTile   (const Request &,VisCube::VTile::Ref &,const LoRange &);
+
+    virtual void releaseTile  (const Request &);
     
     virtual int deliverFooter (const DMI::Record &);
     
@@ -101,10 +104,17 @@ class Sink : public VisHandlerNode
     virtual void setStateImpl (DMI::Record::Ref &rec,bool initializing);
 
   private:
-    // current tile stored here
-    VisCube::VTile::Ref cur_tile;
-    LoRange cur_range;
-    RequestId cur_rqid;
+    // tiles delivered and not yet processed are stored here, per request
+    // ID. With several requests in flight, there may be more than one
+    typedef struct
+    {
+      VisCube::VTile::Ref tile;
+      LoRange range;
+    } PendingTile;
+
+    typedef std::map<HIID,PendingTile> PendingTiles;
+
+    PendingTiles pending_tiles_;
     
     VisCube::VTile::Format::Ref output_format;
       
@@ -158,262 +158,270 @@ static void getRowFlags (Vells &flagvells,const LoVec_int &rowflags,int rowflagm
 }
 
 
-//##ModelId=3F98DAE6023B
-int Spigot::deliverTile (const Request &req,VisCube::VTile::Ref &tileref,const LoRange &rowrange)
+void Spigot::makeResult (Result::Ref &resref,const VisCube::VTile &tile,const LoRange &rowrange)
 {
-  Assert(Axis::TIME==0 && Axis::FREQ==1);
-  const VisCube::VTile &tile = *tileref;
-  cdebug(3)<<"deliver: tile "<<tile.tileId()<<", rqid "<<req.id()<<",row rowrange "<<rowrange<<endl;
-  // already waiting for such a request? Do nothing for now
-  if( currentRequestId() == req.id() )
-  {
-    cdebug(2)<<"deliver: already at rqid but notify not implemented, doing nothing"<<endl;
-    Throw("Spigot: deliver() called after getResult() for the same request ID. "
-          "This is not something we can handle w/o a parent notify mechanism, "
-          "which is not yet implemented. Either something is wrong with your tree, "
-          "or you're not generating unique request IDs.");
-  }
-  else
+  const VisCube::VTile::Format &tileformat = tile.format();
+  TypeId coltype = tileformat.type(icolumn_);
+  LoShape colshape = tileformat.shape(icolumn_);
+  // # output rows -- tile.nrow() if rowrange is all, or rowrange length otherwise
+  int nrows = rowrange.last(tile.nrow()-1) - rowrange.first(0)+1;
+  colshape.push_back(tile.nrow());
+  cdebug(3)<<"makeResult: using "<<nrows<<" of "<<tile.nrow()<<" tile rows\n";
+  int nfreq = 0;
+  bool cubic_column = colshape.size() == 3;
+  // casting away const because blitz constructors below only take non-const
+  // pointers
+  void *coldata = const_cast<void*>(tile.column(icolumn_));
+  int nplanes = cubic_column ? colshape[0] : 1;
+  //FailWhen(cubic_column && nplanes!=int(corr_index_.size()),
+  //            "tile dimensions do not match spigot settings");
+  Result & result = resref <<= new Result(dims_);
+  // get array
+  if( coltype == Tpdouble )
   {
-    const VisCube::VTile::Format &tileformat = tile.format();
-    TypeId coltype = tileformat.type(icolumn_);
-    LoShape colshape = tileformat.shape(icolumn_);
-    // # output rows -- tile.nrow() if rowrange is all, or rowrange length otherwise
-    int nrows = rowrange.last(tile.nrow()-1) - rowrange.first(0)+1;
-    colshape.push_back(tile.nrow());
-    cdebug(3)<<"deliver: using "<<nrows<<" of "<<tile.nrow()<<" tile rows\n";
-    int nfreq = 0;
-    bool cubic_column = colshape.size() == 3;
-    // casting away const because blitz constructors below only take non-const
-    // pointers
-    void *coldata = const_cast<void*>(tile.column(icolumn_));
-    int nplanes = cubic_column ? colshape[0] : 1;
-    //FailWhen(cubic_column && nplanes!=int(corr_index_.size()),
-    //            "tile dimensions do not match spigot settings");
-    Result::Ref next_res;
-    Result & result = next_res <<= new Result(dims_);
-    // get array
-    if( coltype == Tpdouble )
+    // UVW column is a special case
+    if( colname_ == "UVW" )
     {
-      // UVW column is a special case
-      if( colname_ == "UVW" )
+      LoMat_double mat(static_cast<double*>(coldata),colshape,blitz::neverDeleteData);
+      LoShape shape = Axis::timeVector(nrows);
+      for( int i=0; i<3; i++ )
       {
-        LoMat_double mat(static_cast<double*>(coldata),colshape,blitz::neverDeleteData);
-        LoShape shape = Axis::timeVector(nrows);
-        for( int i=0; i<3; i++ )
-        {
-          VellSet &vs = result.setNewVellSet(i);
-          vs.setReal(shape).getArray<double,1>() = mat(i,rowrange);
-        }
-        // add derivarives
-        if( include_derivatives_ )
-        {
-          const LoMat_double &duvw = tile.duvw();
-          for( int i=0; i<3; i++ )
-          {
-            VellSet &vs = result.setNewVellSet(i+3);
-            vs.setReal(shape).getArray<double,1>() = duvw(i,rowrange);
-          }
-        }
-        // also apply row flags (according to mask, and unconditionally for missing data)
-        const LoVec_int  rowflag = tile.rowflag()(rowrange);
-        Vells::Ref flagref;
-        flagref <<= new Vells(Axis::freqTimeMatrix(1,nrows),VellsFlagType(),true);
-        FlagMatrix & pfl = flagref().getArray<VellsFlagType,2>();
-        //// fukcety fuck fuck fuck I don't get why this blitz::where() doesn't work!
-        //// godverdommemotherfucking blitz 
-//         pfl(0,LoRange::all()) = blitz::where(rowflag<0,VisVocabulary::FlagMissing,0);
-//         pfl(0,LoRange::all()) |= (rowflag&row_flag_mask_);
-        //// do it the ugly way instead
-        getRowFlags(flagref(),rowflag,row_flag_mask_);
-        // only attach data flags if they're non-0
-        if( blitz::any(pfl) )
-        {
-          if( flag_bit_ ) // override with flag bit if requested
-            pfl = blitz::where(pfl,flag_bit_,0);
-          for( int i=0; i<result.numVellSets(); i++ )
-            result.vellSetWr(i).setDataFlags(flagref);
-        }
+        VellSet &vs = result.setNewVellSet(i);
+        vs.setReal(shape).getArray<double,1>() = mat(i,rowrange);
       }
-      // else treat it as a standard corr/freq/time column
-      else if( colshape.size() == 3 )
+      // add derivarives
+      if( include_derivatives_ )
       {
-        LoCube_double cube(static_cast<double*>(coldata),colshape,blitz::neverDeleteData);
-        // transpose into time-freq-corr order
-        cube.transposeSelf(blitz::thirdDim,blitz::secondDim,blitz::firstDim);
-        LoShape shape = Axis::freqTimeMatrix(nfreq = colshape[1],nrows);
-        for( uint i=0; i<corr_index_.size(); i++ )
+        const LoMat_double &duvw = tile.duvw();
+        for( int i=0; i<3; i++ )
         {
-          VellSet &vs = result.setNewVellSet(i);
-          int icorr = corr_index_[i];
-          if( icorr >=0 )
-          {
-            FailWhen(icorr >= nplanes,ssprintf("corr index %d out of range for this tile",icorr));
-            vs.setReal(shape).getArray<double,2>() = cube(rowrange,LoRange::all(),icorr);
-          }
-          // else leave vellset empty to indicate missing data
+          VellSet &vs = result.setNewVellSet(i+3);
+          vs.setReal(shape).getArray<double,1>() = duvw(i,rowrange);
         }
       }
-      else if( colshape.size() == 2 )
-      {
-        LoMat_double mat(static_cast<double*>(coldata),colshape,blitz::neverDeleteData);
-        // transpose into time-freq order
-        mat.transposeSelf(blitz::secondDim,blitz::firstDim);
-        LoShape shape = Axis::freqTimeMatrix(nfreq = colshape[0],nrows);
-        result.setNewVellSet(0).setReal(shape).getArray<double,2>() =
-              mat(rowrange,LoRange::all());
-      }
-      else if( colshape.size() == 1 )
+      // also apply row flags (according to mask, and unconditionally for missing data)
+      const LoVec_int  rowflag = tile.rowflag()(rowrange);
+      Vells::Ref flagref;
+      flagref <<= new Vells(Axis::freqTimeMatrix(1,nrows),VellsFlagType(),true);
+      FlagMatrix & pfl = flagref().getArray<VellsFlagType,2>();
+      //// fukcety fuck fuck fuck I don't get why this blitz::where() doesn't work!
+      //// godverdommemotherfucking blitz 
+//         pfl(0,LoRange::all()) = blitz::where(rowflag<0,VisVocabulary::FlagMissing,0);
+//         pfl(0,LoRange::all()) |= (rowflag&row_flag_mask_);
+      //// do it the ugly way instead
+      getRowFlags(flagref(),rowflag,row_flag_mask_);
+      // only attach data flags if they're non-0
+      if( blitz::any(pfl) )
       {
-        LoVec_double vec(static_cast<double*>(coldata),colshape,blitz::neverDeleteData);
-        LoVec_double vec1 = vec(rowrange);
-        LoShape shape = Axis::timeVector(nrows);
-        result.setNewVellSet(0).setReal(shape).getArray<double,1>() = vec1;
+        if( flag_bit_ ) // override with flag bit if requested
+          pfl = blitz::where(pfl,flag_bit_,0);
+        for( int i=0; i<result.numVellSets(); i++ )
+          result.vellSetWr(i).setDataFlags(flagref);
       }
-      else
-        Throw("bad input column shape");
     }
-    else if( coltype == Tpfloat )
+    // else treat it as a standard corr/freq/time column
+    else if( colshape.size() == 3 )
     {
-      if( colshape.size() == 3 )
+      LoCube_double cube(static_cast<double*>(coldata),colshape,blitz::neverDeleteData);
+      // transpose into time-freq-corr order
+      cube.transposeSelf(blitz::thirdDim,blitz::secondDim,blitz::firstDim);
+      LoShape shape = Axis::freqTimeMatrix(nfreq = colshape[1],nrows);
+      for( uint i=0; i<corr_index_.size(); i++ )
       {
-        LoCube_float cube(static_cast<float*>(coldata),colshape,blitz::neverDeleteData);
-        // transpose into time-freq-corr order
-        cube.transposeSelf(blitz::thirdDim,blitz::secondDim,blitz::firstDim);
-        LoShape shape = Axis::freqTimeMatrix(nfreq = colshape[1],nrows);
-        cdebug(5)<<"column data t/s 0: "<<cube(0,LoRange::all(),LoRange::all())<<endl;
-        cdebug(5)<<"column data t/s 1: "<<cube(0,LoRange::all(),LoRange::all())<<endl;
-        for( uint i=0; i<corr_index_.size(); i++ )
+        VellSet &vs = result.setNewVellSet(i);
+        int icorr = corr_index_[i];
+        if( icorr >=0 )
         {
-          VellSet &vs = result.setNewVellSet(i);
-          int icorr = corr_index_[i];
-          if( icorr >=0 )
-          {
-            FailWhen(icorr >= nplanes,ssprintf("corr index %d out of range for this tile",icorr));
-            cdebug(5)<<"column data corr "<<icorr<<": "<<cube(rowrange,LoRange::all(),icorr)<<endl;
-            vs.setReal(shape).getArray<double,2>() = blitz::cast<double>(cube(rowrange,LoRange::all(),icorr));
-          }
-          // else leave vellset empty to indicate missing data
+          FailWhen(icorr >= nplanes,ssprintf("corr index %d out of range for this tile",icorr));
+          vs.setReal(shape).getArray<double,2>() = cube(rowrange,LoRange::all(),icorr);
         }
+        // else leave vellset empty to indicate missing data
       }
-      else if( colshape.size() == 2 )
-      {
-        LoMat_float mat(static_cast<float*>(coldata),colshape,blitz::neverDeleteData);
-        // transpose into time-freq order
-        mat.transposeSelf(blitz::secondDim,blitz::firstDim);
-        LoShape shape = Axis::freqTimeMatrix(nfreq = colshape[0],nrows);
-        result.setNewVellSet(0).setReal(shape).getArray<double,2>() =
-              blitz::cast<double>(mat(rowrange,LoRange::all()));
-      }
-      else if( colshape.size() == 1 )
-      {
-        LoVec_float vec(static_cast<float*>(coldata),colshape,blitz::neverDeleteData);
-        cdebug(5)<<"column data "<<vec<<endl;
-        LoVec_float vec1 = vec(rowrange);
-        LoShape shape = Axis::timeVector(nrows);
-        result.setNewVellSet(0).setReal(shape).getArray<double,1>() = blitz::cast<double>(vec1);
-      }
-      else
-        Throw("bad input column shape");
     }
-    else if( coltype == Tpfcomplex )
+    else if( colshape.size() == 2 )
+    {
+      LoMat_double mat(static_cast<double*>(coldata),colshape,blitz::neverDeleteData);
+      // transpose into time-freq order
+      mat.transposeSelf(blitz::secondDim,blitz::firstDim);
+      LoShape shape = Axis::freqTimeMatrix(nfreq = colshape[0],nrows);
+      result.setNewVellSet(0).setReal(shape).getArray<double,2>() =
+            mat(rowrange,LoRange::all());
+    }
+    else if( colshape.size() == 1 )
     {
-      if( colshape.size() == 3 )
+      LoVec_double vec(static_cast<double*>(coldata),colshape,blitz::neverDeleteData);
+      LoVec_double vec1 = vec(rowrange);
+      LoShape shape = Axis::timeVector(nrows);
+      result.setNewVellSet(0).setReal(shape).getArray<double,1>() = vec1;
+    }
+    else
+      Throw("bad input column shape");
+  }
+  else if( coltype == Tpfloat )
+  {
+    if( colshape.size() == 3 )
+    {
+      LoCube_float cube(static_cast<float*>(coldata),colshape,blitz::neverDeleteData);
+      // transpose into time-freq-corr order
+      cube.transposeSelf(blitz::thirdDim,blitz::secondDim,blitz::firstDim);
+      LoShape shape = Axis::freqTimeMatrix(nfreq = colshape[1],nrows);
+      cdebug(5)<<"column data t/s 0: "<<cube(0,LoRange::all(),LoRange::all())<<endl;
+      cdebug(5)<<"column data t/s 1: "<<cube(0,LoRange::all(),LoRange::all())<<endl;
+      for( uint i=0; i<corr_index_.size(); i++ )
       {
-        LoCube_fcomplex cube(static_cast<fcomplex*>(coldata),colshape,blitz::neverDeleteData);
-        // transpose into time-freq-corr order
-        cube.transposeSelf(blitz::thirdDim,blitz::secondDim,blitz::firstDim);
-        LoShape shape = Axis::freqTimeMatrix(nfreq = colshape[1],nrows);
-        for( uint i=0; i<corr_index_.size(); i++ )
+        VellSet &vs = result.setNewVellSet(i);
+        int icorr = corr_index_[i];
+        if( icorr >=0 )
         {
-          VellSet &vs = result.setNewVellSet(i);
-          int icorr = corr_index_[i];
-          if( icorr >=0 )
-          {
-            FailWhen(icorr >= nplanes,ssprintf("corr index %d out of range for this tile",icorr));
-            vs.setComplex(shape).getArray<dcomplex,2>() =
-              blitz::cast<dcomplex>(cube(rowrange,LoRange::all(),icorr));
-          }
-          // else leave vellset empty to indicate missing data
+          FailWhen(icorr >= nplanes,ssprintf("corr index %d out of range for this tile",icorr));
+          cdebug(5)<<"column data corr "<<icorr<<": "<<cube(rowrange,LoRange::all(),icorr)<<endl;
+          vs.setReal(shape).getArray<double,2>() = blitz::cast<double>(cube(rowrange,LoRange::all(),icorr));
         }
+        // else leave vellset empty to indicate missing data
       }
-      else if( colshape.size() == 2 )
-      {
-        LoMat_fcomplex mat(static_cast<fcomplex*>(coldata),colshape,blitz::neverDeleteData);
-        // transpose into time-freq order
-        mat.transposeSelf(blitz::secondDim,blitz::firstDim);
-        LoShape shape = Axis::freqTimeMatrix(nfreq = colshape[0],nrows);
-        result.setNewVellSet(0).setComplex(shape).getArray<dcomplex,2>() =
-            blitz::cast<dcomplex>(mat(rowrange,LoRange::all()));
-      }
-      else if( colshape.size() == 1 )
-      {
-        LoVec_fcomplex vec(static_cast<fcomplex*>(coldata),colshape,blitz::neverDeleteData);
-        LoVec_fcomplex vec1 = vec(rowrange);
-        LoShape shape = Axis::timeVector(nrows);
-        result.setNewVellSet(0).setComplex(shape).getArray<dcomplex,1>() = blitz::cast<dcomplex>(vec1);
-      }
-      else
-        Throw("bad input column shape");
     }
-    else
+    else if( colshape.size() == 2 )
     {
-      Throw("invalid column type: "+coltype.toString());
+      LoMat_float mat(static_cast<float*>(coldata),colshape,blitz::neverDeleteData);
+      // transpose into time-freq order
+      mat.transposeSelf(blitz::secondDim,blitz::firstDim);
+      LoShape shape = Axis::freqTimeMatrix(nfreq = colshape[0],nrows);
+      result.setNewVellSet(0).setReal(shape).getArray<double,2>() =
+            blitz::cast<double>(mat(rowrange,LoRange::all()));
     }
-    // get flags and rowflags
-    // flags only apply to 3D columns (such as visibility)
+    else if( colshape.size() == 1 )
+    {
+      LoVec_float vec(static_cast<float*>(coldata),colshape,blitz::neverDeleteData);
+      cdebug(5)<<"column data "<<vec<<endl;
+      LoVec_float vec1 = vec(rowrange);
+      LoShape shape = Axis::timeVector(nrows);
+      result.setNewVellSet(0).setReal(shape).getArray<double,1>() = blitz::cast<double>(vec1);
+    }
+    else
+      Throw("bad input column shape");
+  }
+  else if( coltype == Tpfcomplex )
+  {
     if( colshape.size() == 3 )
     {
-      // get flag columns
-      LoCube_int flags   = tile.flags();
+      LoCube_fcomplex cube(static_cast<fcomplex*>(coldata),colshape,blitz::neverDeleteData);
       // transpose into time-freq-corr order
-      flags.transposeSelf(blitz::thirdDim,blitz::secondDim,blitz::firstDim);
-//        cout<<"Tile flags: "<<flags<<endl;
-      const LoVec_int  rowflag = tile.rowflag()(rowrange);
+      cube.transposeSelf(blitz::thirdDim,blitz::secondDim,blitz::firstDim);
+      LoShape shape = Axis::freqTimeMatrix(nfreq = colshape[1],nrows);
       for( uint i=0; i<corr_index_.size(); i++ )
       {
+        VellSet &vs = result.setNewVellSet(i);
         int icorr = corr_index_[i];
         if( icorr >=0 )
         {
-          Vells::Ref flagref;
-          FlagMatrix * pfl = 0;
-          // get flags, if a flag mask is set
-          if( flag_mask_ )
-          {
-            flagref <<= new Vells(Axis::freqTimeMatrix(nfreq,nrows),VellsFlagType(),false);
-            pfl = &( flagref().getArray<VellsFlagType,2>() );
-            *pfl = flags(rowrange,LoRange::all(),icorr) & flag_mask_;
-            // apply row flags according to mask, and unconditionally for missing data
-            for( int j=0; j<nrows; j++ )
-              (*pfl)(j,LoRange::all()) |= (rowflag(j)&row_flag_mask_) |
-                                          (rowflag(j)==VisVocabulary::FlagMissing);
-          }
-          else // else apply row flags only (according to mask, and unconditionally for missing data)
-          {
-            // shape of flag array is 1D (time only)
-            flagref <<= new Vells(Axis::freqTimeMatrix(1,nrows),VellsFlagType(),true);
-            pfl = &( flagref().getArray<VellsFlagType,2>() );
-            (*pfl)(0,LoRange::all()) |= (rowflag&row_flag_mask_) |
-                                        (rowflag == VisVocabulary::FlagMissing);
-          }
-          // only attach data flags if they're non-0
-          if( pfl && blitz::any(*pfl) )
-          {
-            if( flag_bit_ ) // override with flag bit if requested
-              *pfl = blitz::where(*pfl,flag_bit_,0);
-            // attach these dataflags to the i-th vellset
-            result.vellSetWr(i).setDataFlags(flagref);
-          }
+          FailWhen(icorr >= nplanes,ssprintf("corr index %d out of range for this tile",icorr));
+          vs.setComplex(shape).getArray<dcomplex,2>() =
+            blitz::cast<dcomplex>(cube(rowrange,LoRange::all(),icorr));
+        }
+        // else leave vellset empty to indicate missing data
+      }
+    }
+    else if( colshape.size() == 2 )
+    {
+      LoMat_fcomplex mat(static_cast<fcomplex*>(coldata),colshape,blitz::neverDeleteData);
+      // transpose into time-freq order
+      mat.transposeSelf(blitz::secondDim,blitz::firstDim);
+      LoShape shape = Axis::freqTimeMatrix(nfreq = colshape[0],nrows);
+      result.setNewVellSet(0).setComplex(shape).getArray<dcomplex,2>() =
+          blitz::cast<dcomplex>(mat(rowrange,LoRange::all()));
+    }
+    else if( colshape.size() == 1 )
+    {
+      LoVec_fcomplex vec(static_cast<fcomplex*>(coldata),colshape,blitz::neverDeleteData);
+      LoVec_fcomplex vec1 = vec(rowrange);
+      LoShape shape = Axis::timeVector(nrows);
+      result.setNewVellSet(0).setComplex(shape).getArray<dcomplex,1>() = blitz::cast<dcomplex>(vec1);
+    }
+    else
+      Throw("bad input column shape");
+  }
+  else
+  {
+    Throw("invalid column type: "+coltype.toString());
+  }
+  // get flags and rowflags
+  // flags only apply to 3D columns (such as visibility)
+  if( colshape.size() == 3 )
+  {
+    // get flag columns
+    LoCube_int flags   = tile.flags();
+    // transpose into time-freq-corr order
+    flags.transposeSelf(blitz::thirdDim,blitz::secondDim,blitz::firstDim);
+//        cout<<"Tile flags: "<<flags<<endl;
+    const LoVec_int  rowflag = tile.rowflag()(rowrange);
+    for( uint i=0; i<corr_index_.size(); i++ )
+    {
+      int icorr = corr_index_[i];
+      if( icorr >=0 )
+      {
+        Vells::Ref flagref;
+        FlagMatrix * pfl = 0;
+        // get flags, if a flag mask is set
+        if( flag_mask_ )
+        {
+          flagref <<= new Vells(Axis::freqTimeMatrix(nfreq,nrows),VellsFlagType(),false);
+          pfl = &( flagref().getArray<VellsFlagType,2>() );
+          *pfl = flags(rowrange,LoRange::all(),icorr) & flag_mask_;
+          // apply row flags according to mask, and unconditionally for missing data
+          for( int j=0; j<nrows; j++ )
+            (*pfl)(j,LoRange::all()) |= (rowflag(j)&row_flag_mask_) |
+                                        (rowflag(j)==VisVocabulary::FlagMissing);
+        }
+        else // else apply row flags only (according to mask, and unconditionally for missing data)
+        {
+          // shape of flag array is 1D (time only)
+          flagref <<= new Vells(Axis::freqTimeMatrix(1,nrows),VellsFlagType(),true);
+          pfl = &( flagref().getArray<VellsFlagType,2>() );
+          (*pfl)(0,LoRange::all()) |= (rowflag&row_flag_mask_) |
+                                      (rowflag == VisVocabulary::FlagMissing);
+        }
+        // only attach data flags if they're non-0
+        if( pfl && blitz::any(*pfl) )
+        {
+          if( flag_bit_ ) // override with flag bit if requested
+            *pfl = blitz::where(*pfl,flag_bit_,0);
+          // attach these dataflags to the i-th vellset
+          result.vellSetWr(i).setDataFlags(flagref);
         }
       }
     }
-    // copy cells to result
-    result.setCells(req.cells());
+  }
+}
 
-    // add to queue
+//##ModelId=3F98DAE6023B
+int Spigot::deliverTile (const Request &req,VisCube::VTile::Ref &tileref,const LoRange &rowrange)
+{
+  Assert(Axis::TIME==0 && Axis::FREQ==1);
+  const VisCube::VTile &tile = *tileref;
+  cdebug(3)<<"deliver: tile "<<tile.tileId()<<", rqid "<<req.id()<<",row rowrange "<<rowrange<<endl;
+  // already waiting for such a request? Do nothing for now
+  if( currentRequestId() == req.id() )
+  {
+    cdebug(2)<<"deliver: already at rqid but notify not implemented, doing nothing"<<endl;
+    Throw("Spigot: deliver() called after getResult() for the same request ID. "
+          "This is not something we can handle w/o a parent notify mechanism, "
+          "which is not yet implemented. Either something is wrong with your tree, "
+          "or you're not generating unique request IDs.");
+  }
+  else
+  {
+    // Queue the tile itself rather than a result: this shares the tile's
+    // storage instead of copying it, and the conversion to Vells is left
+    // to getResult(), which runs in the thread evaluating the request.
+    // The queue is locked with the state mutex, since with several
+    // requests in flight, we may be executing an earlier one
+    Thread::Mutex::Lock lock(stateMutex());
     res_queue_.push_back(ResQueueItem());
-    res_queue_.back().rqid = req.id();
-    res_queue_.back().res = next_res;
+    ResQueueItem &item = res_queue_.back();
+    item.rqid = req.id();
+    item.tile.copy(tileref);
+    item.range = rowrange;
+    item.cells.attach(req.cells());
     cdebug(3)<<res_queue_.size()<<" results in queue"<<endl;
 
     if( forest().debugLevel() > 1 )
@@ -429,6 +437,26 @@ int Spigot::deliverTile (const Request &req,VisCube::VTile::Ref &tileref,const L
   return 0;
 }
 
+int Spigot::deliverHeader (const DMI::Record &,const VisCube::VTile::Format &)
+{
+  // discard anything left over from a previous stream
+  Thread::Mutex::Lock lock(stateMutex());
+  res_queue_.clear();
+  return 0;
+}
+
+void Spigot::releaseTile (const Request &req)
+{
+  Thread::Mutex::Lock lock(stateMutex());
+  for( ResQueue::iterator qiter = res_queue_.begin(); qiter != res_queue_.end(); )
+    if( qiter->rqid == req.id() )
+      res_queue_.erase(qiter++);
+    else
+      qiter++;
+  if( forest().debugLevel() > 1 )
+    fillDebugState();
+}
+
 void Spigot::fillDebugState ()
 {
   if( res_queue_.empty() )
@@ -444,7 +472,9 @@ void Spigot::fillDebugState ()
     for( ResQueue::const_iterator qiter = res_queue_.begin(); qiter != res_queue_.end(); qiter++,n++ )
     {
       idvec[n] = qiter->rqid;
-      qvec[n] = qiter->res.copy();
+      // results not asked for yet are left empty
+      if( qiter->res.valid() )
+        qvec[n] = qiter->res.copy();
     }
   }
 }
@@ -456,18 +486,30 @@ int Spigot::getResult (Result::Ref &resref,
                        const Request &req,bool)
 {
   // if we have cached results in the queue, go through them until we find
-  // a match. Discard non-matching results at head of queue
-  while( !res_queue_.empty() &&
-         !RqId::maskedCompare(req.id(),res_queue_.begin()->rqid,getDependMask()) )
-    res_queue_.pop_front();
-  // queue empty, no match -- return missing data
-  if( res_queue_.empty() )
+  // a match. Non-matching results are left alone, since they may belong to
+  // other requests in flight; releaseTile() removes them.
+  ResQueue::iterator qiter = res_queue_.begin();
+  while( qiter != res_queue_.end() &&
+         !RqId::maskedCompare(req.id(),qiter->rqid,getDependMask()) )
+    qiter++;
+  // no match -- return missing data
+  if( qiter == res_queue_.end() )
   {
     (resref <<= new Result(1)).setNewVellSet(0);
     return RES_MISSING;
   }
-  // else return head of queue
-  resref.copy(res_queue_.front().res);
+  // make the result the first time around
+  if( !qiter->res.valid() )
+  {
+    Result::Ref res;
+    makeResult(res,*(qiter->tile),qiter->range);
+    res().setCells(*(qiter->cells));
+    qiter->res.xfer(res);
+    qiter->tile.detach();
+    qiter->cells.detach();
+  }
+  // return matching result
+  resref.copy(qiter->res);
   // update state record
   if( forest().debugLevel() > 1 )
     fillDebugState();
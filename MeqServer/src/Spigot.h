@@ -39,9 +39,11 @@
 //defrec begin MeqSpigot
 //  A MeqSpigot is attached to a VisAgent data source, and represents
 //  one interferometer. For every matching VisCube::VTile at the input of the
-//  source, it caches the visibility data. If a matching request is then
-//  received, it returns that data as the result (with one plane per
-//  correlation.) A MeqSpigot usually works in concert with a MeqSink,
+//  source, it holds on to the tile (sharing it, not copying it). If a
+//  matching request is then received, it converts the data into Vells and
+//  returns them as the result (with one plane per correlation.) Tiles for
+//  which no request is received are never converted.
+//  A MeqSpigot usually works in concert with a MeqSink,
 //  in that a sink is placed at the base of the tree, and generates
 //  results matching the input data.
 //  A MeqSpigot can have no children.
@@ -102,8 +104,16 @@ class Spigot : public VisHandlerNode
   public:
     Spigot ();
 
+    virtual int deliverHeader (const DMI::Record &,const VisCube::VTile::Format &);
+
     virtual int deliverTile (const Request &req,VisCube::VTile::Ref &,const LoRange &);
 
+    virtual void releaseTile (const Request &req);
+
+    // index of the tile column read by this spigot
+    int inputColumn () const
+    { return icolumn_; }
+
     //##ModelId=3F98DAE6023E
     virtual TypeId objectType() const
     { return TpMeqSpigot; }
@@ -123,6 +133,9 @@ class Spigot : public VisHandlerNode
   private:
     void fillDebugState ();
 
+    // converts the spigot's column of the given rows of a tile into a result
+    void makeResult (Result::Ref &resref,const VisCube::VTile &tile,const LoRange &rowrange);
+
 //    template<int N,typename TT,typename VT>
 //    void readColumn (Result &result,void *coldata,const LoShape &colshape,const LoRange &rowrange,int nrows);
 
@@ -134,10 +147,15 @@ class Spigot : public VisHandlerNode
     int flag_bit_;
 
     //##ModelId=3F9FF6AA0221
+    // a queued tile. The result is made from the tile (which is then
+    // released) the first time it is asked for
     typedef struct
     {
       HIID rqid;
       Result::Ref res;
+      VisCube::VTile::Ref tile;
+      LoRange range;
+      Cells::Ref cells;
     } ResQueueItem;
 
     typedef std::list<ResQueueItem> ResQueue;
@@ -35,6 +35,8 @@
 #include <MeqServer/MeqPython.h>
 #include <MeqServer/Spigot.h>
 #include <MeqServer/Sink.h>
+#include <MEQ/MTPool.h>
+#include <sys/time.h>
 
 using namespace AppAgent;
 using namespace VisVocabulary;
@@ -68,6 +70,24 @@ const HIID FVisChannelClosed = AidVis|AidChannel|AidClosed;
 
 const HIID FCurrentRequest = AidCurrent|AidRequest;
 
+// time spent waiting on the input channel
+const HIID FInputBlocked = AidInput|AidBlocked;
+// output options: write tiles in a separate thread, and the number of
+// chunks that may be queued up for writing
+const HIID FAsync        = AidAsync;
+const HIID FQueueChunks  = AidQueue|AidChunks;
+// output queue statistics (see MTQueueChannel::fillStats())
+const HIID FOutputStats  = AidOutput|AidStats;
+// number of chunks in flight
+const HIID FPipelineDepth = AidPipeline|AidDepth;
+
+static inline double wallTime ()
+{
+  struct timeval tv;
+  gettimeofday(&tv,0);
+  return tv.tv_sec + tv.tv_usec*1e-6;
+}
+
 
 //##ModelId=3F9FF71B006A
 Meq::VisDataMux::VisDataMux ()
@@ -76,6 +96,11 @@ Meq::VisDataMux::VisDataMux ()
   time_extent_.resize(2,0);
   tile_time_.resize(2,0);
   tile_ts_.resize(2,0);
+  input_blocked_ = 0;
+  output_queue_ = 0;
+  output_queue_chunks_ = 0;
+  pipeline_depth_ = 1;
+  pipeline_stop_ = false;
 
   force_regular_grid = false;
   // use reasonable default
@@ -87,21 +112,92 @@ Meq::VisDataMux::VisDataMux ()
   enableMultiThreadedPolling();
 }
 
+Meq::VisDataMux::~VisDataMux ()
+{
+  // stop pipeline threads. The pipeline is cleared at the end of every
+  // stream, so there should be nothing in flight
+  Thread::Mutex::Lock lock(pipeline_cond_);
+  pipeline_stop_ = true;
+  pipeline_cond_.broadcast();
+  lock.release();
+  for( uint i=0; i<pipeline_threads_.size(); i++ )
+    pipeline_threads_[i].join();
+  for( uint i=0; i<pipeline_.size(); i++ )
+    delete pipeline_[i];
+}
+
 void Meq::VisDataMux::setStateImpl (DMI::Record::Ref &rec,bool initializing)
 {
   Node::setStateImpl(rec,initializing);
-  // do nothing else for now
+  int depth = pipeline_depth_;
+  if( rec[FPipelineDepth].get(depth,initializing) )
+  {
+    FailWhen(depth<1,"pipeline_depth must be at least 1");
+    pipeline_depth_ = depth;
+  }
+}
+
+void Meq::VisDataMux::projectMSInput (DMI::Record &params,const DMI::Record *outrec)
+{
+  // read only the ifrs that have handlers
+  if( !params[MSChannel::FReadIfrs].exists() )
+  {
+    std::vector<int> ifrs;
+    for( uint i=0; i<handlers_.size(); i++ )
+      if( !handlers_[i].empty() )
+        ifrs.push_back(i);
+    if( !ifrs.empty() )
+      params[MSChannel::FReadIfrs] = ifrs;
+  }
+  if( params[MSChannel::FReadColumns].exists() )
+    return;
+  // Read only the columns used by spigots, plus whatever is passed on
+  // to an MS output. Other outputs write out the tiles as they are, so
+  // then everything must be read.
+  const DMI::Record *poutms = 0;
+  if( outrec )
+  {
+    if( !(poutms = (*outrec)[FMS].as_po<DMI::Record>()) )
+      poutms = (*outrec)[FMS0].as_po<DMI::Record>();
+    if( !poutms && outrec->size() )
+      return;
+  }
+  std::set<string> columns;
+  if( poutms )
+  {
+    if( !(*poutms)[MSChannel::FDataColumn].as<string>("").empty() )
+      columns.insert("DATA");
+    if( !(*poutms)[MSChannel::FPredictColumn].as<string>("").empty() )
+      columns.insert("PREDICT");
+  }
+  const VisCube::VTile::IndexToNameMap &colnames = VisCube::VTile::getIndexToNameMap();
+  for( uint i=0; i<handlers_.size(); i++ )
+    for( HandlerSet::const_iterator iter = handlers_[i].begin(); iter != handlers_[i].end(); iter++ )
+    {
+      const Spigot *pspigot = dynamic_cast<const Spigot*>(*iter);
+      if( pspigot )
+        columns.insert(colnames[pspigot->inputColumn()]);
+    }
+  params[MSChannel::FReadColumns] = std::vector<string>(columns.begin(),columns.end());
+  cdebug(2)<<"MS input will read "<<columns.size()<<" tile column(s)"<<endl;
 }
 
 // inits input channel from record
-void Meq::VisDataMux::initInput (const DMI::Record &rec)
+void Meq::VisDataMux::initInput (const DMI::Record &rec,const DMI::Record *outrec)
 {
   wstate()[FInput].remove();
   EventChannel::Ref newchannel;
   // instantiate one of a number of channel types depending on record
   const DMI::Record * prec = 0;
+  DMI::Record::Ref msparams;
   if( (prec = rec[FMS].as_po<DMI::Record>()) != 0 )
+  {
     newchannel <<= new MSInputChannel;
+    // only read what the tree needs from the MS
+    msparams <<= new DMI::Record(*prec,DMI::DEEP);
+    projectMSInput(msparams(),outrec);
+    prec = msparams.deref_p();
+  }
   else if( (prec = rec[FBOIO].as_po<DMI::Record>()) != 0 )
     newchannel <<= new BOIOChannel;
   else if( (prec = rec[FDefault].as_po<DMI::Record>()) != 0 )
@@ -149,11 +245,19 @@ void Meq::VisDataMux::initOutput (const DMI::Record &rec)
     output_channel_().close();
     output_channel_.detach();
   }
+  output_queue_ = 0;
   // init new channel
   if( prec )
   {
-    output_channel_ <<= new MTQueueChannel(newchannel);
-    // output_channel_.xfer(newchannel);
+    // by default, tiles are written in a separate thread, with up to two
+    // chunks' worth of tiles queued up for writing
+    if( rec[FAsync].as<bool>(true) )
+    {
+      output_channel_ <<= output_queue_ = new MTQueueChannel(newchannel);
+      output_queue_chunks_ = rec[FQueueChunks].as<int>(2);
+    }
+    else
+      output_channel_.xfer(newchannel);
     output_channel_().init(*prec);
     wstate()[FOutput] = rec;
   }
@@ -162,6 +266,7 @@ void Meq::VisDataMux::initOutput (const DMI::Record &rec)
 void Meq::VisDataMux::clearOutput ()
 {
   output_channel_.detach();
+  output_queue_ = 0;
   wstate()[FOutput].replace() = false;
 }
 
@@ -175,6 +280,9 @@ void Meq::VisDataMux::postStatus ()
   ref[FTimeslots] = tile_ts_;
   ref[FTime] = tile_time_;
   ref[FTimeExtent] = time_extent_;
+  ref[FInputBlocked] = input_blocked_;
+  if( output_queue_ )
+    output_queue_->fillStats(ref[FOutputStats] <<= new DMI::Record);
   postEvent(FVisNumTiles,ref);
 }
 
@@ -264,6 +372,8 @@ int Meq::VisDataMux::deliverHeader (const DMI::Record &header)
     nstations = 30;
     cdebug(2)<<"no NumStations parameter in header, assuming 30\n";
   }
+  // drop any chunks left over from an aborted stream
+  clearPipeline();
   // reset request ID
   forest().incrRequestId(next_rqid_,FDataset);
   RequestType::setType(next_rqid_,RequestType::EVAL);
@@ -271,6 +381,10 @@ int Meq::VisDataMux::deliverHeader (const DMI::Record &header)
   current_seqnr_ = -1;
   int maxdid = formDataId(nstations-1,nstations-1) + 1;
   have_tile_.assign(maxdid,false);
+  // size the output queue to hold the requested number of chunks (plus
+  // header and footer)
+  if( output_queue_ && output_queue_chunks_ > 0 )
+    output_queue_->setQueueSize(output_queue_chunks_*maxdid+2);
   // forest().resetForNewDataSet();
   handlers_.resize(maxdid);
   child_indices_.resize(maxdid);
@@ -399,6 +513,9 @@ int Meq::VisDataMux::deliverFooter (const DMI::Record &footer)
       try { result_flag |= endSnippet(); }
       CatchExceptions("ending tile "+rqid_.toString('.'));
     }
+    // wait for all chunks in flight, and write them out
+    try { result_flag |= releaseChunks(0); }
+    CatchExceptions("finishing chunks in flight");
     cdebug(2)<<"delivering footer to all handlers"<<endl;
     for( uint i=0; i<handlers_.size(); i++ )
     {
@@ -411,9 +528,12 @@ int Meq::VisDataMux::deliverFooter (const DMI::Record &footer)
       }
     }
   }
-  // post footer to output
+  // post footer to output, and wait for everything to be written out
   if( output_channel_.valid() )
+  {
     output_channel_().postEvent(VisData::VisEventHIID(VisData::FOOTER,HIID()),ObjRef(footer));
+    output_channel_().flush();
+  }
 
   if( !errors.empty() )
     throw errors;
@@ -467,9 +587,15 @@ int Meq::VisDataMux::startSnippet (const VisCube::VTile &tile)
 
 int Meq::VisDataMux::endSnippet ()
 {
+  if( pipeline_depth_ > 1 )
+    return queueSnippet();
   DMI::ExceptionList errors;
   int result_flag = 0;
   cdebug(3)<<"end of tile"<<endl;
+  // if the pipeline depth was lowered in mid-stream, finish off the chunks
+  // still in flight first, so that tiles are written in order
+  try { result_flag |= releaseChunks(0); }
+  CatchExceptions("finishing chunks in flight");
   // post tile count
   postStatus();
   // poll pre-processing child
@@ -532,19 +658,7 @@ int Meq::VisDataMux::endSnippet ()
       {
         const VisCube::VTile *ptile = res[AidTile].as_po<VisCube::VTile>();
         if( ptile )
-        {
-          cdebug(2)<<"handler returns updated tile "<<ptile->tileId()<<", posting to output\n";
-          writing_data_ = true;
-          if( output_channel_.valid() )
-          {
-            if( cached_header_.valid() )
-            {
-              output_channel_().postEvent(VisData::VisEventHIID(VisData::HEADER,HIID()),cached_header_);
-              cached_header_.detach();
-            }
-            output_channel_().postEvent(VisData::VisEventHIID(VisData::DATA,ptile->tileId()),ObjRef(ptile));
-          }
-        }
+          postTile(*ptile);
       }
     }
     CatchExceptions("error processing tile "+rqid_.toString('.'));
@@ -573,12 +687,226 @@ int Meq::VisDataMux::endSnippet ()
     }
     CatchExceptionsMore("post-processing tile "+rqid_.toString('.'));
   }
+  releaseTiles(*current_req_,have_tile_);
   // throw errors if any
   if( !errors.empty() )
     throw errors;
   return result_flag;
 }
 
+void Meq::VisDataMux::postTile (const VisCube::VTile &tile)
+{
+  cdebug(2)<<"handler returns updated tile "<<tile.tileId()<<", posting to output\n";
+  writing_data_ = true;
+  if( output_channel_.valid() )
+  {
+    if( cached_header_.valid() )
+    {
+      output_channel_().postEvent(VisData::VisEventHIID(VisData::HEADER,HIID()),cached_header_);
+      cached_header_.detach();
+    }
+    output_channel_().postEvent(VisData::VisEventHIID(VisData::DATA,tile.tileId()),ObjRef(&tile));
+  }
+}
+
+void Meq::VisDataMux::releaseTiles (const Request &req,const std::vector<bool> &have_tile)
+{
+  for( uint i=0; i<have_tile.size() && i<handlers_.size(); i++ )
+    if( have_tile[i] )
+    {
+      HandlerSet & hlist = handlers_[i];
+      for( HandlerSet::iterator iter = hlist.begin(); iter != hlist.end(); iter++ )
+        (*iter)->releaseTile(req);
+    }
+}
+
+int Meq::VisDataMux::queueSnippet ()
+{
+  cdebug(3)<<"end of tile, queueing request "<<rqid_<<endl;
+  // post tile count
+  postStatus();
+  ChunkJob *job = new ChunkJob;
+  job->req = current_req_;
+  job->have_tile = have_tile_;
+  for( uint i=0; i<child_indices_.size() && i<have_tile_.size(); i++ )
+    if( have_tile_[i] )
+      job->children.insert(job->children.end(),child_indices_[i].begin(),child_indices_[i].end());
+  job->result_flag = 0;
+  job->done = false;
+  Thread::Mutex::Lock lock(pipeline_cond_);
+  // start pipeline threads as needed
+  while( int(pipeline_threads_.size()) < pipeline_depth_ )
+    pipeline_threads_.push_back(Thread::create(startPipelineThread,this));
+  pipeline_.push_back(job);
+  pipeline_jobs_.push_back(job);
+  pipeline_cond_.broadcast();
+  lock.release();
+  // write out any chunks that are done, and wait for the oldest ones if
+  // too many are in flight
+  return releaseChunks(pipeline_depth_);
+}
+
+int Meq::VisDataMux::releaseChunks (uint maxdepth)
+{
+  DMI::ExceptionList errors;
+  int result_flag = 0;
+  Thread::Mutex::Lock lock(pipeline_cond_);
+  while( !pipeline_.empty() && ( pipeline_.front()->done || pipeline_.size() > maxdepth ) )
+  {
+    while( !pipeline_.front()->done )
+      pipeline_cond_.wait();
+    ChunkJob *job = pipeline_.front();
+    pipeline_.pop_front();
+    lock.release();
+    string rqid = job->req->id().toString('.');
+    cdebug(3)<<"chunk "<<rqid<<" finished, "<<job->tiles.size()<<" output tiles"<<endl;
+    result_flag |= job->result_flag;
+    if( !job->errors.empty() )
+      errors.add(job->errors);
+    try
+    {
+      for( uint i=0; i<job->tiles.size(); i++ )
+        postTile(*(job->tiles[i]));
+    }
+    CatchExceptionsMore("writing tiles of "+rqid);
+    releaseTiles(*(job->req),job->have_tile);
+    delete job;
+    lock.lock(pipeline_cond_);
+  }
+  lock.release();
+  if( !errors.empty() )
+    throw errors;
+  return result_flag;
+}
+
+void Meq::VisDataMux::clearPipeline ()
+{
+  Thread::Mutex::Lock lock(pipeline_cond_);
+  // chunks not yet started are simply marked as done
+  for( uint i=0; i<pipeline_jobs_.size(); i++ )
+    pipeline_jobs_[i]->done = true;
+  pipeline_jobs_.clear();
+  while( !pipeline_.empty() )
+  {
+    while( !pipeline_.front()->done )
+      pipeline_cond_.wait();
+    ChunkJob *job = pipeline_.front();
+    pipeline_.pop_front();
+    lock.release();
+    releaseTiles(*(job->req),job->have_tile);
+    delete job;
+    lock.lock(pipeline_cond_);
+  }
+}
+
+void * Meq::VisDataMux::startPipelineThread (void *mux)
+{
+  return static_cast<VisDataMux*>(mux)->runPipelineThread();
+}
+
+void * Meq::VisDataMux::runPipelineThread ()
+{
+  // join the thread pool, since nodes executed from this thread may
+  // need to mark it as blocked
+  if( MTPool::enabled() )
+    MTPool::brigade().join(MTPool::BUSY,0);
+  Thread::Mutex::Lock lock(pipeline_cond_);
+  while( true )
+  {
+    if( MTPool::enabled() )
+      MTPool::Brigade::markThreadAsBlocked(name());
+    while( !pipeline_stop_ && pipeline_jobs_.empty() )
+      pipeline_cond_.wait();
+    if( MTPool::enabled() )
+      MTPool::Brigade::markThreadAsUnblocked(name());
+    if( pipeline_stop_ )
+      break;
+    ChunkJob *job = pipeline_jobs_.front();
+    pipeline_jobs_.pop_front();
+    lock.release();
+    evaluateChunk(*job);
+    lock.lock(pipeline_cond_);
+    job->done = true;
+    pipeline_cond_.broadcast();
+  }
+  return 0;
+}
+
+void Meq::VisDataMux::evaluateChunk (ChunkJob &job)
+{
+  // this is endSnippet() in a pipeline thread: timers and state are left
+  // alone, since the mux thread carries on using them
+  DMI::ExceptionList &errors = job.errors;
+  int result_flag = 0;
+  const Request &req = *job.req;
+  string rqid = req.id().toString('.');
+  cdebug(3)<<"evaluating chunk "<<rqid<<endl;
+  // poll pre-processing child
+  if( children().isChildValid(1) )
+  {
+    Result::Ref res;
+    try
+    {
+      int retcode = children().getChild(1).execute(res,req,0);
+      result_flag |= retcode;
+      if( retcode&RES_FAIL )
+      {
+        res->addToExceptionList(errors);
+        errors.add(MakeNodeException(
+            "error pre-processing tile "+rqid+": "+
+            "child '"+children().getChild(1).name()+"' returns a FAIL"));
+      }
+    }
+    CatchExceptionsMore("pre-processing tile "+rqid);
+  }
+  int nerr0 = errors.size();
+  // poll the sinks one by one. The async poll of endSnippet() can't be used
+  // here, since it keeps its state in the children list
+  for( uint i=0; i<job.children.size() && !forest().abortFlag(); i++ )
+  {
+    int ichild = job.children[i];
+    try
+    {
+      Result::Ref res;
+      int retcode = children().getChild(ichild).execute(res,req,0);
+      result_flag |= retcode;
+      if( retcode&RES_FAIL )
+      {
+        res->addToExceptionList(errors);
+        errors.add(MakeNodeException("child '"+children().getChild(ichild).name()+"' returns a FAIL"));
+      }
+      else if( !(retcode&(RES_WAIT|RES_ABORT)) ) // keep returned tile for output
+      {
+        const VisCube::VTile *ptile = res[AidTile].as_po<VisCube::VTile>();
+        if( ptile )
+          job.tiles.push_back(VisCube::VTile::Ref(ptile));
+      }
+    }
+    CatchExceptions("error processing tile "+rqid);
+  }
+  if( errors.size() > nerr0 )
+    errors.add(MakeNodeException("error processing tile "+rqid));
+  // poll post-processing child
+  if( !forest().abortFlag() && children().isChildValid(2) )
+  {
+    Result::Ref res;
+    try
+    {
+      int retcode = children().getChild(2).execute(res,req,0);
+      result_flag |= retcode;
+      if( retcode&RES_FAIL )
+      {
+        res->addToExceptionList(errors);
+        errors.add(MakeNodeException(
+            "error post-processing tile "+rqid+": "+
+            "child '"+children().getChild(2).name()+"' returns a FAIL"));
+      }
+    }
+    CatchExceptionsMore("post-processing tile "+rqid);
+  }
+  job.result_flag = result_flag;
+}
+
 void Meq::VisDataMux::fillCells (Cells &cells,LoRange &range,const VisCube::VTile &tile)
 {
   // find first valid row, error if none
@@ -631,9 +959,9 @@ int Meq::VisDataMux::pollChildren (Result::Ref &resref,
   timers().children.stop();
   timers().getresult.start();
   // init input channel
-  initInput(*inrec);
-  // init output channel, if any
   const DMI::Record * outrec = request[FOutput].as_po<DMI::Record>();
+  initInput(*inrec,outrec);
+  // init output channel, if any
   if( outrec )
     initOutput(*outrec);
   else
@@ -643,6 +971,7 @@ int Meq::VisDataMux::pollChildren (Result::Ref &resref,
   VellSet::Ref fail_list(DMI::ANONWR);
   int stream_state = VisData::FOOTER; // no stream event yet
   time_extent_.assign(2,0);
+  input_blocked_ = 0;
   bool had_data = false;
   // prepare event record describing start
   DMI::Record::Ref ref(DMI::ANONWR);
@@ -668,7 +997,9 @@ int Meq::VisDataMux::pollChildren (Result::Ref &resref,
       HIID evid;
       ObjRef evdata;
       // wait for a valid input event
+      double t0 = wallTime();
       int state = input_channel_().getEvent(evid,evdata);
+      input_blocked_ += wallTime() - t0;
       // break out once stream is closed
       if( state == AppEvent::CLOSED )
         break;
@@ -723,8 +1054,11 @@ int Meq::VisDataMux::pollChildren (Result::Ref &resref,
         evrec[FNumTiles]  = num_tiles_;
         evrec[FNumChunks] = num_chunks_;
         evrec[FNumTimeslots] = num_ts_;
-        evrec[FMessage] = ssprintf("received footer %s. Processed %d timeslots, %d tiles, %d chunks",
-            ev_inst.toString('.').c_str(),tile_ts_[1]+1,num_tiles_,num_chunks_);
+        evrec[FInputBlocked] = input_blocked_;
+        if( output_queue_ )
+          output_queue_->fillStats(evrec[FOutputStats] <<= new DMI::Record);
+        evrec[FMessage] = ssprintf("received footer %s. Processed %d timeslots, %d tiles, %d chunks, %.1fs waiting for input",
+            ev_inst.toString('.').c_str(),tile_ts_[1]+1,num_tiles_,num_chunks_,input_blocked_);
         postEvent(FVisFooter,evrec);
       }
       else if( event_type == VisData::HEADER )
@@ -763,6 +1097,8 @@ int Meq::VisDataMux::pollChildren (Result::Ref &resref,
         postError("error "+doing_what,errors.makeList());
       }
     }
+    // drop any chunks left in flight (e.g. if aborted)
+    clearPipeline();
     // check for correct stream state -- last thing should have been a footer
     if( !forest().abortFlag() )
     {
@@ -792,6 +1128,7 @@ int Meq::VisDataMux::pollChildren (Result::Ref &resref,
   }
   catch( std::exception &exc )  // catch-all for errors 
   {
+    clearPipeline();
     // abort channels
     input_channel_().abort();
     if( output_channel_.valid() )
@@ -801,6 +1138,7 @@ int Meq::VisDataMux::pollChildren (Result::Ref &resref,
   }
   catch( ... )  // catch-all and cleanup for any errors not caught above
   {
+    clearPipeline();
     // post end event
     postEvent(FVisChannelClosed,endref);
     // abort channels
@@ -30,11 +30,19 @@
 #include <MeqServer/VisHandlerNode.h>
 #include <MeqServer/TID-MeqServer.h>
 #include <VisCube/VisVocabulary.h>
+#include <TimBase/Thread/Condition.h>
 #include <vector>
+#include <deque>
     
 #pragma types #Meq::VisDataMux
 #pragma aid Station Index Tile Format Start Pre Post Sync Chunks 
-#pragma aid Open Closed Current Timeslots
+#pragma aid Open Closed Current Timeslots Blocked Async Queue Stats
+#pragma aid Pipeline Depth
+
+namespace AppAgent
+{
+class MTQueueChannel;
+}
 
 namespace Meq 
 {
@@ -48,6 +56,8 @@ class VisDataMux : public Node
   public:
     //##ModelId=3F9FF71B006A
     VisDataMux ();
+
+    virtual ~VisDataMux ();
   
     virtual TypeId objectType() const
     { return TpMeqVisDataMux; }
@@ -90,8 +100,13 @@ class VisDataMux : public Node
     //##ModelId=3F9FF71B00C7
     VisDataMux (const VisDataMux &);
 
-    void initInput (const DMI::Record &rec);
+    void initInput (const DMI::Record &rec,const DMI::Record *outrec);
     void initOutput (const DMI::Record &rec);
+
+    // fills in the ifrs and tile columns to be read by an MS input channel,
+    // from the handlers in the tree and the output record. Fields already
+    // in the input parameters are left alone.
+    void projectMSInput (DMI::Record &params,const DMI::Record *outrec);
     
     void clearOutput ();
     
@@ -99,6 +114,40 @@ class VisDataMux : public Node
     
     int startSnippet (const VisCube::VTile &tile);
     int endSnippet   ();
+
+    // posts an output tile, preceded by the cached header if needed
+    void postTile (const VisCube::VTile &tile);
+    // tells the handlers of all data IDs that had a tile that the request
+    // is finished with
+    void releaseTiles (const Request &req,const std::vector<bool> &have_tile);
+
+    // a chunk (snippet) in flight, when pipeline_depth_>1
+    class ChunkJob
+    {
+      public:
+        Request::Ref        req;
+        std::vector<bool>   have_tile;
+        std::vector<int>    children;   // sinks to be polled
+        std::vector<VisCube::VTile::Ref> tiles;  // output tiles returned by sinks
+        DMI::ExceptionList  errors;
+        int                 result_flag;
+        bool                done;
+    };
+
+    // hands the current snippet over to the pipeline threads (instead of
+    // endSnippet())
+    int queueSnippet ();
+    // evaluates a chunk: polls the pre child, the sinks, and the post child
+    void evaluateChunk (ChunkJob &job);
+    // releases finished chunks in order, posting their tiles to the output,
+    // and waits for the oldest ones until no more than maxdepth remain
+    // in flight. Throws any errors of the released chunks.
+    int releaseChunks (uint maxdepth);
+    // waits for all chunks in flight, and discards them
+    void clearPipeline ();
+
+    static void * startPipelineThread (void *mux);
+    void * runPipelineThread ();
     
     //##ModelId=3F992F280174
     static int formDataId (int sta1,int sta2)
@@ -156,8 +205,32 @@ class VisDataMux : public Node
     std::vector<int>    tile_ts_;     // range of timeslot indices for current tile
     std::vector<double> tile_time_;   // range of times for current tile
     std::vector<double> time_extent_; // range of times for full stream (from header)
+    double input_blocked_;            // time spent waiting for input events
     AppAgent::EventChannel::Ref  input_channel_;    
     AppAgent::EventChannel::Ref  output_channel_;    
+    // in async output mode, output_channel_ is an MTQueueChannel, which
+    // writes tiles in its own thread. Otherwise this is 0.
+    AppAgent::MTQueueChannel *   output_queue_;
+    // max number of chunks of tiles in the output queue, 0 to leave the
+    // queue size as given in the output record
+    int output_queue_chunks_;
+
+    // number of chunks that may be in flight at once ("pipeline_depth"
+    // state field, default 1). With a depth of 1, each chunk is fully
+    // evaluated before the next one is read. With a depth of K>1, each chunk
+    // is handed to one of K pipeline threads as soon as it has been read,
+    // and its tiles are written out once it and all chunks before it are
+    // finished. Since every node still holds a single cached result, only
+    // use this with trees that carry no state from one chunk to the next
+    // (i.e. no solvers), and note that subtrees shared between sinks may be
+    // evaluated more than once per chunk.
+    int pipeline_depth_;
+    // everything below is protected by pipeline_cond_
+    Thread::Condition pipeline_cond_;
+    std::deque<ChunkJob *> pipeline_;       // chunks in flight, oldest first
+    std::deque<ChunkJob *> pipeline_jobs_;  // chunks not yet picked up by a thread
+    std::vector<Thread::ThrID> pipeline_threads_;
+    bool pipeline_stop_;
 };
 
 } // namespace Meq
@@ -94,7 +94,15 @@ class VisHandlerNode : public Node
     //##    RES_UPDATED result available and tile was updated, output tile is
     //##                attached to tileref
     virtual int deliverTile   (const Request &,VisCube::VTile::Ref &,const LoRange &) { return 0; }
-                         
+
+    //##Documentation
+    //## Alerts node that the request a tile was delivered with has been
+    //## fully evaluated, so anything held for it may be released. Note that
+    //## the data mux may have several requests in flight at once (see
+    //## VisDataMux's pipeline_depth), so tiles for later requests may be
+    //## delivered before this is called.
+    virtual void releaseTile (const Request &) {}
+
     //##Documentation
     //## Alerts node that a visdata stream is finished.
     //## Returns result state (see Node::RES_xxx constants), which can be
@@ -66,6 +66,8 @@ int main (int argc,const char *argv[])
     close(i);
 
   int max_threads = 1;
+  int mt_scheduler = Meq::MTPool::SCHED_LIFO;
+  int mt_affinity = Meq::MTPool::AFFINITY_NONE;
 
   // collect command-line arguments into vector
   StrVec args(argc-1);
@@ -92,6 +94,26 @@ int main (int argc,const char *argv[])
     int nt = atoi(iter->c_str());
     if( nt>0 )
       max_threads = nt;
+    // "-mt N:opt:opt" selects the work order scheduler ("lifo" or "steal")
+    // and/or the thread affinity policy ("none", "core" or "socket")
+    size_t colon = iter->find(':');
+    while( colon != string::npos )
+    {
+      size_t next = iter->find(':',colon+1);
+      string opt = iter->substr(colon+1,next == string::npos ? string::npos : next-colon-1);
+      int sched = Meq::MTPool::parseScheduler(opt);
+      int aff = Meq::MTPool::parseAffinity(opt);
+      if( sched >= 0 )
+        mt_scheduler = sched;
+      else if( aff >= 0 )
+        mt_affinity = aff;
+      else
+      {
+        cerr<<"-mt options must be one of 'lifo', 'steal', 'none', 'core' or 'socket'\n";
+        return 1;
+      }
+      colon = next;
+    }
   }
   // "-gw" option
   string local_gw;
@@ -133,7 +155,7 @@ int main (int argc,const char *argv[])
     // otherwise only start if mt>1
     // this needs to happen before initializing MPI
     if( max_threads > 1 || meqmpi.comm_size() > 1 )
-      Meq::MTPool::start(max_threads*2-1,max_threads);
+      Meq::MTPool::start(max_threads*2-1,max_threads,mt_scheduler,mt_affinity);
     // rank 0: main server.
     // don't bother to initialize MPI unless there's someone to talk to
     if( meqmpi.comm_size() > 1 )
@@ -142,7 +164,7 @@ int main (int argc,const char *argv[])
   // no MPI support -- start worker threads only as needed
   // Start one less since the main execution thread will join the brigade.
   if( max_threads > 1 )
-    Meq::MTPool::start(max_threads*2-1,max_threads);
+    Meq::MTPool::start(max_threads*2-1,max_threads,mt_scheduler,mt_affinity);
 #endif
 
   using main_debug_context::getDebugContext;
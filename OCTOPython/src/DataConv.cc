@@ -831,6 +831,57 @@ PyObject * pyFromArray (const DMI::NumArray &da)
   }
 }
 
+// -----------------------------------------------------------------------
+// pyViewFromArray
+// returns a read-only NumPy array that refers to the data of a 
+// DMI::NumArray directly, without copying. 'owner' must be a Python object 
+// that holds a ref to the DMI::NumArray for as long as it lives; it becomes 
+// the base object of the NumPy array.
+// Single-element arrays are returned as scalars, same as pyFromArray().
+// Returns NEW REF
+// -----------------------------------------------------------------------
+PyObject * pyViewFromArray (const DMI::NumArray &da,PyObject *owner)
+{
+  Thread::Mutex::Lock lock(da.mutex());
+  int rank = da.rank();
+  TypeId objtype = da.objectType();
+  if( rank==1 && da.size() == 1 && objtype == TpDMINumArray )
+    return pyFromArray(da);
+  cdebug(3)<<"pyViewFromArray: creating array view"<<endl;
+  PyTypeObject *pytype = &PyArray_Type;
+  PyObjectRef realclass;
+  if( objtype != TpDMINumArray )
+  {
+    cdebug(3)<<"pyViewFromArray: real type is "<<objtype<<endl;
+    PyObjectRef args = Py_BuildValue("(sO)",objtype.toString().c_str(),*py_dmisyms.array_class); // new ref
+    if( !args )
+      throwErrorOpt(Runtime,"failed to create dmi_type() args tuple for "+objtype.toString());
+    realclass = PyObject_CallObject(*py_dmisyms.dmi_type,*args); // new ref
+    if( !realclass )
+      throwErrorOpt(Runtime,"failed to call dmi_type() for "+objtype.toString());
+    pytype = reinterpret_cast<PyTypeObject*>(*realclass);
+  }
+  int typecode = typeIdToNumarray(da.elementType());
+  npy_intp dims[rank];
+  for( int i=0; i<rank; i++ )
+    dims[i] = da.shape()[i];
+  // flags=0 with a non-0 data pointer gives us a C-ordered array that does
+  // not own its data and is not writeable
+  PyObjectRef pyarr = PyArray_New(pytype,rank,dims,typecode,0,
+                                  const_cast<void*>(da.getConstDataPtr()),0,0,0);
+  if( !pyarr )
+    throwErrorOpt(Runtime,"failed to create numpy array view for "+objtype.toString());
+  // the array now holds a ref to the owner, which keeps the data alive
+  Py_INCREF(owner);
+#if NPY_API_VERSION >= 0x00000007
+  if( PyArray_SetBaseObject(reinterpret_cast<PyArrayObject*>(*pyarr),owner) < 0 )
+    throwErrorOpt(Runtime,"failed to set base object of numpy array view");
+#else
+  PyArray_BASE(*pyarr) = owner;
+#endif
+  return ~pyarr; // steal our ref since we need to return a NEW REF
+}
+
 // -----------------------------------------------------------------------
 // pyFromMessage
 // -----------------------------------------------------------------------
@@ -97,6 +97,34 @@ static PyObject * LazyObjRef_resolve (LazyObjRef* self)
 }
 
 
+// -----------------------------------------------------------------------
+// view
+// like resolve(), but NumArrays are returned as read-only NumPy arrays
+// referring to the DMI data directly (the lazy ref becomes their base 
+// object and keeps the data alive). Records are converted as usual, i.e.
+// with their own fields left as lazy refs.
+// returns NEW reference to object
+// -----------------------------------------------------------------------
+static PyObject * LazyObjRef_view (LazyObjRef* self)
+{
+  try
+  {
+    // return None for invalid field
+    if( !self->field.valid() )
+      returnNone;
+    const DMI::BObj &obj = self->field.ref().deref();
+    const DMI::NumArray *parr = dynamic_cast<const DMI::NumArray *>(&obj);
+    if( parr )
+      return pyViewFromArray(*parr,(PyObject*)self);
+    PyObjectRef pyobj = pyFromDMI(obj);
+    // returns NEW ref, stealing from ours
+    return ~pyobj;
+  }
+  catchStandardErrors(NULL);
+  returnNone;
+}
+
+
 // -----------------------------------------------------------------------
 // members/data structures init
 // -----------------------------------------------------------------------
@@ -104,6 +132,8 @@ static PyObject * LazyObjRef_resolve (LazyObjRef* self)
 static PyMethodDef LazyObjRef_methods[] = {
     {"resolve",     (PyCFunction)LazyObjRef_resolve, METH_NOARGS,
                   "resolves lazy ref into object, returns object" },
+    {"view",        (PyCFunction)LazyObjRef_view, METH_NOARGS,
+                  "resolves lazy ref into object, returning arrays as read-only views" },
     {NULL}  /* Sentinel */
 };
 
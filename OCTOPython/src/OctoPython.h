@@ -94,6 +94,10 @@ namespace OctoPython
   PyObject * pyFromArray    (const DMI::NumArray &);
   PyObject * pyFromMessage  (const Message &);
   PyObject * pyFromHIID     (const HIID &);
+  // Builds a read-only NumPy array referring to the NumArray's data without
+  // copying it. 'owner' must hold a ref to the NumArray, it becomes the
+  // base object of the returned array. Returns _NEW REFERENCE_.
+  PyObject * pyViewFromArray (const DMI::NumArray &,PyObject *owner);
   // simple helper for std::strings, returns NEW REF
   inline PyObject * pyFromString (const std::string &str)
   { return PyString_FromString(str.c_str()); }
@@ -50,6 +50,59 @@ from Timba.array import array
 import Timba
 from Timba.utils import *
 
+# 
+# === hiid interning ===
+# Constructing a hiid from a string requires a round-trip into C++, and
+# hiids are built over and over again from the same few strings (message ids,
+# command names, etc.) So, hiids built from a single string or tuple are 
+# interned in these caches, which map the string (plus separator) or the tuple 
+# to a shared hiid instance. Hiids are immutable, so sharing is safe. 
+# The caches are simply flushed when they grow beyond _hiid_cache_limit.
+#
+_hiid_str_cache = {};
+_hiid_tuple_cache = {};
+_hiid_cache_limit = 16384;
+
+def _intern_hiid (cache,key,value):
+  if len(cache) >= _hiid_cache_limit:
+    cache.clear();
+  cache[key] = value;
+  return value;
+
+# special AtomicID values (see DMI/src/AtomicID.h)
+_AidAny = -1;
+_AidWildcard = -2;
+
+def _str_to_hiid (x,sep):
+  """returns interned hiid parsed from string x, or None if parsing fails""";
+  h = _hiid_str_cache.get((x,sep));
+  if h is None:
+    try:
+      parsed = Timba.octopython.str_to_hiid(x,sep);
+    except:
+      return None;
+    h = _intern_hiid(_hiid_str_cache,(x,sep),tuple.__new__(hiid,parsed));
+  return h;
+
+def _hiid_matches (a,b):
+  """pure-Python version of HIID::matches(), for hiids made up of AtomicID
+  ints: '?' (-1) matches any one element, '*' (-2) matches the remainder.
+  Returns None if a non-int element is encountered.""";
+  for x,y in zip(a,b):
+    if type(x) is not int or type(y) is not int:
+      return None;
+    if x == _AidWildcard or y == _AidWildcard:
+      return True;
+    if x != y and x != _AidAny and y != _AidAny:
+      return False;
+  na = len(a);
+  nb = len(b);
+  if na > nb:
+    return tuple.__getitem__(a,nb) == _AidWildcard;
+  elif nb > na:
+    return tuple.__getitem__(b,na) == _AidWildcard;
+  return True;
+
 # 
 # === class hiid ===
 #
@@ -57,12 +110,25 @@ class hiid (tuple):
   "Represents the DMI HIID class";
   def __new__ (self,*args,**kw):
     sep = kw.get('sep','._');           # use '.' separator by default
+    # fast path: a single string or tuple seen before returns interned hiid
+    if len(args) == 1 and self is hiid:
+      x = args[0];
+      if isinstance(x,str):
+        h = _str_to_hiid(x,sep);
+        if h is not None:
+          return h;
+      elif type(x) is hiid:
+        return x;
+      elif type(x) is tuple:
+        try: return _hiid_tuple_cache[x];
+        except (KeyError,TypeError): pass;
     mylist = ();
     for x in args:
       if isinstance(x,str):            # a string? Use HIID mapping functions
-        try:
-          mylist = mylist + Timba.octopython.str_to_hiid(x,sep);
-        except:
+        h = _str_to_hiid(x,sep);
+        if h is not None:
+          mylist = mylist + h;
+        else:
           # normally, this would never fail, but if it ever does, here's a fallback
           mylist = mylist + (x,);
       elif isinstance(x,(tuple,list)): # other sequence? use as list
@@ -71,7 +137,12 @@ class hiid (tuple):
         mylist = mylist + (x,);
       else:
         raise ValueError, "can't construct hiid from a %s"%type(x);
-    return tuple.__new__(self,mylist);
+    obj = tuple.__new__(self,mylist);
+    # intern the result of a single-tuple construction
+    if len(args) == 1 and self is hiid and type(args[0]) is tuple:
+      try: _intern_hiid(_hiid_tuple_cache,args[0],obj);
+      except TypeError: pass;
+    return obj;
   # get(n) returns element N as integer
   def get (self,n):
     return tuple.__getitem__(self,n);
@@ -89,9 +160,16 @@ class hiid (tuple):
       return '.'.join(map(str,self));
   def __repr__ (self):
     return "hiid('%s')" % str(self);
-  # matches() function matches hiids
+  # matches() function matches hiids. The common all-integer case is 
+  # handled in Python, anything else goes to C++
   def matches (self,other):
-    return Timba.octopython.hiid_matches(self,make_hiid(other));
+    other = make_hiid(other);
+    if self is other:
+      return True;
+    match = _hiid_matches(self,other);
+    if match is None:
+      return Timba.octopython.hiid_matches(self,other);
+    return match;
   def startswith (self,other):
     other = make_hiid(other);
     return self[:len(other)] == other;
@@ -433,9 +511,105 @@ class record (dict):
     return True;
   def __ne__ (self,other):
     return not self.__eq__(other);
+  # view: returns a read-only view of the record
+  def view (self):
+    "returns a read-only record_view of this record";
+    return record_view(self);
 
 make_record = type_maker(record);
 
+class record_view (object):
+  """A record_view is a read-only view of a record received from C++. 
+  Fields of such records are lazy refs to the underlying DMI::Record fields.
+  Unlike the record itself, the view never resolves all fields at once:
+  a field is converted only when it is accessed, nested records are returned 
+  as further views, and arrays are returned as read-only NumPy arrays that
+  refer to the DMI data directly, without copying. Accessed fields are cached
+  in the view, the viewed record itself is left untouched.
+  Use materialize() to obtain a regular (writeable) record.
+  """;
+  def __init__ (self,rec):
+    object.__setattr__(self,'_rec',rec);
+    object.__setattr__(self,'_cache',{});
+  # converts a raw dict value into its view representation
+  def _make_view (value):
+    if isinstance(value,lazy_objref):
+      value = value.view();
+    if isinstance(value,record):
+      value = record_view(value);
+    return value;
+  _make_view = staticmethod(_make_view);
+  # returns view of field with the given (already-made) key
+  def _view_field (self,key):
+    value = self._cache.get(key,KeyError);
+    if value is KeyError:
+      value = dict.get(self._rec,key,KeyError);
+      if value is KeyError:
+        raise KeyError,"no such key: %s"%key;
+      try:
+        value = self._make_view(value);
+      except:
+        value = sys.exc_info()[1];
+      self._cache[key] = value;
+    return value;
+  def get (self,key,default=None):
+    try: key = self._rec.make_key(key);
+    except ValueError,info: raise TypeError,info;
+    try:
+      return self._view_field(key);
+    except KeyError:
+      if default is KeyError:
+        raise;
+      return default;
+  def __getitem__ (self,name):
+    return self.get(name,default=KeyError);
+  def __getattr__ (self,name):
+    if name.startswith('__'):
+      raise AttributeError,name;
+    try:   key = self._rec.make_key(name);
+    except ValueError,info: raise AttributeError,info;
+    try:   return self._view_field(key);
+    except KeyError: raise AttributeError,"no such field: "+str(key);
+  def _readonly (self,*args):
+    raise TypeError,"record_view is read-only";
+  __setattr__ = __setitem__ = __delattr__ = __delitem__ = _readonly;
+  def __contains__ (self,name):
+    return name in self._rec;
+  has_field = __contains__;
+  def __len__ (self):
+    return dict.__len__(self._rec);
+  def __iter__ (self):
+    return dict.iterkeys(self._rec);
+  def keys (self):
+    return dict.keys(self._rec);
+  field_names = iterkeys = keys;
+  # the iterators convert fields one at a time, as they are reached
+  def iteritems (self):
+    for key in dict.keys(self._rec):
+      yield key,self._view_field(key);
+  def itervalues (self):
+    for key in dict.keys(self._rec):
+      yield self._view_field(key);
+  def items (self):
+    return list(self.iteritems());
+  def values (self):
+    return list(self.itervalues());
+  def materialize (self):
+    """returns a regular record with the contents of the view. Nested views
+    are materialized recursively, array views are copied""";
+    rec = type(self._rec)();
+    for key,value in self.iteritems():
+      if isinstance(value,record_view):
+        value = value.materialize();
+      elif isinstance(value,array_class) and not value.flags.owndata:
+        value = value.copy();
+      dict.__setitem__(rec,key,value);
+    return rec;
+  def __str__ (self):
+    return "view" + str(self.materialize());
+  def __repr__ (self):
+    return "record_view(%s)"%(", ".join(self.keys()),);
+
 class dmilist (list):
   """A dmilist() is a list that is explicitly converted into a DMI::List
   type when passed to C++ (note that normal lists may be converted into a 
@@ -606,6 +780,7 @@ except ImportError:
   class lazy_objref (object):
     def resolve (self):
       return None;
+    view = resolve;
   
 #
 # self-test code follows
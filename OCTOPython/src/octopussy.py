@@ -109,6 +109,108 @@ def stop ():
 
 from octopython import get_server_ports
   
+#
+# _mask_index
+#   Prefix-trie over HIID masks, used by proxy_wp to look up the masked
+#   whenevers matching a message id in O(depth) rather than scanning every
+#   mask. Follows the semantics of HIID::matches(): "?" matches any single
+#   element, "*" matches the remainder of the id (including nothing at all).
+#
+class _mask_index (object):
+  "prefix-trie index of hiid masks"
+  # special AtomicID values (see DMI/src/AtomicID.h)
+  AidAny      = -1;
+  AidWildcard = -2;
+
+  class node (object):
+    __slots__ = ( "children","terminal","wild" );
+    def __init__ (self):
+      self.children = {};   # element -> child node
+      self.terminal = [];   # masks ending exactly at this node
+      self.wild = [];       # masks with a "*" at this position
+
+  def __init__ (self):
+    self._root = self.node();
+    self._size = 0;
+
+  def __len__ (self):
+    return self._size;
+
+  def _path (self,mask):
+    """returns the elements of mask up to (not including) the first "*",
+    and a flag telling if a "*" was found""";
+    mask = tuple(mask);
+    for i,x in enumerate(mask):
+      if x == self.AidWildcard:
+        return mask[:i],True;
+    return mask,False;
+
+  def add (self,mask):
+    path,wild = self._path(mask);
+    nd = self._root;
+    for x in path:
+      child = nd.children.get(x);
+      if child is None:
+        child = nd.children[x] = self.node();
+      nd = child;
+    (nd.wild if wild else nd.terminal).append(mask);
+    self._size += 1;
+
+  def remove (self,mask):
+    path,wild = self._path(mask);
+    # walk down, remembering the trail so that empty nodes may be pruned
+    trail = [];
+    nd = self._root;
+    for x in path:
+      child = nd.children.get(x);
+      if child is None:
+        return False;
+      trail.append((nd,x));
+      nd = child;
+    lst = nd.wild if wild else nd.terminal;
+    for i,m in enumerate(lst):
+      if m is mask or m == mask:
+        del lst[i];
+        self._size -= 1;
+        break;
+    else:
+      return False;
+    # prune empty branches
+    while trail and not (nd.children or nd.terminal or nd.wild):
+      parent,x = trail.pop();
+      del parent.children[x];
+      nd = parent;
+    return True;
+
+  def match (self,msgid):
+    """returns list of masks matching msgid. Returns None if msgid itself
+    contains wildcards, in which case the caller must fall back to a full
+    scan.""";
+    result = [];
+    frontier = [self._root];
+    for x in msgid:
+      # named AtomicIDs are negative, so only "?" and "*" are excluded
+      if not isinstance(x,(int,long)) or x == self.AidAny or x == self.AidWildcard:
+        return None;
+      nxt = [];
+      for nd in frontier:
+        if nd.wild:
+          result += nd.wild;
+        child = nd.children.get(x);
+        if child is not None:
+          nxt.append(child);
+        child = nd.children.get(self.AidAny);
+        if child is not None:
+          nxt.append(child);
+      if not nxt:
+        return result;
+      frontier = nxt;
+    # end of msgid: masks ending here, or ending in "*" here, will match
+    for nd in frontier:
+      result += nd.terminal;
+      result += nd.wild;
+    return result;
+
 #
 # proxy_wp
 #   This is an interface to a WorkProcess
@@ -141,14 +243,22 @@ class proxy_wp(octopython.proxy_wp,verbosity):
         return self.target(*self.args,**self.kwargs);
       return None;
   
-  def __init__(self,wpid=None,verbose=0,verb_name=None):
+  # msgid prefix of node status events. In batched mode, these are
+  # coalesced so that only the latest status of every node is dispatched.
+  _coalesce_prefix = tuple(hiid('node.status'));
+
+  def __init__(self,wpid=None,verbose=0,verb_name=None,batch=False):
     # init base classes
     octopython.proxy_wp.__init__(self,wpid);
     verbosity.__init__(self,verbose,name=verb_name or str(self.address()));
     _dprint(1,"initializing");
+    # default mode for event_loop() and poll_pending_events()
+    self.batch_events = batch;
     # registered whenevers
     self._we_ids   = {};  # dict of whenevers (for exact matches)
     self._we_masks = {};  # list of whenevers (for mask lookups)
+    self._we_mask_index = _mask_index();  # prefix-trie over _we_masks keys
+    self.reset_dispatch_stats();
 
   def send (self,msg,to,payload=None,priority=0):
     "sends message to recepient";
@@ -203,7 +313,11 @@ class proxy_wp(octopython.proxy_wp,verbosity):
     try:
       if is_mask:
         _dprint(2,"adding masked whenever:",str(msgid),str(target));
-        self._we_masks.setdefault(msgid,[]).append(we);
+        welist = self._we_masks.get(msgid);
+        if welist is None:
+          welist = self._we_masks[msgid] = [];
+          self._we_mask_index.add(msgid);
+        welist.append(we);
       else:
         _dprint(2,"adding matched whenever:",str(msgid),str(target));
         self._we_ids.setdefault(msgid,[]).append(we);
@@ -225,6 +339,8 @@ class proxy_wp(octopython.proxy_wp,verbosity):
           if we is seq[i]:
             _dprint(2,"cancelling whenever:",str(msgid));
             del seq[i];
+            if not seq and dicts is self._we_masks:
+              self._remove_mask(msgid);
             return;
     finally:
       self.resume_events();
@@ -238,9 +354,43 @@ class proxy_wp(octopython.proxy_wp,verbosity):
     return len(welist);
   _clear_oneshots = staticmethod(_clear_oneshots);
     
+  def _remove_mask (self,mask):
+    del self._we_masks[mask];
+    self._we_mask_index.remove(mask);
+
+  def _match_masks (self,msgid):
+    """returns list of registered masks matching msgid. Uses the prefix
+    index, unless msgid itself contains wildcards""";
+    masks = self._we_mask_index.match(msgid);
+    if masks is None:
+      self._dispatch_stats['mask_scans'] += 1;
+      masks = [ mask for mask in self._we_masks.iterkeys() if msgid.matches(mask) ];
+    return masks;
+
+  def reset_dispatch_stats (self):
+    """resets the whenever dispatch counters""";
+    self._dispatch_stats = dict(messages=0,fired=0,mask_scans=0,dispatch_time=0.,fire_time=0.,
+                                batches=0,coalesced=0);
+
+  def dispatch_stats (self):
+    """returns a record of whenever dispatch counters: number of messages
+    dispatched, number of whenevers fired, number of messages that required
+    a full mask scan, time spent looking up whenevers and time spent firing
+    them (in seconds), number of batches received and number of status
+    events dropped by coalescing, plus the current number of registered ids
+    and masks.
+    """;
+    stats = record(self._dispatch_stats);
+    stats.num_ids = len(self._we_ids);
+    stats.num_masks = len(self._we_masks);
+    if stats.messages:
+      stats.dispatch_time_per_msg = stats.dispatch_time/stats.messages;
+    return stats;
+
   def _dispatch_whenevers (self,msg):
     # got message, process it
     pending_list = [];
+    t0 = time.time();
     self.pause_events();
     try:
       _dprint(3,"processing message",msg.msgid);
@@ -251,23 +401,65 @@ class proxy_wp(octopython.proxy_wp,verbosity):
       # clear one-shots, and remove list if it becomes empty
       if welist and not self._clear_oneshots(welist):
         del self._we_ids[msg.msgid];
-      # check the masks list
-      for mask,welist in self._we_masks.iteritems():
-        if msg.msgid.matches(mask):
+      # check the masks index
+      if self._we_masks:
+        for mask in self._match_masks(msg.msgid):
+          welist = self._we_masks[mask];
           _dprintf(3,"found %d mask whenevers for %s\n",len(welist),mask);
           pending_list += welist;
           if welist and not self._clear_oneshots(welist):
-            del self._we_masks[mask];
+            self._remove_mask(mask);
     finally:
       self.resume_events();
+    t1 = time.time();
     _dprintf(3,"firing %d matched whenevers\n",len(pending_list));
     for we in pending_list:
       we.fire(msg);
+    stats = self._dispatch_stats;
+    stats['messages'] += 1;
+    stats['fired'] += len(pending_list);
+    stats['dispatch_time'] += t1-t0;
+    stats['fire_time'] += time.time()-t1;
       
+  def _coalesce_status_events (self,msgs,keep=()):
+    """Drops all but the latest node status event for every node from a list
+    of messages. Status events are recognized by a 'node.status.<nodeindex>'
+    sequence in their msgid (these carry no payload, the status is in the id
+    itself). Messages matching one of the hiids in 'keep' are never dropped.
+    Returns the resulting list.
+    """;
+    prefix = self._coalesce_prefix;
+    np = len(prefix);
+    keys = [None]*len(msgs);
+    latest = {};
+    for i,msg in enumerate(msgs):
+      ids = tuple(msg.msgid);
+      for j in range(len(ids)-np):
+        if ids[j:j+np] == prefix:
+          keys[i] = key = (getattr(msg,'from',None),ids[:j+np+1]);
+          latest[key] = i;
+          break;
+    ncoalesce = len(msgs) - keys.count(None) - len(latest);
+    if not ncoalesce:
+      return msgs;
+    result = [];
+    for i,msg in enumerate(msgs):
+      key = keys[i];
+      if key is None or latest[key] == i:
+        result.append(msg);
+      else:
+        for aw in keep:
+          if aw.matches(msg.msgid):
+            result.append(msg);
+            break;
+    self._dispatch_stats['coalesced'] += len(msgs) - len(result);
+    return result;
+
   # poll_pending_events()
-  # Calls receive() in a continuous loop, processes events by invoking
-  # their whenever handlers.
-  def poll_pending_events (self):
+  # Calls receive_all(), processes events by invoking their whenever handlers.
+  # If coalesce is True (default is the batch_events attribute), redundant
+  # node status events are dropped
+  def poll_pending_events (self,coalesce=None):
       try:  
         _dprint(3,"going into receive_all()");
         msgs = self.receive_all();
@@ -276,6 +468,11 @@ class proxy_wp(octopython.proxy_wp,verbosity):
         return None;
       # dispatch all messages
       if msgs:
+        self._dispatch_stats['batches'] += 1;
+        if coalesce is None:
+          coalesce = self.batch_events;
+        if coalesce:
+          msgs = self._coalesce_status_events(msgs);
         for msg in msgs:
           self._dispatch_whenevers(msg);
     
@@ -286,13 +483,16 @@ class proxy_wp(octopython.proxy_wp,verbosity):
   # await mask is received (returns message).
   # If timeout (in seconds) is supplied, returns None after it has expired.
   # Otherwise loop indefinitely, or until the C++ ProxyWP has exited
-  def event_loop (self,await=[],timeout=None):
+  def event_loop (self,await=[],timeout=None,batch=None):
     """runs event loop for this WP -- calls receive() to fetch messages,
     dispatches whenevers, discards messages not matching a whenever. 'await'
     may be set to one or more msgids, in this case the method will  exit when a
     matching message is received. 'timeout' may be used to specify a time
     limit, use None to loop indefinitely (or until the C++ WP has  exited). If
     timeout=0, processes all pending messages and returns. 
+    If 'batch' is True (default is the batch_events attribute), the queue is
+    drained in bulk and redundant node status events are coalesced, see
+    _batch_event_loop().
     """;
     # convert await argument to list of hiids
     await = make_hiid_list(await);
@@ -301,6 +501,10 @@ class proxy_wp(octopython.proxy_wp,verbosity):
       endtime = 1e+40; # quite long enough...
     else:
       endtime = time.time() + timeout;
+    if batch is None:
+      batch = self.batch_events;
+    if batch:
+      return self._batch_event_loop(await,timeout,endtime);
     while self.num_pending() or time.time() <= endtime:
       try:  
         _dprint(3,"going into receive()");
@@ -325,6 +529,49 @@ class proxy_wp(octopython.proxy_wp,verbosity):
     # end of while-loop, if we dropped out, it's a timeout, return None
     return None
 
+  # _batch_event_loop()
+  # Batched version of event_loop(). Blocks for the first message, then
+  # drains the rest of the queue with receive_all(), coalesces node status
+  # events and dispatches the whole batch. Note that when a message matches
+  # the await list, the remainder of its batch is still dispatched before
+  # returning, since the batch has already been taken off the queue.
+  def _batch_event_loop (self,await,timeout,endtime):
+    while True:
+      try:
+        _dprint(3,"going into receive_all()");
+        msgs = self.receive_all();
+        if not msgs:
+          now = time.time();
+          if timeout is not None and now > endtime:
+            return None;
+          if timeout is None:
+            to = -1;
+          else:
+            to = max(0,endtime - now);
+          msg = self.receive(to);
+          # msg=None probably indicates timeout, go back up to check
+          if msg is None:
+            continue;
+          msgs = [msg] + (self.receive_all() or []);
+      except octopython.OctoPythonError,value:
+        _dprint(1,"exiting on receive error:",value);
+        return None;
+      self._dispatch_stats['batches'] += 1;
+      _dprintf(3,"got batch of %d messages\n",len(msgs));
+      msgs = self._coalesce_status_events(msgs,keep=await);
+      result = None;
+      for msg in msgs:
+        self._dispatch_whenevers(msg);
+        # check for a match in the await-list
+        if result is None:
+          for aw in await:
+            if aw.matches(msg.msgid):
+              _dprintf(3,"matches await %s\n",aw);
+              result = msg;
+              break;
+      if result is not None:
+        return result;
+
   def await (self,what,timeout=None,resume=False):
     """alias for event_loop() with an await argument.
     if resume is true, resumes the event loop before commencing await. This
@@ -351,9 +598,9 @@ class proxy_wp_thread(proxy_wp):
   "represents an OCTOPUSSY connection endpoint (i.e. WorkProcess)"
   ExitMessage = hiid("e.x.i.t");
   
-  def __init__ (self,wpid='python',verbose=0,thread_api=threading):
+  def __init__ (self,wpid='python',verbose=0,thread_api=threading,batch=False):
     self.name = str(wpid)+'-init';  # because parent calls self.get_verbosity_name()
-    proxy_wp.__init__(self,wpid,verbose=verbose);
+    proxy_wp.__init__(self,wpid,verbose=verbose,batch=batch);
     self.name = str(self.address());
     # lock for event queue
     self._lock = thread_api.RLock(); 
@@ -447,40 +694,56 @@ class proxy_wp_thread(proxy_wp):
   def event_loop (self,*args,**kwargs):
     raise RuntimeError,"can't call event_loop on " + self.__class__.__name__;
     
-  # the run-loop: calls receive() in a continuous loop, processes events
+  def _notify_awaits (self,msg):
+    self._lock.acquire();
+    self._await_cond.acquire();
+    try:
+      for awp in self._awaiting.itervalues():
+        for msgid in awp[0]:
+          if msg.msgid.matches(msgid):
+            _dprintf(3,"matches await %s, notifying\n",msgid);
+            awp[1] = msg;
+            self._await_cond.notifyAll();
+            break; # break out to next awaiting pair
+    finally:
+      self._await_cond.release();
+      self._lock.release();
+    
+  # the run-loop: calls receive() in a continuous loop, processes events.
+  # In batch mode, the rest of the queue is drained after every receive,
+  # and redundant node status events are coalesced.
   def run (self):
     running = 1;
     _dprint(1,"running thread");
-    while True:
+    while running:
       try:  
         _dprint(3,"going into receive()");
         msg = self.receive_threaded();
+        # msg=None probably indicates timeout, go back up to check
+        if msg is None:
+          continue;
+        msgs = [msg];
+        if self.batch_events:
+          msgs += self.receive_all() or [];
       except octopython.OctoPythonError, value:
         _dprint(1,"exiting on receive error:",value);
         break;
-      # msg=None probably indicates timeout, go back up to check
-      if msg is None:
-        continue;
-      # check for predefined exit message
-      if msg.msgid == self.ExitMessage and msg.is_from(self.address()):
-        _dprint(1,"got exit message",msg);
-        break;
-      # process messages
-      self._dispatch_whenevers(msg);
-      # now, check for matching awaits
-      self._lock.acquire();
-      self._await_cond.acquire();
-      try:
-        for awp in self._awaiting.itervalues():
-          for msgid in awp[0]:
-            if msg.msgid.matches(msgid):
-              _dprintf(3,"matches await %s, notifying\n",msgid);
-              awp[1] = msg;
-              self._await_cond.notifyAll();
-              break; # break out to next awaiting pair
-      finally:
-        self._await_cond.release();
-        self._lock.release();
+      if len(msgs) > 1:
+        self._dispatch_stats['batches'] += 1;
+        awaited = [ msgid for awp in self._awaiting.values() for msgid in awp[0] ];
+        msgs = self._coalesce_status_events(msgs,keep=awaited);
+      for msg in msgs:
+        # check for predefined exit message. Any messages after it in the
+        # same batch have already been received, so they are still
+        # dispatched before the loop exits
+        if msg.msgid == self.ExitMessage and msg.is_from(self.address()):
+          _dprint(1,"got exit message",msg);
+          running = 0;
+          continue;
+        # process messages
+        self._dispatch_whenevers(msg);
+        # now, check for matching awaits
+        self._notify_awaits(msg);
     # end of while-loop (exit is inside) 
     _dprint(1,"finishing thread");
  
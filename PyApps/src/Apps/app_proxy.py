@@ -77,15 +77,17 @@ class app_proxy (verbosity):
     if wp_verbose is None:
       wp_verbose = verbose;
     
+    # in GUI mode only the latest status of each node is of interest, so
+    # let the WP drain its queue in batches and coalesce node status events
     if threads:
       self.dprint(1,"running in threaded mode");
       # select threading API
       if gui: api = Timba.qt_threading;
       else:   api = threading;
-      self._pwp = octopussy.proxy_wp_thread(str(client_id),verbose=wp_verbose,thread_api=api);
+      self._pwp = octopussy.proxy_wp_thread(str(client_id),verbose=wp_verbose,thread_api=api,batch=gui);
     else:
       self.dprint(1,"running in non-threaded mode");
-      self._pwp = octopussy.proxy_wp(str(client_id),verbose=wp_verbose);
+      self._pwp = octopussy.proxy_wp(str(client_id),verbose=wp_verbose,batch=gui);
       
     # subscribe and register handler for app events
     self._pwp.whenever(self._rcv_prefix+"*",self._event_handler,subscribe=True);
@@ -404,6 +406,10 @@ class app_proxy (verbosity):
       args = (self._rcv_prefix + args[0],) + args[1:];
     return self._pwp.whenever(*args,**kwargs);
     
+  def cancel_whenever (self,we):
+    "interface to pwp's cancel_whenever function";
+    return self._pwp.cancel_whenever(we);
+    
   def await (self,what,timeout=None,resume=False):
     "interface to pwp's event loop, in the await form";
     if timeout is not None:
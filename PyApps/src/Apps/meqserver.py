@@ -63,6 +63,7 @@ import traceback
 import os
 import string
 import time
+import itertools
 from Timba import octopussy
 from Timba import mequtils
 from Timba.pretty_print import PrettyPrinter
@@ -77,6 +78,46 @@ default_spawn = ("meqserver");
 default_spawn_opt = ("meqserver-opt");
 default_launch = ();
 
+class meq_future (object):
+  """A meq_future is a handle to the result of a command sent via
+  meqserver.meq_async(). The command is sent right away; the handle is
+  resolved (by command index) once the kernel replies. Use result() to 
+  wait for a single handle, or meqserver.gather() to wait for many.
+  """;
+  def __init__ (self,server,command,command_index):
+    self.server = server;
+    self.command = command;
+    self.command_index = command_index;
+    self.msg = self.payload = None;
+    self._done = False;
+    self._we = None;
+  def _resolve (self,msg):
+    self.msg = msg;
+    self.payload = msg.payload;
+    self._done = True;
+  def done (self):
+    "returns True if a reply has been received";
+    return self._done;
+  def result (self,timeout=None):
+    """waits for the reply and returns its payload, or None on timeout""";
+    return self.server.gather([self],timeout=timeout)[0];
+  def cancel (self):
+    """stops listening for the reply""";
+    if self._we is not None and not self._done:
+      self.server.cancel_whenever(self._we);
+      self._we = None;
+  def __repr__ (self):
+    return "meq_future(%s,%d%s)"%(self.command,self.command_index,
+                                  self._done and ",done" or "");
+
+class meq_error (RuntimeError):
+  """Raised when the kernel replies with an error instead of the expected
+  result. The error record (or message) is available as the error attribute.
+  """;
+  def __init__ (self,message,error=None):
+    RuntimeError.__init__(self,message);
+    self.error = error;
+
 class meqserver (multiapp_proxy):
   """interface to MeqServer app""";
   def __init__(self,appid='meqserver',client_id='meqclient',
@@ -132,6 +173,51 @@ class meqserver (multiapp_proxy):
       payload.silent = silent;
       self.send_command('command'+command,payload);
   
+  def meq_async (self,command,args=None):
+    """sends a meq-command without waiting, returns a meq_future that is
+    resolved when the result comes back. Any number of commands may be 
+    in flight at once; use gather() to collect their results.""";
+    command = make_hiid(command);
+    payload = record();
+    if args is not None:
+      payload.args = args;
+    payload.command_index = self.new_command_index();
+    future = meq_future(self,command,payload.command_index);
+    # register the handler before sending, so that the reply can't be missed
+    future._we = self.whenever('result' + command + payload.command_index,
+                               future._resolve,one_shot=True);
+    self.dprintf(3,'sending command %s, index %d\n',command,payload.command_index);
+    self.dprint(5,'arguments are ',args);
+    self.send_command('command'+command,payload);
+    return future;
+
+  def gather (self,futures,timeout=None):
+    """waits for all the given meq_futures to be resolved, returns list of
+    result payloads (in the same order). Timeout is in seconds, None waits 
+    indefinitely; on timeout, unresolved futures are returned as None.""";
+    if timeout is not None:
+      endtime = time.time() + timeout;
+    self.pause_events();
+    try:
+      while True:
+        pending = [ f for f in futures if not f.done() ];
+        if not pending:
+          break;
+        self.dprint(4,'gather: waiting for',len(pending),'results');
+        if timeout is None:
+          wait = None;
+        else:
+          wait = endtime - time.time();
+          if wait <= 0:
+            self.dprint(2,'gather: timeout with',len(pending),'results pending');
+            break;
+        # awaiting any result will dispatch the whenevers of our futures
+        self.await('result.*',resume=True,timeout=wait);
+        self.pause_events();
+    finally:
+      self.resume_events();
+    return [ f.payload for f in futures ];
+
   # helper function to create a node specification record
   def makenodespec (self,node):
     "makes an record( containing a node specification";
@@ -156,7 +242,129 @@ class meqserver (multiapp_proxy):
     spec.sync = sync;
     spec.state = fields_record;
     return self.meq('Node.Set.State',spec,wait=wait);
-  
+
+  def makenodelistspec (self,nodes):
+    """makes a record containing a batch node specification. Returns
+    (spec,order), where order[i] is the position in the reply of the
+    i-th node of the input list (the kernel processes node indices first,
+    then names)""";
+    names = [];
+    indices = [];
+    for node in nodes:
+      if isinstance(node,str):
+        names.append(node);
+      elif isinstance(node,(int,long)):
+        indices.append(node);
+      else:
+        raise TypeError,'node must be specified by name or index, have '+str(type(node));
+    spec = record();
+    if indices:
+      spec.nodeindex = indices;
+    if names:
+      spec.name = names;
+    order = [];
+    ni = nn = 0;
+    for node in nodes:
+      if isinstance(node,str):
+        order.append(len(indices)+nn);
+        nn += 1;
+      else:
+        order.append(ni);
+        ni += 1;
+    return spec,order;
+
+  def getnodestates (self,nodes,fields=None,wait=True,sync=False):
+    """gets the state records of a list of nodes (names or indices) in
+    one command. If fields is given, only those state fields are returned.
+    With wait=True, returns a list of state records in the same order as
+    nodes; nodes that could not be found get a record with an 'error' field.
+    If the command fails as a whole, a meq_error carrying the kernel's error
+    is raised.
+    """;
+    spec,order = self.makenodelistspec(nodes);
+    spec.sync = sync;
+    if fields:
+      spec.field = list(fields);
+    retval = self.meq('Node.Get.State.Batch',spec,wait=wait);
+    if not wait:
+      return retval;
+    states = retval.get('state',None);
+    if states is None or len(states) != len(order):
+      error = retval.get('error',None);
+      raise meq_error('Node.Get.State.Batch failed: %s'%(error,),error);
+    return [ states[i] for i in order ];
+
+  def setnodestates (self,nodes,states,wait=False,sync=True):
+    """sets the state of a list of nodes (names or indices) in one command.
+    states is either a single record applied to all nodes, or a list of
+    records, one per node.""";
+    spec,order = self.makenodelistspec(nodes);
+    spec.sync = sync;
+    if isinstance(states,dict):
+      spec.state = states;
+    else:
+      if len(states) != len(nodes):
+        raise ValueError,'%d state records given for %d nodes'%(len(states),len(nodes));
+      batch = [None]*len(nodes);
+      for st,i in zip(states,order):
+        batch[i] = make_record(st);
+      spec.batch = batch;
+    return self.meq('Node.Set.State.Batch',spec,wait=wait);
+
+  def createnodebatch (self,initrecs,script_name='',chunk_size=0,progress=None,
+                       max_pending=2):
+    """creates nodes from an iterable of init-records via Create.Node.Batch.
+    If chunk_size>0, init-records are pulled from the iterable and sent in
+    chunks of that size, so the kernel creates the nodes of one chunk while
+    the next one is being prepared; at most max_pending chunks are in
+    flight at any time. The kernel initializes the forest when the final
+    chunk arrives. If given, progress(nsent) is called after every chunk.
+    All earlier chunks must have succeeded before the final one is sent,
+    a failed chunk raises a RuntimeError. As with a plain Create.Node.Batch,
+    the final reply is not waited for.
+    """;
+    if not chunk_size:
+      batch = list(initrecs);
+      self.meq('Create.Node.Batch',record(script_name=script_name,batch=batch));
+      if progress:
+        progress(len(batch));
+      return;
+    # waits for the reply to a chunk, raises an error if it failed
+    def wait_chunk (future):
+      reply = future.result();
+      error = reply and reply.get('error',None);
+      if error:
+        raise RuntimeError,'Create.Node.Batch failed: %s'%(error,);
+    initrecs = iter(initrecs);
+    pending = [];
+    nsent = 0;
+    try:
+      chunk = list(itertools.islice(initrecs,chunk_size));
+      while chunk:
+        # look ahead one chunk to know whether this is the final one
+        nextchunk = list(itertools.islice(initrecs,chunk_size));
+        args = record(script_name=script_name,batch=chunk,init=not nextchunk);
+        nsent += len(chunk);
+        if nextchunk:
+          # throttle: wait for the oldest chunk before queueing another one
+          while len(pending) >= max_pending:
+            wait_chunk(pending.pop(0));
+          pending.append(self.meq_async('Create.Node.Batch',args));
+        else:
+          # make sure all earlier chunks went through before the kernel is
+          # told to initialize
+          while pending:
+            wait_chunk(pending.pop(0));
+          self.meq('Create.Node.Batch',args);
+        self.dprint(2,'createnodebatch: sent',nsent,'init-records');
+        if progress:
+          progress(nsent);
+        chunk = nextchunk;
+    finally:
+      # on error, stop listening for replies to the chunks still in flight
+      for future in pending:
+        future.cancel();
+
   def getnodeindex (self,name):
     retval = self.meq('Get.NodeIndex',self.makenodespec(name),wait=True);
     try: return retval.nodeindex;
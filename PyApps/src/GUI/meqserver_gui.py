@@ -1322,7 +1322,8 @@ Warning! You have modified the script since it was last compiled, so the tree ma
       if getattr(value,'forest_changed',False):
         if self._have_nodelist:
           self._have_nodelist = False;
-          meqds.nodelist.clear();
+          # keep the (now stale) nodelist around: its forest serial lets
+          # the next request fetch only a delta from the kernel
           self.treebrowser.clear();
         self._have_forest_state = False;
       # check if message includes update of node state
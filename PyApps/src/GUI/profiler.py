@@ -109,13 +109,15 @@ class Profiler (PersistentCurrier):
          'c/-',
          '+C',
          '++C',
+         'Ev',
     # new cache columns
          'Rq new',
          'c/hit',
          'c/m',
          'c/-',
          '+C',
-         '++C'
+         '++C',
+         'Ev'
       ]);
     self._tw.setRootIsDecorated(True);
     self._tw.setAllColumnsShowFocus(True);
@@ -138,24 +140,10 @@ class Profiler (PersistentCurrier):
     def __init__ (self,name,ps=None,cs=None,count=1):
       self.name = name;
       if ps is None:
-        ps = Timba.array.zeros((3,2));
+        ps = Timba.array.zeros(meqds.ProfilingStatsShape);
       if cs is None:
-        cs = Timba.array.zeros((2,6));
+        cs = Timba.array.zeros(meqds.CacheStatsShape);
       self.ps,self.cs,self.count = ps,cs,count;
-    def __iadd__ (self,other):
-      self.ps = self.ps + other.ps;
-      self.cs = self.cs + other.cs;
-      self.count += other.count;
-      return self;
-    def __add__ (self,other):
-      res = copy.deepcopy(self);
-      return res.__iadd__(other);
-    
-  class NodeStatEntry (StatEntry):
-    __slots__ = ( "classname" );
-    def __init__ (self,node):
-      Profiler.StatEntry.__init__(self,node.name,node.profiling_stats,node.cache_stats);
-      self.classname = node.classname;
       
   def _process_nodelist (self,dum):
     self._qa_collect.setEnabled(True);
@@ -163,10 +151,13 @@ class Profiler (PersistentCurrier):
       return;
     tmp = self._appgui.wait_cursor();
     self.clear();
-    # build internal list of by-class stats
+    # the nodelist keeps stats in columns: node entries are made on demand
+    # (see _node_stats()), and by-class sums are computed in one go
     self._stats = {};
-    for ni,node in meqds.nodelist.iteritems():
-      self._stats[ni] = self.NodeStatEntry(node);
+    profarrays = meqds.nodelist.profiling_arrays();
+    if profarrays is not None:
+      for row,ni in enumerate(profarrays[0].tolist()):
+        self._stats[ni] = row;
     # populate profiler view
     if self._stats:
       self._label.setText("profiling stats collected at "+time.strftime("%H:%M:%S"));
@@ -179,9 +170,8 @@ class Profiler (PersistentCurrier):
       treeview.setChildIndicatorPolicy(QTreeWidgetItem.ShowIndicator);
 
       # by-class views
-      self._classes = meqds.nodelist.classes();
       self.cw_item = classview = StickyTreeWidgetItem(self._tw,"By Class",key=20);
-      classview._generate_items = self.curry(self._generate_summary_stats,lambda x:x.classname);
+      classview._generate_items = self._generate_class_stats;
       classview.setFlags(Qt.ItemIsEnabled);
       classview.setChildIndicatorPolicy(QTreeWidgetItem.ShowIndicator);
     else:
@@ -230,21 +220,16 @@ class Profiler (PersistentCurrier):
     def __ge__ (self,other):
       return other < self;
       
-  def _summarize_stats (self,keyfunc,stats):
-    sums = {};
-    for se in stats.itervalues():
-      key = keyfunc(se);
-      try: sums[key] += se;
-      except KeyError:
-        sums[key] = newentry = self.StatEntry(str(key),count=0);
-        newentry += se;
-    return sums;
-    
-  def _generate_summary_stats (self,keyfunc,parent_item):
-    # generate summary stats using the supplied key-function
-    sums = self._summarize_stats(keyfunc,self._stats);
-    for key,se in sums.iteritems():
-      self.StatItem(parent_item,str(key),se.count,se);
+  def _generate_class_stats (self,parent_item):
+    # per-class sums come straight from the nodelist columns
+    for classname,(ps,cs,count) in meqds.nodelist.class_profiling_stats().iteritems():
+      self.StatItem(parent_item,classname,count,self.StatEntry(classname,ps,cs,count));
+
+  def _node_stats (self,ni):
+    """returns StatEntry for node ni, or raises KeyError""";
+    row = self._stats[ni];
+    nis,ps,cs = meqds.nodelist.profiling_arrays();
+    return self.StatEntry(meqds.nodelist[ni].name,ps[row],cs[row]);
         
   def _generate_node_items (self,nodelist,parent_item):
     for label,ni in nodelist:
@@ -254,7 +239,7 @@ class Profiler (PersistentCurrier):
         except KeyError: 
           _dprint(1,"lost node",label,ni);
           continue;
-        try: se = self._stats[ni];
+        try: se = self._node_stats(ni);
         except KeyError: 
           _dprint(1,"lost node stats",label,ni);
           continue;
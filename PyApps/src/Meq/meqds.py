@@ -40,6 +40,8 @@ import time
 import copy
 import math
 import traceback
+import itertools
+import numpy
 
 try:
   from PyQt4.Qt import QObject,SIGNAL
@@ -133,34 +135,241 @@ CS_RES_map = {  CS_RES_NONE:     ('-','valid result'),
                 CS_RES_MISSING:  ('m','missing data returned'),
                 CS_RES_FAIL:     ('!','fail result returned')   };
  
-# this class defines and manages a node list
+# Column store behind NodeList: one row per node, with attributes held in
+# numpy arrays (or plain lists for strings and request IDs). Children and
+# step-children are kept as CSR-style adjacency: the child node indices of
+# row i are ch_ni[ch_ptr[i]:ch_ptr[i+1]], with matching keys in ch_key.
+class _NodeColumns (object):
+  __slots__ = ( "ni","names","classid","proc","status","rqid",
+                "ch_ptr","ch_ni","ch_key","sc_ptr","sc_ni","prof","cache" );
+
+  # builds columns from a list of MEQ-produced (sub)lists, one per processor.
+  # classid is a function mapping classnames to integer IDs
+  def __init__ (self,proclist=(),classid=None):
+    ni = [];
+    self.names = [];
+    self.rqid = [];
+    self.ch_key = [];
+    classids = [];
+    proc = [];
+    status = [];
+    ch_ptr = [0];
+    ch_ni = [];
+    sc_ptr = [0];
+    sc_ni = [];
+    prof = [];
+    cache = [];
+    has_prof = bool(proclist);
+    for p,sublist in enumerate(proclist):
+      # (0,) is a special case of an empty list (see bug in DMI/Vec.cc)
+      if sublist.nodeindex == (0,):
+        continue;
+      nn = len(sublist.nodeindex);
+      ni.extend(sublist.nodeindex);
+      self.names.extend(sublist.name);
+      classids.extend(map(classid,sublist['class']));
+      proc.extend([p]*nn);
+      status.extend(sublist.control_status);
+      self.rqid.extend(sublist.request_id);
+      for children in sublist.children:
+        if isinstance(children,dict):
+          for key,ch in children.iteritems():
+            self.ch_key.append(key);
+            ch_ni.append(ch);
+        elif children is not None:
+          self.ch_key.extend(range(len(children)));
+          ch_ni.extend(children);
+        ch_ptr.append(len(ch_ni));
+      for step_children in sublist.step_children:
+        if step_children is not None:
+          sc_ni.extend(step_children);
+        sc_ptr.append(len(sc_ni));
+      # profiling info is optional
+      if has_prof and hasattr(sublist,'profiling_stats'):
+        for ps,cs in zip(sublist.profiling_stats,sublist.cache_stats):
+          try: prof.append([ps.total[0:2],ps.children[0:2],ps.get_result[0:2]]);
+          except (KeyError,AttributeError): prof.append(None);
+          try: cache.append([cs.all_requests,cs.new_requests]);
+          except (KeyError,AttributeError): cache.append(None);
+      else:
+        has_prof = False;
+    self.ni      = numpy.array(ni,numpy.int32);
+    self.classid = numpy.array(classids,numpy.int32);
+    self.proc    = numpy.array(proc,numpy.int32);
+    self.status  = numpy.array(status,numpy.int32);
+    self.ch_ptr  = numpy.array(ch_ptr,numpy.int32);
+    self.ch_ni   = numpy.array(ch_ni,numpy.int32);
+    self.sc_ptr  = numpy.array(sc_ptr,numpy.int32);
+    self.sc_ni   = numpy.array(sc_ni,numpy.int32);
+    if has_prof:
+      self.prof = _stats_array(prof,ProfilingStatsShape);
+      self.cache = _stats_array(cache,CacheStatsShape);
+    else:
+      self.prof = self.cache = None;
+
+  def __len__ (self):
+    return len(self.ni);
+
+  def children (self,row):
+    i0,i1 = self.ch_ptr[row],self.ch_ptr[row+1];
+    return tuple(zip(self.ch_key[i0:i1],self.ch_ni[i0:i1].tolist()));
+
+  def step_children (self,row):
+    return tuple(self.sc_ni[self.sc_ptr[row]:self.sc_ptr[row+1]].tolist());
+
+  # returns new columns containing only the rows selected by the mask
+  def select (self,mask):
+    rows = numpy.nonzero(mask)[0];
+    res = _NodeColumns();
+    for attr in ("ni","classid","proc","status"):
+      setattr(res,attr,getattr(self,attr)[rows]);
+    res.names = [ self.names[i] for i in rows ];
+    res.rqid = [ self.rqid[i] for i in rows ];
+    for ptr,ni in (("ch_ptr","ch_ni"),("sc_ptr","sc_ni")):
+      degree = numpy.diff(getattr(self,ptr));
+      edges = numpy.repeat(mask,degree);
+      setattr(res,ni,getattr(self,ni)[edges]);
+      setattr(res,ptr,numpy.concatenate(([0],numpy.cumsum(degree[rows]))).astype(numpy.int32));
+      if ptr == "ch_ptr":
+        res.ch_key = [ key for key,sel in zip(self.ch_key,edges) if sel ];
+    if self.prof is not None:
+      res.prof,res.cache = self.prof[rows],self.cache[rows];
+    else:
+      res.prof = res.cache = None;
+    return res;
+
+  # returns new columns with the rows of other appended. Profiling stats
+  # are only kept if present in self, missing ones are zero-filled
+  def concat (self,other):
+    res = _NodeColumns();
+    for attr in ("ni","classid","proc","status","ch_ni","sc_ni"):
+      setattr(res,attr,numpy.concatenate((getattr(self,attr),getattr(other,attr))));
+    for ptr in ("ch_ptr","sc_ptr"):
+      a,b = getattr(self,ptr),getattr(other,ptr);
+      setattr(res,ptr,numpy.concatenate((a,b[1:]+a[-1])));
+    res.names = self.names + other.names;
+    res.rqid = self.rqid + other.rqid;
+    res.ch_key = self.ch_key + other.ch_key;
+    if self.prof is not None:
+      res.prof = numpy.concatenate((self.prof,_zero_stats(other.prof,len(other),self.prof)));
+      res.cache = numpy.concatenate((self.cache,_zero_stats(other.cache,len(other),self.cache)));
+    else:
+      res.prof = res.cache = None;
+    return res;
+
+# fields of a node's CacheStats (see MEQ/src/Node.h), and the shapes of a
+# node's profiling and cache stats (cache stats have a row for all requests
+# and a row for new requests)
+CacheStatsFields = ( 'req','hits','miss','none','cached','longcached','evicted' );
+ProfilingStatsShape = (3,2);
+CacheStatsShape = (2,len(CacheStatsFields));
+
+# forms a list of per-node stats into an (nnodes,...) array. Missing
+# entries (None) are zero-filled; shape gives the default row shape when
+# no entry is available to take it from
+def _stats_array (stats,shape):
+  for st in stats:
+    if st is not None:
+      shape = numpy.shape(st);
+      break;
+  arr = numpy.zeros((len(stats),)+tuple(shape));
+  for i,st in enumerate(stats):
+    if st is not None:
+      try: arr[i] = st;
+      except ValueError: pass;
+  return arr;
+
+def _zero_stats (stats,nrows,like):
+  if stats is not None and stats.shape[1:] == like.shape[1:]:
+    return stats;
+  return numpy.zeros((nrows,)+like.shape[1:]);
+
+# this class defines and manages a node list.
+# Node attributes are held column-wise in a _NodeColumns object, with
+# parents computed as another CSR adjacency (pa_ptr/pa_ni). NodeList.Node
+# objects are lightweight proxies on top of the columns, created on demand
+# and kept for as long as their node stays in the list.
 class NodeList (QObject):
   NodeAttrs = ('name','class','children','step_children','control_status');
   RequestRecord = record(**dict.fromkeys(NodeAttrs,True));
   RequestRecord.nodeindex=True;
   RequestRecord.get_forest_status = 2;
-  
+  # ask for incremental updates relative to our forest_serial
+  RequestRecord.delta = True;
+
   class Node (QObject):
+    # attribute values of a node that is not (or no longer) in the list
+    _defaults = dict(name=None,classname=None,proc=0,children=(),step_children=(),
+                     parents=[],request_id=None,control_status=0,
+                     profiling_stats=0,cache_stats=0);
     def __init__ (self,ni,parent=None):
       QObject.__init__(self,parent);
       self.nodeindex = ni;
-      self.name = None;
-      self.classname = None;
-      self.proc = 0;
-      self.children = [];
-      self.step_children = [];
-      self.parents  = [];
-      self.request_id = None;
+      self._nodelist = parent;
+      self._detached = {};
       self.breakpoint = 0;
-      self.control_status = 0;
-      self.control_status_string = '';
-      self.profiling_stats = self.cache_stats = 0;
+    # gets/sets attribute from the nodelist columns
+    def _get (self,attr):
+      nl = self._nodelist;
+      if nl is not None:
+        row = nl._rownum(self.nodeindex);
+        if row >= 0:
+          return nl._node_attr(row,attr);
+      if attr in self._detached:
+        return self._detached[attr];
+      # the parents list is made anew on every access, as it is for nodes
+      # in the list, so that nodes never share it
+      if attr == 'parents':
+        return [];
+      return self._defaults[attr];
+    def _set (self,attr,value):
+      nl = self._nodelist;
+      row = -1;
+      if nl is not None:
+        row = nl._rownum(self.nodeindex);
+      if row >= 0:
+        nl._set_node_attr(row,attr,value);
+      else:
+        self._detached[attr] = value;
+    # called when the node goes away from the nodelist: keeps a copy of
+    # its last known attributes, as callers may still hold the proxy
+    def _detach (self):
+      if self._nodelist is not None:
+        self._detached = dict([ (attr,self._get(attr)) for attr in self._defaults ]);
+        self._nodelist = None;
+    name            = property(lambda self:self._get('name'));
+    classname       = property(lambda self:self._get('classname'));
+    proc            = property(lambda self:self._get('proc'));
+    children        = property(lambda self:self._get('children'));
+    step_children   = property(lambda self:self._get('step_children'));
+    parents         = property(lambda self:self._get('parents'));
+    profiling_stats = property(lambda self:self._get('profiling_stats'));
+    cache_stats     = property(lambda self:self._get('cache_stats'));
+    request_id      = property(lambda self:self._get('request_id'),
+                               lambda self,value:self._set('request_id',value));
+    control_status  = property(lambda self:self._get('control_status'),
+                               lambda self,value:self._set('control_status',value));
+    def _control_status_string (self):
+      status = self.control_status;
+      s = ['-'] * 8;
+      s[0] = CS_ES_state(status)[2];
+      if status&CS_STOP_BREAKPOINT:   s[0] = ">"+s[0];
+      if status&CS_BREAKPOINT_SS:     s[1] = "b";
+      if status&CS_BREAKPOINT:        s[1] = "B";
+      if status&CS_ACTIVE:            s[2] = "A";
+      if status&CS_PUBLISHING:        s[3] = "P";
+      if status&CS_CACHED:            s[4] = "C";
+      if status&CS_RETCACHE:          s[5] = "c";
+      s[6] = CS_RES_map[status&CS_RES_MASK][0];
+      return ''.join(s);
+    control_status_string = property(_control_status_string);
     def child_label_format (self):
       try: format = self._child_label_format;
       # creates a format string for formatting child labels.
       except AttributeError:
-        if self.children:
-          keylengths = map(lambda ch:len(str(ch[0])),self.children);
+        children = self.children;
+        if children:
+          keylengths = map(lambda ch:len(str(ch[0])),children);
           if len(keylengths) > 1:
             maxlen = max(*keylengths);
           else:
@@ -187,20 +396,8 @@ class NodeList (QObject):
     def update_status (self,status,rqid=False):
       old_status = self.control_status;
       self.control_status = status;
-      s = ['-'] * 8;
-      s[0] = CS_ES_state(status)[2];
-      if status&CS_STOP_BREAKPOINT:   s[0] = ">"+s[0];
-      if status&CS_BREAKPOINT_SS:     s[1] = "b";
-      if status&CS_BREAKPOINT:        s[1] = "B";
-      if status&CS_ACTIVE:            s[2] = "A";
-      if status&CS_PUBLISHING:        s[3] = "P";
-      if status&CS_CACHED:            s[4] = "C";
-      if status&CS_RETCACHE:          s[5] = "c";
-      s[6] = CS_RES_map[status&CS_RES_MASK][0];
-      s = ''.join(s);
       if not isinstance(rqid,bool):
         self.request_id = rqid;
-      self.control_status_string = s;
       _dprint(6,"node",self.name,"update status %X"%(status,));
       self.emit(SIGNAL("status"),self,old_status);
     def update_state (self,state,event=None):
@@ -228,130 +425,227 @@ class NodeList (QObject):
   # init node list
   def __init__ (self,meqnl=None,parent=None):
     QObject.__init__(self,parent);
-    self.serial = 0;
+    self._proxies = {};
+    self._classnames = [];
+    self._classids = {};
+    self.clear();
     if meqnl:
-      self.load_meqlist(meqnl);
-    else:
-      self.clear();
-      
+      self.load(meqnl);
+
   def clear (self):
-    self._nimap = self._namemap = self._classmap = {};
-    self._rootnodes = [];
+    for node in self._proxies.itervalues():
+      node._detach();
+    self._proxies = {};
+    self._set_columns(_NodeColumns());
+    self._has_profiling = False;
     self.serial = 0;
-  
+
   # initialize from a MEQ-produced nodelist
   def load (self,meqnl):
     if not self.is_valid_meqnodelist(meqnl):
       raise ValueError,"not a valid meqnodelist";
+    # a delta only makes sense on top of the list it was computed against
+    if getattr(meqnl,'delta',False) and self.serial:
+      self._apply_delta(meqnl);
+      self.serial = getattr(meqnl,'forest_serial',0);
+      self.emit(SIGNAL("loaded"),meqnl,);
+      return;
     self.serial = getattr(meqnl,'forest_serial',0);
     # make sure we have a proclist. If only one
     # list arrives, stuff it into proclist anyway
     proclist = getattr(meqnl,'proc',None);
     if proclist is None:
       proclist = [meqnl];
-    self._nimap = {};
-    self._namemap = {};
-    self._classmap = {};
-    for proc,sublist in enumerate(proclist):
-      # form sequence of iterators
-      iter_name     = iter(sublist.name);
-      iter_class    = iter(sublist['class']);
-      iter_children = iter(sublist.children);
-      iter_step_children = iter(sublist.step_children);
-      iter_cstate   = iter(sublist.control_status);
-      iter_rqid     = iter(sublist.request_id);
-      # profiling info is optional
-      if hasattr(sublist,'profiling_stats'):
-        self._has_profiling = True;
-        iter_prof   = iter(sublist.profiling_stats);
-        iter_cache  = iter(sublist.cache_stats);
-      else:
-        iter_prof = iter_cache = None;
-        self._has_profiling = False;
-      # iterate over all nodes in list
-      # (0,) is a special case of an empty list (see bug in DMI/Vec.cc)
-      if sublist.nodeindex != (0,):
-        for ni in sublist.nodeindex:
-          # insert node into list (or use old one: may have been inserted below)
-          node = self._nimap.setdefault(ni,self.Node(ni,self));
-          node.name      = iter_name.next();
-          node.classname = iter_class.next();
-          node.proc      = proc;
-          node.update_status(iter_cstate.next(),iter_rqid.next());
-          children  = iter_children.next();
-          step_children  = iter_step_children.next();
-          # set children
-          if children is None:
-            node.children = ();
-          elif isinstance(children,dict):
-            node.children = tuple(children.iteritems());
-          else:
-            node.children = tuple(enumerate(children));
-          # set step_children
-          if step_children is None:
-            node.step_children = ();
-          else:
-            node.step_children = step_children;
-          # set profiling stats, form them into 2D arrays for easier accounting
-          if iter_prof is not None:
-            ps = iter_prof.next();
-            try: node.profiling_stats = array([ps.total[0:2],ps.children[0:2],ps.get_result[0:2]]);
-            except KeyError: node.profiling_stats = sys.exc_info();
-            cs = iter_cache.next();
-            try: node.cache_stats = array([cs.all_requests,cs.new_requests]);
-            except KeyError: node.cache_stats = sys.exc_info();
-          # for all children, init node entry in list (if necessary), and
-          # add to parent list
-          for (i,ch_ni) in node.children:
-            if ch_ni > 0: # ignore missing children
-              self._nimap.setdefault(ch_ni,self.Node(ch_ni)).parents.append(ni);
-          for ch_ni in node.step_children:
-            self._nimap.setdefault(ch_ni,self.Node(ch_ni)).parents.append(ni);
-          # add to name map
-          self._namemap[node.name] = node;
-          # add to class map
-          self._classmap.setdefault(node.classname,[]).append(node);
-    # compose list of root (i.e. parentless) nodes
-    self._rootnodes = [ node for node in self._nimap.itervalues() if not node.parents ];
+    # a full load makes new node objects, as before
+    for node in self._proxies.itervalues():
+      node._detach();
+    self._proxies = {};
+    cols = _NodeColumns(proclist,self._class_id);
+    self._has_profiling = cols.prof is not None;
+    self._set_columns(cols);
     # emit signal
     self.emit(SIGNAL("loaded"),meqnl,);
-    
+
+  # applies an incremental nodelist (see MeqServer::getNodeList()): the
+  # list itself contains newly created nodes only, 'deleted' gives the
+  # indices of removed nodes, and the optional 'update' sublist carries
+  # control status and profiling stats for all nodes
+  def _apply_delta (self,meqnl):
+    deleted = meqnl.get('deleted',None) or ();
+    created = _NodeColumns([meqnl],self._class_id);
+    _dprint(2,"applying nodelist delta: %d deleted, %d created"%(len(deleted),len(created)));
+    # drop deleted nodes, and nodes whose index has been reused by a new one
+    cols = self._cols;
+    drop = [ row for row in map(self._rownum,list(deleted)+created.ni.tolist()) if row >= 0 ];
+    if drop:
+      keep = numpy.ones(len(cols),bool);
+      keep[drop] = False;
+      for row in drop:
+        node = self._proxies.pop(int(cols.ni[row]),None);
+        if node is not None:
+          node._detach();
+      cols = cols.select(keep);
+    # created nodes carry no profiling stats: these come with the update
+    # (NB: getattr() would return the dict.update method here)
+    update = meqnl.get('update',None);
+    self._has_profiling = update is not None;
+    cols.prof = cols.cache = None;
+    self._set_columns(cols.concat(created));
+    if update is not None and update.nodeindex != (0,):
+      self._apply_update(update);
+
+  # applies a status/stats update sublist to the existing nodes
+  def _apply_update (self,update):
+    cols = self._cols;
+    rows = numpy.array(map(self._rownum,update.nodeindex),numpy.int32);
+    valid = rows >= 0;
+    old_status = cols.status.copy();
+    cols.status[rows[valid]] = numpy.array(update.control_status,numpy.int32)[valid];
+    for row,rqid in zip(rows,update.request_id):
+      if row >= 0:
+        cols.rqid[row] = rqid;
+    prof = [ None ] * len(cols);
+    cache = [ None ] * len(cols);
+    for row,ps,cs in zip(rows,update.profiling_stats,update.cache_stats):
+      if row >= 0:
+        try: prof[row] = [ps.total[0:2],ps.children[0:2],ps.get_result[0:2]];
+        except (KeyError,AttributeError): pass;
+        try: cache[row] = [cs.all_requests,cs.new_requests];
+        except (KeyError,AttributeError): pass;
+    cols.prof = _stats_array(prof,ProfilingStatsShape);
+    cols.cache = _stats_array(cache,CacheStatsShape);
+    # notify subscribers of nodes whose status has changed
+    for ni,node in self._proxies.items():
+      row = self._rownum(ni);
+      if cols.status[row] != old_status[row]:
+        node.emit(SIGNAL("status"),node,int(old_status[row]));
+
+  # installs new columns, and recomputes the derived indices
+  def _set_columns (self,cols):
+    self._cols = cols;
+    nn = len(cols);
+    # node index -> row lookup table
+    maxni = nn and int(cols.ni.max());
+    self._rowmap = numpy.zeros(maxni+1,numpy.int32) - 1;
+    self._rowmap[cols.ni] = numpy.arange(nn,dtype=numpy.int32);
+    self._namemap = dict(zip(cols.names,cols.ni.tolist()));
+    # parent adjacency: collect (parent row,child node index) pairs from
+    # both children and step-children, then sort by child row
+    src = numpy.concatenate((numpy.repeat(numpy.arange(nn),numpy.diff(cols.ch_ptr)),
+                             numpy.repeat(numpy.arange(nn),numpy.diff(cols.sc_ptr))));
+    dst = numpy.concatenate((cols.ch_ni,cols.sc_ni));
+    # ignore missing children (index<=0) and nodes not in the list
+    valid = (dst>0)&(dst<=maxni);
+    src,dst = src[valid],self._rowmap[dst[valid]];
+    valid = dst>=0;
+    src,dst = src[valid],dst[valid];
+    order = numpy.argsort(dst,kind='mergesort');
+    self._pa_ni = cols.ni[src[order]];
+    self._pa_ptr = numpy.searchsorted(dst[order],numpy.arange(nn+1));
+    self._classmap = self._rootnodes = None;
+
+  # returns the row of a node index, or -1 if not in the list
+  def _rownum (self,ni):
+    if 0 < ni < len(self._rowmap):
+      return int(self._rowmap[ni]);
+    return -1;
+
+  def _class_id (self,classname):
+    cid = self._classids.get(classname,None);
+    if cid is None:
+      cid = self._classids[classname] = len(self._classnames);
+      self._classnames.append(classname);
+    return cid;
+
+  # column accessors used by NodeList.Node
+  def _node_attr (self,row,attr):
+    cols = self._cols;
+    if attr == 'name':              return cols.names[row];
+    elif attr == 'classname':       return self._classnames[cols.classid[row]];
+    elif attr == 'proc':            return int(cols.proc[row]);
+    elif attr == 'control_status':  return int(cols.status[row]);
+    elif attr == 'request_id':      return cols.rqid[row];
+    elif attr == 'children':        return cols.children(row);
+    elif attr == 'step_children':   return cols.step_children(row);
+    elif attr == 'parents':         return self._pa_ni[self._pa_ptr[row]:self._pa_ptr[row+1]].tolist();
+    elif attr == 'profiling_stats':
+      return cols.prof[row] if cols.prof is not None else 0;
+    elif attr == 'cache_stats':
+      return cols.cache[row] if cols.cache is not None else 0;
+    raise AttributeError,attr;
+
+  def _set_node_attr (self,row,attr,value):
+    if attr == 'control_status':    self._cols.status[row] = value;
+    elif attr == 'request_id':      self._cols.rqid[row] = value;
+    else:                           raise AttributeError,attr;
+
+  # returns (creating as needed) the Node proxy for a node index
+  def _node (self,ni):
+    node = self._proxies.get(ni,None);
+    if node is None:
+      node = self._proxies[ni] = self.Node(ni,self);
+    return node;
+
 #  __init__ = busyCursorMethod(__init__);
   # return list of root nodes
   def rootnodes (self):
+    if self._rootnodes is None:
+      roots = numpy.nonzero(numpy.diff(self._pa_ptr)==0)[0];
+      self._rootnodes = map(self._node,self._cols.ni[roots].tolist());
     return self._rootnodes;
   # return map of classes
   def classes (self):
+    if self._classmap is None:
+      self._classmap = {};
+      for ni,cid in zip(self._cols.ni.tolist(),self._cols.classid.tolist()):
+        self._classmap.setdefault(self._classnames[cid],[]).append(self._node(ni));
     return self._classmap;
   def iteritems (self):
-    return self._nimap.iteritems();
+    for ni in self._cols.ni.tolist():
+      yield ni,self._node(ni);
   def iternodes (self):
-    return self._nimap.itervalues();
+    return itertools.imap(self._node,self._cols.ni.tolist());
   def has_profiling (self):
     return self._has_profiling;
+  # columnar access to profiling stats: returns a tuple of
+  # (nodeindex,profiling_stats,cache_stats) arrays, with one row per node,
+  # or None if the list carries no profiling info
+  def profiling_arrays (self):
+    if not self._has_profiling or self._cols.prof is None:
+      return None;
+    return self._cols.ni,self._cols.prof,self._cols.cache;
+  # sums profiling stats per class. Returns a dict of
+  # classname: (profiling_stats,cache_stats,node_count)
+  def class_profiling_stats (self):
+    if self.profiling_arrays() is None or not len(self._cols):
+      return {};
+    cols = self._cols;
+    order = numpy.argsort(cols.classid,kind='mergesort');
+    cids = cols.classid[order];
+    starts = numpy.nonzero(numpy.concatenate(([True],cids[1:]!=cids[:-1])))[0];
+    prof = numpy.add.reduceat(cols.prof[order],starts);
+    cache = numpy.add.reduceat(cols.cache[order],starts);
+    counts = numpy.diff(numpy.concatenate((starts,[len(cids)])));
+    return dict([ (self._classnames[cids[i0]],(prof[k],cache[k],int(counts[k])))
+                  for k,i0 in enumerate(starts) ]);
   # mapping methods
   def __len__ (self):
-    try: return len(self._nimap);
-    except AttributeError: return 0;
-  # helper method: selects name or nodeindex map depending on key type
-  def _map_ (self,key):
-    if not hasattr(self,'_namemap'):
-      raise KeyError,"nodelist is empty";
-    if isinstance(key,str):      return self._namemap;
-    elif isinstance(key,int):    return self._nimap;
-    else:                        raise TypeError,"invalid node key "+str(key);
+    return len(self._cols);
   def __getitem__ (self,key):
-    return self._map_(key).__getitem__(key);
+    if isinstance(key,str):
+      return self._node(self._namemap[key]);
+    elif isinstance(key,int):
+      if self._rownum(key) < 0:
+        raise KeyError,key;
+      return self._node(key);
+    else:
+      raise TypeError,"invalid node key "+str(key);
   def __contains__ (self,key):
-    return self._map_(key).__contains__(key);
-  def __setitem__ (self,key,node):
-    if __debug__:
-      if isinstance(key,string):  assert value.name == key;
-      elif isinstance(key,int):   assert value.nodeindex == key;
-      else:                       raise TypeError,"invalid node key "+str(key);
-    self._nimap[node.nodeindex] = self._namemap[node.name] = node;
+    if isinstance(key,str):      return key in self._namemap;
+    elif isinstance(key,int):    return self._rownum(key) >= 0;
+    else:                        raise TypeError,"invalid node key "+str(key);
   def __iter__(self):
-    return iter(self._nimap);
+    return iter(self._cols.ni.tolist());
 
   # return True if this is a valid meqNodeList (i.e. node list object from meq kernel)
   def is_valid_meqnodelist (nodelist):
@@ -555,8 +849,9 @@ def request_nodelist (force=False,profiling_stats=False,sync=False):
   """Sends a request to the kernel to return a nodelist.""";
   rec = NodeList.RequestRecord;
   rec.sync = sync;
-  # force explicit refresh
-  if force or profiling_stats:
+  # force explicit refresh. Profiling stats are sent as an in-place
+  # update of the existing list, so they no longer need a full reload
+  if force:
     rec.forest_serial = 0;
   else:
     rec.forest_serial = nodelist.serial;
@@ -653,8 +948,10 @@ def set_node_state (node,**kwargs):
 def update_node_state (state,event):
   ni = state.nodeindex;
   _dprint(5,"updating state of node ",state.name);
-  if nodelist:
-    nodelist[ni].update_state(state,event);
+  # the node may be missing from a stale list awaiting a delta
+  try: node = nodelist[ni];
+  except KeyError: return;
+  node.update_state(state,event);
 
 # create global node list
 nodelist = NodeList();
@@ -163,7 +163,7 @@ def import_tdl_module (filename,text=None,config=0):
     raise TDL.CumulativeError(*ns.GetErrors());
 
 def run_forest_definition (mqs,filename,tdlmod,text,
-                           parent=None,wait=True,
+                           parent=None,wait=True,progress=None,
                            predef_args={},define_args={},postdef_args={}):
   """Compiles a TDL script and sends it to meqserver given by mqs.
   Parameters:
@@ -173,6 +173,8 @@ def run_forest_definition (mqs,filename,tdlmod,text,
     text:     script text for putting into forest
     parent:   parent widget passed to TDL script (if a GUI is running)
     wait:     if True, waits for forest to build before returning
+    progress: if not None, called as progress(nsent,num_nodes) as node
+              definitions are sent to the meqserver
     predef_args: dict of extra arguments for _tdl_predefine()
     define_args: dict of extra arguments for _define_forest()
     postdef_args: dict of extra arguments for _tdl_postdefine()
@@ -223,8 +225,9 @@ def run_forest_definition (mqs,filename,tdlmod,text,
     # call the define function
     define_func(ns,**args);
     _update_modlist();
-    # resolve the nodescope
-    ns.Resolve();
+    # resolve the nodescope. Keying the resolve on the filename lets
+    # recompiles of the same script reuse unchanged init-records
+    ns.Resolve(cache_key=filename);
     # do we have an error list? show it
     errlist = ns.GetErrors();
     if errlist:
@@ -243,9 +246,14 @@ def run_forest_definition (mqs,filename,tdlmod,text,
       fst.tdl_source = record(**{os.path.basename(filename):text});
       mqs.meq('Set.Forest.State',record(state=fst,get_forest_status=0));
       if num_nodes:
-        mqs.meq('Create.Node.Batch',
-            record(script_name=os.path.basename(filename),
-            batch=map(lambda nr:nr.initrec(),allnodes.itervalues())));
+        if progress:
+          progress_func = lambda nsent:progress(nsent,num_nodes);
+        else:
+          progress_func = None;
+        mqs.createnodebatch((nr.initrec() for nr in allnodes.itervalues()),
+            script_name=os.path.basename(filename),
+            chunk_size=getattr(Timba.TDL.Settings,'node_batch_chunk_size',0),
+            progress=progress_func);
 #        mqs.meq('Init.Node.Batch',record(name=list(ns.RootNodes().iterkeys())),wait=wait);
         msg = """TDL script successfully compiled. %d node definitions
   (of which %d are root nodes) sent to meqserver.""" \
@@ -294,12 +302,12 @@ def run_forest_definition (mqs,filename,tdlmod,text,
 
 
 
-def compile_file (mqs,filename,text=None,parent=None,wait=True,config=0,
+def compile_file (mqs,filename,text=None,parent=None,wait=True,config=0,progress=None,
                   predef_args={},define_args={},postdef_args={}):
   """imports TDL module and runs forest definition.
   Basically a compound of the above two functions.""";
   (tdlmod,text) = import_tdl_module(filename,text=text,config=config);
-  return run_forest_definition(mqs,filename,tdlmod,text,wait=wait,
+  return run_forest_definition(mqs,filename,tdlmod,text,wait=wait,progress=progress,
                   predef_args=predef_args,define_args=define_args,postdef_args=postdef_args);
 
 
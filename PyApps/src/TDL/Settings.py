@@ -29,5 +29,14 @@ from Timba import dmi
 
 orphans_are_roots = True;
 
-forest_state = dmi.record();
+# if >0, node definitions are sent to the meqserver in chunks of this size
+# (see meqserver.createnodebatch()); 0 sends them in a single batch
+node_batch_chunk_size = 0;
+
+# if True, chains of elementwise function nodes created by implicit
+# arithmetic (e.g. a*b+c*exp(d)) are folded into single MeqFused nodes
+# when the forest is resolved (checked against the unfused nodes by
+# MeqNodes/test/tFused)
+fuse_expressions = False;
 
+forest_state = dmi.record();
@@ -35,6 +35,7 @@ import traceback
 import re
 import os.path
 import copy
+import hashlib
 
 _dbg = utils.verbosity(0,name='tdl');
 _dprint = _dbg.dprint;
@@ -362,7 +363,10 @@ class _NodeDef (object):
       basename = ','.join(map(lambda x:x[1].basename,self.children));
       basename = "%s(%s)" % (classname,basename);
       _dprint(4,"creating auto-name",basename,quals,kwquals);
-      return scope[basename](*quals,**kwquals) << self;
+      node = scope[basename](*quals,**kwquals) << self;
+      # mark it, so that it can be folded into its parent when resolving
+      node._autodefined = True;
+      return node;
     else:
       basename = scope.MakeUniqueName(classname);
       return scope[basename] << self;
@@ -914,6 +918,95 @@ class NodeGroup (dict):
 _MODULE_FILENAME = Timba.utils.extract_stack()[-1][0];
 _MODULE_DIRNAME = os.path.dirname(_MODULE_FILENAME);
 
+# results of the last cached _NodeRepository.resolve() (see cache_key argument)
+_resolve_cache = {};
+
+class _NodeIndexAllocator (object):
+  """Assigns node indices during a repository resolve. Names found in
+  prev_indices get their previous index back, as long as they are among
+  current_names. Other names get free indices, filling holes first: these
+  include the indices of nodes that have since gone away.
+  """;
+  def __init__ (self,prev_indices,current_names):
+    self._prev = prev_indices;
+    used = set([ prev_indices[name] for name in current_names if name in prev_indices ]);
+    self._next = max(used or [0]) + 1;
+    self._free = [ ni for ni in xrange(self._next-1,0,-1) if ni not in used ];
+  def __call__ (self,name):
+    ni = self._prev.get(name,None);
+    if ni is not None:
+      return ni;
+    if self._free:
+      return self._free.pop();
+    ni = self._next;
+    self._next += 1;
+    return ni;
+
+def _digest_value (md5,value):
+  """Feeds a canonical form of value into md5. Records and dicts are
+  fed in key order, arrays as their type, shape and raw data.
+  """;
+  if isinstance(value,dict):
+    md5.update("%s{%d"%(type(value).__name__,len(value)));
+    for key in sorted(value.iterkeys()):
+      md5.update("%r:"%(key,));
+      _digest_value(md5,value[key]);
+    md5.update("}");
+  elif isinstance(value,(list,tuple)):
+    md5.update("%s[%d"%(type(value).__name__,len(value)));
+    for item in value:
+      _digest_value(md5,item);
+    md5.update("]");
+  elif dmi.is_array(value):
+    md5.update("array(%s,%s)"%(value.dtype.str,value.shape));
+    md5.update(value.tostring());
+  else:
+    md5.update("%s(%r)"%(type(value).__name__,value));
+
+# init-record fields filled in by _NodeRepository.resolve()
+_resolved_initrec_fields = set(('nodeindex','name','node_description',
+                                'children','step_children','parents'));
+
+def _initrec_digest (initrec):
+  """Returns a digest of a node's init-record, leaving out the fields
+  filled in by _NodeRepository.resolve(). The digest of a raw init-record
+  thus equals that of the record it is finalized into.
+  """;
+  md5 = hashlib.md5();
+  for key in sorted(initrec.iterkeys()):
+    if key not in _resolved_initrec_fields:
+      md5.update("%r:"%(key,));
+      _digest_value(md5,initrec[key]);
+  return md5.digest();
+
+def _node_links (node):
+  """Returns a tuple describing a node's links (by name) and description,
+  for comparison with the previous resolve (see _NodeRepository.resolve()).
+  """;
+  return (node._debuginfo,node.children.is_dict,
+          tuple([ (label,child and child.name) for label,child in node.children ]),
+          tuple([ child.name for label,child in node.stepchildren ]),
+          tuple(sorted(node.parents.iterkeys())));
+
+# Node classes that can be folded into a MeqFused node (see
+# _NodeRepository.fuse_expressions()), mapped to their MeqFused opcode and
+# number of children. None means any number of children.
+_fusable_classes = dict(MeqAdd=('add',None),MeqSubtract=('sub',None),
+                        MeqMultiply=('mul',None),MeqDivide=('div',2),
+                        MeqNegate=('neg',1),MeqInvert=('inv',1));
+for _name in ( 'Abs','Acos','Arg','Asin','Atan','Ceil','Conj','Cos','Cosh',
+               'Exp','Fabs','Floor','Imag','Log','Real','Sin','Sinh','Sqr',
+               'Sqrt','Tan','Tanh','Pow2','Pow3','Pow4','Pow5','Pow6',
+               'Pow7','Pow8' ):
+  _fusable_classes['Meq'+_name] = (_name.lower(),1);
+for _name in ( 'Atan2','FMod','Polar','Pow','ToComplex' ):
+  _fusable_classes['Meq'+_name] = (_name.lower(),2);
+del _name;
+
+# init-record fields that a node may have and still be fused
+_fusable_initrec_fields = set(('class','proc','name','nodeindex','node_description',
+                               'children','step_children','parents'));
+
 class _NodeRepository (dict):
   def __init__ (self,root_scope,testing=False,caller_filename=None):
     """initializes repository.
@@ -985,6 +1078,87 @@ class _NodeRepository (dict):
           self.deleteOrphan(ch);
     return True;
 
+  def fuse_expressions (self):
+    """Folds chains of elementwise function nodes (MeqAdd, MeqMultiply,
+    MeqExp, etc.) into MeqFused nodes, which evaluate a whole expression
+    in one pass instead of making a full-size intermediate result per
+    operator. Only nodes auto-defined by implicit arithmetic (e.g. the a*b
+    in "ns.x << a*b+c") are folded into their parent, and only if they have
+    no other parents and no init-record fields of their own. The top node
+    of each chain keeps its name and becomes the MeqFused node.
+    Returns the number of nodes folded away.
+    """;
+    def fusable (node):
+      try: opcode,nch = _fusable_classes[node.classname];
+      except KeyError: return False;
+      if node.stepchildren or node.children.is_dict or \
+          ( nch is not None and len(node.children) != nch ) or \
+          [ ch for label,ch in node.children if ch is None ]:
+        return False;
+      for key in node._initrec.iterkeys():
+        if key not in _fusable_initrec_fields:
+          return False;
+      return True;
+    def absorbable (node):
+      if not getattr(node,'_autodefined',False) or len(node.parents) != 1 or \
+          not node.initialized() or not fusable(node):
+        return False;
+      parent = node.parents.values()[0];
+      return fusable(parent) and parent._proc == node._proc;
+    # builds up the program for node and its absorbable children
+    def make_program (node,program,leaves,absorbed):
+      for label,child in node.children:
+        if absorbable(child):
+          make_program(child,program,leaves,absorbed);
+          absorbed[child.name] = child;
+        else:
+          leaves.setdefault(child.name,(len(leaves),child));
+          program.append('$%d'%leaves[child.name][0]);
+      opcode,nch = _fusable_classes[node.classname];
+      if nch is None:
+        opcode = '%s %d'%(opcode,len(node.children));
+      program.append(opcode);
+    roots = [ node for node in self.itervalues()
+              if node.initialized() and fusable(node) and not absorbable(node) ];
+    nfused = 0;
+    for node in roots:
+      program = [];
+      leaves = {};
+      absorbed = {};
+      make_program(node,program,leaves,absorbed);
+      if not absorbed:
+        continue;
+      _dprint(3,'fusing',node.name,'with',absorbed.keys(),'program',program);
+      # repoint the leaves from the absorbed nodes to the fused node
+      children = [ child for index,child in sorted(leaves.itervalues()) ];
+      for child in children:
+        for name in absorbed.iterkeys():
+          child.parents.pop(name,None);
+        child.parents[node.name] = node;
+      # remove absorbed nodes from repository, and from the scope dictionary
+      # for unqualified names (see deleteOrphan())
+      for name,absnode in absorbed.iteritems():
+        del self[name];
+        if not ( absnode.quals or absnode.kwquals ):
+          try: delattr(absnode.scope,name.split('::')[-1]);
+          except AttributeError: pass;
+      # keep the node's own init-record fields (node_description, etc.); the
+      # children and class are replaced
+      initrec = dmi.record(program=program);
+      for key,value in node._initrec.iteritems():
+        if key not in ('class','children','step_children'):
+          initrec[key] = value;
+      initrec['class'] = node.classname = 'MeqFused';
+      if node._proc is not None:
+        initrec.proc = node._proc;
+      node._initrec = initrec;
+      node.children = _NodeDef.ChildList(children);
+      nfused += len(absorbed);
+      child = absnode = None;  # relinquish refs, otherwise orphan collection is confused
+    node = None;
+    _dprint(1,nfused,"nodes were fused into expressions");
+    return nfused;
+
   def rootmap (self):
     try: return self._roots;
     except:
@@ -1167,12 +1341,29 @@ class _NodeRepository (dict):
     return [ node for name,node in self.iteritems() \
                   if match(name) and node._initrec is not None ];
 
-  def resolve (self,cleanup_orphans):
+  def resolve (self,cleanup_orphans,cache_key=None,fuse_expressions=False):
     """resolves contents of repository.
     cleanup_orphans: If True, then all orphan nodes are deleted.
                      If False, all orphans will be treated as root nodes.
+    cache_key:       If not None, the node indices and finalized init-records
+                     are remembered under this key (usually the script
+                     filename). A later resolve with the same key keeps the
+                     node indices of same-named nodes, and reuses the old
+                     init-records of nodes whose links and init-record
+                     digests have not changed.
+    fuse_expressions: If True, chains of elementwise function nodes are
+                     folded into MeqFused nodes (see fuse_expressions()).
     This will also create a VisDataMux as needed.
     """;
+    # results of the previous resolve with the same key, if any
+    global _resolve_cache;
+    if cache_key is not None and _resolve_cache.get('key') == cache_key:
+      prev_indices = _resolve_cache['nodeindices'];
+      prev_initrecs = _resolve_cache['initrecs'];
+    else:
+      prev_indices = prev_initrecs = {};
+    allocate_index = _NodeIndexAllocator(prev_indices,
+        [ name for name,node in self.iteritems() if node.initialized() ]);
     uninit = [];
     orphans = [];
     self._roots = {};
@@ -1221,9 +1412,11 @@ class _NodeRepository (dict):
       for proc,nodelist in self._proc_assignment.iteritems():
         for node in nodelist:
           recursive_proc_assign(node,proc);
+    # fold expressions, now that all processor assignments are known
+    if fuse_expressions:
+      self.fuse_expressions();
     # now go through node list, weed out uninitialized nodes, finalize
     # parents and children, etc.
-    current_nodeindex = 1;
     for (name,node) in self.iteritems():
       if not node.initialized():
         uninit.append(name);
@@ -1243,14 +1436,9 @@ class _NodeRepository (dict):
             if node._name_stack != ch._name_stack:
               self.add_error(node._name_stack.make_error(UninitializedNode,
                                 "...node '%s' used in this context"%ch.name));
-        # make copy of initrec if needed
-        if hasattr(node._initrec,'name'):
-          node._initrec = node._initrec.copy();
-        # finalize the init-record by adding node name and children
-        node.nodeindex = node._initrec.nodeindex = current_nodeindex;
-        current_nodeindex += 1;
-        node._initrec.node_description = ':'.join((name,node.classname,node._debuginfo));
-        node._initrec.name = node.name;
+        # assign node index. The init-record is finalized below, once
+        # the indices of all children and parents are known
+        node.nodeindex = allocate_index(name);
         _dprint(3,'checked node',node.name,'nodeindex',node.nodeindex);
         ch = None; # relinquish ref to node, otherwise orphan collection is confused
     node = None;  # relinquish ref to node, otherwise orphan collection is confused
@@ -1270,9 +1458,31 @@ class _NodeRepository (dict):
     if cleanup_orphans:
       map(self.deleteOrphan,orphans);
     _dprint(1,len0 - len(self),"orphans were deleted,",len(self._roots),"roots remain");
-    # now that all nodeindices have been assigned, do another loop to resolve
-    # the children specifications and replace them with node indices
+    # now that all nodeindices have been assigned, do another loop to
+    # finalize the init-records: add node name and index, and resolve the
+    # children specifications and replace them with node indices
+    num_reused = 0;
+    links = {};
+    digests = {};
     for node in self.itervalues():
+      # unchanged since the previous resolve? Nodes that were linked by
+      # the same names then still have the same indices (see
+      # _NodeIndexAllocator), so if the links and the digest of the
+      # init-record match, the old finalized init-record can be reused.
+      # Digests are only computed for such candidates.
+      if cache_key is not None:
+        nodelinks = links[node.name] = _node_links(node);
+        prev = prev_initrecs.get(node.name,None);
+        if prev is not None and prev[0] == nodelinks:
+          prevrec,prevdigest = prev[1:];
+          digest = _initrec_digest(node._initrec);
+          if digest == (prevdigest or _initrec_digest(prevrec)):
+            node._initrec = prevrec;
+            digests[node.name] = digest;
+            num_reused += 1;
+            continue;
+      fields = dict(nodeindex=node.nodeindex,name=node.name,
+                    node_description=':'.join((node.name,node.classname,node._debuginfo)));
       if node.children.is_dict:
         children = dmi.record([(label,getattr(child,'nodeindex',-1))
                                   for label,child in node.children]);
@@ -1280,13 +1490,28 @@ class _NodeRepository (dict):
         children = [ getattr(child,'nodeindex',-1) for label,child in node.children ];
       _dprint(5,'node',node.name,'child nodeindices are',children);
       if children:
-        node._initrec.children = children;
+        fields['children'] = children;
       if node.stepchildren:
-        node._initrec.step_children = [ child.nodeindex for label,child in node.stepchildren ];
+        fields['step_children'] = [ child.nodeindex for label,child in node.stepchildren ];
       # assign parent list
       if node.parents:
-        node._initrec.parents = [ parent.nodeindex for parent in node.parents.itervalues() ];
-      
+        fields['parents'] = [ parent.nodeindex for parent in node.parents.itervalues() ];
+      # make copy of initrec if needed (i.e. if it is shared with another
+      # node that has already finalized it)
+      if hasattr(node._initrec,'name'):
+        node._initrec = node._initrec.copy();
+      for field,value in fields.iteritems():
+        node._initrec[field] = value;
+    node = None;  # relinquish ref to node
+    if prev_initrecs:
+      _dprint(1,"reused",num_reused,"of",len(self),"init-records from previous resolve");
+    # remember results for the next resolve with the same key
+    if cache_key is not None:
+      _resolve_cache = dict(key=cache_key,
+        nodeindices=dict([ (name,node.nodeindex) for name,node in self.iteritems() ]),
+        initrecs=dict([ (name,(links[name],node._initrec,digests.get(name)))
+                        for name,node in self.iteritems() ]));
+
     # print roots in debug mode
     if _dbg.verbose > 3:
       for node in self._roots.itervalues():
@@ -1482,12 +1707,15 @@ class NodeScope (object):
     """Returns the repository""";
     return self._repository;
 
-  def Resolve (self):
+  def Resolve (self,cache_key=None):
     """Resolves the node repository: checks tree, trims orphans, etc. Should be done as the final
     step of tree definition. If rootnodes is supplied (or if self.ROOT is populated), then root
     nodes outside the specified group will be considered orphans and trimmed away.
+    If cache_key is given (e.g. the script filename), node indices and unchanged init-records
+    are carried over from the previous Resolve() with the same key.
     """;
-    self._repository.resolve(not Timba.TDL.Settings.orphans_are_roots);
+    self._repository.resolve(not Timba.TDL.Settings.orphans_are_roots,cache_key=cache_key,
+                             fuse_expressions=Timba.TDL.Settings.fuse_expressions);
 
   def AllNodes (self):
     """returns the complete node repository. A node repository is essentially
@@ -32,15 +32,17 @@ Runs TDL scripts in batch mode. <commands> are interpreted as follows:
 """);
   parser.add_option("-c","--config",dest="config",type="string",
                     help="configuration file to use (default batch.tdlconf)");
-  parser.add_option("--mt",dest="mt",type="int",
-                    help="number of threads to run in meqserver (default 1)");
+  parser.add_option("--mt",dest="mt",type="string",metavar="N[:SCHED][:AFFINITY]",
+                    help="number of threads to run in meqserver (default 1), optionally followed by "
+                    "the work order scheduler (lifo or steal) and/or the thread affinity policy "
+                    "(none, core or socket), e.g. --mt 8:steal:socket");
   parser.add_option("-d", "--debug",dest="debug",type="string",action="append",metavar="Context=Level",
                     help="(for debugging C++ code) sets debug level of the named C++ context. May be used multiple times.");
   parser.add_option("-v", "--verbose",dest="verbose",type="string",action="append",metavar="Context=Level",
                     help="(for debugging Python code) sets verbosity level of the named Python context. May be used multiple times.");
   parser.add_option("-t", "--trace",dest="trace",action="store_true",
                     help="(for debugging Python code) enables line tracing of Python statements");
-  parser.set_defaults(mt=1,config="batch.tdlconf");
+  parser.set_defaults(mt="1",config="batch.tdlconf");
 
   (options, rem_args) = parser.parse_args();
 
@@ -0,0 +1,87 @@
+#!/usr/bin/python
+#
+#% $Id$ 
+#
+#
+# Copyright (C) 2002-2007
+# The MeqTree Foundation & 
+# ASTRON (Netherlands Foundation for Research in Astronomy)
+# P.O.Box 2, 7990 AA Dwingeloo, The Netherlands
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, see <http://www.gnu.org/licenses/>,
+# or write to the Free Software Foundation, Inc., 
+# 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+
+# Checks the whenever mask index of proxy_wp against a brute-force
+# matches() scan, using real (named) hiid masks.
+
+import sys
+from Timba.dmi import *
+from Timba.octopussy import _mask_index
+
+masks = [ hiid('node.status.*'),
+          hiid('node.status'),
+          hiid('node.?.state'),
+          hiid('node.*'),
+          hiid('result.*'),
+          hiid('vis.header'),
+          hiid('*') ];
+
+msgids = [ hiid('node.status'),
+           hiid('node.status.1.2'),
+           hiid('node.get.state'),
+           hiid('node.status.state'),
+           hiid('result.node.get.state'),
+           hiid('vis.header'),
+           hiid('vis.footer'),
+           hiid('request.1') ];
+
+def sorted_masks (lst):
+  lst = map(tuple,lst);
+  lst.sort();
+  return lst;
+
+def main ():
+  index = _mask_index();
+  for m in masks:
+    index.add(m);
+  nfail = 0;
+  for msgid in msgids:
+    result = index.match(msgid);
+    expected = [ m for m in masks if msgid.matches(m) ];
+    if result is None:
+      print "%s: index returned None (full scan fallback)"%msgid;
+      nfail += 1;
+    elif sorted_masks(result) != sorted_masks(expected):
+      print "%s: index gives %s, expected %s"%(msgid,result,expected);
+      nfail += 1;
+  # messages ids with wildcards must fall back to a full scan
+  if index.match(hiid('node.*')) is not None:
+    print "node.*: expected None";
+    nfail += 1;
+  # removing masks must remove them from the results
+  index.remove(hiid('node.*'));
+  index.remove(hiid('*'));
+  if sorted_masks(index.match(hiid('node.status'))) != sorted_masks([hiid('node.status.*'),hiid('node.status')]):
+    print "node.status: wrong result after removing masks";
+    nfail += 1;
+  if nfail:
+    print nfail,"test(s) FAILED";
+  else:
+    print "all tests OK";
+  return nfail;
+
+if __name__ == '__main__':
+  sys.exit(main() and 1 or 0);